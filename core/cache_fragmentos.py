@@ -0,0 +1,61 @@
+"""
+Versionado de fragmentos de plantilla cacheados por tenant.
+
+Cada fragmento (menú lateral, paleta de diagnósticos, catálogos SAT) tiene un
+contador de versión por schema. Las plantillas usan la versión como parte de la
+llave de {% cache %}, y las señales la incrementan cuando cambian los datos de
+origen, de modo que nunca se sirve HTML obsoleto y no hace falta borrar llaves.
+
+Uso en plantillas (ver context_processors.fragmentos_cache):
+    {% load cache %}
+    {% cache 86400 menu_dinamico fragmentos.menu user.pk %} ... {% endcache %}
+"""
+from django.core.cache import cache
+from django.db import connection
+
+FRAGMENTOS = ('menu', 'diagnosticos', 'sat')
+
+# Tiempo de vida de los fragmentos en plantillas; la invalidación real es por versión
+TIMEOUT_FRAGMENTO = 60 * 60 * 24
+
+
+def _schema_actual():
+    return getattr(connection, 'schema_name', 'public')
+
+
+def _clave(fragmento, schema):
+    return f'fragmento_version:{schema}:{fragmento}'
+
+
+def versiones(schema=None):
+    """
+    Devuelve {fragmento: '<schema>:<version>'} para todos los fragmentos con una
+    sola lectura al caché. El schema va incluido para que la llave sea única por tenant.
+    """
+    schema = schema or _schema_actual()
+    claves = {_clave(f, schema): f for f in FRAGMENTOS}
+    actuales = cache.get_many(list(claves))
+    resultado = {}
+    for clave, fragmento in claves.items():
+        version = actuales.get(clave)
+        if version is None:
+            version = 1
+            cache.add(clave, version, None)
+        resultado[fragmento] = f'{schema}:{version}'
+    return resultado
+
+
+def version(fragmento, schema=None):
+    """Versión actual de un fragmento para el schema dado (o el activo)."""
+    return versiones(schema)[fragmento]
+
+
+def invalidar(*fragmentos, schema=None):
+    """Incrementa la versión de los fragmentos indicados en el schema activo."""
+    schema = schema or _schema_actual()
+    for fragmento in fragmentos:
+        clave = _clave(fragmento, schema)
+        try:
+            cache.incr(clave)
+        except ValueError:
+            cache.set(clave, 2, None)
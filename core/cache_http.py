@@ -0,0 +1,134 @@
+"""
+Caché HTTP (ETag / Last-Modified) para las APIs JSON de catálogos.
+
+Los catálogos que los formularios piden cada vez que se abren (diagnósticos,
+servicios por dentista, horarios, tipos de trabajo de laboratorio) casi nunca
+cambian. Cada modelo tiene una versión por schema en el caché que las señales
+avanzan al guardar o borrar (ver signals.py). La vista decorada calcula el ETag
+con esas versiones y, si el navegador ya tiene la respuesta vigente, contesta
+304 sin ejecutar la vista ni consultar los modelos.
+
+La versión es un timestamp en milisegundos: sirve también como Last-Modified y,
+si el caché la pierde (se reinicia o se purga), vuelve con un valor nuevo en
+lugar de repetir uno que un navegador pudiera tener guardado.
+
+Uso (debajo del decorador de login para que el 304 también exija sesión):
+    @tenant_login_required
+    @cache_catalogo(models.Diagnostico)
+    def diagnostico_api_list(request): ...
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+# Segundos que el navegador puede reutilizar la respuesta sin preguntar
+MAX_AGE_CATALOGO = 60
+
+
+def _clave(modelo, schema):
+    return f'http_version:{schema}:{modelo._meta.label_lower}'
+
+
+def _ahora_ms():
+    return int(time.time() * 1000)
+
+
+def _avanzar(clave):
+    actual = cache.get(clave) or 0
+    cache.set(clave, max(_ahora_ms(), actual + 1), None)
+
+
+def invalidar(modelo, schema=None):
+    """
+    Avanza la versión de `modelo` en el schema activo; las respuestas anteriores dejan de validar.
+    Se avanza otra vez al confirmar la transacción: lo que otra request haya
+    guardado con la versión intermedia (leyendo datos aún sin confirmar) queda descartado.
+    """
+    clave = _clave(modelo, schema or connection.schema_name)
+    _avanzar(clave)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _avanzar(clave))
+
+
+def versiones(*modelos, schema=None):
+    """Versiones actuales de `modelos` en el schema dado (o el activo), con una sola lectura al caché."""
+    claves = [_clave(m, schema or getattr(connection, 'schema_name', 'public')) for m in modelos]
+    return _versiones(claves, cache.get_many(claves))
+
+
+def _versiones(claves, actuales):
+    """Versiones de `claves`, inicializando con la hora actual las que no estén en el caché."""
+    faltantes = {clave: _ahora_ms() for clave in claves if clave not in actuales}
+    for clave, version in faltantes.items():
+        cache.add(clave, version, None)
+    return [{**faltantes, **actuales}[clave] for clave in claves]
+
+
+async def _aversiones(claves):
+    """Como _versiones() para vistas async: DatabaseCache no puede tocar la BD desde el event loop."""
+    actuales = await cache.aget_many(claves)
+    faltantes = {clave: _ahora_ms() for clave in claves if clave not in actuales}
+    for clave, version in faltantes.items():
+        await cache.aadd(clave, version, None)
+    return [{**faltantes, **actuales}[clave] for clave in claves]
+
+
+def _validadores(versiones, schema):
+    firma = f"{schema}:{':'.join(str(v) for v in versiones)}"
+    etag = quote_etag(hashlib.md5(firma.encode(), usedforsecurity=False).hexdigest())
+    return etag, max(versiones) // 1000
+
+
+def _schema(request):
+    tenant = getattr(request, 'tenant', None)
+    return getattr(tenant, 'schema_name', None) or getattr(connection, 'schema_name', 'public')
+
+
+def _completar(response, etag, ultima_modificacion, max_age):
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(ultima_modificacion)
+        patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+def cache_catalogo(*modelos, max_age=MAX_AGE_CATALOGO):
+    """
+    Decorador para vistas GET cuyo resultado depende solo de `modelos`.
+    Acepta vistas síncronas y async.
+    """
+    def decorador(vista):
+        if iscoroutinefunction(vista):
+            @wraps(vista)
+            async def envoltura(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await vista(request, *args, **kwargs)
+                schema = _schema(request)
+                claves = [_clave(m, schema) for m in modelos]
+                versiones = await _aversiones(claves)
+                etag, ultima_modificacion = _validadores(versiones, schema)
+                no_modificada = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+                if no_modificada is not None:
+                    return _completar(no_modificada, etag, ultima_modificacion, max_age)
+                return _completar(await vista(request, *args, **kwargs), etag, ultima_modificacion, max_age)
+        else:
+            @wraps(vista)
+            def envoltura(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return vista(request, *args, **kwargs)
+                schema = _schema(request)
+                claves = [_clave(m, schema) for m in modelos]
+                versiones = _versiones(claves, cache.get_many(claves))
+                etag, ultima_modificacion = _validadores(versiones, schema)
+                no_modificada = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+                if no_modificada is not None:
+                    return _completar(no_modificada, etag, ultima_modificacion, max_age)
+                return _completar(vista(request, *args, **kwargs), etag, ultima_modificacion, max_age)
+        return envoltura
+    return decorador
@@ -0,0 +1,224 @@
+"""
+PDF firmado de los consentimientos de pacientes: documento base + hoja de firmas.
+
+El texto legal de cada versión de ConsentimientoInformado se compone una sola
+vez (su archivo_pdf, subido o generado con `generar_pdfs_consentimiento`). Para
+un PacienteConsentimiento firmado no se vuelve a maquetar ese texto: se toma el
+PDF base (leído una vez por proceso), se estampa en cada página un pie pequeño
+con los datos del paciente y se agrega una hoja con las firmas. Ambas piezas se
+dibujan con ReportLab en una sola página cada una y se combinan con pypdf.
+
+El resultado se guarda por contenido (consentimientos_firmados/ab/<sha256>.pdf)
+y el hash queda en PacienteConsentimiento.hash_documento, así que el archivo
+sirve también para verificar que el documento no cambió.
+
+Uso:
+    nombre = guardar_firmado(paciente_consentimiento)
+    exportar_zip(PacienteConsentimiento.objects.filter(...), archivo_destino)
+"""
+import csv
+import hashlib
+import io
+import logging
+import zipfile
+from functools import lru_cache
+
+from django.core.files.base import ContentFile
+from django.utils import timezone
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+CARPETA_FIRMADOS = 'consentimientos_firmados'
+
+# PDFs base (bytes) en memoria por proceso, por nombre de archivo de la versión
+MAX_BASES_EN_CACHE = 16
+
+
+@lru_cache(maxsize=MAX_BASES_EN_CACHE)
+def _leer_base(storage, nombre):
+    with storage.open(nombre, 'rb') as archivo:
+        return archivo.read()
+
+
+def base_pdf(consentimiento):
+    """Bytes del PDF base de una versión del consentimiento (leído una vez por proceso)."""
+    # Cada versión sube su propio archivo; si se reemplaza, el nombre cambia y la llave también
+    return _leer_base(consentimiento.archivo_pdf.storage, consentimiento.archivo_pdf.name)
+
+
+def _canvas(buffer, tamano):
+    from reportlab.pdfgen import canvas
+
+    # invariant: sin fecha de creación ni id aleatorio, el mismo contenido produce los mismos bytes
+    return canvas.Canvas(buffer, pagesize=tamano, invariant=1)
+
+
+def _pie(paciente_consentimiento, tamano):
+    """Página transparente con el pie que se estampa sobre cada página del documento base."""
+    ancho, _ = tamano
+    buffer = io.BytesIO()
+    c = _canvas(buffer, tamano)
+    paciente = paciente_consentimiento.paciente
+    fecha = timezone.localtime(paciente_consentimiento.fecha_firmado).strftime('%d/%m/%Y %H:%M')
+    c.setFont('Helvetica', 7)
+    c.setFillGray(0.35)
+    c.drawString(
+        36, 18,
+        f'Paciente: {paciente.nombre} {paciente.apellido}  ·  Folio {paciente_consentimiento.pk}  ·  Firmado: {fecha}'
+    )
+    c.drawRightString(ancho - 36, 18, f'v{paciente_consentimiento.consentimiento.version}')
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _firma(c, archivo, x, y, ancho, alto):
+    """Dibuja la imagen de firma (ya normalizada a PNG de 1 bit, ver imagenes.py) si se puede leer."""
+    from reportlab.lib.utils import ImageReader
+
+    if not archivo:
+        return
+    try:
+        with archivo.open('rb') as contenido:
+            lector = ImageReader(io.BytesIO(contenido.read()))
+        c.drawImage(lector, x, y, ancho, alto, mask='auto', preserveAspectRatio=True, anchor='sw')
+    except Exception:
+        logger.warning("No se pudo dibujar la firma %s", archivo.name, exc_info=True)
+
+
+def _hoja_firmas(paciente_consentimiento, tamano):
+    """Hoja final con los datos del paciente y las firmas de paciente y testigos."""
+    ancho, alto = tamano
+    pc = paciente_consentimiento
+    buffer = io.BytesIO()
+    c = _canvas(buffer, tamano)
+    y = alto - 72
+
+    c.setFont('Helvetica-Bold', 14)
+    c.drawString(72, y, 'CONSTANCIA DE FIRMA')
+    y -= 22
+    c.setFont('Helvetica', 10)
+    lineas = [
+        f'Documento: {pc.consentimiento.titulo} (versión {pc.consentimiento.version})',
+        f'Paciente: {pc.paciente.nombre} {pc.paciente.apellido}',
+        f'Fecha de firma: {timezone.localtime(pc.fecha_firmado).strftime("%d/%m/%Y %H:%M")}',
+        f'Folio: {pc.pk}',
+    ]
+    if pc.presentado_por_id:
+        lineas.append(f'Presentado por: {pc.presentado_por}')
+    for linea in lineas:
+        c.drawString(72, y, linea)
+        y -= 15
+
+    firmas = [('Firma del paciente', pc.firma_paciente, f'{pc.paciente.nombre} {pc.paciente.apellido}')]
+    if pc.firma_testigo1:
+        firmas.append(('Testigo 1', pc.firma_testigo1, pc.nombre_testigo1))
+    if pc.firma_testigo2:
+        firmas.append(('Testigo 2', pc.firma_testigo2, pc.nombre_testigo2))
+
+    y -= 20
+    for titulo, archivo, nombre in firmas:
+        y -= 90
+        _firma(c, archivo, 72, y + 6, 220, 80)
+        c.line(72, y, 292, y)
+        c.setFont('Helvetica', 9)
+        c.drawString(72, y - 12, f'{titulo}: {nombre}')
+        y -= 30
+
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def generar_firmado(paciente_consentimiento):
+    """Bytes del PDF firmado: páginas del documento base con pie + hoja de firmas."""
+    from pypdf import PdfReader, PdfWriter
+
+    base = PdfReader(io.BytesIO(base_pdf(paciente_consentimiento.consentimiento)))
+    primera = base.pages[0].mediabox
+    tamano = (float(primera.width), float(primera.height))
+    pie = PdfReader(io.BytesIO(_pie(paciente_consentimiento, tamano))).pages[0]
+
+    escritor = PdfWriter()
+    for pagina in base.pages:
+        agregada = escritor.add_page(pagina)
+        agregada.merge_page(pie)
+    escritor.add_page(PdfReader(io.BytesIO(_hoja_firmas(paciente_consentimiento, tamano))).pages[0])
+    escritor.add_metadata({
+        '/Title': f'{paciente_consentimiento.consentimiento.titulo} - {paciente_consentimiento.paciente}',
+    })
+    salida = io.BytesIO()
+    escritor.write(salida)
+    return salida.getvalue()
+
+
+def nombre_por_contenido(contenido):
+    resumen = hashlib.sha256(contenido).hexdigest()
+    return resumen, f'{CARPETA_FIRMADOS}/{resumen[:2]}/{resumen}.pdf'
+
+
+def guardar_firmado(paciente_consentimiento, regenerar=False):
+    """
+    Genera (si hace falta) y guarda el PDF firmado; devuelve el nombre en el storage.
+    Solo para consentimientos en estado FIRMADO.
+    """
+    pc = paciente_consentimiento
+    if pc.estado != 'FIRMADO':
+        raise ValueError(f'El consentimiento {pc.pk} no está firmado')
+    campo = pc.documento_firmado
+    if campo and not regenerar and campo.storage.exists(campo.name):
+        return campo.name
+
+    contenido = generar_firmado(pc)
+    resumen, nombre = nombre_por_contenido(contenido)
+    storage = campo.storage
+    if not storage.exists(nombre):
+        nombre = storage.save(nombre, ContentFile(contenido))
+    # update() directo: no dispara las señales de guardado del consentimiento
+    models.PacienteConsentimiento.objects.filter(pk=pc.pk).update(documento_firmado=nombre, hash_documento=resumen)
+    pc.documento_firmado.name = nombre
+    pc.hash_documento = resumen
+    return nombre
+
+
+def _nombre_en_zip(pc):
+    fecha = timezone.localtime(pc.fecha_firmado).strftime('%Y%m%d')
+    paciente = f'{pc.paciente.apellido}_{pc.paciente.nombre}'.replace(' ', '_').replace('/', '-')
+    return f'{fecha}_{paciente}_{pc.consentimiento.tipo_documento}_v{pc.consentimiento.version}_{pc.pk}.pdf'
+
+
+def exportar_zip(queryset, destino):
+    """
+    Escribe en `destino` (archivo binario) un ZIP con los PDF firmados de `queryset`
+    y un indice.csv con folio, paciente, documento, fecha y sha256. Los que aún no
+    tienen PDF guardado se generan en el camino. Devuelve cuántos se exportaron.
+    """
+    consentimientos = queryset.filter(estado='FIRMADO').select_related(
+        'paciente', 'consentimiento', 'presentado_por'
+    ).order_by('fecha_firmado', 'pk')
+
+    indice = io.StringIO()
+    escritor_csv = csv.writer(indice)
+    escritor_csv.writerow(['folio', 'paciente', 'documento', 'version', 'fecha_firmado', 'archivo', 'sha256'])
+    total = 0
+    # Los PDF ya vienen comprimidos: ZIP_STORED evita recomprimirlos
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_STORED) as archivo_zip:
+        for pc in consentimientos.iterator(chunk_size=200):
+            try:
+                nombre = guardar_firmado(pc)
+            except Exception:
+                logger.exception("No se pudo generar el PDF firmado del consentimiento %s", pc.pk)
+                continue
+            en_zip = _nombre_en_zip(pc)
+            with pc.documento_firmado.storage.open(nombre, 'rb') as pdf:
+                archivo_zip.writestr(en_zip, pdf.read())
+            escritor_csv.writerow([
+                pc.pk, f'{pc.paciente.nombre} {pc.paciente.apellido}', pc.consentimiento.titulo,
+                pc.consentimiento.version, timezone.localtime(pc.fecha_firmado).isoformat(), en_zip,
+                pc.hash_documento,
+            ])
+            total += 1
+        archivo_zip.writestr('indice.csv', indice.getvalue().encode('utf-8-sig'))
+    return total
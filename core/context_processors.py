@@ -1,12 +1,47 @@
 # core/context_processors.py
+from django.utils.functional import SimpleLazyObject
+
+from .cache_fragmentos import versiones, TIMEOUT_FRAGMENTO
 from .permissions_utils import get_menu_for_user
+from .principal import obtener_principal
 
 def menu_dinamico(request):
     """
     Context processor que proporciona el menú dinámico basado en permisos.
     Además agrega un agregado 'reportes_menu' con todos los enlaces de reportes
     a fin de mostrarlos bajo un solo dropdown.
+
+    Los valores son perezosos: las consultas solo se ejecutan si la plantilla
+    los usa, así que con el fragmento del menú en caché no se consulta nada.
+    """
+    datos = SimpleLazyObject(lambda: _construir_menu(request))
+    return {
+        'menu_dinamico': SimpleLazyObject(lambda: datos['menu_dinamico']),
+        'menu_filtrado': SimpleLazyObject(lambda: datos['menu_filtrado']),
+        'reportes_menu': SimpleLazyObject(lambda: datos['reportes_menu']),
+    }
+
+
+def principal(request):
+    """Expone el Principal de la request (grupos y perfiles del usuario) como `principal`."""
+    valor = getattr(request, 'principal', None)
+    if valor is None:
+        valor = SimpleLazyObject(lambda: obtener_principal(request.user))
+    return {'principal': valor}
+
+
+def fragmentos_cache(request):
     """
+    Versiones de los fragmentos cacheados del tenant activo, para usarlas como
+    llave en {% cache %} (ver core/cache_fragmentos.py).
+    """
+    return {
+        'fragmentos': SimpleLazyObject(versiones),
+        'fragmentos_ttl': TIMEOUT_FRAGMENTO,
+    }
+
+
+def _construir_menu(request):
     if hasattr(request, 'user') and request.user.is_authenticated:
         menu = get_menu_for_user(request.user)
     else:
@@ -84,7 +119,7 @@ def menu_dinamico(request):
     existentes = set(r['url_name'] for r in reportes_menu)
     # Solo admins ven los fallback si no estaban ya presentes
     try:
-        es_admin = request.user.is_superuser or request.user.groups.filter(nombre='Administrador').exists()
+        es_admin = obtener_principal(request.user).es_admin
     except Exception:
         es_admin = False
     if es_admin:
@@ -6,6 +6,8 @@ from datetime import timedelta
 
 # Importar modelos solo para type hinting si es necesario o dentro de los métodos
 from . import models
+from .services import EspecialidadService
+from .principal import obtener_principal
 from django.forms import BaseFormSet
 
 class PacienteFiltroForm(forms.Form):
@@ -322,41 +324,14 @@ class CitaForm(forms.ModelForm):
     
     def _get_servicios_para_dentista(self, dentista):
         """Obtener servicios que puede realizar el dentista según sus especialidades
-        
-        Lógica jerárquica:
+
+        Lógica jerárquica (ver EspecialidadService):
         1. Todos los dentistas pueden realizar servicios de especialidad 'Dentista General'
-        2. Cada especialidad puede incluir servicios de otras especialidades (campo especialidades_incluidas)
+        2. Cada especialidad incluye los servicios de sus especialidades_incluidas, a cualquier profundidad
         3. Se devuelven servicios propios + incluidos + generales
         """
-        servicios_ids = set()
-        
-        # 1. Siempre incluir servicios de la especialidad "Dentista General" (base para todos)
-        try:
-            especialidad_general = models.Especialidad.objects.get(nombre='Dentista General')
-            servicios_ids.update(
-                models.Servicio.objects.filter(
-                    especialidad=especialidad_general,
-                    activo=True
-                ).values_list('id', flat=True)
-            )
-        except models.Especialidad.DoesNotExist:
-            pass  # Si no existe, solo usar especialidades específicas
-        
-        # 2. Agregar servicios de las especialidades del dentista (usando jerarquía)
-        for especialidad in dentista.especialidades.all():
-            # Usar el método del modelo que ya maneja especialidades_incluidas
-            especialidad_servicios = especialidad.servicios_disponibles()
-            servicios_ids.update(especialidad_servicios.values_list('id', flat=True))
-        
-        # 3. Retornar queryset filtrado
-        if servicios_ids:
-            return models.Servicio.objects.filter(id__in=servicios_ids, activo=True).distinct()
-        else:
-            # Si no hay servicios, al menos mostrar los generales
-            return models.Servicio.objects.filter(
-                especialidad__nombre='Dentista General',
-                activo=True
-            )
+        servicios_ids = EspecialidadService.servicios_permitidos(dentista.pk)
+        return models.Servicio.objects.filter(id__in=servicios_ids, activo=True)
     
     def clean_fecha_hora(self):
         """Procesar fecha/hora asegurando zona horaria correcta"""
@@ -389,12 +364,11 @@ class CitaForm(forms.ModelForm):
         if fecha_hora and dentista:
             # Validar que el dentista puede realizar los servicios seleccionados
             if servicios_planeados:
-                servicios_dentista = self._get_servicios_para_dentista(dentista)
-                servicios_invalidos = []
-                
-                for servicio in servicios_planeados:
-                    if servicio not in servicios_dentista:
-                        servicios_invalidos.append(servicio.nombre)
+                servicios_dentista = EspecialidadService.servicios_permitidos(dentista.pk)
+                servicios_invalidos = [
+                    servicio.nombre for servicio in servicios_planeados
+                    if servicio.pk not in servicios_dentista
+                ]
                 
                 if servicios_invalidos:
                     raise ValidationError(
@@ -1507,9 +1481,9 @@ class TrabajoLaboratorioUpdateForm(forms.ModelForm):
 
         # Limitar opciones de estado según rol
         if self.usuario:
-            es_dentista = self.usuario.groups.filter(name='Dentista').exists()
-            es_recepcion = self.usuario.groups.filter(name='Recepcionista').exists() or \
-                          self.usuario.groups.filter(name='Administrador').exists()
+            principal = obtener_principal(self.usuario)
+            es_dentista = principal.es_dentista
+            es_recepcion = principal.en_grupo('Recepcionista', 'Administrador')
 
             if es_dentista and not self.usuario.is_superuser:
                 # Dentista solo puede marcar como COLOCADO
@@ -0,0 +1,226 @@
+"""
+Normalización de imágenes subidas (firmas, logos de clínica, fotos de dentistas)
+y caché de logos ya decodificados para los PDF.
+
+Antes las imágenes se guardaban tal cual se subían (fotos de celular de varios
+MB con EXIF, firmas en PNG RGBA de lienzo completo) y cada recibo abría y
+decodificaba tenant.logo.path desde disco. Ahora, al guardar un modelo con una
+imagen nueva (señal pre_save, ver signals.py):
+
+- se corrige la orientación EXIF, se reduce al tamaño máximo del perfil y se
+  vuelve a codificar sin metadatos;
+- las firmas se pasan a PNG de 1 bit sobre fondo blanco;
+- se generan en ese momento los derivados de tamaño fijo del perfil
+  (logo para PDF y encabezado, miniatura de la foto);
+- el nombre lleva el hash del contenido, así que un nombre identifica siempre
+  la misma imagen y la misma subida no se guarda dos veces.
+
+lector_logo() mantiene por proceso los ImageReader de ReportLab de los logos:
+como el nombre depende del contenido, la llave nunca queda vieja.
+"""
+import hashlib
+import logging
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.text import slugify
+
+logger = logging.getLogger(__name__)
+
+# Logos de clínica con ImageReader decodificado en memoria por proceso
+MAX_LOGOS_EN_CACHE = 32
+
+
+@dataclass(frozen=True)
+class PerfilImagen:
+    """Cómo se normaliza un tipo de imagen y qué derivados (nombre -> (ancho, alto)) se generan."""
+    max_lado: int
+    formato: str  # 'PNG' o 'JPEG'
+    bitonal: bool = False
+    derivados: dict = field(default_factory=dict)
+    recortar_derivados: bool = False
+
+
+PERFILES = {
+    'firma': PerfilImagen(max_lado=1000, formato='PNG', bitonal=True),
+    'logo': PerfilImagen(max_lado=800, formato='PNG', derivados={'pdf': (300, 300), 'cabecera': (256, 64)}),
+    'foto': PerfilImagen(
+        max_lado=1200, formato='JPEG', derivados={'miniatura': (320, 320)}, recortar_derivados=True
+    ),
+}
+
+# (app_label.Modelo, campo) -> perfil
+CAMPOS = {
+    ('core.Paciente', 'firma_consentimiento'): 'firma',
+    ('core.PacienteConsentimiento', 'firma_paciente'): 'firma',
+    ('core.PacienteConsentimiento', 'firma_testigo1'): 'firma',
+    ('core.PacienteConsentimiento', 'firma_testigo2'): 'firma',
+    ('core.PerfilDentista', 'foto'): 'foto',
+    ('tenants.Clinica', 'logo'): 'logo',
+}
+
+EXTENSIONES = {'PNG': 'png', 'JPEG': 'jpg'}
+
+
+def _abrir(contenido):
+    from PIL import Image, ImageOps
+
+    imagen = Image.open(BytesIO(contenido))
+    imagen.load()
+    return ImageOps.exif_transpose(imagen)
+
+
+def _sobre_blanco(imagen):
+    """Aplana la transparencia sobre fondo blanco (firmas de lienzo, JPEG)."""
+    from PIL import Image
+
+    if imagen.mode in ('RGBA', 'LA') or (imagen.mode == 'P' and 'transparency' in imagen.info):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, (255, 255, 255))
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB')
+
+
+def _codificar(imagen, perfil):
+    """Bytes de `imagen` en el formato del perfil, sin EXIF ni metadatos."""
+    salida = BytesIO()
+    if perfil.bitonal:
+        # Umbral fijo: el trazo queda negro y el resto blanco; PNG de 1 bit pesa unos pocos KB
+        imagen = _sobre_blanco(imagen).convert('L').point(lambda p: 255 if p > 200 else 0).convert('1')
+        imagen.save(salida, 'PNG', optimize=True)
+    elif perfil.formato == 'JPEG':
+        _sobre_blanco(imagen).save(salida, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        if imagen.mode not in ('RGB', 'RGBA', 'L', 'LA', '1'):
+            imagen = imagen.convert('RGBA')
+        imagen.save(salida, 'PNG', optimize=True)
+    return salida.getvalue()
+
+
+def normalizar(contenido, perfil):
+    """Devuelve (bytes normalizados, imagen PIL) de la imagen `contenido` según `perfil`."""
+    from PIL import Image
+
+    imagen = _abrir(contenido)
+    imagen.thumbnail((perfil.max_lado, perfil.max_lado), Image.Resampling.LANCZOS)
+    return _codificar(imagen, perfil), imagen
+
+
+def derivar(imagen, perfil, tamano):
+    """Bytes del derivado de `imagen` con el tamaño `tamano` (ancho, alto)."""
+    from PIL import Image, ImageOps
+
+    if perfil.recortar_derivados:
+        derivado = ImageOps.fit(imagen, tamano, Image.Resampling.LANCZOS)
+    else:
+        derivado = imagen.copy()
+        derivado.thumbnail(tamano, Image.Resampling.LANCZOS)
+    return _codificar(derivado, perfil)
+
+
+def nombre_derivado(nombre, derivado):
+    """'logos_clinicas/logo-ab12.png', 'pdf' -> 'logos_clinicas/derivados/logo-ab12__pdf.png'"""
+    directorio, archivo = os.path.split(nombre)
+    base, extension = os.path.splitext(archivo)
+    return os.path.join(directorio, 'derivados', f'{base}__{derivado}{extension}')
+
+
+def _guardar(storage, nombre, contenido):
+    # Nombres por contenido: si ya existe es la misma imagen
+    if not storage.exists(nombre):
+        guardado = storage.save(nombre, ContentFile(contenido))
+        if guardado != nombre:
+            logger.warning("El storage guardó %s como %s", nombre, guardado)
+        return guardado
+    return nombre
+
+
+def procesar_subida(instancia, campo, perfil_nombre):
+    """
+    Si `campo` de `instancia` tiene un archivo recién subido (aún sin guardar), lo
+    normaliza, guarda imagen y derivados, y deja el campo apuntando al archivo guardado.
+    Un archivo que no se puede decodificar se deja como vino.
+    """
+    archivo = getattr(instancia, campo)
+    if not archivo or getattr(archivo, '_committed', True):
+        return False
+
+    perfil = PERFILES[perfil_nombre]
+    try:
+        archivo.open('rb')
+        archivo.seek(0)
+        original = archivo.read()
+        contenido, imagen = normalizar(original, perfil)
+    except Exception:
+        logger.warning("No se pudo normalizar %s.%s (%s); se guarda sin cambios",
+                       instancia._meta.label, campo, archivo.name, exc_info=True)
+        return False
+
+    campo_modelo = instancia._meta.get_field(campo)
+    base = slugify(os.path.splitext(os.path.basename(archivo.name))[0])[:40] or campo
+    resumen = hashlib.sha256(contenido).hexdigest()[:16]
+    nombre = campo_modelo.generate_filename(instancia, f'{base}-{resumen}.{EXTENSIONES[perfil.formato]}')
+
+    storage = campo_modelo.storage
+    nombre = _guardar(storage, nombre, contenido)
+    for derivado, tamano in perfil.derivados.items():
+        try:
+            _guardar(storage, nombre_derivado(nombre, derivado), derivar(imagen, perfil, tamano))
+        except Exception:
+            logger.warning("No se pudo generar el derivado %s de %s", derivado, nombre, exc_info=True)
+
+    # Asignar el nombre (y no un File) deja el campo como ya guardado
+    setattr(instancia, campo, nombre)
+    logger.debug("Imagen %s.%s normalizada: %d -> %d bytes",
+                 instancia._meta.label, campo, len(original), len(contenido))
+    return True
+
+
+def url_derivado(archivo, derivado):
+    """URL del derivado de `archivo` si existe; si no (imagen anterior al pipeline), la del original."""
+    if not archivo:
+        return ''
+    nombre = nombre_derivado(archivo.name, derivado)
+    if _existe(archivo.storage, nombre):
+        return archivo.storage.url(nombre)
+    return archivo.url
+
+
+@lru_cache(maxsize=256)
+def _existe(storage, nombre):
+    # Los derivados se escriben antes de que el campo apunte al original, así que
+    # para un nombre dado la respuesta no cambia
+    return storage.exists(nombre)
+
+
+@lru_cache(maxsize=MAX_LOGOS_EN_CACHE)
+def _lector(storage, nombre):
+    from reportlab.lib.utils import ImageReader
+
+    derivado = nombre_derivado(nombre, 'pdf')
+    if storage.exists(derivado):
+        with storage.open(derivado, 'rb') as archivo:
+            return ImageReader(BytesIO(archivo.read()))
+
+    # Logo anterior al pipeline: se reduce en memoria una sola vez por proceso
+    with storage.open(nombre, 'rb') as archivo:
+        perfil = PERFILES['logo']
+        _, imagen = normalizar(archivo.read(), perfil)
+    return ImageReader(BytesIO(derivar(imagen, perfil, perfil.derivados['pdf'])))
+
+
+def lector_logo(clinica):
+    """ImageReader del logo de `clinica` para ReportLab (decodificado una vez por proceso), o None."""
+    logo = getattr(clinica, 'logo', None)
+    if not logo:
+        return None
+    try:
+        return _lector(logo.storage or default_storage, logo.name)
+    except Exception:
+        logger.warning("No se pudo leer el logo %s", logo.name, exc_info=True)
+        return None
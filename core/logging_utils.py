@@ -0,0 +1,150 @@
+"""
+Utilidades de logging para el camino de cada request.
+
+- RequestContextFilter: agrega tenant, usuario e id de request a cada registro a
+  partir del contexto que fija RequestLogContextMiddleware, para no repetirlos
+  en cada mensaje.
+- SamplingFilter: deja pasar solo 1 de cada N eventos de nivel bajo (DEBUG) en
+  loggers de alto tráfico.
+- QueueRotatingFileHandler: encola los registros y los escribe a disco en un
+  hilo aparte (QueueListener), fuera del hilo que atiende la request.
+
+Se configuran desde settings.LOGGING.
+"""
+import atexit
+import itertools
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import uuid
+from contextvars import ContextVar
+from multiprocessing import util as multiprocessing_util
+
+from django.utils.functional import empty
+
+_contexto_log = ContextVar('contexto_log', default=None)
+
+SIN_VALOR = '-'
+
+
+def iniciar_contexto(request):
+    """
+    Asocia la request actual al contexto de logging y devuelve el token para
+    restaurarlo. Respeta el encabezado X-Request-ID si viene del proxy.
+    """
+    request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex[:12]
+    request.request_id = request_id
+    return _contexto_log.set({'request': request, 'request_id': request_id})
+
+
+def terminar_contexto(token):
+    _contexto_log.reset(token)
+
+
+def contexto_actual():
+    """Devuelve (request_id, tenant, usuario) del contexto activo o '-'."""
+    contexto = _contexto_log.get()
+    if not contexto:
+        return SIN_VALOR, SIN_VALOR, SIN_VALOR
+
+    request = contexto['request']
+    tenant = getattr(request, 'tenant', None)
+    tenant = getattr(tenant, 'schema_name', None) or SIN_VALOR
+
+    # Solo usar el usuario si AuthenticationMiddleware ya lo resolvió; evaluar
+    # request.user aquí dispararía la carga de la sesión desde el logging
+    usuario = SIN_VALOR
+    lazy_user = request.__dict__.get('user')
+    envuelto = getattr(lazy_user, '_wrapped', None)
+    if envuelto is not None and envuelto is not empty:
+        usuario = envuelto.get_username() if envuelto.is_authenticated else 'anonimo'
+
+    return contexto['request_id'], tenant, usuario
+
+
+class RequestContextFilter(logging.Filter):
+    """Agrega request_id, tenant y usuario a los registros (para el formatter)."""
+
+    def filter(self, record):
+        record.request_id, record.tenant, record.usuario = contexto_actual()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Muestreo determinista de eventos de bajo nivel: de los registros con nivel
+    <= max_level deja pasar 1 de cada round(1/rate). Los de mayor nivel pasan siempre.
+    """
+
+    def __init__(self, rate=1.0, max_level='DEBUG'):
+        super().__init__()
+        rate = float(rate)
+        self.cada = round(1 / rate) if rate > 0 else 0
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+        self._contador = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > self.max_level:
+            return True
+        if not self.cada:
+            return False
+        return next(self._contador) % self.cada == 0
+
+
+class QueueRotatingFileHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que delega en un RotatingFileHandler atendido por un
+    QueueListener en segundo plano. El formatter configurado se aplica al
+    handler de archivo, no al encolado.
+
+    El hilo del listener no sobrevive a un fork (run_workers, el pool de
+    migrate_all_tenants): se arranca en el primer emit() de cada proceso, con
+    su propia cola, y se vuelve a arrancar si el PID cambió.
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, encoding=None):
+        super().__init__(queue.SimpleQueue())
+        self.destino = logging.handlers.RotatingFileHandler(
+            filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding
+        )
+        self.listener = None
+        self._pid = None
+        self._arranque = threading.Lock()
+        atexit.register(self._detener_listener)
+
+    def _asegurar_listener(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._arranque:
+            if self._pid == pid:
+                return
+            # En el hijo de un fork el listener heredado no tiene hilo: cola y listener nuevos
+            self.queue = queue.SimpleQueue()
+            self.listener = logging.handlers.QueueListener(
+                self.queue, self.destino, respect_handler_level=True
+            )
+            self.listener.start()
+            self._pid = pid
+            # Los hijos de multiprocessing terminan sin correr atexit; Finalize vacía la cola al salir
+            multiprocessing_util.Finalize(self, self._detener_listener, exitpriority=10)
+
+    def emit(self, record):
+        self._asegurar_listener()
+        super().emit(record)
+
+    def setFormatter(self, fmt):
+        self.destino.setFormatter(fmt)
+
+    def _detener_listener(self):
+        # Vacía la cola pendiente; puede llamarse desde close() y desde atexit.
+        # Solo el proceso que arrancó el listener puede detenerlo.
+        if self.listener is not None and self._pid == os.getpid() and self.listener._thread is not None:
+            self.listener.stop()
+
+    def close(self):
+        self._detener_listener()
+        self.destino.close()
+        super().close()
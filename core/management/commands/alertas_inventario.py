@@ -0,0 +1,52 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica
+from core.services import InventarioService
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera el digest diario de alertas de inventario (stock bajo y caducidades) de cada clínica '
+        'y encola un solo correo por clínica para sus administradores. Programarlo cada noche.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Procesar solo un tenant específico (schema_name)'
+        )
+        parser.add_argument(
+            '--fecha',
+            type=datetime.date.fromisoformat,
+            help='Fecha del digest (YYYY-MM-DD). Por defecto hoy.'
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            help='Días hacia adelante para "próximo a caducar" (por defecto settings.ALERTAS_INVENTARIO_DIAS_CADUCIDAD)'
+        )
+        parser.add_argument(
+            '--sin-notificar',
+            action='store_true',
+            help='Solo generar el digest, sin enviar el correo'
+        )
+
+    def handle(self, *args, **options):
+        tenants = Clinica.objects.exclude(schema_name='public')
+        if options['tenant']:
+            tenants = tenants.filter(schema_name=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f"Tenant '{options['tenant']}' no encontrado")
+
+        for tenant in tenants:
+            with tenant_context(tenant):
+                digest = InventarioService.generar_digest_alertas(options['fecha'], options['dias'])
+                notificado = False
+                if not options['sin_notificar']:
+                    notificado = InventarioService.notificar_digest_alertas(digest, tenant)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {tenant.schema_name}: {digest.stock_bajo} stock bajo, {digest.caducados} caducados, "
+                f"{digest.proximos_caducar} próximos a caducar{' (correo encolado)' if notificado else ''}"
+            ))
@@ -0,0 +1,205 @@
+import datetime
+import json
+import math
+import subprocess
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica
+from core.models import Cita, LoteInsumo, Paciente, Pago
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano (valores ya ordenados)."""
+    if not valores:
+        return None
+    indice = max(0, min(len(valores) - 1, math.ceil(p / 100 * len(valores)) - 1))
+    return valores[indice]
+
+
+class Command(BaseCommand):
+    help = (
+        'Corre los flujos principales (agenda, dashboards, reportes, exportaciones y caja) '
+        'contra un tenant y registra p50/p95 y número de consultas en un JSON comparable entre commits.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='schema_name del tenant a medir')
+        parser.add_argument('--usuario', type=str, help='Usuario con el que se navega (por defecto un superusuario o Administrador)')
+        parser.add_argument('--repeticiones', type=int, default=10, help='Mediciones por escenario')
+        parser.add_argument('--calentamiento', type=int, default=2, help='Corridas descartadas antes de medir')
+        parser.add_argument('--solo', type=str, help='Medir solo los escenarios cuyo nombre contenga este texto')
+        parser.add_argument('--json', type=str, help='Ruta donde guardar el resultado (línea base)')
+        parser.add_argument('--comparar', type=str, help='Línea base JSON contra la cual comparar')
+        parser.add_argument(
+            '--tolerancia',
+            type=float,
+            default=settings.BENCHMARK_REGRESSION_TOLERANCE,
+            help='Aumento relativo de p95 permitido antes de marcar regresión (0.25 = 25%%)'
+        )
+
+    def escenarios(self):
+        hoy = timezone.localdate()
+        inicio_semana = hoy - datetime.timedelta(days=hoy.weekday())
+        fin_semana = inicio_semana + datetime.timedelta(days=7)
+        inicio_mes = hoy.replace(day=1)
+        paciente_id = Paciente.objects.filter(saldo_global__gt=0).values_list('pk', flat=True).first()
+
+        rango_mes = f'fecha_inicio={inicio_mes}&fecha_fin={hoy}'
+        escenarios = [
+            ('agenda.pagina', 'agenda/'),
+            ('agenda.eventos_semana', f'api/citas/?start={inicio_semana}&end={fin_semana}'),
+            ('dashboard.inicio', ''),
+            ('dashboard.financiero', 'finanzas/'),
+            ('reportes.ingresos', f'reportes/ingresos/?{rango_mes}'),
+            ('reportes.saldos', 'reportes/saldos/'),
+            ('reportes.servicios_vendidos', 'reportes/servicios-vendidos/'),
+            ('reportes.ingresos_dentista', f'reportes/ingresos-dentista/?{rango_mes}'),
+            ('reportes.valor_inventario', 'costos/valor-inventario/'),
+            ('exportar.ingresos_excel', f'reportes/ingresos/export/?{rango_mes}'),
+            ('exportar.servicios_vendidos_pdf', 'reportes/servicios-vendidos/pdf/'),
+            ('exportar.inventario_excel', 'insumos/exportar/'),
+            ('caja.citas_pendientes', 'citas/pendientes/'),
+            ('caja.pacientes_pendientes', 'pacientes/pendientes/'),
+            ('caja.pagos', 'finanzas/pagos/'),
+        ]
+        if paciente_id:
+            escenarios += [
+                ('caja.saldo_paciente', f'api/pacientes/{paciente_id}/saldo/'),
+                ('caja.registrar_pago_paciente', f'finanzas/pagos/registrar/paciente/{paciente_id}/'),
+            ]
+        return escenarios
+
+    def handle(self, *args, **options):
+        tenant = Clinica.objects.filter(schema_name=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' no encontrado")
+
+        client = Client(raise_request_exception=False)
+        with tenant_context(tenant):
+            usuario = self._usuario(options['usuario'])
+            client.force_login(usuario)
+            escenarios = self.escenarios()
+            volumen = {
+                'pacientes': Paciente.objects.count(),
+                'citas': Cita.objects.count(),
+                'pagos': Pago.objects.count(),
+                'lotes': LoteInsumo.objects.count(),
+            }
+
+        if options['solo']:
+            escenarios = [e for e in escenarios if options['solo'] in e[0]]
+
+        resultados = {}
+        for nombre, ruta in escenarios:
+            resultados[nombre] = self._medir(client, f'/{tenant.schema_name}/{ruta}', options)
+            r = resultados[nombre]
+            estilo = self.style.SUCCESS if r['status'] == 200 else self.style.WARNING
+            self.stdout.write(estilo(
+                f"{nombre:<34} p50 {r['p50_ms']:9.1f}ms  p95 {r['p95_ms']:9.1f}ms  "
+                f"{r['consultas']:5d} consultas  HTTP {r['status']}"
+            ))
+
+        reporte = {
+            'commit': self._commit(),
+            'fecha': timezone.now().isoformat(),
+            'tenant': tenant.schema_name,
+            'usuario': usuario.username,
+            'repeticiones': options['repeticiones'],
+            'volumen': volumen,
+            'escenarios': resultados,
+        }
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Resultado guardado en {options['json']}")
+
+        if options['comparar']:
+            self._comparar(reporte, options['comparar'], options['tolerancia'])
+
+    def _usuario(self, username):
+        if username:
+            usuario = User.objects.filter(username=username).first()
+            if usuario is None:
+                raise CommandError(f"Usuario '{username}' no encontrado en el tenant")
+            return usuario
+        usuario = (
+            User.objects.filter(is_superuser=True, is_active=True).first()
+            or User.objects.filter(groups__name='Administrador', is_active=True).first()
+        )
+        if usuario is None:
+            raise CommandError('No hay superusuario ni Administrador en el tenant; use --usuario')
+        return usuario
+
+    def _medir(self, client, url, options):
+        for _ in range(options['calentamiento']):
+            client.get(url)
+
+        tiempos = []
+        consultas = []
+        respuesta = None
+        for _ in range(options['repeticiones']):
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuesta = client.get(url)
+                # Consumir respuestas en streaming (exportaciones) dentro de la medición
+                contenido = b''.join(respuesta.streaming_content) if respuesta.streaming else respuesta.content
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(capturadas))
+
+        tiempos.sort()
+        return {
+            'url': url,
+            'status': respuesta.status_code,
+            'bytes': len(contenido),
+            'p50_ms': round(percentil(tiempos, 50), 2),
+            'p95_ms': round(percentil(tiempos, 95), 2),
+            'media_ms': round(sum(tiempos) / len(tiempos), 2),
+            'consultas': max(consultas),
+        }
+
+    def _commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def _comparar(self, actual, ruta, tolerancia):
+        with open(ruta, encoding='utf-8') as archivo:
+            base = json.load(archivo)
+
+        self.stdout.write(f"\nComparación contra {base.get('commit')} ({ruta}), tolerancia p95 {tolerancia:.0%}")
+        if base.get('volumen') != actual['volumen']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  El volumen de datos difiere de la línea base: {base.get('volumen')} vs {actual['volumen']}"
+            ))
+
+        regresiones = []
+        for nombre, r in actual['escenarios'].items():
+            anterior = base.get('escenarios', {}).get(nombre)
+            if not anterior:
+                continue
+            cambio = (r['p95_ms'] - anterior['p95_ms']) / anterior['p95_ms'] if anterior['p95_ms'] else 0
+            detalle = (
+                f"{nombre:<34} p95 {anterior['p95_ms']:9.1f} → {r['p95_ms']:9.1f}ms ({cambio:+.0%})  "
+                f"consultas {anterior['consultas']} → {r['consultas']}"
+            )
+            if cambio > tolerancia or r['consultas'] > anterior['consultas']:
+                regresiones.append(nombre)
+                self.stdout.write(self.style.ERROR(detalle))
+            else:
+                self.stdout.write(detalle)
+
+        if regresiones:
+            raise CommandError(f"Regresiones de rendimiento en: {', '.join(regresiones)}")
+        self.stdout.write(self.style.SUCCESS('✅ Sin regresiones respecto a la línea base'))
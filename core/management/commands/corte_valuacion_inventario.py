@@ -0,0 +1,38 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica
+from core.services import ValuacionInventarioService
+
+
+class Command(BaseCommand):
+    help = (
+        'Guarda la valuación actual del inventario (PEPS y costo promedio) como corte de fin de mes. '
+        'Programarlo el último día de cada mes, al cierre.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Registrar solo un tenant específico (schema_name)'
+        )
+        parser.add_argument(
+            '--fecha',
+            type=datetime.date.fromisoformat,
+            help='Fecha del corte (YYYY-MM-DD). Por defecto hoy; un corte existente de esa fecha se reemplaza.'
+        )
+
+    def handle(self, *args, **options):
+        tenants = Clinica.objects.exclude(schema_name='public')
+        if options['tenant']:
+            tenants = tenants.filter(schema_name=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f"Tenant '{options['tenant']}' no encontrado")
+
+        for tenant in tenants:
+            with tenant_context(tenant):
+                renglones = ValuacionInventarioService.registrar_corte(options['fecha'])
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {tenant.schema_name}: corte con {renglones} renglones (insumo/unidad dental)"
+            ))
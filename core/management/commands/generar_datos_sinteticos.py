@@ -0,0 +1,360 @@
+import contextlib
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica, Domain
+from core.models import (
+    Cita, Especialidad, Insumo, LoteInsumo, Paciente, Pago, PerfilDentista,
+    Servicio, ServicioInsumo, TratamientoCita, UnidadDental,
+)
+from core.services import ResumenReportesService
+
+
+NOMBRES = [
+    'María', 'José', 'Guadalupe', 'Juan', 'Fernanda', 'Luis', 'Ana', 'Carlos', 'Sofía', 'Miguel',
+    'Valeria', 'Jorge', 'Daniela', 'Ricardo', 'Alejandra', 'Eduardo', 'Paola', 'Fernando', 'Lucía', 'Raúl',
+]
+APELLIDOS = [
+    'Hernández', 'García', 'Martínez', 'López', 'González', 'Pérez', 'Rodríguez', 'Sánchez', 'Ramírez', 'Cruz',
+    'Flores', 'Gómez', 'Morales', 'Vázquez', 'Reyes', 'Jiménez', 'Torres', 'Díaz', 'Gutiérrez', 'Ruiz',
+]
+CATALOGO_SERVICIOS = {
+    'Odontología General': [('Consulta', 400, 30), ('Limpieza', 700, 45), ('Resina', 900, 60), ('Extracción simple', 800, 45)],
+    'Endodoncia': [('Endodoncia unirradicular', 3500, 90), ('Endodoncia multirradicular', 5500, 120)],
+    'Ortodoncia': [('Ajuste de brackets', 900, 30), ('Colocación de brackets', 12000, 120)],
+    'Periodoncia': [('Raspado y alisado', 1800, 60)],
+}
+INSUMOS_BASE = [
+    ('Guantes de nitrilo', 'caja', 100), ('Cubrebocas', 'caja', 50), ('Anestesia lidocaína', 'caja', 50),
+    ('Resina A2', 'jeringa', 1), ('Eyectores', 'bolsa', 100), ('Limas K', 'caja', 6),
+    ('Gasas estériles', 'paquete', 200), ('Hipoclorito', 'litro', 1), ('Brackets metálicos', 'kit', 20),
+]
+# Probabilidad de cada estado para citas pasadas; las futuras quedan PRO/CON
+ESTADOS_PASADOS = [('COM', 0.70), ('ATN', 0.10), ('CAN', 0.15), ('PRO', 0.05)]
+METODOS_PAGO = ['Efectivo', 'Tarjeta', 'Transferencia']
+
+
+@contextlib.contextmanager
+def sin_auto_now(*campos):
+    """
+    Desactiva temporalmente auto_now_add/auto_now para poder insertar fechas
+    históricas con bulk_create (recibe tuplas (modelo, nombre_campo)).
+    """
+    originales = []
+    for modelo, nombre in campos:
+        campo = modelo._meta.get_field(nombre)
+        originales.append((campo, campo.auto_now, campo.auto_now_add))
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera datos sintéticos realistas a escala (pacientes, citas, tratamientos, pagos, '
+        'insumos y lotes) con inserciones masivas, para pruebas de rendimiento.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='schema_name del tenant destino')
+        parser.add_argument('--crear-tenant', action='store_true', help='Crear el tenant si no existe')
+        parser.add_argument('--pacientes', type=int, default=10000, help='Número de pacientes a generar')
+        parser.add_argument('--citas-por-paciente', type=float, default=4, help='Promedio de citas por paciente')
+        parser.add_argument('--dentistas', type=int, default=8, help='Número de dentistas')
+        parser.add_argument('--unidades', type=int, default=4, help='Número de unidades dentales')
+        parser.add_argument('--lotes', type=int, default=2000, help='Número de lotes de insumos')
+        parser.add_argument('--meses', type=int, default=24, help='Meses de historial a generar hacia atrás')
+        parser.add_argument('--tamano-lote', type=int, default=5000, help='Renglones por bulk_create')
+        parser.add_argument('--semilla', type=int, default=42, help='Semilla aleatoria (mismos datos en cada corrida)')
+        parser.add_argument(
+            '--sin-resumenes', action='store_true',
+            help='No reconstruir los resúmenes diarios de reportes al terminar'
+        )
+
+    def handle(self, *args, **options):
+        self.rnd = random.Random(options['semilla'])
+        self.tamano = options['tamano_lote']
+
+        tenant = Clinica.objects.filter(schema_name=options['tenant']).first()
+        if tenant is None:
+            if not options['crear_tenant']:
+                raise CommandError(f"Tenant '{options['tenant']}' no encontrado (use --crear-tenant)")
+            tenant = Clinica.objects.create(schema_name=options['tenant'], nombre=f"Sintético {options['tenant']}")
+            Domain.objects.create(domain=f"{options['tenant']}.localhost", tenant=tenant, is_primary=True)
+            self.stdout.write(self.style.SUCCESS(f'Tenant {tenant.schema_name} creado'))
+
+        inicio = time.perf_counter()
+        with tenant_context(tenant):
+            # El sufijo evita choques de email/username si se corre varias veces
+            self.sufijo = f"{options['semilla']}-{Paciente.objects.count()}"
+            self.hoy = timezone.now()
+            self.desde = self.hoy - datetime.timedelta(days=30 * options['meses'])
+
+            servicios = self._catalogo()
+            dentistas = self._dentistas(options['dentistas'], servicios)
+            unidades = self._unidades(options['unidades'])
+            insumos = self._insumos(servicios)
+
+            pacientes = self._pacientes(options['pacientes'])
+            citas = self._citas(pacientes, dentistas, unidades, servicios, options['citas_por_paciente'])
+            self._tratamientos_y_pagos(citas, servicios)
+            self._lotes(insumos, unidades, options['lotes'])
+
+            if not options['sin_resumenes']:
+                self._paso('Reconstruyendo resúmenes diarios')
+                ResumenReportesService.reconstruir()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Datos sintéticos generados en {tenant.schema_name} en {time.perf_counter() - inicio:.1f}s'
+        ))
+
+    # --- Utilidades ---
+
+    def _paso(self, texto):
+        self.stdout.write(f'  · {texto}...')
+
+    def _en_lotes(self, modelo, generador, proyeccion=None):
+        """
+        Inserta los objetos del generador en bloques de tamano-lote. Devuelve
+        proyeccion(objeto) de cada creado (p. ej. su pk), o [] sin proyección:
+        con millones de filas no se guardan las instancias.
+        """
+        creados, bloque = [], []
+
+        def insertar():
+            insertados = modelo.objects.bulk_create(bloque)
+            if proyeccion:
+                creados.extend(map(proyeccion, insertados))
+
+        for objeto in generador:
+            bloque.append(objeto)
+            if len(bloque) >= self.tamano:
+                insertar()
+                bloque = []
+        if bloque:
+            insertar()
+        return creados
+
+    def _fecha_aleatoria(self, desde, hasta):
+        segundos = int((hasta - desde).total_seconds())
+        fecha = desde + datetime.timedelta(seconds=self.rnd.randint(0, max(segundos, 0)))
+        # Citas en horario de consultorio, en bloques de 30 minutos
+        return fecha.replace(hour=self.rnd.randint(9, 19), minute=self.rnd.choice((0, 30)), second=0, microsecond=0)
+
+    # --- Catálogos ---
+
+    def _catalogo(self):
+        self._paso('Catálogo de especialidades y servicios')
+        servicios = []
+        for nombre_esp, items in CATALOGO_SERVICIOS.items():
+            especialidad, _ = Especialidad.objects.get_or_create(nombre=nombre_esp)
+            for nombre, precio, duracion in items:
+                servicio, _ = Servicio.objects.get_or_create(
+                    nombre=nombre, especialidad=especialidad,
+                    defaults={'precio': Decimal(precio), 'duracion_minutos': duracion},
+                )
+                servicios.append(servicio)
+        return servicios
+
+    def _dentistas(self, cantidad, servicios):
+        self._paso(f'{cantidad} dentistas')
+        grupo, _ = Group.objects.get_or_create(name='Dentista')
+        usuarios = User.objects.bulk_create([
+            User(username=f'dentista-{self.sufijo}-{i}', password='!', first_name=self.rnd.choice(NOMBRES))
+            for i in range(cantidad)
+        ])
+        grupo.user_set.add(*usuarios)
+        dentistas = PerfilDentista.objects.bulk_create([
+            PerfilDentista(
+                usuario=usuario, nombre=usuario.first_name, apellido=self.rnd.choice(APELLIDOS),
+                email=f'{usuario.username}@example.com',
+            )
+            for usuario in usuarios
+        ])
+        especialidades = list(Especialidad.objects.all())
+        relacion = PerfilDentista.especialidades.through
+        relacion.objects.bulk_create([
+            relacion(perfildentista_id=d.id, especialidad_id=e.id)
+            for d in dentistas for e in self.rnd.sample(especialidades, k=min(2, len(especialidades)))
+        ], ignore_conflicts=True)
+        return dentistas
+
+    def _unidades(self, cantidad):
+        self._paso(f'{cantidad} unidades dentales')
+        return [
+            UnidadDental.objects.get_or_create(nombre=f'Unidad {i + 1}')[0]
+            for i in range(cantidad)
+        ]
+
+    def _insumos(self, servicios):
+        self._paso('Insumos y consumo por servicio')
+        insumos = []
+        for nombre, empaque, por_empaque in INSUMOS_BASE:
+            insumo, _ = Insumo.objects.get_or_create(
+                nombre=nombre,
+                defaults={
+                    'unidad_empaque': empaque, 'cantidad_por_empaque': por_empaque,
+                    'requiere_lote_caducidad': True, 'stock_minimo': 20,
+                },
+            )
+            insumos.append(insumo)
+        ServicioInsumo.objects.bulk_create([
+            ServicioInsumo(servicio=s, insumo=i, cantidad=Decimal(self.rnd.randint(1, 3)))
+            for s in servicios for i in self.rnd.sample(insumos, k=3)
+            if not ServicioInsumo.objects.filter(servicio=s, insumo=i).exists()
+        ])
+        return insumos
+
+    # --- Volumen ---
+
+    def _pacientes(self, cantidad):
+        self._paso(f'{cantidad} pacientes')
+
+        def generar():
+            for i in range(cantidad):
+                creado = self._fecha_aleatoria(self.desde, self.hoy)
+                yield Paciente(
+                    nombre=self.rnd.choice(NOMBRES),
+                    apellido=f'{self.rnd.choice(APELLIDOS)} {self.rnd.choice(APELLIDOS)}',
+                    email=f'paciente-{self.sufijo}-{i}@example.com',
+                    telefono=f'55{self.rnd.randint(10000000, 99999999)}',
+                    fecha_nacimiento=datetime.date(self.rnd.randint(1945, 2020), self.rnd.randint(1, 12), self.rnd.randint(1, 28)),
+                    consentimiento_cofepris=self.rnd.random() < 0.8,
+                    creado_en=creado,
+                    actualizado_en=creado,
+                )
+
+        with sin_auto_now((Paciente, 'creado_en'), (Paciente, 'actualizado_en')):
+            return self._en_lotes(Paciente, generar(), lambda p: p.pk)
+
+    def _citas(self, pacientes, dentistas, unidades, servicios, promedio):
+        total = int(len(pacientes) * promedio)
+        self._paso(f'{total} citas')
+        pesos = [p for _, p in ESTADOS_PASADOS]
+        estados = [e for e, _ in ESTADOS_PASADOS]
+        futuro = self.hoy + datetime.timedelta(days=60)
+
+        def generar():
+            for _ in range(total):
+                fecha = self._fecha_aleatoria(self.desde, futuro)
+                if fecha < self.hoy:
+                    estado = self.rnd.choices(estados, weights=pesos)[0]
+                else:
+                    estado = self.rnd.choice(('PRO', 'CON'))
+                yield Cita(
+                    paciente_id=self.rnd.choice(pacientes),
+                    dentista_id=self.rnd.choice(dentistas).pk,
+                    unidad_dental_id=self.rnd.choice(unidades).pk,
+                    fecha_hora=fecha,
+                    estado=estado,
+                    creado_en=fecha - datetime.timedelta(days=self.rnd.randint(1, 20)),
+                )
+
+        with sin_auto_now((Cita, 'creado_en')):
+            citas = self._en_lotes(
+                Cita, generar(), lambda c: (c.pk, c.estado, c.paciente_id, c.dentista_id, c.fecha_hora)
+            )
+
+        # Servicios planeados (M2M) también en bloque
+        relacion = Cita.servicios_planeados.through
+        self._en_lotes(relacion, (
+            relacion(cita_id=pk, servicio_id=s.pk)
+            for pk, *_ in citas
+            for s in self.rnd.sample(servicios, k=self.rnd.choice((1, 1, 2)))
+        ))
+        return citas
+
+    def _tratamientos_y_pagos(self, citas, servicios):
+        atendidas = [c for c in citas if c[1] in ('ATN', 'COM')]
+        self._paso(f'{len(atendidas)} tratamientos y pagos')
+        servicios_por_id = {s.pk: s for s in servicios}
+
+        def generar_tratamientos():
+            for pk, _, _, dentista_id, fecha in atendidas:
+                yield TratamientoCita(
+                    cita_id=pk,
+                    dientes_tratados=','.join(str(self.rnd.choice((11, 16, 21, 26, 36, 46))) for _ in range(self.rnd.randint(1, 2))),
+                    descripcion='Tratamiento sintético',
+                    estado_inicial_descripcion='Inicial',
+                    estado_final_descripcion='Final',
+                    registrado_por_id=dentista_id,
+                    fecha_registro=fecha + datetime.timedelta(minutes=40),
+                )
+
+        with transaction.atomic(), sin_auto_now((TratamientoCita, 'fecha_registro'), (Pago, 'fecha_pago')):
+            tratamientos = self._en_lotes(TratamientoCita, generar_tratamientos(), lambda t: (t.pk, t.cita_id))
+
+            relacion = TratamientoCita.servicios.through
+            asignados = {}
+            filas = []
+            for tratamiento_id, cita_id in tratamientos:
+                servicio = self.rnd.choice(servicios)
+                asignados[cita_id] = servicio.pk
+                filas.append(relacion(tratamientocita_id=tratamiento_id, servicio_id=servicio.pk))
+            self._en_lotes(relacion, iter(filas))
+
+            # La mayoría de las citas atendidas se pagan completas; algunas quedan con saldo
+            saldos = {}
+
+            def generar_pagos():
+                for pk, _, paciente_id, _, fecha in atendidas:
+                    precio = servicios_por_id[asignados[pk]].precio
+                    saldos[paciente_id] = saldos.get(paciente_id, Decimal('0.00')) + precio
+                    if self.rnd.random() < 0.1:
+                        continue
+                    monto = precio if self.rnd.random() < 0.85 else (precio / 2).quantize(Decimal('0.01'))
+                    saldos[paciente_id] -= monto
+                    yield Pago(
+                        paciente_id=paciente_id, cita_id=pk, monto=monto,
+                        metodo_pago=self.rnd.choice(METODOS_PAGO),
+                        fecha_pago=fecha + datetime.timedelta(hours=1),
+                    )
+
+            self._en_lotes(Pago, generar_pagos())
+
+            # Mismo resultado que PacienteService.actualizar_saldo_global (cada cita
+            # sintética tiene un solo servicio realizado), sin recorrer paciente por paciente
+            Paciente.objects.bulk_update(
+                [Paciente(pk=pk, saldo_global=saldo) for pk, saldo in saldos.items() if saldo],
+                ['saldo_global'],
+                batch_size=self.tamano,
+            )
+
+    def _lotes(self, insumos, unidades, cantidad):
+        self._paso(f'{cantidad} lotes de insumos')
+        hoy = self.hoy.date()
+
+        def generar():
+            for i in range(cantidad):
+                recepcion = self._fecha_aleatoria(self.desde, self.hoy)
+                yield LoteInsumo(
+                    insumo=self.rnd.choice(insumos),
+                    unidad_dental=self.rnd.choice(unidades),
+                    cantidad=self.rnd.randint(0, 200),
+                    numero_lote=f'L-{self.sufijo}-{i}',
+                    fecha_caducidad=hoy + datetime.timedelta(days=self.rnd.randint(-60, 720)),
+                    fecha_recepcion=recepcion,
+                    costo_unitario=Decimal(self.rnd.randint(5, 500)),
+                )
+
+        with sin_auto_now((LoteInsumo, 'fecha_recepcion')):
+            self._en_lotes(LoteInsumo, generar())
+
+        # Insumo.stock se mantiene desde los lotes; bulk_create no dispara señales
+        total_lotes = (
+            LoteInsumo.objects.filter(insumo=OuterRef('pk'))
+            .values('insumo').annotate(total=Sum('cantidad')).values('total')
+        )
+        Insumo.objects.update(stock=Coalesce(Subquery(total_lotes), Value(0)))
@@ -0,0 +1,137 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica
+from core.management.commands.benchmark_rendimiento import percentil
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo de abrir conexiones (con y sin pool), de SET search_path y '
+        'cuántos SET se emiten por request bajo carga concurrente.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='schema_name del tenant a usar')
+        parser.add_argument('--usuario', type=str, help='Usuario para las requests (por defecto un superusuario)')
+        parser.add_argument('--url', type=str, default='api/diagnosticos/', help='Ruta relativa al tenant a pedir')
+        parser.add_argument('--peticiones', type=int, default=200, help='Número total de requests')
+        parser.add_argument('--hilos', type=int, default=4, help='Requests concurrentes')
+        parser.add_argument('--conexiones', type=int, default=20, help='Conexiones a abrir para medir el setup')
+        parser.add_argument(
+            '--sin-optimizacion',
+            action='store_true',
+            help='Medir con TENANT_LIMIT_SET_CALLS=False (un SET por cursor, comportamiento anterior)'
+        )
+
+    def handle(self, *args, **options):
+        tenant = Clinica.objects.filter(schema_name=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' no encontrado")
+
+        self._medir_conexiones(options['conexiones'])
+        self._medir_search_path(tenant)
+
+        if options['sin_optimizacion']:
+            with override_settings(TENANT_LIMIT_SET_CALLS=False):
+                self._medir_requests(tenant, options)
+        else:
+            self._medir_requests(tenant, options)
+
+    def _medir_conexiones(self, cantidad):
+        import psycopg
+
+        parametros = connection.get_connection_params()
+        tiempos = []
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            psycopg.connect(**parametros).close()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        self.stdout.write(
+            f"Conexión nueva:      p50 {percentil(tiempos, 50):7.2f}ms  p95 {percentil(tiempos, 95):7.2f}ms"
+        )
+
+        pool = connection.pool
+        if pool is None:
+            self.stdout.write("Pool:                desactivado (DB_POOL=false)")
+            return
+        pool.open(wait=True)
+        tiempos = []
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            conexion = pool.getconn()
+            pool.putconn(conexion)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tiempos.sort()
+        self.stdout.write(
+            f"Conexión del pool:   p50 {percentil(tiempos, 50):7.2f}ms  p95 {percentil(tiempos, 95):7.2f}ms  "
+            f"({pool.get_stats().get('pool_size')} abiertas)"
+        )
+
+    def _medir_search_path(self, tenant, repeticiones=200):
+        sql = f"SET search_path = '{tenant.schema_name}','public'"
+        with connection.cursor() as cursor:
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                cursor.execute(sql)
+            promedio = (time.perf_counter() - inicio) * 1000 / repeticiones
+        self.stdout.write(f"SET search_path:     {promedio:7.3f}ms por ejecución")
+
+    def _medir_requests(self, tenant, options):
+        with tenant_context(tenant):
+            usuario = (
+                User.objects.filter(username=options['usuario']).first() if options['usuario']
+                else User.objects.filter(is_superuser=True, is_active=True).first()
+            )
+        if usuario is None:
+            raise CommandError('No se encontró el usuario para las requests; use --usuario')
+
+        url = f"/{tenant.schema_name}/{options['url']}"
+        locales = threading.local()
+        resultados = []
+        lock = threading.Lock()
+
+        def peticion(_):
+            if not hasattr(locales, 'client'):
+                locales.client = Client()
+                with tenant_context(tenant):
+                    locales.client.force_login(usuario)
+            antes = getattr(connection, 'search_path_sets', 0)
+            inicio = time.perf_counter()
+            respuesta = locales.client.get(url)
+            duracion = (time.perf_counter() - inicio) * 1000
+            sets = getattr(connection, 'search_path_sets', 0) - antes
+            with lock:
+                resultados.append((duracion, sets, respuesta.status_code))
+
+        def trabajar(indices):
+            try:
+                for i in indices:
+                    peticion(i)
+            finally:
+                connections.close_all()
+
+        hilos = max(1, options['hilos'])
+        bloques = [range(i, options['peticiones'], hilos) for i in range(hilos)]
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            list(pool.map(trabajar, bloques))
+        total = time.perf_counter() - inicio
+
+        tiempos = sorted(r[0] for r in resultados)
+        sets = sum(r[1] for r in resultados)
+        errores = sum(1 for r in resultados if r[2] >= 400)
+        self.stdout.write(
+            f"Requests ({hilos} hilos): {len(resultados)} en {total:.2f}s = {len(resultados) / total:.1f} req/s, "
+            f"p50 {percentil(tiempos, 50):.1f}ms p95 {percentil(tiempos, 95):.1f}ms, "
+            f"{sets / max(len(resultados), 1):.2f} SET search_path por request"
+            + (f", {errores} respuestas con error" if errores else '')
+        )
@@ -0,0 +1,134 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Librerías que no deben cargarse al arrancar un worker; solo las usan las
+# vistas de exportación (core.views_exportar) al atender una descarga.
+MODULOS_PESADOS = ('reportlab', 'openpyxl')
+
+_LINEA_IMPORTTIME = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+
+def medir(modulo):
+    """
+    Importa `modulo` después de django.setup() en un proceso nuevo con
+    `python -X importtime` y devuelve (registros, total_ms, pesados): un dict por
+    módulo importado, el tiempo total en ms y las librerías pesadas que se cargaron.
+    Lanza RuntimeError si la importación falla. También lo usa core/tests.py.
+    """
+    env = os.environ.copy()
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'dental_saas.settings')
+
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import django; django.setup(); import {modulo}'],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=settings.BASE_DIR,
+    )
+    if proceso.returncode != 0:
+        error = '\n'.join(
+            l for l in proceso.stderr.splitlines() if not l.startswith('import time:')
+        )
+        raise RuntimeError(f'No se pudo importar {modulo}:\n{error[-2000:]}')
+
+    registros = []
+    for linea in proceso.stderr.splitlines():
+        coincidencia = _LINEA_IMPORTTIME.match(linea)
+        if coincidencia:
+            propio, acumulado, sangria, nombre = coincidencia.groups()
+            registros.append({
+                'modulo': nombre,
+                'propio_us': int(propio),
+                'acumulado_us': int(acumulado),
+                'nivel': len(sangria) // 2,
+            })
+
+    total_ms = sum(r['propio_us'] for r in registros) / 1000
+    pesados = sorted({
+        r['modulo'] for r in registros
+        if r['modulo'].split('.')[0] in MODULOS_PESADOS
+    })
+    return registros, total_ms, pesados
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el arranque en frío de un worker (django.setup() + URLconf) con '
+        '`python -X importtime` y falla si excede el presupuesto o carga librerías pesadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modulo',
+            type=str,
+            default=settings.ROOT_URLCONF,
+            help='Módulo a importar después de django.setup() (por defecto ROOT_URLCONF)'
+        )
+        parser.add_argument(
+            '--presupuesto-ms',
+            type=float,
+            default=getattr(settings, 'IMPORT_TIME_BUDGET_MS', 2500),
+            help='Tiempo máximo permitido en milisegundos'
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Número de módulos más lentos a mostrar'
+        )
+        parser.add_argument(
+            '--json',
+            type=str,
+            help='Ruta de archivo donde guardar el resultado en JSON'
+        )
+
+    def handle(self, *args, **options):
+        modulo = options['modulo']
+        try:
+            registros, total_ms, pesados = medir(modulo)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        lentos = sorted(
+            (r for r in registros if r['nivel'] == 0),
+            key=lambda r: r['acumulado_us'],
+            reverse=True
+        )[:options['top']]
+
+        resultado = {
+            'modulo': modulo,
+            'total_ms': round(total_ms, 1),
+            'presupuesto_ms': options['presupuesto_ms'],
+            'modulos_importados': len(registros),
+            'modulos_pesados': pesados,
+            'mas_lentos': [
+                {'modulo': r['modulo'], 'acumulado_ms': round(r['acumulado_us'] / 1000, 1)}
+                for r in lentos
+            ],
+        }
+
+        self.stdout.write(f"Importación en frío de {modulo}: {resultado['total_ms']} ms "
+                          f"({len(registros)} módulos, presupuesto {options['presupuesto_ms']} ms)")
+        for r in resultado['mas_lentos']:
+            self.stdout.write(f"  {r['acumulado_ms']:>9.1f} ms  {r['modulo']}")
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+
+        errores = []
+        if pesados:
+            errores.append(f"se importaron librerías pesadas al arrancar: {', '.join(pesados[:10])}")
+        if total_ms > options['presupuesto_ms']:
+            errores.append(f"{resultado['total_ms']} ms excede el presupuesto de {options['presupuesto_ms']} ms")
+        if errores:
+            raise CommandError('; '.join(errores))
+
+        self.stdout.write(self.style.SUCCESS('✅ Importación dentro del presupuesto'))
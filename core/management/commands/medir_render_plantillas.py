@@ -0,0 +1,180 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.template import Context, Engine, TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+
+
+# Configuración previa: tres rutas DIRS solapadas y loaders sin caché
+DIRS_ANTERIORES = ('templates', 'core/templates', 'core/templates/core')
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el costo de cargar y renderizar las plantillas más pesadas con y sin '
+        'el loader en caché (antes/después de deduplicar DIRS). Con --menu mide el '
+        'render del menú lateral con y sin el caché de reverse() de url_helpers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Número de plantillas más pesadas a medir'
+        )
+        parser.add_argument(
+            '--repeticiones',
+            type=int,
+            default=20,
+            help='Repeticiones por medición'
+        )
+        parser.add_argument(
+            '--menu',
+            action='store_true',
+            help='Medir solo el render del menú lateral (partials/menu_dinamico.html)'
+        )
+        parser.add_argument(
+            '--json',
+            type=str,
+            help='Ruta de archivo donde guardar el resultado en JSON'
+        )
+
+    def handle(self, *args, **options):
+        from django.conf import settings
+
+        if options['menu']:
+            return self._medir_menu(options)
+
+        actual = engines['django'].engine
+        directorios = list(actual.dirs) + list(get_app_template_dirs('templates'))
+        plantillas = self._mas_pesadas(directorios, options['top'])
+
+        base = dict(libraries=actual.libraries, builtins=actual.builtins, debug=actual.debug)
+        sin_cache = Engine(
+            dirs=[settings.BASE_DIR / d for d in DIRS_ANTERIORES],
+            loaders=[
+                'django.template.loaders.filesystem.Loader',
+                'django.template.loaders.app_directories.Loader',
+            ],
+            **base
+        )
+        con_cache = Engine(dirs=actual.dirs, loaders=actual.loaders, **base)
+
+        resultados = []
+        self.stdout.write(f"{'plantilla':<55} {'KB':>6} {'sin caché':>11} {'con caché':>11} {'render':>9}")
+        for nombre, tamano in plantillas:
+            try:
+                antes = self._promedio_ms(lambda: sin_cache.get_template(nombre), options['repeticiones'])
+                con_cache.get_template(nombre)
+            except TemplateSyntaxError as e:
+                self.stdout.write(self.style.WARNING(f'{nombre:<55} {tamano / 1024:6.1f} error de sintaxis: {e}'))
+                continue
+            despues = self._promedio_ms(lambda: con_cache.get_template(nombre), options['repeticiones'])
+
+            # El render sin contexto real solo es orientativo; algunas plantillas requieren datos
+            try:
+                plantilla = con_cache.get_template(nombre)
+                render = self._promedio_ms(lambda: plantilla.render(Context({})), options['repeticiones'])
+            except Exception:
+                render = None
+
+            resultados.append({
+                'plantilla': nombre,
+                'kb': round(tamano / 1024, 1),
+                'carga_sin_cache_ms': round(antes, 3),
+                'carga_con_cache_ms': round(despues, 3),
+                'render_ms': round(render, 3) if render is not None else None,
+            })
+            render_txt = f'{render:8.2f}' if render is not None else '     n/d'
+            self.stdout.write(
+                f'{nombre:<55} {tamano / 1024:6.1f} {antes:9.2f}ms {despues:9.3f}ms {render_txt}ms'
+            )
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+
+    def _medir_menu(self, options):
+        """
+        Renderiza el menú lateral con un menú sintético armado con las rutas 'core:' del
+        URLconf (sin BD): en frío, vaciando el caché de URLs en cada repetición (equivale
+        a reverse() en cada enlace, como antes), y en caliente.
+        """
+        from types import SimpleNamespace
+
+        from django.contrib.auth.models import User
+        from django.template.loader import get_template
+        from django.test import RequestFactory
+        from django.urls import get_resolver
+
+        from core.principal import Principal
+        from core.url_helpers import limpiar_cache_urls
+
+        nombres = sorted(
+            f'core:{nombre}'
+            for nombre in get_resolver().namespace_dict['core'][1].reverse_dict
+            if isinstance(nombre, str)
+        )
+        por_modulo = 6
+        menu = [
+            {
+                'modulo': SimpleNamespace(nombre=f'Módulo {i // por_modulo + 1}', icono=''),
+                'submenus': [
+                    SimpleNamespace(nombre=nombre, url_name=nombre, icono='')
+                    for nombre in nombres[i:i + por_modulo]
+                ],
+            }
+            for i in range(0, min(len(nombres), options['top'] * por_modulo), por_modulo)
+        ]
+
+        request = RequestFactory().get('/demo/')
+        request.tenant_prefix = '/demo'
+        usuario = User(username='medicion')
+        usuario._principal = Principal(usuario_id=0, grupos=['Administrador', 'Recepcionista', 'Dentista'])
+        request.user = usuario
+        contexto = {'request': request, 'user': usuario, 'menu_filtrado': menu, 'reportes_menu': []}
+        plantilla = get_template('core/partials/menu_dinamico.html')
+
+        def en_frio():
+            limpiar_cache_urls()
+            plantilla.render(contexto)
+
+        enlaces = sum(len(item['submenus']) for item in menu)
+        frio = self._promedio_ms(en_frio, options['repeticiones'])
+        plantilla.render(contexto)
+        caliente = self._promedio_ms(lambda: plantilla.render(contexto), options['repeticiones'])
+        resultado = {
+            'modulos': len(menu),
+            'enlaces': enlaces,
+            'render_sin_cache_urls_ms': round(frio, 3),
+            'render_con_cache_urls_ms': round(caliente, 3),
+        }
+        self.stdout.write(
+            f'Menú lateral ({len(menu)} módulos, {enlaces} enlaces): '
+            f'{frio:.2f}ms sin caché de URLs, {caliente:.2f}ms con caché '
+            f'({frio / caliente if caliente else 0:.1f}x)'
+        )
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+
+    def _mas_pesadas(self, directorios, top):
+        encontradas = {}
+        for directorio in directorios:
+            for raiz, _, archivos in os.walk(directorio):
+                for archivo in archivos:
+                    if not archivo.endswith('.html'):
+                        continue
+                    ruta = os.path.join(raiz, archivo)
+                    nombre = os.path.relpath(ruta, directorio).replace(os.sep, '/')
+                    encontradas.setdefault(nombre, os.path.getsize(ruta))
+        return sorted(encontradas.items(), key=lambda x: x[1], reverse=True)[:top]
+
+    def _promedio_ms(self, funcion, repeticiones):
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            funcion()
+        return (time.perf_counter() - inicio) * 1000 / repeticiones
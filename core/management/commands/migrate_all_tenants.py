@@ -1,63 +1,181 @@
-from django.core.management.base import BaseCommand
+import io
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
 from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
 from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.utils import timezone
 from tenants.models import Clinica
 
+
+def _inicializar_worker():
+    """Cada proceso abre su propia conexión; la heredada del padre no se comparte."""
+    import django
+    from django.db import connections
+
+    django.setup()
+    connections.close_all()
+
+
+def _migrar_schema(schema_name, verbosity):
+    """Ejecuta migrate_schemas para un schema en el proceso worker; devuelve (schema, ok, segundos, salida)."""
+    from django.db import connections
+
+    salida = io.StringIO()
+    inicio = time.perf_counter()
+    try:
+        call_command(
+            'migrate_schemas', tenant=True, schema_name=schema_name,
+            interactive=False, verbosity=verbosity, stdout=salida, stderr=salida,
+        )
+        ok = True
+    except Exception as e:
+        salida.write(f'\n{type(e).__name__}: {e}')
+        ok = False
+    finally:
+        connections.close_all()
+    return schema_name, ok, time.perf_counter() - inicio, salida.getvalue()
+
+
 class Command(BaseCommand):
-    help = 'Ejecuta migraciones en todos los tenants existentes'
+    help = (
+        'Ejecuta migraciones en todos los tenants existentes en paralelo, omitiendo los que '
+        'ya están al día y guardando el avance para poder reanudar una corrida fallida.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
-            '--tenant', 
-            type=str, 
+            '--tenant',
+            type=str,
             help='Ejecutar migraciones solo en un tenant específico'
         )
+        parser.add_argument(
+            '--procesos',
+            type=int,
+            default=4,
+            help='Número máximo de procesos en paralelo (cada uno con su conexión)'
+        )
+        parser.add_argument(
+            '--reanudar',
+            action='store_true',
+            help='Omitir los tenants que la corrida anterior ya completó'
+        )
+        parser.add_argument(
+            '--todos',
+            action='store_true',
+            help='Migrar aunque django_migrations indique que el tenant está al día'
+        )
+        parser.add_argument(
+            '--estado',
+            type=str,
+            default=str(settings.LOG_DIR / 'migrate_all_tenants.json'),
+            help='Archivo JSON donde se registra el avance por tenant'
+        )
 
     def handle(self, *args, **options):
         self.stdout.write("🚀 Iniciando migraciones en tenants...")
-        
+        inicio = time.perf_counter()
+
+        tenants = Clinica.objects.exclude(schema_name='public')
         if options['tenant']:
-            # Migrar solo un tenant específico
-            try:
-                tenant = Clinica.objects.get(schema_name=options['tenant'])
-                self._migrate_tenant(tenant)
-            except Clinica.DoesNotExist:
-                self.stdout.write(
-                    self.style.ERROR(f"❌ Tenant '{options['tenant']}' no encontrado")
-                )
-        else:
-            # Migrar todos los tenants excepto 'public'
-            tenants = Clinica.objects.exclude(schema_name='public')
-            
+            tenants = tenants.filter(schema_name=options['tenant'])
             if not tenants.exists():
-                self.stdout.write(
-                    self.style.WARNING("⚠️ No se encontraron tenants para migrar")
-                )
-                return
-            
-            for tenant in tenants:
-                self._migrate_tenant(tenant)
-        
+                raise CommandError(f"❌ Tenant '{options['tenant']}' no encontrado")
+        schemas = list(tenants.order_by('schema_name').values_list('schema_name', flat=True))
+        if not schemas:
+            self.stdout.write(self.style.WARNING("⚠️ No se encontraron tenants para migrar"))
+            return
+
+        objetivo = sorted(MigrationLoader(None, ignore_no_migrations=True).graph.leaf_nodes())
+        estado = self._cargar_estado(options['estado'], objetivo, options['reanudar'])
+
+        pendientes = []
+        for schema in schemas:
+            if options['reanudar'] and estado['tenants'].get(schema, {}).get('estado') == 'ok':
+                continue
+            if not options['todos'] and self._al_dia(schema, objetivo):
+                estado['tenants'][schema] = {'estado': 'ok', 'segundos': 0, 'omitido': True}
+                continue
+            pendientes.append(schema)
+
         self.stdout.write(
-            self.style.SUCCESS("✅ Migraciones completadas en todos los tenants")
-        )
-
-    def _migrate_tenant(self, tenant):
-        """Ejecuta migraciones en un tenant específico"""
-        self.stdout.write(f"📊 Migrando tenant: {tenant.nombre} ({tenant.schema_name})")
-        
-        try:
-            # Cambiar al esquema del tenant
-            connection.set_tenant(tenant)
-            
-            # Ejecutar migraciones
-            call_command('migrate', verbosity=1, interactive=False)
-            
-            self.stdout.write(
-                self.style.SUCCESS(f"✅ Migraciones completadas para {tenant.schema_name}")
+            f"📊 {len(schemas)} tenants: {len(pendientes)} por migrar, "
+            f"{len(schemas) - len(pendientes)} al día o ya completados"
+        )
+        self._guardar_estado(options['estado'], estado)
+
+        if pendientes:
+            procesos = max(1, min(options['procesos'], len(pendientes)))
+            with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_worker) as pool:
+                # La conexión del padre no debe heredarse abierta a los workers
+                connection.close()
+                futuros = [pool.submit(_migrar_schema, s, options['verbosity']) for s in pendientes]
+                for futuro in as_completed(futuros):
+                    schema, ok, segundos, salida = futuro.result()
+                    estado['tenants'][schema] = {
+                        'estado': 'ok' if ok else 'error',
+                        'segundos': round(segundos, 2),
+                        'fecha': timezone.now().isoformat(),
+                        **({} if ok else {'error': salida[-2000:]}),
+                    }
+                    self._guardar_estado(options['estado'], estado)
+                    if ok:
+                        self.stdout.write(self.style.SUCCESS(f"✅ {schema} migrado en {segundos:.1f}s"))
+                    else:
+                        self.stdout.write(self.style.ERROR(f"❌ Error migrando {schema}:\n{salida[-2000:]}"))
+
+        self._reporte(estado, schemas, time.perf_counter() - inicio)
+
+        fallidos = [s for s in schemas if estado['tenants'].get(s, {}).get('estado') == 'error']
+        if fallidos:
+            raise CommandError(
+                f"Fallaron {len(fallidos)} tenants: {', '.join(fallidos)}. "
+                f"Corrija y vuelva a ejecutar con --reanudar"
             )
-            
-        except Exception as e:
-            self.stdout.write(
-                self.style.ERROR(f"❌ Error migrando {tenant.schema_name}: {str(e)}")
-            )
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS("✅ Migraciones completadas en todos los tenants"))
+
+    def _al_dia(self, schema, objetivo):
+        """Chequeo barato: las migraciones hoja del proyecto ya están en <schema>.django_migrations."""
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [f'"{schema}".django_migrations'])
+            if cursor.fetchone()[0] is None:
+                return False
+            cursor.execute(f'SELECT app, name FROM "{schema}".django_migrations')
+            aplicadas = set(cursor.fetchall())
+        return all(nodo in aplicadas for nodo in objetivo)
+
+    def _cargar_estado(self, ruta, objetivo, reanudar):
+        objetivo = [list(nodo) for nodo in objetivo]
+        if reanudar:
+            try:
+                with open(ruta, encoding='utf-8') as archivo:
+                    estado = json.load(archivo)
+                # El avance solo sirve si el objetivo de migraciones no cambió
+                if estado.get('objetivo') == objetivo:
+                    return estado
+                self.stdout.write(self.style.WARNING("⚠️ Las migraciones cambiaron desde la última corrida; se empieza de cero"))
+            except (OSError, ValueError):
+                pass
+        return {'objetivo': objetivo, 'inicio': timezone.now().isoformat(), 'tenants': {}}
+
+    def _guardar_estado(self, ruta, estado):
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(estado, archivo, indent=2, ensure_ascii=False)
+
+    def _reporte(self, estado, schemas, total):
+        migrados = sorted(
+            ((s, estado['tenants'][s]) for s in schemas
+             if s in estado['tenants'] and not estado['tenants'][s].get('omitido')),
+            key=lambda x: x[1]['segundos'], reverse=True,
+        )
+        self.stdout.write("\n⏱️  Tiempos por tenant:")
+        for schema, datos in migrados:
+            self.stdout.write(f"  {schema:<30} {datos['estado']:<6} {datos['segundos']:8.1f}s")
+        suma = sum(d['segundos'] for _, d in migrados)
+        self.stdout.write(
+            f"  Total: {total:.1f}s de reloj, {suma:.1f}s sumados en {len(migrados)} tenants migrados"
+        )
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from core.services import ProvisionamientoTenantService
+
+
+class Command(BaseCommand):
+    help = (
+        'Construye o actualiza el schema plantilla (migrado y con datos semilla) que se '
+        'clona al dar de alta una clínica. Correr después de cada deploy con migraciones.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forzar',
+            action='store_true',
+            help='Reconstruir la plantilla aunque esté al día'
+        )
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Solo informar si la plantilla está vigente (código de salida 1 si no)'
+        )
+
+    def handle(self, *args, **options):
+        plantilla = ProvisionamientoTenantService.schema_plantilla()
+        if not plantilla:
+            raise CommandError('TENANT_TEMPLATE_SCHEMA no está configurado')
+
+        if options['verificar']:
+            if ProvisionamientoTenantService.plantilla_vigente():
+                self.stdout.write(self.style.SUCCESS(f"✅ Plantilla '{plantilla}' vigente"))
+                return
+            raise CommandError(f"Plantilla '{plantilla}' ausente o con migraciones pendientes")
+
+        inicio = time.perf_counter()
+        reconstruida = ProvisionamientoTenantService.preparar_plantilla(
+            forzar=options['forzar'], verbosity=options['verbosity']
+        )
+        if reconstruida:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Plantilla '{plantilla}' construida en {time.perf_counter() - inicio:.1f}s"
+            ))
+        else:
+            self.stdout.write(f"Plantilla '{plantilla}' ya está al día (use --forzar para reconstruir)")
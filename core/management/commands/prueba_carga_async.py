@@ -0,0 +1,175 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.utils import timezone
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica
+from core import models
+from core.management.commands.benchmark_rendimiento import percentil
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga de los endpoints JSON de consulta frecuente contra uno o más '
+        'servidores en marcha (p. ej. gunicorn síncrono y gunicorn con ASGI_MODE=true) '
+        'y compara el throughput con peticiones concurrentes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='schema_name del tenant con datos sembrados')
+        parser.add_argument(
+            '--servidor',
+            action='append',
+            required=True,
+            help='nombre=url_base, p. ej. wsgi=http://127.0.0.1:8000 (repetir para comparar)'
+        )
+        parser.add_argument('--usuario', type=str, help='Usuario de la sesión (por defecto un superusuario)')
+        parser.add_argument(
+            '--cookie',
+            type=str,
+            help='Valor de la cookie de sesión a usar; por defecto se crea una en el caché compartido '
+                 '(solo sirve si los servidores corren en esta máquina)'
+        )
+        parser.add_argument('--concurrencia', type=int, default=32, help='Peticiones simultáneas')
+        parser.add_argument('--peticiones', type=int, default=500, help='Peticiones por servidor')
+        parser.add_argument('--timeout', type=float, default=30, help='Segundos máximos por petición')
+        parser.add_argument('--json', type=str, help='Ruta donde guardar los resultados en JSON')
+
+    def handle(self, *args, **options):
+        tenant = Clinica.objects.filter(schema_name=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' no encontrado")
+
+        servidores = []
+        for valor in options['servidor']:
+            nombre, separador, url = valor.partition('=')
+            if not separador or not url.startswith('http'):
+                raise CommandError(f"--servidor inválido: '{valor}' (use nombre=http://host:puerto)")
+            servidores.append((nombre, url.rstrip('/')))
+
+        with tenant_context(tenant):
+            rutas = self._rutas(tenant)
+            cookie = options['cookie'] or self._crear_sesion(options['usuario'])
+        if not rutas:
+            raise CommandError('El tenant no tiene datos; ejecute generar_datos_sinteticos primero')
+
+        resultados = {}
+        for nombre, url_base in servidores:
+            self.stdout.write(f"\n▶ {nombre} ({url_base}): {options['peticiones']} peticiones, "
+                              f"{options['concurrencia']} concurrentes")
+            resultados[nombre] = self._ejecutar(url_base, rutas, cookie, options)
+            self._imprimir(resultados[nombre])
+
+        if len(resultados) > 1:
+            base, *otros = list(resultados)
+            self.stdout.write('\nComparación de throughput:')
+            for nombre in otros:
+                factor = resultados[nombre]['req_s'] / max(resultados[base]['req_s'], 1e-9)
+                self.stdout.write(f"  {nombre} vs {base}: {factor:.2f}x")
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+
+    def _rutas(self, tenant):
+        """Rutas de los endpoints a probar, con parámetros tomados de los datos del tenant."""
+        prefijo = f'/{tenant.schema_name}/'
+        paciente_id = models.Paciente.objects.values_list('pk', flat=True).first()
+        dentista_id = models.PerfilDentista.objects.values_list('pk', flat=True).first()
+        if paciente_id is None or dentista_id is None:
+            return []
+        hoy = timezone.localdate().isoformat()
+        return [
+            ('agenda', f'{prefijo}api/citas/?dentista_id={dentista_id}'),
+            ('horarios', f'{prefijo}api/dentista/{dentista_id}/horarios-disponibles/?fecha={hoy}'),
+            ('horario_dentista', f'{prefijo}api/dentista/{dentista_id}/horario/'),
+            ('odontograma', f'{prefijo}api/odontograma/{paciente_id}/'),
+            ('busqueda_pacientes', f'{prefijo}api/pacientes/?q=a&limit=20'),
+            ('citas_paciente_lab', f'{prefijo}api/pacientes/{paciente_id}/citas/'),
+        ]
+
+    def _crear_sesion(self, username):
+        usuario = (
+            User.objects.filter(username=username).first() if username
+            else User.objects.filter(is_superuser=True, is_active=True).first()
+        )
+        if usuario is None:
+            raise CommandError('No se encontró el usuario para la sesión; use --usuario')
+        client = Client()
+        client.force_login(usuario)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def _ejecutar(self, url_base, rutas, cookie, options):
+        encabezados = {
+            'Cookie': f'{settings.SESSION_COOKIE_NAME}={cookie}',
+            'Accept': 'application/json',
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+
+        def peticion(i):
+            nombre, ruta = rutas[i % len(rutas)]
+            solicitud = urllib.request.Request(url_base + ruta, headers=encabezados)
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(solicitud, timeout=options['timeout']) as respuesta:
+                    respuesta.read()
+                    status = respuesta.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, TimeoutError, OSError):
+                status = 0
+            return nombre, (time.perf_counter() - inicio) * 1000, status
+
+        # Calentamiento: una petición por ruta para no medir imports ni el primer SET search_path
+        for i in range(len(rutas)):
+            peticion(i)
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrencia'])) as pool:
+            muestras = list(pool.map(peticion, range(options['peticiones'])))
+        total = time.perf_counter() - inicio
+
+        por_ruta = defaultdict(list)
+        errores = defaultdict(int)
+        for nombre, ms, status in muestras:
+            por_ruta[nombre].append(ms)
+            if status == 0 or status >= 400:
+                errores[nombre] += 1
+        todos = sorted(ms for _, ms, _ in muestras)
+        return {
+            'segundos': round(total, 3),
+            'req_s': round(len(muestras) / total, 1),
+            'p50_ms': round(percentil(todos, 50), 1),
+            'p95_ms': round(percentil(todos, 95), 1),
+            'errores': sum(errores.values()),
+            'rutas': {
+                nombre: {
+                    'peticiones': len(tiempos),
+                    'p50_ms': round(percentil(sorted(tiempos), 50), 1),
+                    'p95_ms': round(percentil(sorted(tiempos), 95), 1),
+                    'errores': errores[nombre],
+                }
+                for nombre, tiempos in por_ruta.items()
+            },
+        }
+
+    def _imprimir(self, resultado):
+        for nombre, datos in resultado['rutas'].items():
+            linea = f"  {nombre:<20} p50 {datos['p50_ms']:8.1f}ms  p95 {datos['p95_ms']:8.1f}ms"
+            if datos['errores']:
+                linea += f"  {datos['errores']} errores"
+            self.stdout.write(linea)
+        self.stdout.write(
+            f"  Total: {resultado['req_s']:.1f} req/s en {resultado['segundos']:.2f}s, "
+            f"p50 {resultado['p50_ms']:.1f}ms p95 {resultado['p95_ms']:.1f}ms"
+        )
+        if resultado['errores']:
+            self.stdout.write(self.style.WARNING(f"  ⚠️ {resultado['errores']} peticiones con error"))
@@ -0,0 +1,43 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica
+from core.services import ResumenReportesService
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes diarios de ingresos y servicios vendidos usados por los reportes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Reconstruir solo un tenant específico (schema_name)'
+        )
+        parser.add_argument(
+            '--desde',
+            type=datetime.date.fromisoformat,
+            help='Fecha inicial (YYYY-MM-DD). Por defecto todo el historial.'
+        )
+        parser.add_argument(
+            '--hasta',
+            type=datetime.date.fromisoformat,
+            help='Fecha final (YYYY-MM-DD). Por defecto hasta hoy.'
+        )
+
+    def handle(self, *args, **options):
+        tenants = Clinica.objects.exclude(schema_name='public')
+        if options['tenant']:
+            tenants = tenants.filter(schema_name=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f"Tenant '{options['tenant']}' no encontrado")
+
+        for tenant in tenants:
+            with tenant_context(tenant):
+                ingresos, servicios = ResumenReportesService.reconstruir(
+                    fecha_inicio=options['desde'],
+                    fecha_fin=options['hasta'],
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {tenant.schema_name}: {ingresos} renglones de ingresos, {servicios} de servicios"
+            ))
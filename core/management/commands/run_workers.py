@@ -0,0 +1,134 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Count
+from django_tenants.utils import get_public_schema_name, schema_context
+
+from core import tareas
+
+
+def _bucle_worker(indice, detener, intervalo, schema_name):
+    """Toma y ejecuta tareas hasta que el proceso padre pida detenerse."""
+    # El padre maneja SIGINT/SIGTERM y avisa con `detener`; la tarea en curso termina
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    connections.close_all()
+
+    worker = f'{tareas.identificador_worker()}#{indice}'
+    ultima_limpieza = 0.0
+    try:
+        while not detener.is_set():
+            if indice == 0 and time.monotonic() - ultima_limpieza > 60:
+                tareas.liberar_atascadas()
+                ultima_limpieza = time.monotonic()
+            tarea_encolada = tareas.tomar_siguiente(worker=worker, schema_name=schema_name)
+            if tarea_encolada is None:
+                detener.wait(intervalo)
+                continue
+            tareas.ejecutar(tarea_encolada)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Ejecuta las tareas en segundo plano de core/tareas.py (cola en el schema público) '
+        'con N procesos worker. Termina ordenadamente con SIGTERM/Ctrl+C.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=2, help='Número de procesos worker')
+        parser.add_argument('--intervalo', type=float, default=2.0, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--tenant', type=str, help='Atender solo las tareas de este schema')
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Ejecutar las tareas listas en este proceso y salir (útil en cron o para depurar)'
+        )
+        parser.add_argument('--resumen', action='store_true', help='Mostrar el estado de la cola y salir')
+        parser.add_argument('--purgar', action='store_true', help='Borrar tareas completadas viejas y salir')
+
+    def handle(self, *args, **options):
+        if options['resumen']:
+            return self._resumen()
+        if options['purgar']:
+            borradas = tareas.purgar_terminadas()
+            self.stdout.write(self.style.SUCCESS(f'✅ {borradas} tareas completadas purgadas'))
+            return
+        if options['una_vez']:
+            return self._una_vez(options['tenant'])
+
+        tareas.liberar_atascadas()
+        procesos = max(1, options['procesos'])
+        contexto = multiprocessing.get_context('fork')
+        detener = contexto.Event()
+        # Cada worker abre su propia conexión; la del padre no debe heredarse abierta
+        connections.close_all()
+
+        def iniciar(indice):
+            proceso = contexto.Process(
+                target=_bucle_worker,
+                args=(indice, detener, options['intervalo'], options['tenant']),
+                name=f'run_workers-{indice}',
+            )
+            proceso.start()
+            return proceso
+
+        def pedir_detencion(signum, frame):
+            if not detener.is_set():
+                self.stdout.write('⏹️  Deteniendo workers (terminan la tarea en curso)...')
+            detener.set()
+
+        signal.signal(signal.SIGTERM, pedir_detencion)
+        signal.signal(signal.SIGINT, pedir_detencion)
+
+        workers = [iniciar(i) for i in range(procesos)]
+        self.stdout.write(self.style.SUCCESS(f'🚀 {procesos} workers atendiendo la cola de tareas'))
+
+        while not detener.is_set():
+            detener.wait(5)
+            # Un worker que murió (p. ej. por memoria) se reemplaza
+            for i, proceso in enumerate(workers):
+                if not proceso.is_alive() and not detener.is_set():
+                    self.stdout.write(self.style.WARNING(
+                        f'⚠️ El worker {i} terminó con código {proceso.exitcode}; reiniciando'
+                    ))
+                    workers[i] = iniciar(i)
+
+        for proceso in workers:
+            proceso.join()
+        self.stdout.write(self.style.SUCCESS('✅ Workers detenidos'))
+
+    def _una_vez(self, schema_name):
+        tareas.liberar_atascadas()
+        ok = fallidas = 0
+        inicio = time.perf_counter()
+        while True:
+            tarea_encolada = tareas.tomar_siguiente(schema_name=schema_name)
+            if tarea_encolada is None:
+                break
+            if tareas.ejecutar(tarea_encolada):
+                ok += 1
+            else:
+                fallidas += 1
+        self.stdout.write(
+            f'{ok + fallidas} tareas ejecutadas en {time.perf_counter() - inicio:.1f}s: '
+            f'{ok} correctas, {fallidas} con error'
+        )
+
+    def _resumen(self):
+        from tenants.models import TareaEncolada
+
+        with schema_context(get_public_schema_name()):
+            conteos = (
+                TareaEncolada.objects.values('nombre', 'estado')
+                .annotate(total=Count('id')).order_by('nombre', 'estado')
+            )
+            nombres_estado = dict(TareaEncolada.ESTADOS)
+            if not conteos:
+                self.stdout.write('La cola está vacía')
+            for fila in conteos:
+                self.stdout.write(f"{fila['nombre']:<60} {nombres_estado[fila['estado']]:<12} {fila['total']:6d}")
@@ -1,9 +1,8 @@
 import datetime
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from django.conf import settings
 from django_tenants.utils import tenant_context
 from tenants.models import Clinica
+from core import tareas
 from core.models import Paciente
 
 class Command(BaseCommand):
@@ -32,7 +31,7 @@ class Command(BaseCommand):
             self.stdout.write('No hay pacientes que cumplan años mañana en este tenant.')
             return
 
-        self.stdout.write(f'Encontrados {pacientes_cumpleaneros.count()} cumpleañeros. Enviando emails...')
+        self.stdout.write(f'Encontrados {pacientes_cumpleaneros.count()} cumpleañeros. Encolando emails...')
 
         for paciente in pacientes_cumpleaneros:
             if not paciente.email:
@@ -47,14 +46,10 @@ class Command(BaseCommand):
                 f'¡Muchas felicidades!'
             )
             
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [paciente.email],
-                    fail_silently=False,
-                )
-                self.stdout.write(self.style.SUCCESS(f'Felicitación enviada a {paciente.email}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error al enviar email a {paciente.email}: {e}'))
\ No newline at end of file
+            # El envío (con reintentos) lo hace un worker; la clave evita duplicar
+            # el correo si el comando corre de nuevo antes de que se envíe
+            tareas.encolar(
+                tareas.enviar_email, subject, message, [paciente.email],
+                clave=f'cumpleanos:{paciente.pk}:{tomorrow.isoformat()}',
+            )
+            self.stdout.write(self.style.SUCCESS(f'Felicitación encolada para {paciente.email}'))
@@ -1,8 +1,8 @@
+import datetime
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from django.conf import settings
 from django_tenants.utils import tenant_context
 from tenants.models import Clinica
+from core import tareas
 from core.models import Cita
 
 class Command(BaseCommand):
@@ -20,19 +20,24 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS('Proceso de recordatorios de pago finalizado para todos los tenants.'))
 
     def enviar_recordatorios_por_tenant(self, tenant):
-        citas_con_saldo = Cita.objects.filter(
-            estado='COM', # Solo citas completadas
-            saldo_pendiente__gt=0
-        ).select_related('cliente')
+        today = datetime.date.today()
 
-        if not citas_con_saldo.exists():
+        # saldo_pendiente es una propiedad (costo real - pagos), no una columna
+        citas_con_saldo = [
+            cita for cita in Cita.objects.filter(
+                estado='COM', # Solo citas completadas
+            ).select_related('paciente')
+            if cita.saldo_pendiente > 0
+        ]
+
+        if not citas_con_saldo:
             self.stdout.write('No hay citas con saldos pendientes en este tenant.')
             return
 
-        self.stdout.write(f'Encontradas {citas_con_saldo.count()} citas con saldo pendiente. Enviando emails...')
+        self.stdout.write(f'Encontradas {len(citas_con_saldo)} citas con saldo pendiente. Encolando emails...')
 
         for cita in citas_con_saldo:
-            paciente = cita.cliente
+            paciente = cita.paciente
             if not paciente.email:
                 self.stdout.write(self.style.WARNING(f'Paciente {paciente} no tiene email. Saltando.'))
                 continue
@@ -46,15 +51,11 @@ class Command(BaseCommand):
                 f'Gracias,\n'
                 f'El equipo de {tenant.nombre}'
             )
-            
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [paciente.email],
-                    fail_silently=False,
-                )
-                self.stdout.write(self.style.SUCCESS(f'Recordatorio de pago enviado a {paciente.email}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error al enviar email a {paciente.email}: {e}'))
\ No newline at end of file
+
+            # El envío (con reintentos) lo hace un worker; la clave evita duplicar
+            # el correo si el comando corre de nuevo antes de que se envíe
+            tareas.encolar(
+                tareas.enviar_email, subject, message, [paciente.email],
+                clave=f'recordatorio-pago:{cita.pk}:{today.isoformat()}',
+            )
+            self.stdout.write(self.style.SUCCESS(f'Recordatorio de pago encolado para {paciente.email}'))
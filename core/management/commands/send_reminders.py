@@ -1,9 +1,8 @@
 import datetime
 from django.core.management.base import BaseCommand
-from django.core.mail import send_mail
-from django.conf import settings
 from django_tenants.utils import tenant_context
 from tenants.models import Clinica
+from core import tareas
 from core.models import Cita
 
 class Command(BaseCommand):
@@ -26,16 +25,16 @@ class Command(BaseCommand):
         citas_de_manana = Cita.objects.filter(
             fecha_hora__date=tomorrow,
             estado__in=['PRO', 'CON']
-        ).select_related('cliente')
+        ).select_related('paciente')
 
         if not citas_de_manana.exists():
             self.stdout.write('No hay citas programadas para mañana en este tenant.')
             return
 
-        self.stdout.write(f'Encontradas {citas_de_manana.count()} citas. Enviando emails...')
+        self.stdout.write(f'Encontradas {citas_de_manana.count()} citas. Encolando emails...')
 
         for cita in citas_de_manana:
-            paciente = cita.cliente
+            paciente = cita.paciente
             if not paciente.email:
                 self.stdout.write(self.style.WARNING(f'Paciente {paciente} no tiene email. Saltando.'))
                 continue
@@ -51,14 +50,10 @@ class Command(BaseCommand):
                 f'El equipo de {tenant.nombre}'
             )
             
-            try:
-                send_mail(
-                    subject,
-                    message,
-                    settings.DEFAULT_FROM_EMAIL,
-                    [paciente.email],
-                    fail_silently=False,
-                )
-                self.stdout.write(self.style.SUCCESS(f'Recordatorio enviado a {paciente.email}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error al enviar email a {paciente.email}: {e}'))
\ No newline at end of file
+            # El envío (con reintentos) lo hace un worker; la clave evita duplicar
+            # el correo si el comando corre de nuevo antes de que se envíe
+            tareas.encolar(
+                tareas.enviar_email, subject, message, [paciente.email],
+                clave=f'recordatorio-cita:{cita.pk}:{tomorrow.isoformat()}',
+            )
+            self.stdout.write(self.style.SUCCESS(f'Recordatorio encolado para {paciente.email}'))
@@ -0,0 +1,110 @@
+import gzip
+import json
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from django.template.loader import get_template
+
+
+# Plantillas que cargaban la mayor parte de su JS/CSS inline
+PLANTILLAS_PESADAS = (
+    'core/agenda.html',
+    'core/cita_manage.html',
+    'core/service_list.html',
+    'core/odontograma_48.html',
+    'core/pago_list.html',
+)
+
+_INLINE = re.compile(r'<(script)(?![^>]*\bsrc=)[^>]*>(.*?)</script>|<(style)[^>]*>(.*?)</style>', re.S | re.I)
+_STATIC = re.compile(r"""{%\s*static\s+['"]([^'"]+)['"]\s*%}""")
+
+
+def kb(texto):
+    return len(texto.encode('utf-8')) / 1024
+
+
+def kb_inline(html):
+    """KB de JS/CSS inline (<script> sin src y <style>) en `html`. También lo usa core/tests.py."""
+    return sum(kb(m.group(2) or m.group(4) or '') for m in _INLINE.finditer(html))
+
+
+class Command(BaseCommand):
+    help = (
+        'Verifica el presupuesto de peso de las plantillas pesadas: tamaño del HTML '
+        'y del JS/CSS inline (que se descarga en cada navegación por ser no-store).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--plantilla',
+            action='append',
+            help='Plantilla a verificar (se puede repetir). Por defecto las plantillas pesadas.'
+        )
+        parser.add_argument(
+            '--max-html-kb',
+            type=float,
+            default=getattr(settings, 'PAGE_HTML_BUDGET_KB', 40),
+            help='Tamaño máximo del código fuente de la plantilla en KB'
+        )
+        parser.add_argument(
+            '--max-inline-kb',
+            type=float,
+            default=getattr(settings, 'PAGE_INLINE_BUDGET_KB', 2),
+            help='Tamaño máximo de <script>/<style> inline en KB'
+        )
+        parser.add_argument(
+            '--json',
+            type=str,
+            help='Ruta de archivo donde guardar el resultado en JSON'
+        )
+
+    def handle(self, *args, **options):
+        plantillas = options['plantilla'] or PLANTILLAS_PESADAS
+        resultados = []
+        errores = []
+
+        for nombre in plantillas:
+            fuente = get_template(nombre).template.source
+            html_kb = kb(fuente)
+            inline_kb = kb_inline(fuente)
+
+            estaticos = []
+            for ruta in _STATIC.findall(fuente):
+                archivo = finders.find(ruta)
+                if not archivo:
+                    errores.append(f'{nombre}: no existe el archivo estático {ruta}')
+                    continue
+                with open(archivo, 'rb') as f:
+                    contenido = f.read()
+                estaticos.append({
+                    'ruta': ruta,
+                    'kb': round(len(contenido) / 1024, 1),
+                    'gzip_kb': round(len(gzip.compress(contenido)) / 1024, 1),
+                })
+
+            resultados.append({
+                'plantilla': nombre,
+                'html_kb': round(html_kb, 1),
+                'inline_kb': round(inline_kb, 1),
+                'estaticos': estaticos,
+            })
+
+            self.stdout.write(f'{nombre}: HTML {html_kb:.1f} KB, inline {inline_kb:.1f} KB')
+            for e in estaticos:
+                self.stdout.write(f"    {e['ruta']}: {e['kb']} KB ({e['gzip_kb']} KB gzip, cacheable)")
+
+            if html_kb > options['max_html_kb']:
+                errores.append(f"{nombre}: HTML de {html_kb:.1f} KB excede {options['max_html_kb']} KB")
+            if inline_kb > options['max_inline_kb']:
+                errores.append(f"{nombre}: {inline_kb:.1f} KB de JS/CSS inline excede {options['max_inline_kb']} KB")
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+
+        if errores:
+            raise CommandError('\n'.join(errores))
+
+        self.stdout.write(self.style.SUCCESS('✅ Plantillas dentro del presupuesto de peso'))
@@ -0,0 +1,138 @@
+import json
+import re
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import URLPattern
+from django_tenants.utils import tenant_context
+from tenants.models import Clinica
+from core import models
+from core.presupuesto_consultas import obtener_presupuesto, verificar_presupuesto
+
+
+# Rutas cuyo GET tiene efectos secundarios; no se recorren
+EXCLUIR_POR_DEFECTO = ('logout', 'cancelar', 'inicializar', 'clonar', 'enviar', 'switch', 'setup')
+
+# Modelo con el que se rellena cada parámetro de ruta (además de <int:pk>)
+PARAMETROS = {
+    'paciente_id': models.Paciente,
+    'cliente_id': models.Paciente,
+    'cita_id': models.Cita,
+    'dentista_id': models.PerfilDentista,
+}
+
+CONVERTIDOR = re.compile(r'<(?:\w+:)?(\w+)>')
+
+
+def construir_ruta(patron):
+    """Sustituye cada parámetro de la ruta por el primer registro existente del modelo correspondiente."""
+    ruta = str(patron.pattern)
+    faltante = False
+
+    def sustituir(match):
+        nonlocal faltante
+        nombre = match.group(1)
+        modelo = PARAMETROS.get(nombre)
+        if nombre == 'pk':
+            modelo = getattr(getattr(patron.callback, 'view_class', None), 'model', None)
+        pk = modelo.objects.values_list('pk', flat=True).first() if modelo else None
+        if pk is None:
+            faltante = True
+            return ''
+        return str(pk)
+
+    ruta = CONVERTIDOR.sub(sustituir, ruta)
+    return None if faltante else ruta
+
+
+def rutas_a_verificar(excluir=EXCLUIR_POR_DEFECTO, solo=None):
+    """
+    Rutas GET con nombre de core/urls.py y su path con parámetros ya rellenados
+    (ejecutar dentro del tenant con datos). Devuelve (rutas, omitidas): lista de
+    (patron, ruta) y nombres de las que no tienen datos para sus parámetros.
+    También la usa core/tests.py.
+    """
+    from core import urls as core_urls
+
+    rutas = []
+    omitidas = []
+    for patron in core_urls.urlpatterns:
+        if not isinstance(patron, URLPattern) or not patron.name:
+            continue
+        if any(fragmento in patron.name for fragmento in excluir):
+            continue
+        if solo and solo not in patron.name:
+            continue
+        ruta = construir_ruta(patron)
+        if ruta is None:
+            omitidas.append(patron.name)
+            continue
+        rutas.append((patron, ruta))
+    return rutas, omitidas
+
+
+class Command(BaseCommand):
+    help = (
+        'Recorre todas las rutas GET de core/urls.py contra un tenant con datos (ver '
+        'generar_datos_sinteticos) y verifica el presupuesto de consultas de cada vista.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=str, required=True, help='schema_name del tenant con datos sembrados')
+        parser.add_argument('--usuario', type=str, help='Usuario con el que se navega (por defecto un superusuario)')
+        parser.add_argument('--solo', type=str, help='Verificar solo rutas cuyo nombre contenga este texto')
+        parser.add_argument('--excluir', nargs='*', default=list(EXCLUIR_POR_DEFECTO), help='Fragmentos de nombre de ruta a omitir')
+        parser.add_argument('--json', type=str, help='Ruta donde guardar el resultado en JSON')
+
+    def handle(self, *args, **options):
+        tenant = Clinica.objects.filter(schema_name=options['tenant']).first()
+        if tenant is None:
+            raise CommandError(f"Tenant '{options['tenant']}' no encontrado")
+
+        client = Client(raise_request_exception=False)
+        with tenant_context(tenant):
+            usuario = (
+                User.objects.filter(username=options['usuario']).first() if options['usuario']
+                else User.objects.filter(is_superuser=True, is_active=True).first()
+            )
+            if usuario is None:
+                raise CommandError('No se encontró el usuario para navegar; use --usuario')
+            client.force_login(usuario)
+
+            rutas, omitidas = rutas_a_verificar(options['excluir'], options['solo'])
+            for nombre in omitidas:
+                self.stdout.write(self.style.NOTICE(f'{nombre:<45} omitida (parámetros sin datos)'))
+
+        resultados = []
+        excedidas = []
+        for patron, ruta in rutas:
+            url = f'/{tenant.schema_name}/{ruta}'
+            respuesta, consultas, ms, excedidos = verificar_presupuesto(client, url)
+            presupuesto = obtener_presupuesto(patron.callback)
+            limite = presupuesto.max_consultas if presupuesto else settings.QUERY_BUDGET_DEFAULT
+            resultados.append({
+                'nombre': patron.name,
+                'url': url,
+                'status': respuesta.status_code,
+                'consultas': consultas,
+                'ms_bd': round(ms, 2),
+                'presupuesto': limite,
+                'declarado': presupuesto is not None,
+                'excedido': excedidos,
+            })
+            linea = f'{patron.name:<45} {consultas:4d}/{limite:<4d} {ms:8.1f}ms  HTTP {respuesta.status_code}'
+            if excedidos:
+                excedidas.append(patron.name)
+                self.stdout.write(self.style.ERROR(f"{linea}  ❌ {', '.join(excedidos)}"))
+            else:
+                self.stdout.write(linea)
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+
+        if excedidas:
+            raise CommandError(f"{len(excedidas)} vistas exceden su presupuesto: {', '.join(excedidas)}")
+        self.stdout.write(self.style.SUCCESS(f'✅ {len(resultados)} rutas dentro del presupuesto'))
@@ -1,16 +1,63 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.shortcuts import redirect
 from django.conf import settings
 from django.urls import resolve
 from django.http import HttpResponse, Http404
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
 from django_tenants.middleware.main import TenantMainMiddleware
 from django_tenants.utils import get_tenant_model, get_tenant_domain_model
+from whitenoise.middleware import WhiteNoiseMiddleware
 import logging
 import re
 
+from . import logging_utils
+from .principal import obtener_principal
+from .presupuesto_consultas import contar_consultas, excede, histograma, obtener_presupuesto
+
 logger = logging.getLogger(__name__)
 
+
+class RequestLogContextMiddleware:
+    """
+    Fija el contexto de logging (id de request, tenant, usuario) una sola vez por
+    request; RequestContextFilter lo agrega a cada registro. Debe ir primero en
+    MIDDLEWARE para cubrir también los logs del middleware de tenants.
+    """
+
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        token = logging_utils.iniciar_contexto(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            logging_utils.terminar_contexto(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        # El ContextVar se copia a los hilos de sync_to_async, así que el
+        # contexto también llega a los middlewares y vistas síncronos
+        token = logging_utils.iniciar_contexto(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            logging_utils.terminar_contexto(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+
 class ForceAuthenticationMiddleware:
     """
     Middleware que fuerza autenticación para todas las rutas excepto login, logout, admin y archivos estáticos
@@ -48,26 +95,24 @@ class ForceAuthenticationMiddleware:
     def __call__(self, request):
         # Verificar si la URL está exenta
         path = request.path
-        user = request.user
-        
-        # Log para diagnóstico (solo para URLs que no sean estáticas)
-        if not any(path.startswith(prefix) for prefix in self.static_prefixes):
-            logger.info(f"ForceAuth: Path={path}, User={user}, Authenticated={user.is_authenticated}")
         
         # PRIMERO: Archivos estáticos - permitir siempre sin procesamiento
         if any(path.startswith(prefix) for prefix in self.static_prefixes):
             return self.get_response(request)
-        
+
+        # Usuario y tenant los agrega RequestContextFilter; no evaluar request.user aquí
+        logger.debug("ForceAuth: Path=%s", path)
+
         # SEGUNDO: URLs específicas exentas
         if any(path.startswith(exempt) for exempt in self.exempt_urls):
-            logger.info(f"ForceAuth: Path {path} exenta por URL específica")
+            logger.debug("ForceAuth: Path %s exenta por URL específica", path)
             return self.get_response(request)
 
         # TERCERO: Si el usuario no está autenticado, redirigir al login
         if not request.user.is_authenticated:
             # IMPORTANTE: Si ya estamos en una página de login, NO redirigir (evitar bucle infinito)
             if path.endswith('/accounts/login/') or '/accounts/login/' in path:
-                logger.info(f"ForceAuth: Ya estamos en login ({path}), permitiendo acceso")
+                logger.debug("ForceAuth: Ya estamos en login (%s), permitiendo acceso", path)
                 return self.get_response(request)
             
             # Si estamos en una ruta de clínica, mantener el contexto
@@ -75,7 +120,7 @@ class ForceAuthenticationMiddleware:
             if clinic_slug:
                 # Estamos en una clínica, redirigir al login de esa clínica
                 login_url = f'/{clinic_slug}/accounts/login/'
-                logger.info(f"ForceAuth: Redirigiendo desde {path} al login de clínica: {login_url}")
+                logger.debug("ForceAuth: Redirigiendo desde %s al login de clínica: %s", path, login_url)
             else:
                 # Usar login estándar para rutas públicas
                 login_url = settings.LOGIN_URL
@@ -84,13 +129,13 @@ class ForceAuthenticationMiddleware:
                 tenant_param = request.GET.get('tenant')
                 if tenant_param:
                     login_url += f'?tenant={tenant_param}'
-                    logger.info(f"ForceAuth: Redirigiendo desde {path} a {login_url} (tenant={tenant_param})")
+                    logger.debug("ForceAuth: Redirigiendo desde %s a %s (tenant=%s)", path, login_url, tenant_param)
                 else:
-                    logger.info(f"ForceAuth: Redirigiendo desde {path} a {login_url}")
+                    logger.debug("ForceAuth: Redirigiendo desde %s a %s", path, login_url)
             
             return redirect(login_url)
         
-        logger.info(f"ForceAuth: Permitiendo acceso autenticado a {path}")
+        logger.debug("ForceAuth: Permitiendo acceso autenticado a %s", path)
         return self.get_response(request)
     
     def _extract_clinic_from_path(self, path):
@@ -146,14 +191,27 @@ class NoCacheMiddleware:
     Middleware que agrega headers a cada respuesta para prevenir
     el cacheo en el navegador.
     """
+    async_capable = True
+    sync_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
 
     def __call__(self, request):
-        response = self.get_response(request)
-        
-        # Solo aplicar a respuestas HTML para no afectar archivos estáticos o APIs
-        if 'text/html' in response.get('Content-Type', ''):
+        if self.es_async:
+            return self.__acall__(request)
+        return self.agregar_headers(self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.agregar_headers(await self.get_response(request))
+
+    def agregar_headers(self, response):
+        # Solo aplicar a respuestas HTML para no afectar archivos estáticos o APIs,
+        # y nunca a las que ya traen validadores de caché (core/cache_http.py)
+        if 'text/html' in response.get('Content-Type', '') and not response.has_header('ETag'):
             response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
             response['Pragma'] = 'no-cache'
             response['Expires'] = '0'
@@ -161,6 +219,37 @@ class NoCacheMiddleware:
         return response
 
 
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoiseMiddleware (6.x solo es síncrono) que además acepta una cadena
+    async. Con WSGI se comporta igual que el original; con ASGI evita que un
+    solo middleware síncrono obligue a Django a correr en un hilo el resto de
+    la cadena y las vistas async.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings=settings)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
 class LocalTimezoneMiddleware(MiddlewareMixin):
     """
     Middleware que activa automáticamente la zona horaria local para todas las peticiones.
@@ -178,3 +267,60 @@ class LocalTimezoneMiddleware(MiddlewareMixin):
         """Limpia la zona horaria al final de cada petición"""
         timezone.deactivate()
         return response
+
+
+class PrincipalMiddleware(MiddlewareMixin):
+    """
+    Expone request.principal (core/principal.py): grupos y perfiles del usuario
+    cargados con una sola consulta, la primera vez que algo los necesita.
+    Debe ir después de AuthenticationMiddleware.
+    """
+
+    def process_request(self, request):
+        request.principal = SimpleLazyObject(lambda: obtener_principal(request.user))
+
+
+class QueryBudgetMiddleware:
+    """
+    Registra consultas y tiempo de BD por vista en el histograma en memoria
+    (core.presupuesto_consultas.histograma) y avisa en el log cuando una vista
+    excede el presupuesto declarado con @presupuesto_consultas. Opcional: se
+    activa con settings.QUERY_BUDGET_MIDDLEWARE.
+    """
+    async_capable = True
+    sync_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        with contar_consultas() as contador:
+            response = self.get_response(request)
+        self.registrar(request, contador)
+        return response
+
+    async def __acall__(self, request):
+        # El contador se instala en la conexión del hilo thread_sensitive de la
+        # request, que es donde corren el ORM async y los middlewares síncronos
+        medicion = contar_consultas()
+        contador = await sync_to_async(medicion.__enter__)()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(medicion.__exit__)(None, None, None)
+        self.registrar(request, contador)
+        return response
+
+    def registrar(self, request, contador):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            vista = match.view_name or match._func_path
+            excedidos = excede(obtener_presupuesto(match.func), contador.consultas, contador.ms)
+            if excedidos:
+                logger.warning("Presupuesto de consultas excedido en %s (%s): %s", vista, request.path, ', '.join(excedidos))
+            histograma.registrar(vista, contador.consultas, contador.ms, excedido=bool(excedidos))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-19 12:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0040_fecha_nacimiento_opcional'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenIngresoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('metodo_pago', models.CharField(max_length=50)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('num_pagos', models.PositiveIntegerField(default=0)),
+                ('num_citas', models.PositiveIntegerField(default=0, help_text='Citas distintas con pago en el día')),
+                ('dentista', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_ingreso', to='core.perfildentista')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Ingresos',
+                'verbose_name_plural': 'Resúmenes Diarios de Ingresos',
+                'ordering': ['dia'],
+                'indexes': [models.Index(fields=['dia', 'dentista'], name='core_resume_dia_732f9d_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('dentista__isnull', False)), fields=('dia', 'dentista', 'metodo_pago'), name='uniq_resumen_ingreso_dentista'), models.UniqueConstraint(condition=models.Q(('dentista__isnull', True)), fields=('dia', 'metodo_pago'), name='uniq_resumen_ingreso_sin_dentista')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumenServicioDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('ingresos', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('dentista', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_servicio', to='core.perfildentista')),
+                ('servicio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumenes_diarios', to='core.servicio')),
+            ],
+            options={
+                'verbose_name': 'Resumen Diario de Servicios',
+                'verbose_name_plural': 'Resúmenes Diarios de Servicios',
+                'ordering': ['dia'],
+                'unique_together': {('dia', 'dentista', 'servicio')},
+            },
+        ),
+    ]
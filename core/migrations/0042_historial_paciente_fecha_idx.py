@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0041_resumenes_diarios_reportes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historialclinico',
+            index=models.Index(fields=['paciente', '-fecha_evento'], name='core_histor_pacient_6e9dbb_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0042_historial_paciente_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='trabajolaboratorio',
+            index=models.Index(fields=['estado', 'fecha_entrega_estimada'], name='core_trabaj_estado_f0ece0_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0043_trabajo_laboratorio_retraso_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pacienteconsentimiento',
+            name='documento_firmado',
+            field=models.FileField(blank=True, help_text='PDF firmado, guardado con el SHA-256 de su contenido como nombre', max_length=255, null=True, upload_to='consentimientos_firmados/'),
+        ),
+        migrations.AddField(
+            model_name='pacienteconsentimiento',
+            name='hash_documento',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
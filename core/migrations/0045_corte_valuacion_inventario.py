@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0044_consentimiento_documento_firmado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorteValuacionInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha_corte', models.DateField()),
+                ('existencia', models.PositiveIntegerField(default=0)),
+                ('cantidad_sin_costo', models.PositiveIntegerField(default=0, help_text='Unidades en lotes sin costo capturado')),
+                ('valor_peps', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('costo_promedio', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('valor_promedio', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('insumo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cortes_valuacion', to='core.insumo')),
+                ('unidad_dental', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cortes_valuacion', to='core.unidaddental')),
+            ],
+            options={
+                'verbose_name': 'Corte de Valuación de Inventario',
+                'verbose_name_plural': 'Cortes de Valuación de Inventario',
+                'ordering': ['-fecha_corte'],
+                'unique_together': {('fecha_corte', 'insumo', 'unidad_dental')},
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0045_corte_valuacion_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('STOCK_BAJO', 'Stock Bajo'), ('PROXIMO_CADUCAR', 'Próximo a Caducar'), ('CADUCADO', 'Caducado')], max_length=20)),
+                ('insumo_nombre', models.CharField(max_length=200)),
+                ('unidad_dental_nombre', models.CharField(blank=True, max_length=100)),
+                ('numero_lote', models.CharField(blank=True, max_length=100)),
+                ('fecha_caducidad', models.DateField(blank=True, null=True)),
+                ('cantidad', models.IntegerField(help_text='Stock del insumo o existencia del lote')),
+                ('stock_minimo', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Alerta de Inventario',
+                'verbose_name_plural': 'Alertas de Inventario',
+                'ordering': ['tipo', 'fecha_caducidad', 'insumo_nombre'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DigestAlertasInventario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('generado_en', models.DateTimeField(auto_now=True)),
+                ('dias_caducidad', models.PositiveSmallIntegerField(help_text="Horizonte de días para 'próximo a caducar'")),
+                ('stock_bajo', models.PositiveIntegerField(default=0)),
+                ('proximos_caducar', models.PositiveIntegerField(default=0)),
+                ('caducados', models.PositiveIntegerField(default=0)),
+                ('notificado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Digest de Alertas de Inventario',
+                'verbose_name_plural': 'Digests de Alertas de Inventario',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='insumo',
+            index=models.Index(condition=models.Q(('stock__lte', models.F('stock_minimo'))), fields=['nombre'], name='insumo_stock_bajo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='loteinsumo',
+            index=models.Index(condition=models.Q(('cantidad__gt', 0), ('fecha_caducidad__isnull', False)), fields=['fecha_caducidad'], name='lote_caducidad_existencia_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertainventario',
+            name='insumo',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.insumo'),
+        ),
+        migrations.AddField(
+            model_name='alertainventario',
+            name='lote',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.loteinsumo'),
+        ),
+        migrations.AddField(
+            model_name='alertainventario',
+            name='digest',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='core.digestalertasinventario'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def copiar_nombres(apps, schema_editor):
+    CorteValuacionInventario = apps.get_model('core', 'CorteValuacionInventario')
+    Insumo = apps.get_model('core', 'Insumo')
+    UnidadDental = apps.get_model('core', 'UnidadDental')
+
+    insumo = Insumo.objects.filter(pk=OuterRef('insumo_id'))
+    CorteValuacionInventario.objects.update(
+        insumo_nombre=Coalesce(Subquery(insumo.values('nombre')[:1]), Value('')),
+        insumo_unidad_medida=Coalesce(Subquery(insumo.values('unidad_medida')[:1]), Value('')),
+        proveedor_nombre=Coalesce(Subquery(insumo.values('proveedor__nombre')[:1]), Value('')),
+        unidad_dental_nombre=Coalesce(
+            Subquery(UnidadDental.objects.filter(pk=OuterRef('unidad_dental_id')).values('nombre')[:1]), Value('')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0046_alertas_inventario_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cortevaluacioninventario',
+            name='insumo_nombre',
+            field=models.CharField(default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='cortevaluacioninventario',
+            name='insumo_unidad_medida',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='cortevaluacioninventario',
+            name='proveedor_nombre',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='cortevaluacioninventario',
+            name='unidad_dental_nombre',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.AlterField(
+            model_name='cortevaluacioninventario',
+            name='insumo',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cortes_valuacion', to='core.insumo'),
+        ),
+        migrations.AlterField(
+            model_name='cortevaluacioninventario',
+            name='unidad_dental',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cortes_valuacion', to='core.unidaddental'),
+        ),
+        migrations.RunPython(copiar_nombres, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0047_corte_valuacion_nombres'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='resumeningresodiario',
+            name='num_citas',
+            field=models.PositiveIntegerField(default=0, help_text='Citas distintas con pago en el día y método; no se suma entre filas (una cita con dos métodos o varios días contaría doble)'),
+        ),
+    ]
@@ -4,8 +4,12 @@ Mixins personalizados para manejar autenticación con tenants path-based
 from django.contrib.auth.mixins import LoginRequiredMixin, AccessMixin
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import redirect
-from django.urls import reverse
+from .url_helpers import con_prefijo, reverse_en_cache
+from asgiref.sync import iscoroutinefunction
 from functools import wraps
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 def tenant_reverse(viewname, request=None, tenant=None, urlconf=None, args=None, kwargs=None, current_app=None):
@@ -25,8 +29,8 @@ def tenant_reverse(viewname, request=None, tenant=None, urlconf=None, args=None,
         tenant_reverse('core:paciente_detail', request=request, kwargs={'pk': 1})
         # Retorna: /dev/pacientes/1/
     """
-    # Obtener la URL base usando reverse()
-    url = reverse(viewname, urlconf=urlconf, args=args, kwargs=kwargs, current_app=current_app)
+    # Obtener la URL base (en caché por proceso, ver url_helpers.reverse_en_cache)
+    url = reverse_en_cache(viewname, urlconf=urlconf, args=args, kwargs=kwargs, current_app=current_app)
 
     # Obtener el tenant
     tenant_obj = None
@@ -37,11 +41,7 @@ def tenant_reverse(viewname, request=None, tenant=None, urlconf=None, args=None,
 
     # Agregar prefijo del tenant
     if tenant_obj and hasattr(tenant_obj, 'schema_name'):
-        tenant_prefix = f"/{tenant_obj.schema_name}"
-        if not url.startswith(tenant_prefix):
-            if url.startswith('/'):
-                url = url[1:]
-            url = f"{tenant_prefix}/{url}"
+        url = con_prefijo(url, f"/{tenant_obj.schema_name}")
 
     return url
 
@@ -56,9 +56,6 @@ class TenantLoginRequiredMixin(LoginRequiredMixin):
         """
         Obtiene la URL de login incluyendo el prefijo del tenant si existe
         """
-        import logging
-        logger = logging.getLogger(__name__)
-
         login_url = super().get_login_url()
 
         # Obtener el prefijo del tenant del request
@@ -70,9 +67,10 @@ class TenantLoginRequiredMixin(LoginRequiredMixin):
             if tenant and hasattr(tenant, 'schema_name'):
                 tenant_prefix = f"/{tenant.schema_name}"
 
-        logger.info(f"[TenantLoginRequiredMixin] Original login_url: {login_url}")
-        logger.info(f"[TenantLoginRequiredMixin] tenant_prefix: '{tenant_prefix}'")
-        logger.info(f"[TenantLoginRequiredMixin] request.path: {self.request.path}")
+        logger.debug(
+            "[TenantLoginRequiredMixin] login_url=%s tenant_prefix=%r path=%s",
+            login_url, tenant_prefix, self.request.path
+        )
 
         # Si existe prefijo y la URL no lo incluye ya, agregarlo
         if tenant_prefix and not login_url.startswith(tenant_prefix):
@@ -80,9 +78,9 @@ class TenantLoginRequiredMixin(LoginRequiredMixin):
             if login_url.startswith('/'):
                 login_url = login_url[1:]
             login_url = f'{tenant_prefix}/{login_url}'
-            logger.info(f"[TenantLoginRequiredMixin] Modified login_url: {login_url}")
+            logger.debug("[TenantLoginRequiredMixin] Modified login_url: %s", login_url)
         else:
-            logger.warning(f"[TenantLoginRequiredMixin] No tenant_prefix or already in URL")
+            logger.debug("[TenantLoginRequiredMixin] No tenant_prefix or already in URL")
 
         return login_url
 
@@ -97,8 +95,58 @@ def tenant_login_required(function=None, redirect_field_name='next', login_url=N
         @tenant_login_required
         def mi_vista(request):
             ...
+
+    También acepta vistas `async def` (verifica la sesión con request.auser()).
     """
+    def no_autenticado(request):
+        # Si es una petición AJAX, devolver JSON en lugar de redirigir
+        if request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.headers.get('accept', '').startswith('application/json'):
+            from django.http import JsonResponse
+            return JsonResponse({
+                'error': 'Autenticación requerida',
+                'message': 'Su sesión ha expirado. Por favor, recargue la página e inicie sesión de nuevo.'
+            }, status=401)
+        
+        # Para peticiones normales, redirigir al login
+        tenant_prefix = getattr(request, 'tenant_prefix', '')
+
+        # Si no hay tenant_prefix pero hay tenant, construirlo desde tenant.schema_name
+        if not tenant_prefix and hasattr(request, 'tenant'):
+            tenant = getattr(request, 'tenant', None)
+            if tenant and hasattr(tenant, 'schema_name'):
+                tenant_prefix = f"/{tenant.schema_name}"
+
+        # Construir URL de login con prefijo
+        if login_url:
+            resolved_login_url = login_url
+        else:
+            from django.conf import settings
+            resolved_login_url = settings.LOGIN_URL
+
+        # Agregar prefijo del tenant si existe
+        if tenant_prefix and not resolved_login_url.startswith(tenant_prefix):
+            if resolved_login_url.startswith('/'):
+                resolved_login_url = resolved_login_url[1:]
+            resolved_login_url = f'{tenant_prefix}/{resolved_login_url}'
+
+        # Agregar parámetro next si se especifica
+        path = request.get_full_path()
+        from django.contrib.auth.views import redirect_to_login
+        return redirect_to_login(path, resolved_login_url, redirect_field_name)
+
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            # Vistas async (core/views_async.py): request.user es perezoso y
+            # evaluarlo consultaría la BD desde el event loop
+            @wraps(view_func)
+            async def _wrapped_async_view(request, *args, **kwargs):
+                user = await request.auser()
+                if user.is_authenticated:
+                    return await view_func(request, *args, **kwargs)
+                return no_autenticado(request)
+
+            return _wrapped_async_view
+
         @wraps(view_func)
         def _wrapped_view(request, *args, **kwargs):
             # Si el usuario está autenticado, continuar
@@ -106,40 +154,7 @@ def tenant_login_required(function=None, redirect_field_name='next', login_url=N
                 return view_func(request, *args, **kwargs)
             
             # Usuario no autenticado
-            # Si es una petición AJAX, devolver JSON en lugar de redirigir
-            if request.headers.get('x-requested-with') == 'XMLHttpRequest' or request.headers.get('accept', '').startswith('application/json'):
-                from django.http import JsonResponse
-                return JsonResponse({
-                    'error': 'Autenticación requerida',
-                    'message': 'Su sesión ha expirado. Por favor, recargue la página e inicie sesión de nuevo.'
-                }, status=401)
-            
-            # Para peticiones normales, redirigir al login
-            tenant_prefix = getattr(request, 'tenant_prefix', '')
-
-            # Si no hay tenant_prefix pero hay tenant, construirlo desde tenant.schema_name
-            if not tenant_prefix and hasattr(request, 'tenant'):
-                tenant = getattr(request, 'tenant', None)
-                if tenant and hasattr(tenant, 'schema_name'):
-                    tenant_prefix = f"/{tenant.schema_name}"
-
-            # Construir URL de login con prefijo
-            if login_url:
-                resolved_login_url = login_url
-            else:
-                from django.conf import settings
-                resolved_login_url = settings.LOGIN_URL
-
-            # Agregar prefijo del tenant si existe
-            if tenant_prefix and not resolved_login_url.startswith(tenant_prefix):
-                if resolved_login_url.startswith('/'):
-                    resolved_login_url = resolved_login_url[1:]
-                resolved_login_url = f'{tenant_prefix}/{resolved_login_url}'
-
-            # Agregar parámetro next si se especifica
-            path = request.get_full_path()
-            from django.contrib.auth.views import redirect_to_login
-            return redirect_to_login(path, resolved_login_url, redirect_field_name)
+            return no_autenticado(request)
         
         return _wrapped_view
     
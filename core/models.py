@@ -197,26 +197,11 @@ class Especialidad(models.Model):
         return self.nombre
     
     def servicios_disponibles(self):
-        """Obtener todos los servicios que puede realizar esta especialidad"""
-        # Recopilar IDs de servicios propios y de especialidades incluidas
-        servicios_ids = set()
-        
-        # Servicios propios
-        servicios_ids.update(
-            self.servicio_set.filter(activo=True).values_list('id', flat=True)
-        )
-        
-        # Servicios de especialidades incluidas
-        for esp_incluida in self.especialidades_incluidas.all():
-            servicios_ids.update(
-                esp_incluida.servicio_set.filter(activo=True).values_list('id', flat=True)
-            )
-        
-        # Retornar queryset filtrado por IDs
-        if servicios_ids:
-            return Servicio.objects.filter(id__in=servicios_ids, activo=True).distinct()
-        else:
-            return Servicio.objects.none()
+        """Servicios activos de esta especialidad y de sus incluidas, a cualquier profundidad"""
+        from .services import EspecialidadService
+
+        servicios_ids = EspecialidadService.servicios_de_especialidad(self.pk)
+        return Servicio.objects.filter(id__in=servicios_ids, activo=True)
 
 class PerfilDentista(PersonaBase):
     usuario = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='perfil_dentista')
@@ -361,6 +346,66 @@ class CuotaPlan(models.Model):
     def __str__(self):
         return f"Cuota {self.numero} de {self.plan}"
 
+# --- Resúmenes diarios precalculados para reportes financieros ---
+
+class ResumenIngresoDiario(models.Model):
+    """
+    Acumulado diario de pagos por (día, dentista, método de pago).
+    Se mantiene desde core/signals.py y se reconstruye con
+    `manage.py reconstruir_resumenes`. dentista es null para abonos sin cita.
+    """
+    dia = models.DateField()
+    dentista = models.ForeignKey(PerfilDentista, on_delete=models.CASCADE, null=True, blank=True, related_name='resumenes_ingreso')
+    metodo_pago = models.CharField(max_length=50)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    num_pagos = models.PositiveIntegerField(default=0)
+    num_citas = models.PositiveIntegerField(default=0, help_text="Citas distintas con pago en el día y método; no se suma entre filas (una cita con dos métodos o varios días contaría doble)")
+
+    class Meta:
+        ordering = ['dia']
+        verbose_name = 'Resumen Diario de Ingresos'
+        verbose_name_plural = 'Resúmenes Diarios de Ingresos'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dia', 'dentista', 'metodo_pago'],
+                condition=models.Q(dentista__isnull=False),
+                name='uniq_resumen_ingreso_dentista',
+            ),
+            models.UniqueConstraint(
+                fields=['dia', 'metodo_pago'],
+                condition=models.Q(dentista__isnull=True),
+                name='uniq_resumen_ingreso_sin_dentista',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['dia', 'dentista']),
+        ]
+
+    def __str__(self):
+        return f"{self.dia} {self.dentista_id or '-'} {self.metodo_pago}: ${self.total}"
+
+
+class ResumenServicioDiario(models.Model):
+    """
+    Acumulado diario de servicios vendidos por (día, dentista, servicio).
+    Solo considera tratamientos de citas Atendidas/Completadas; ingresos
+    se valúa al precio vigente del servicio, igual que los reportes originales.
+    """
+    dia = models.DateField()
+    dentista = models.ForeignKey(PerfilDentista, on_delete=models.CASCADE, related_name='resumenes_servicio')
+    servicio = models.ForeignKey(Servicio, on_delete=models.CASCADE, related_name='resumenes_diarios')
+    cantidad = models.PositiveIntegerField(default=0)
+    ingresos = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['dia']
+        unique_together = ('dia', 'dentista', 'servicio')
+        verbose_name = 'Resumen Diario de Servicios'
+        verbose_name_plural = 'Resúmenes Diarios de Servicios'
+
+    def __str__(self):
+        return f"{self.dia} {self.servicio_id} x{self.cantidad}"
+
 # --- Modelos de Gestión de Inventario ---
 
 class UnidadDental(models.Model):
@@ -401,6 +446,13 @@ class Insumo(models.Model):
     unidad_empaque = models.CharField(max_length=50, blank=True, null=True, help_text="Tipo de empaque (ej. Caja, Paquete, Bulto). Dejar vacío si se compra por unidad individual.")
     cantidad_por_empaque = models.PositiveIntegerField(default=1, help_text="Cantidad de unidades individuales por empaque (ej. 100 guantes por caja).")
 
+    class Meta:
+        indexes = [
+            # Índice parcial: solo los insumos en o bajo su mínimo (alertas de stock bajo)
+            models.Index(fields=['nombre'], condition=models.Q(stock__lte=models.F('stock_minimo')),
+                         name='insumo_stock_bajo_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
 
@@ -441,6 +493,14 @@ class LoteInsumo(models.Model):
         help_text="Referencia al detalle de compra que originó este lote"
     )
 
+    class Meta:
+        indexes = [
+            # Índice parcial para las alertas de caducidad: solo lotes con existencia y fecha de caducidad
+            models.Index(fields=['fecha_caducidad'],
+                         condition=models.Q(cantidad__gt=0, fecha_caducidad__isnull=False),
+                         name='lote_caducidad_existencia_idx'),
+        ]
+
     def __str__(self):
         return f"{self.cantidad} de {self.insumo.nombre} (Lote: {self.numero_lote or 'N/A'}) en {self.unidad_dental.nombre}"
 
@@ -498,6 +558,104 @@ class MovimientoInventario(models.Model):
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.lote.insumo.nombre} ({self.diferencia:+d})"
 
+
+class CorteValuacionInventario(models.Model):
+    """
+    Valuación de la existencia por (insumo, unidad dental) a una fecha de corte,
+    con ambos métodos (PEPS y costo promedio). La registra
+    `manage.py corte_valuacion_inventario` al cierre de cada mes para que los
+    reportes históricos lean esta tabla y no el historial de lotes.
+
+    Los nombres del insumo, su proveedor y la unidad dental se copian al
+    registrar el corte: borrar o renombrar el catálogo después no altera los
+    cortes ya cerrados.
+    """
+    fecha_corte = models.DateField()
+    insumo = models.ForeignKey(
+        Insumo, on_delete=models.SET_NULL, null=True, blank=True, related_name='cortes_valuacion'
+    )
+    insumo_nombre = models.CharField(max_length=200, default='')
+    insumo_unidad_medida = models.CharField(max_length=50, blank=True, default='')
+    proveedor_nombre = models.CharField(max_length=200, blank=True, default='')
+    unidad_dental = models.ForeignKey(
+        UnidadDental, on_delete=models.SET_NULL, null=True, blank=True, related_name='cortes_valuacion'
+    )
+    unidad_dental_nombre = models.CharField(max_length=100, default='')
+    existencia = models.PositiveIntegerField(default=0)
+    cantidad_sin_costo = models.PositiveIntegerField(default=0, help_text="Unidades en lotes sin costo capturado")
+    valor_peps = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    costo_promedio = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True)
+    valor_promedio = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-fecha_corte']
+        unique_together = ('fecha_corte', 'insumo', 'unidad_dental')
+        verbose_name = 'Corte de Valuación de Inventario'
+        verbose_name_plural = 'Cortes de Valuación de Inventario'
+
+    def __str__(self):
+        return f"{self.fecha_corte} {self.insumo_id}/{self.unidad_dental_id}: ${self.valor_peps}"
+
+
+class DigestAlertasInventario(models.Model):
+    """
+    Alertas de inventario de un día (stock bajo, lotes caducados y próximos a
+    caducar), precalculadas por `manage.py alertas_inventario` cada noche. Los
+    dashboards leen el digest del día en lugar de consultar lotes e insumos, y
+    el correo de alertas se envía una sola vez por clínica (notificado_en).
+    """
+    fecha = models.DateField(unique=True)
+    generado_en = models.DateTimeField(auto_now=True)
+    dias_caducidad = models.PositiveSmallIntegerField(help_text="Horizonte de días para 'próximo a caducar'")
+    stock_bajo = models.PositiveIntegerField(default=0)
+    proximos_caducar = models.PositiveIntegerField(default=0)
+    caducados = models.PositiveIntegerField(default=0)
+    notificado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-fecha']
+        verbose_name = 'Digest de Alertas de Inventario'
+        verbose_name_plural = 'Digests de Alertas de Inventario'
+
+    @property
+    def total(self):
+        return self.stock_bajo + self.proximos_caducar + self.caducados
+
+    def __str__(self):
+        return f"Alertas de inventario {self.fecha}: {self.total}"
+
+
+class AlertaInventario(models.Model):
+    """Renglón de un DigestAlertasInventario; guarda los datos a mostrar para no volver a unir tablas."""
+    STOCK_BAJO = 'STOCK_BAJO'
+    PROXIMO_CADUCAR = 'PROXIMO_CADUCAR'
+    CADUCADO = 'CADUCADO'
+    TIPO_CHOICES = [
+        (STOCK_BAJO, 'Stock Bajo'),
+        (PROXIMO_CADUCAR, 'Próximo a Caducar'),
+        (CADUCADO, 'Caducado'),
+    ]
+
+    digest = models.ForeignKey(DigestAlertasInventario, on_delete=models.CASCADE, related_name='alertas')
+    tipo = models.CharField(max_length=20, choices=TIPO_CHOICES)
+    insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, related_name='+')
+    lote = models.ForeignKey(LoteInsumo, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    insumo_nombre = models.CharField(max_length=200)
+    unidad_dental_nombre = models.CharField(max_length=100, blank=True)
+    numero_lote = models.CharField(max_length=100, blank=True)
+    fecha_caducidad = models.DateField(null=True, blank=True)
+    cantidad = models.IntegerField(help_text="Stock del insumo o existencia del lote")
+    stock_minimo = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['tipo', 'fecha_caducidad', 'insumo_nombre']
+        verbose_name = 'Alerta de Inventario'
+        verbose_name_plural = 'Alertas de Inventario'
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.insumo_nombre}"
+
 class Compra(models.Model):
     ESTADOS_COMPRA = [
         ('PENDIENTE', 'Pendiente'),
@@ -699,6 +857,10 @@ class HistorialClinico(models.Model):
         ordering = ['-fecha_evento']
         verbose_name = 'Entrada de Historial Clínico'
         verbose_name_plural = 'Entradas de Historial Clínico'
+        indexes = [
+            # Último registro por paciente (estado del historial en la lista de pacientes)
+            models.Index(fields=['paciente', '-fecha_evento']),
+        ]
 
     def __str__(self):
         return f"{self.get_tipo_registro_display()} - {self.paciente} ({self.fecha_evento.strftime('%d/%m/%Y %H:%M')})"
@@ -1408,6 +1570,16 @@ class PacienteConsentimiento(models.Model):
         blank=True,
         help_text="Observaciones sobre el proceso de consentimiento"
     )
+
+    # PDF firmado (documento base + hoja de firmas), ver core/consentimientos_pdf.py
+    documento_firmado = models.FileField(
+        upload_to='consentimientos_firmados/',
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text="PDF firmado, guardado con el SHA-256 de su contenido como nombre"
+    )
+    hash_documento = models.CharField(max_length=64, blank=True)
     
     class Meta:
         ordering = ['-fecha_presentado']
@@ -1557,10 +1729,17 @@ class TrabajoLaboratorio(models.Model):
 
     notas = models.TextField(blank=True)
 
+    # Estados en los que el trabajo ya no puede retrasarse
+    ESTADOS_CERRADOS = ('ENTREGADO', 'COLOCADO', 'PAGADO', 'CANCELADO')
+
     class Meta:
         ordering = ['-fecha_solicitud']
         verbose_name = 'Trabajo de Laboratorio'
         verbose_name_plural = 'Trabajos de Laboratorio'
+        indexes = [
+            # Trabajos retrasados: estado abierto y fecha estimada vencida
+            models.Index(fields=['estado', 'fecha_entrega_estimada']),
+        ]
 
     def __str__(self):
         return f"{self.tipo_trabajo.nombre} - {self.paciente.nombre} {self.paciente.apellido}"
@@ -1575,7 +1754,7 @@ class TrabajoLaboratorio(models.Model):
     def esta_retrasado(self):
         """Verifica si está retrasado"""
         from datetime import date
-        if self.estado not in ['ENTREGADO', 'COLOCADO', 'PAGADO', 'CANCELADO']:
+        if self.estado not in self.ESTADOS_CERRADOS:
             return date.today() > self.fecha_entrega_estimada
         return False
 
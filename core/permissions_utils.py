@@ -5,6 +5,27 @@ from django.shortcuts import get_object_or_404
 from django.core.exceptions import PermissionDenied
 from django.contrib import messages
 from .models_permissions import SubmenuItem, PermisoRol, LogAcceso
+from .principal import obtener_principal
+
+# Campo de PermisoRol para cada permiso que se puede exigir
+CAMPOS_PERMISO = {
+    'ver': 'puede_ver',
+    'crear': 'puede_crear',
+    'editar': 'puede_editar',
+    'eliminar': 'puede_eliminar',
+    'exportar': 'puede_exportar',
+}
+
+
+def _algun_rol_permite(user, submenu_item, permiso_requerido, permisos=tuple(CAMPOS_PERMISO)):
+    """True si algún grupo del usuario tiene `permiso_requerido` en el submenú (una sola consulta)."""
+    if permiso_requerido not in permisos:
+        return False
+    return PermisoRol.objects.filter(
+        rol__name__in=obtener_principal(user).grupos,
+        submenu_item=submenu_item,
+        **{CAMPOS_PERMISO[permiso_requerido]: True}
+    ).exists()
 
 class PermisoDinamicoMixin(AccessMixin):
     """
@@ -47,31 +68,8 @@ class PermisoDinamicoMixin(AccessMixin):
             # Si no existe configuración, permitir acceso por defecto
             return True
         
-        # Verificar permisos por cada grupo del usuario
-        for grupo in user.groups.all():
-            try:
-                permiso_rol = PermisoRol.objects.get(
-                    rol=grupo,
-                    submenu_item=submenu_item
-                )
-                
-                # Verificar el permiso específico
-                if permiso_requerido == 'ver' and permiso_rol.puede_ver:
-                    return True
-                elif permiso_requerido == 'crear' and permiso_rol.puede_crear:
-                    return True
-                elif permiso_requerido == 'editar' and permiso_rol.puede_editar:
-                    return True
-                elif permiso_requerido == 'eliminar' and permiso_rol.puede_eliminar:
-                    return True
-                elif permiso_requerido == 'exportar' and permiso_rol.puede_exportar:
-                    return True
-                    
-            except PermisoRol.DoesNotExist:
-                # Si no existe configuración específica, denegar acceso
-                continue
-        
-        return False
+        # Basta con que alguno de los grupos del usuario tenga el permiso
+        return _algun_rol_permite(user, submenu_item, permiso_requerido)
     
     def registrar_acceso(self, user, url_name):
         """
@@ -111,21 +109,7 @@ def verificar_permiso_ajax(user, url_name, permiso_requerido='ver'):
     except SubmenuItem.DoesNotExist:
         return True  # Permitir por defecto si no hay configuración
     
-    for grupo in user.groups.all():
-        try:
-            permiso_rol = PermisoRol.objects.get(rol=grupo, submenu_item=submenu_item)
-            if permiso_requerido == 'ver' and permiso_rol.puede_ver:
-                return True
-            elif permiso_requerido == 'crear' and permiso_rol.puede_crear:
-                return True
-            elif permiso_requerido == 'editar' and permiso_rol.puede_editar:
-                return True
-            elif permiso_requerido == 'eliminar' and permiso_rol.puede_eliminar:
-                return True
-        except PermisoRol.DoesNotExist:
-            continue
-    
-    return False
+    return _algun_rol_permite(user, submenu_item, permiso_requerido, permisos=('ver', 'crear', 'editar', 'eliminar'))
 
 def get_menu_for_user(user):
     """
@@ -181,9 +165,8 @@ def get_menu_for_user(user):
             })
     else:
         # Obtener módulos basados en permisos
-        grupos_usuario = user.groups.all()
         permisos_usuario = PermisoRol.objects.filter(
-            rol__in=grupos_usuario,
+            rol__name__in=obtener_principal(user).grupos,
             puede_ver=True,
             submenu_item__activo=True,
             submenu_item__modulo__activo=True
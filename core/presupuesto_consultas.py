@@ -0,0 +1,163 @@
+"""
+Presupuestos de consultas SQL por vista.
+
+- @presupuesto_consultas(n, max_ms=None): declara cuántas consultas (y cuánto
+  tiempo de BD) puede usar una vista. Sirve igual para funciones y para vistas
+  basadas en clase.
+- contar_consultas(): cuenta consultas y tiempo de BD con
+  connection.execute_wrapper, sin depender de DEBUG.
+- verificar_presupuesto(): ejecuta una request con el cliente de pruebas y
+  compara contra el presupuesto (lo usa `manage.py verificar_presupuestos_consultas`).
+- HistogramaConsultas / histograma: ventana móvil en memoria por vista que
+  alimenta QueryBudgetMiddleware y consulta el endpoint de administración.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+
+Presupuesto = namedtuple('Presupuesto', ['max_consultas', 'max_ms'])
+
+
+def presupuesto_consultas(max_consultas, max_ms=None):
+    """
+    Declara el máximo de consultas (y opcionalmente de milisegundos en BD) de una vista.
+
+    Uso:
+        @presupuesto_consultas(12)
+        class CitaListView(TenantLoginRequiredMixin, ListView): ...
+
+        @presupuesto_consultas(5, max_ms=200)
+        def pacientes_api(request): ...
+    """
+    def decorador(vista):
+        vista.presupuesto_consultas = Presupuesto(max_consultas, max_ms)
+        return vista
+    return decorador
+
+
+def obtener_presupuesto(vista):
+    """Presupuesto declarado para la función resuelta por el URLconf, o None."""
+    ruta = getattr(vista, 'lazy_view_path', None)
+    if ruta:
+        vista = import_string(ruta)
+    presupuesto = getattr(vista, 'presupuesto_consultas', None)
+    if presupuesto is None:
+        presupuesto = getattr(getattr(vista, 'view_class', None), 'presupuesto_consultas', None)
+    return presupuesto
+
+
+class _Contador:
+    def __init__(self):
+        self.consultas = 0
+        self.ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.ms += (time.perf_counter() - inicio) * 1000
+
+
+@contextmanager
+def contar_consultas(conexion=None):
+    """Cuenta consultas y tiempo de BD ejecutados dentro del bloque."""
+    contador = _Contador()
+    with (conexion or connection).execute_wrapper(contador):
+        yield contador
+
+
+def excede(presupuesto, consultas, ms):
+    """Devuelve la lista de límites excedidos (vacía si cumple)."""
+    excedidos = []
+    if presupuesto is None:
+        return excedidos
+    if consultas > presupuesto.max_consultas:
+        excedidos.append(f'{consultas} consultas > {presupuesto.max_consultas}')
+    if presupuesto.max_ms is not None and ms > presupuesto.max_ms:
+        excedidos.append(f'{ms:.1f}ms en BD > {presupuesto.max_ms}ms')
+    return excedidos
+
+
+def verificar_presupuesto(client, url, presupuesto=None):
+    """
+    Ejecuta GET url con el cliente de pruebas y devuelve
+    (respuesta, consultas, ms_bd, excedidos). Si no se pasa presupuesto se usa
+    el declarado en la vista o settings.QUERY_BUDGET_DEFAULT.
+    """
+    with contar_consultas() as contador:
+        respuesta = client.get(url)
+        if respuesta.streaming:
+            b''.join(respuesta.streaming_content)
+
+    if presupuesto is None and respuesta.resolver_match is not None:
+        presupuesto = obtener_presupuesto(respuesta.resolver_match.func)
+    if presupuesto is None:
+        presupuesto = Presupuesto(settings.QUERY_BUDGET_DEFAULT, None)
+    return respuesta, contador.consultas, contador.ms, excede(presupuesto, contador.consultas, contador.ms)
+
+
+def assert_presupuesto(client, url, presupuesto=None):
+    """Versión de verificar_presupuesto que lanza AssertionError si se excede."""
+    respuesta, consultas, ms, excedidos = verificar_presupuesto(client, url, presupuesto)
+    if excedidos:
+        raise AssertionError(f"{url}: {', '.join(excedidos)}")
+    return respuesta
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+class HistogramaConsultas:
+    """Últimas N mediciones (consultas, ms de BD) por vista, seguras entre hilos."""
+
+    def __init__(self, ventana=500):
+        self.ventana = ventana
+        self._datos = {}
+        self._excedidos = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, consultas, ms, excedido=False):
+        with self._lock:
+            serie = self._datos.get(vista)
+            if serie is None:
+                serie = self._datos[vista] = deque(maxlen=self.ventana)
+            serie.append((consultas, ms))
+            if excedido:
+                self._excedidos[vista] = self._excedidos.get(vista, 0) + 1
+
+    def resumen(self):
+        with self._lock:
+            copia = {vista: list(serie) for vista, serie in self._datos.items()}
+            excedidos = dict(self._excedidos)
+
+        resultado = {}
+        for vista, serie in copia.items():
+            consultas = [c for c, _ in serie]
+            tiempos = [ms for _, ms in serie]
+            resultado[vista] = {
+                'muestras': len(serie),
+                'consultas_p50': _percentil(consultas, 50),
+                'consultas_p95': _percentil(consultas, 95),
+                'consultas_max': max(consultas),
+                'ms_bd_p50': round(_percentil(tiempos, 50), 2),
+                'ms_bd_p95': round(_percentil(tiempos, 95), 2),
+                'presupuesto_excedido': excedidos.get(vista, 0),
+            }
+        return dict(sorted(resultado.items(), key=lambda x: x[1]['consultas_p95'], reverse=True))
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._excedidos.clear()
+
+
+histograma = HistogramaConsultas(getattr(settings, 'QUERY_BUDGET_WINDOW', 500))
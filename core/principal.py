@@ -0,0 +1,86 @@
+"""
+Datos de autorización del usuario resueltos una vez por request.
+
+Las verificaciones de rol (user.groups.filter(name=...).exists(), el filtro
+has_group de las plantillas, request.user.perfil_dentista) hacían una consulta
+cada vez. Principal carga con una sola consulta los nombres de grupo y los ids
+de los perfiles de dentista y de paciente, y queda guardado en el propio
+objeto usuario, así que todas las vistas, formularios y plantillas de la
+request lo comparten.
+
+Uso:
+    principal = obtener_principal(request.user)   # o request.principal (PrincipalMiddleware)
+    if principal.en_grupo('Administrador', 'Recepcionista'): ...
+    if principal.dentista_id: ...
+En plantillas: {% if principal.es_admin %} o {% if user|has_group:"Dentista" %}.
+"""
+from django.contrib.auth import get_user_model
+
+ADMINISTRADOR = 'Administrador'
+DENTISTA = 'Dentista'
+RECEPCIONISTA = 'Recepcionista'
+
+
+class Principal:
+    """Grupos y perfiles de un usuario; inmutable durante la request."""
+
+    def __init__(self, usuario_id=None, es_superusuario=False, grupos=(), dentista_id=None, paciente_id=None):
+        self.usuario_id = usuario_id
+        self.es_superusuario = es_superusuario
+        self.grupos = frozenset(grupos)
+        self.dentista_id = dentista_id
+        self.paciente_id = paciente_id
+
+    @property
+    def es_autenticado(self):
+        return self.usuario_id is not None
+
+    def en_grupo(self, *nombres):
+        """True si pertenece a alguno de los grupos indicados (no considera superusuario)."""
+        return not self.grupos.isdisjoint(nombres)
+
+    @property
+    def es_admin(self):
+        return self.es_superusuario or ADMINISTRADOR in self.grupos
+
+    @property
+    def es_dentista(self):
+        return DENTISTA in self.grupos
+
+    @property
+    def es_recepcion(self):
+        return RECEPCIONISTA in self.grupos
+
+    def __repr__(self):
+        return f'<Principal usuario={self.usuario_id} grupos={sorted(self.grupos)}>'
+
+
+ANONIMO = Principal()
+
+
+def obtener_principal(usuario):
+    """Principal del usuario, consultado una vez y guardado en la instancia."""
+    if usuario is None or not usuario.is_authenticated:
+        return ANONIMO
+    principal = getattr(usuario, '_principal', None)
+    if principal is None:
+        filas = get_user_model().objects.filter(pk=usuario.pk).values_list(
+            'groups__name', 'perfil_dentista__id', 'paciente_perfil__id'
+        )
+        grupos, dentista_id, paciente_id = set(), None, None
+        for grupo, dentista_id, paciente_id in filas:
+            if grupo:
+                grupos.add(grupo)
+        principal = usuario._principal = Principal(
+            usuario_id=usuario.pk,
+            es_superusuario=usuario.is_superuser,
+            grupos=grupos,
+            dentista_id=dentista_id,
+            paciente_id=paciente_id,
+        )
+    return principal
+
+
+def invalidar_principal(usuario):
+    """Descarta el Principal guardado (p. ej. tras cambiar los grupos del usuario en la misma request)."""
+    usuario.__dict__.pop('_principal', None)
@@ -0,0 +1,140 @@
+"""
+Recálculos diferidos y agrupados por transacción para las señales de core/signals.py.
+
+Las señales ya no recalculan en el momento: marcan qué quedó desactualizado
+(saldo de un paciente, stock de un insumo, cubeta de resumen día/dentista) y
+cada marca se procesa una sola vez al confirmar la transacción con
+transaction.on_commit. Así recibir una compra con 30 lotes, importar inventario
+o guardar varias veces la misma cita en una transacción recalculan cada
+insumo/paciente una vez, y no en cada save().
+
+- Fuera de una transacción (autocommit) on_commit ejecuta de inmediato, igual
+  que antes.
+- Si la transacción se revierte no se recalcula nada de lo marcado en ella.
+  Lo marcado dentro de un savepoint revertido sí se recalcula al confirmar la
+  transacción externa: sobra trabajo, pero el resultado sale de la BD y es el
+  mismo.
+- Con settings.RECALCULOS_EN_SEGUNDO_PLANO los saldos y stocks se encolan
+  como tareas (core/tareas.py, deduplicadas por id) en lugar de calcularse al
+  terminar la request; los resúmenes siempre se calculan al confirmar.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django_tenants.utils import schema_context
+
+from . import models
+
+logger = logging.getLogger(__name__)
+
+
+def _recalcular_saldos(paciente_ids):
+    from .services import PacienteService
+
+    for paciente in models.Paciente.objects.filter(pk__in=paciente_ids):
+        PacienteService.actualizar_saldo_global(paciente)
+
+
+def _recalcular_stocks(insumo_ids):
+    # Un solo UPDATE para todos los insumos marcados (mismo resultado que Insumo.actualizar_stock_total)
+    total_lotes = models.LoteInsumo.objects.filter(insumo=OuterRef('pk')).values('insumo').annotate(
+        total=Sum('cantidad')
+    ).values('total')
+    models.Insumo.objects.filter(pk__in=insumo_ids).update(
+        stock=Coalesce(Subquery(total_lotes, output_field=IntegerField()), Value(0))
+    )
+
+
+def _recalcular_ingresos(cubetas):
+    from .services import ResumenReportesService
+
+    for dia, dentista_id in cubetas:
+        ResumenReportesService.recalcular_ingresos_dia(dia, dentista_id)
+
+
+def _recalcular_servicios(cubetas):
+    from .services import ResumenReportesService
+
+    for dia, dentista_id in cubetas:
+        ResumenReportesService.recalcular_servicios_dia(dia, dentista_id)
+
+
+# Orden de ejecución: los resúmenes de ingresos no dependen de saldos ni stock
+RECALCULOS = {
+    'saldo_paciente': _recalcular_saldos,
+    'stock_insumo': _recalcular_stocks,
+    'ingresos_dia': _recalcular_ingresos,
+    'servicios_dia': _recalcular_servicios,
+}
+
+
+def _pendientes():
+    """
+    Marcas de la transacción en curso: {(schema, tipo): set(valores)}. El dict
+    vive dentro de su callback de on_commit, así que si la transacción (o el
+    savepoint donde se registró) se revierte, Django descarta el callback y
+    las marcas con él.
+    """
+    for _, callback, _ in connection.run_on_commit:
+        pendientes = getattr(callback, 'recalculos_pendientes', None)
+        if pendientes is not None:
+            return pendientes
+
+    pendientes = {}
+
+    def procesar_al_confirmar():
+        procesar_pendientes(pendientes)
+
+    procesar_al_confirmar.recalculos_pendientes = pendientes
+    transaction.on_commit(procesar_al_confirmar, robust=True)
+    return pendientes
+
+
+def marcar(tipo, valor):
+    """Marca `valor` (id o cubeta) para recalcular con RECALCULOS[tipo] al confirmar la transacción."""
+    if not connection.in_atomic_block:
+        # Autocommit: no hay transacción que esperar
+        procesar_pendientes({(connection.schema_name, tipo): {valor}})
+        return
+    _pendientes().setdefault((connection.schema_name, tipo), set()).add(valor)
+
+
+def marcar_saldo(paciente_id):
+    if paciente_id:
+        marcar('saldo_paciente', paciente_id)
+
+
+def marcar_stock(insumo_id):
+    if insumo_id:
+        marcar('stock_insumo', insumo_id)
+
+
+def procesar_pendientes(pendientes):
+    """Ejecuta una vez cada recálculo de `pendientes` ({(schema, tipo): valores}), en el orden de RECALCULOS."""
+    for tipo in RECALCULOS:
+        for (schema_name, tipo_marcado), valores in pendientes.items():
+            if tipo_marcado == tipo:
+                _ejecutar(schema_name, tipo, valores)
+
+
+def _ejecutar(schema_name, tipo, valores):
+    from . import tareas
+
+    segundo_plano = {
+        'saldo_paciente': tareas.recalcular_saldo_paciente,
+        'stock_insumo': tareas.recalcular_stock_insumo,
+    }
+    with schema_context(schema_name):
+        if getattr(settings, 'RECALCULOS_EN_SEGUNDO_PLANO', False) and tipo in segundo_plano:
+            for valor in valores:
+                tareas.encolar(segundo_plano[tipo], valor, clave=f'{tipo}:{valor}')
+            return
+        try:
+            with transaction.atomic():
+                RECALCULOS[tipo](valores)
+        except Exception:
+            logger.exception("Error recalculando %s para %d registros en %s", tipo, len(valores), schema_name)
+            raise
@@ -3,11 +3,14 @@ Servicios de negocio para el core de la aplicación.
 Esta capa separa la lógica de negocio de los modelos y vistas.
 """
 
+import logging
 from decimal import Decimal
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import Sum, Count, F
 from . import models
 
+logger = logging.getLogger(__name__)
+
 
 class PacienteService:
     """Servicios relacionados con la gestión de pacientes"""
@@ -41,6 +44,48 @@ class PacienteService:
 
             return paciente.saldo_global
 
+    # Un historial con más de estos días sin registros necesita actualización
+    DIAS_ACTUALIZAR_HISTORIAL = 90
+    # Texto con el que el portal marca el historial llenado por el propio paciente
+    MARCA_COMPLETADO_PORTAL = 'Auto-Completado por Paciente'
+
+    @staticmethod
+    def anotar_estado_historial(queryset):
+        """
+        Anota en SQL (subconsultas Exists/Max, sin JOIN ni DISTINCT) el estado del historial:
+        - tiene_respuestas: contestó el cuestionario
+        - ultima_fecha_historial: fecha del registro de historial clínico más reciente
+        - completado_portal: algún registro viene del portal del paciente
+        - estado_historial: 'pendiente' (nada), 'actualizar' (solo cuestionario o el
+          último registro tiene más de DIAS_ACTUALIZAR_HISTORIAL días) o 'completo'
+        - tiene_acceso_portal: el paciente tiene usuario
+        Se puede filtrar y ordenar por cualquiera de ellos.
+        """
+        from datetime import timedelta
+        from django.db.models import (
+            BooleanField, Case, CharField, Exists, ExpressionWrapper, OuterRef, Q, Subquery, Value, When,
+        )
+        from django.db.models.functions import Now
+
+        historial = models.HistorialClinico.objects.filter(paciente=OuterRef('pk'))
+        limite = Now() - timedelta(days=PacienteService.DIAS_ACTUALIZAR_HISTORIAL)
+        return queryset.annotate(
+            tiene_respuestas=Exists(models.RespuestaHistorial.objects.filter(paciente=OuterRef('pk'))),
+            ultima_fecha_historial=Subquery(historial.order_by('-fecha_evento').values('fecha_evento')[:1]),
+            completado_portal=Exists(
+                historial.filter(descripcion_evento__contains=PacienteService.MARCA_COMPLETADO_PORTAL)
+            ),
+            tiene_acceso_portal=ExpressionWrapper(Q(usuario__isnull=False), output_field=BooleanField()),
+        ).annotate(
+            estado_historial=Case(
+                When(ultima_fecha_historial__isnull=True, tiene_respuestas=False, then=Value('pendiente')),
+                When(ultima_fecha_historial__isnull=True, then=Value('actualizar')),
+                When(ultima_fecha_historial__lt=limite, then=Value('actualizar')),
+                default=Value('completo'),
+                output_field=CharField(),
+            ),
+        )
+
 
 class CitaService:
     """Servicios relacionados con la gestión de citas"""
@@ -97,66 +142,238 @@ class CitaService:
             
             # Descontar insumos del inventario
             if insumos_consumidos:
-                InventarioService.descontar_insumos(insumos_consumidos)
-            
-            # Actualizar saldo del paciente
-            PacienteService.actualizar_saldo_global(cita.paciente)
+                InventarioService.descontar_insumos(
+                    insumos_consumidos, unidad_dental_id=cita.unidad_dental_id, notas=f'Cita #{cita.pk}'
+                )
+            # El saldo del paciente lo recalcula la señal de Cita al confirmar la transacción
+
+
+class EspecialidadService:
+    """
+    Servicios que puede realizar cada dentista según sus especialidades.
+
+    Reglas:
+    1. Todos los dentistas pueden realizar los servicios de 'Dentista General'.
+    2. Una especialidad incluye los servicios de sus especialidades_incluidas y
+       de las que éstas incluyan, a cualquier profundidad (los ciclos se toleran).
+
+    El cierre transitivo se calcula para toda la clínica con cuatro consultas y se
+    guarda en el caché bajo las versiones de Especialidad, Servicio y
+    PerfilDentista (cache_http), que las señales avanzan cuando cambian.
+    """
+
+    ESPECIALIDAD_GENERAL = 'Dentista General'
+    TIMEOUT_CIERRE = 60 * 60 * 24
+
+    @staticmethod
+    def cierre():
+        """
+        {'especialidades': {especialidad_id: frozenset(servicio_ids)},
+         'dentistas': {dentista_id: frozenset(servicio_ids)}} con solo servicios activos.
+        """
+        from django.core.cache import cache
+        from django.db import connection
+        from . import cache_http
+
+        schema = connection.schema_name
+        versiones = cache_http.versiones(models.Especialidad, models.Servicio, models.PerfilDentista, schema=schema)
+        clave = f"cierre_servicios:{schema}:{':'.join(str(v) for v in versiones)}"
+        resultado = cache.get(clave)
+        if resultado is None:
+            resultado = EspecialidadService.construir_cierre()
+            cache.set(clave, resultado, EspecialidadService.TIMEOUT_CIERRE)
+        return resultado
+
+    @staticmethod
+    def construir_cierre():
+        """Calcula el cierre desde la BD (sin caché)."""
+        from collections import defaultdict
+
+        incluidas = defaultdict(set)
+        for origen, destino in models.Especialidad.especialidades_incluidas.through.objects.values_list(
+            'from_especialidad_id', 'to_especialidad_id'
+        ):
+            incluidas[origen].add(destino)
+
+        servicios = defaultdict(set)
+        for especialidad_id, servicio_id in models.Servicio.objects.filter(activo=True).values_list('especialidad_id', 'id'):
+            servicios[especialidad_id].add(servicio_id)
+
+        especialidades = {}
+        generales = set()
+        for especialidad_id, nombre in models.Especialidad.objects.values_list('id', 'nombre'):
+            if nombre == EspecialidadService.ESPECIALIDAD_GENERAL:
+                generales.update(servicios[especialidad_id])
+            # Recorrido en profundidad; `visitadas` corta los ciclos
+            visitadas = {especialidad_id}
+            pendientes = [especialidad_id]
+            while pendientes:
+                for siguiente in incluidas[pendientes.pop()]:
+                    if siguiente not in visitadas:
+                        visitadas.add(siguiente)
+                        pendientes.append(siguiente)
+            especialidades[especialidad_id] = frozenset().union(*(servicios[e] for e in visitadas))
+
+        por_dentista = defaultdict(set)
+        for dentista_id in models.PerfilDentista.objects.values_list('id', flat=True):
+            por_dentista[dentista_id].update(generales)
+        for dentista_id, especialidad_id in models.PerfilDentista.especialidades.through.objects.values_list(
+            'perfildentista_id', 'especialidad_id'
+        ):
+            por_dentista[dentista_id].update(especialidades.get(especialidad_id, ()))
+
+        return {
+            'especialidades': especialidades,
+            'dentistas': {dentista_id: frozenset(ids) for dentista_id, ids in por_dentista.items()},
+        }
+
+    @staticmethod
+    def servicios_permitidos(dentista_id):
+        """frozenset con los ids de servicios activos que puede realizar el dentista."""
+        return EspecialidadService.cierre()['dentistas'].get(dentista_id, frozenset())
+
+    @staticmethod
+    def servicios_de_especialidad(especialidad_id):
+        """frozenset con los ids de servicios activos de la especialidad y sus incluidas."""
+        return EspecialidadService.cierre()['especialidades'].get(especialidad_id, frozenset())
 
 
 class InventarioService:
     """Servicios relacionados con la gestión de inventario"""
     
     @staticmethod
-    def descontar_insumos(insumos_consumidos):
+    def descontar_insumos(insumos_consumidos, unidad_dental_id=None, usuario=None, notas=''):
         """
-        Descuenta insumos del inventario por consumo en servicios.
-        
+        Descuenta insumos del inventario por consumo en servicios (FIFO por caducidad).
+
         Args:
             insumos_consumidos: Dict {insumo_id: cantidad_consumida}
+        Returns:
+            Dict {insumo_id: cantidad} de lo que no alcanzó a descontarse (ver consumir_fifo).
+        """
+        return InventarioService.consumir_fifo(
+            insumos_consumidos, unidad_dental_id=unidad_dental_id, usuario=usuario, notas=notas
+        )
+
+    @staticmethod
+    def requerimientos_de_servicios(servicio_ids):
+        """
+        Insumos que consumen los servicios indicados según ServicioInsumo, con una consulta.
+        Devuelve {insumo_id: cantidad entera}; las fracciones (0.5 de un insumo) se redondean hacia arriba
+        sobre el total de cada insumo, porque los lotes se llevan en unidades enteras.
+        """
+        import math
+
+        if not servicio_ids:
+            return {}
+        filas = models.ServicioInsumo.objects.filter(servicio_id__in=servicio_ids).values('insumo_id').annotate(
+            total=Sum('cantidad')
+        ).order_by()
+        return {fila['insumo_id']: math.ceil(fila['total']) for fila in filas if fila['total'] and fila['total'] > 0}
+
+    @staticmethod
+    def consumir_fifo(requerimientos, unidad_dental_id=None, usuario=None, notas='',
+                      motivo='CONSUMO_TRATAMIENTO'):
+        """
+        Consume `requerimientos` ({insumo_id: cantidad}) de los lotes con existencia,
+        primero los que caducan antes (sin caducidad al final) y luego los más antiguos.
+
+        Bloquea los lotes candidatos con select_for_update, calcula la asignación en
+        memoria y la aplica con un solo bulk_update más un bulk_create de
+        MovimientoInventario (SALIDA_CONSUMO). Con `unidad_dental_id` solo se toma de
+        los lotes de esa unidad. El stock del insumo se recalcula una vez al confirmar
+        (core/recalculos.py).
+
+        Returns:
+            Dict {insumo_id: cantidad} de lo que no alcanzó a cubrirse con los lotes.
         """
+        from . import recalculos
+
+        pendientes = {insumo_id: int(cantidad) for insumo_id, cantidad in requerimientos.items() if cantidad > 0}
+        if not pendientes:
+            return {}
+
         with transaction.atomic():
-            for insumo_id, cantidad in insumos_consumidos.items():
-                try:
-                    insumo = models.Insumo.objects.get(pk=insumo_id)
-                    
-                    # Si requiere seguimiento por lote
-                    if insumo.requiere_lote_caducidad:
-                        # Consumir de los lotes más antiguos primero (FIFO)
-                        lotes = insumo.lotes.filter(cantidad__gt=0).order_by('fecha_caducidad')
-                        
-                        cantidad_restante = cantidad
-                        for lote in lotes:
-                            if cantidad_restante <= 0:
-                                break
-                                
-                            if lote.cantidad >= cantidad_restante:
-                                lote.cantidad -= cantidad_restante
-                                cantidad_restante = 0
-                            else:
-                                cantidad_restante -= lote.cantidad
-                                lote.cantidad = 0
-                            
-                            lote.save()
-                    
-                    # Actualizar stock total
-                    insumo.actualizar_stock_total()
-                    
-                except models.Insumo.DoesNotExist:
-                    continue  # Insumo no encontrado, continuar con el siguiente
+            lotes = models.LoteInsumo.objects.select_for_update().filter(
+                insumo_id__in=list(pendientes), cantidad__gt=0
+            )
+            if unidad_dental_id:
+                lotes = lotes.filter(unidad_dental_id=unidad_dental_id)
+            # Ordenar por insumo primero también fija el orden de los bloqueos entre transacciones concurrentes
+            lotes = lotes.order_by(
+                'insumo_id', F('fecha_caducidad').asc(nulls_last=True), 'fecha_recepcion', 'pk'
+            ).only('id', 'insumo_id', 'cantidad')
+
+            modificados = []
+            movimientos = []
+            for lote in lotes:
+                restante = pendientes.get(lote.insumo_id, 0)
+                if restante <= 0:
+                    continue
+                tomado = min(lote.cantidad, restante)
+                movimientos.append(models.MovimientoInventario(
+                    lote_id=lote.id,
+                    tipo='SALIDA_CONSUMO',
+                    motivo=motivo,
+                    cantidad_anterior=lote.cantidad,
+                    cantidad_nueva=lote.cantidad - tomado,
+                    diferencia=-tomado,
+                    notas=notas,
+                    usuario=usuario,
+                ))
+                lote.cantidad -= tomado
+                pendientes[lote.insumo_id] = restante - tomado
+                modificados.append(lote)
+
+            if modificados:
+                # bulk_update no emite post_save: el stock se marca aquí una vez por insumo
+                models.LoteInsumo.objects.bulk_update(modificados, ['cantidad'], batch_size=500)
+                models.MovimientoInventario.objects.bulk_create(movimientos, batch_size=500)
+                for insumo_id in {lote.insumo_id for lote in modificados}:
+                    recalculos.marcar_stock(insumo_id)
+
+        faltantes = {insumo_id: cantidad for insumo_id, cantidad in pendientes.items() if cantidad > 0}
+        if faltantes:
+            logger.warning(
+                "Consumo de insumos sin existencia suficiente%s: %s",
+                f" en la unidad {unidad_dental_id}" if unidad_dental_id else '', faltantes
+            )
+        return faltantes
+
+    @staticmethod
+    def consumir_por_tratamiento(tratamiento, servicio_ids=None, usuario=None):
+        """
+        Descuenta los insumos de los servicios de un TratamientoCita (o solo `servicio_ids`)
+        de los lotes de la unidad dental de su cita.
+        """
+        if servicio_ids is None:
+            servicio_ids = list(tratamiento.servicios.values_list('id', flat=True))
+        requerimientos = InventarioService.requerimientos_de_servicios(servicio_ids)
+        if not requerimientos:
+            return {}
+        unidad_dental_id = models.Cita.objects.filter(pk=tratamiento.cita_id).values_list(
+            'unidad_dental_id', flat=True
+        ).first()
+        return InventarioService.consumir_fifo(
+            requerimientos,
+            unidad_dental_id=unidad_dental_id,
+            usuario=usuario,
+            notas=f'Tratamiento #{tratamiento.pk} de la cita #{tratamiento.cita_id}',
+        )
     
     @staticmethod
     def alertas_stock_bajo():
         """
-        Retorna lista de insumos con stock por debajo del mínimo.
+        Retorna lista de insumos con stock por debajo del mínimo (índice parcial insumo_stock_bajo_idx).
         """
         return models.Insumo.objects.filter(
             stock__lte=models.F('stock_minimo')
-        ).select_related('proveedor')
+        ).select_related('proveedor').order_by('nombre')
     
     @staticmethod 
     def alertas_caducidad(dias=30):
         """
-        Retorna lotes próximos a caducar en los próximos N días.
+        Retorna lotes próximos a caducar en los próximos N días (índice parcial lote_caducidad_existencia_idx).
         """
         from datetime import date, timedelta
         
@@ -164,9 +381,540 @@ class InventarioService:
         
         return models.LoteInsumo.objects.filter(
             fecha_caducidad__lte=fecha_limite,
+            fecha_caducidad__isnull=False,
             cantidad__gt=0
         ).select_related('insumo', 'unidad_dental').order_by('fecha_caducidad')
 
+    @staticmethod
+    def generar_digest_alertas(fecha=None, dias=None):
+        """
+        Calcula las alertas de inventario del día y las guarda en DigestAlertasInventario
+        (reemplaza las de esa fecha, conserva notificado_en). Tres consultas: stock bajo,
+        lotes por caducidad y la escritura. Purga los digests más viejos que
+        settings.ALERTAS_INVENTARIO_RETENCION_DIAS.
+        """
+        from datetime import timedelta
+        from django.conf import settings
+        from django.utils import timezone
+
+        hoy = fecha or timezone.localdate()
+        dias = dias or getattr(settings, 'ALERTAS_INVENTARIO_DIAS_CADUCIDAD', 30)
+
+        alertas = [
+            models.AlertaInventario(
+                tipo=models.AlertaInventario.STOCK_BAJO,
+                insumo_id=insumo['id'],
+                insumo_nombre=insumo['nombre'],
+                cantidad=insumo['stock'],
+                stock_minimo=insumo['stock_minimo'],
+            )
+            for insumo in models.Insumo.objects.filter(stock__lte=F('stock_minimo')).order_by('nombre').values(
+                'id', 'nombre', 'stock', 'stock_minimo'
+            )
+        ]
+        lotes = models.LoteInsumo.objects.filter(
+            cantidad__gt=0, fecha_caducidad__isnull=False, fecha_caducidad__lte=hoy + timedelta(days=dias)
+        ).order_by('fecha_caducidad').values(
+            'id', 'insumo_id', 'insumo__nombre', 'unidad_dental__nombre', 'numero_lote', 'fecha_caducidad', 'cantidad'
+        )
+        for lote in lotes:
+            alertas.append(models.AlertaInventario(
+                tipo=(models.AlertaInventario.CADUCADO if lote['fecha_caducidad'] < hoy
+                      else models.AlertaInventario.PROXIMO_CADUCAR),
+                insumo_id=lote['insumo_id'],
+                lote_id=lote['id'],
+                insumo_nombre=lote['insumo__nombre'],
+                unidad_dental_nombre=lote['unidad_dental__nombre'],
+                numero_lote=lote['numero_lote'] or '',
+                fecha_caducidad=lote['fecha_caducidad'],
+                cantidad=lote['cantidad'],
+            ))
+
+        conteo = {tipo: 0 for tipo, _ in models.AlertaInventario.TIPO_CHOICES}
+        for alerta in alertas:
+            conteo[alerta.tipo] += 1
+
+        with transaction.atomic():
+            digest, _ = models.DigestAlertasInventario.objects.update_or_create(
+                fecha=hoy,
+                defaults={
+                    'dias_caducidad': dias,
+                    'stock_bajo': conteo[models.AlertaInventario.STOCK_BAJO],
+                    'proximos_caducar': conteo[models.AlertaInventario.PROXIMO_CADUCAR],
+                    'caducados': conteo[models.AlertaInventario.CADUCADO],
+                },
+            )
+            digest.alertas.all().delete()
+            for alerta in alertas:
+                alerta.digest = digest
+            models.AlertaInventario.objects.bulk_create(alertas, batch_size=500)
+
+            retencion = getattr(settings, 'ALERTAS_INVENTARIO_RETENCION_DIAS', 30)
+            models.DigestAlertasInventario.objects.filter(fecha__lt=hoy - timedelta(days=retencion)).delete()
+        return digest
+
+    @staticmethod
+    def digest_alertas(fecha=None):
+        """
+        Digest de alertas del día con sus renglones ya cargados (digest.alertas.all()).
+        Si el comando nocturno no lo generó, se genera aquí una vez.
+        """
+        from django.db.models import Prefetch
+        from django.utils import timezone
+
+        hoy = fecha or timezone.localdate()
+        consulta = models.DigestAlertasInventario.objects.prefetch_related(
+            Prefetch('alertas', queryset=models.AlertaInventario.objects.order_by('fecha_caducidad', 'insumo_nombre'))
+        )
+        digest = consulta.filter(fecha=hoy).first()
+        if digest is None:
+            InventarioService.generar_digest_alertas(hoy)
+            digest = consulta.get(fecha=hoy)
+        return digest
+
+    @staticmethod
+    def notificar_digest_alertas(digest, clinica):
+        """
+        Encola un solo correo con todas las alertas del digest para los administradores
+        de la clínica. No hace nada si no hay alertas o si ya se notificó. Devuelve True si encoló.
+        """
+        from django.contrib.auth.models import User
+        from django.utils import timezone
+        from . import tareas
+        from .principal import ADMINISTRADOR
+
+        if digest.notificado_en or not digest.total:
+            return False
+        destinatarios = sorted(set(
+            User.objects.filter(groups__name=ADMINISTRADOR, is_active=True).exclude(email='').values_list(
+                'email', flat=True
+            )
+        ))
+        if not destinatarios:
+            logger.info("Sin administradores con email para las alertas de inventario de %s", clinica.schema_name)
+            return False
+
+        titulos = dict(models.AlertaInventario.TIPO_CHOICES)
+        secciones = {tipo: [] for tipo in titulos}
+        for alerta in digest.alertas.all():
+            if alerta.tipo == models.AlertaInventario.STOCK_BAJO:
+                linea = f"- {alerta.insumo_nombre}: quedan {alerta.cantidad} (mínimo {alerta.stock_minimo})"
+            else:
+                linea = (
+                    f"- {alerta.insumo_nombre} (Lote: {alerta.numero_lote or 'N/A'}) en {alerta.unidad_dental_nombre}: "
+                    f"{alerta.cantidad} unidades, caducidad {alerta.fecha_caducidad.strftime('%d/%m/%Y')}"
+                )
+            secciones[alerta.tipo].append(linea)
+
+        cuerpo = [f"Alertas de inventario de {clinica.nombre} al {digest.fecha.strftime('%d/%m/%Y')}:"]
+        for tipo in (models.AlertaInventario.CADUCADO, models.AlertaInventario.PROXIMO_CADUCAR,
+                     models.AlertaInventario.STOCK_BAJO):
+            if secciones[tipo]:
+                cuerpo.append(f"\n{titulos[tipo]} ({len(secciones[tipo])}):")
+                cuerpo.extend(secciones[tipo])
+
+        tareas.encolar(
+            tareas.enviar_email,
+            f'Alertas de inventario en {clinica.nombre} ({digest.total})',
+            '\n'.join(cuerpo),
+            destinatarios,
+            clave=f'alertas-inventario:{digest.fecha.isoformat()}',
+        )
+        models.DigestAlertasInventario.objects.filter(pk=digest.pk).update(notificado_en=timezone.now())
+        return True
+
+    @staticmethod
+    def importar_excel(archivo):
+        """
+        Importa insumos y lotes desde la hoja 'Inventario' del Excel que genera
+        la exportación de inventario. Las filas con error se omiten y se reportan.
+
+        Args:
+            archivo: Archivo o stream del Excel (.xlsx)
+
+        Returns:
+            Dict con filas_procesadas, insumos_creados, insumos_actualizados,
+            lotes_creados, lotes_actualizados y errores (lista de textos).
+            Lanza KeyError si el libro no tiene la hoja 'Inventario'.
+        """
+        from openpyxl import load_workbook
+        from datetime import datetime
+
+        wb = load_workbook(archivo, data_only=True)
+        ws = wb['Inventario']
+
+        errores = []
+        filas_procesadas = 0
+        insumos_creados = 0
+        insumos_actualizados = 0
+        lotes_creados = 0
+        lotes_actualizados = 0
+
+        # Obtener todas las unidades dentales disponibles
+        unidades_dict = {u.nombre: u for u in models.UnidadDental.objects.all()}
+        proveedores_dict = {p.nombre: p for p in models.Proveedor.objects.all()}
+
+        with transaction.atomic():
+            for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+                try:
+                    # Extraer valores
+                    id_insumo = row[0]
+                    nombre = row[1]
+                    descripcion = row[2] or ''
+                    unidad_medida = row[3] or ''
+                    proveedor_nombre = row[4]
+                    stock_minimo = row[5] or 0
+                    precio_unitario = row[6] or 0.0
+                    id_lote = row[7]
+                    unidad_dental_nombre = row[8]
+                    cantidad_lote = row[9] or 0
+                    numero_lote = row[10] or ''
+                    fecha_cad_str = row[11]
+                    registro_sanitario = row[12] or ''
+
+                    # Validación: nombre es obligatorio
+                    if not nombre:
+                        continue  # Fila vacía, skip
+
+                    # Validar valores numéricos
+                    try:
+                        stock_minimo = int(stock_minimo)
+                        precio_unitario = float(precio_unitario)
+                        cantidad_lote = int(cantidad_lote)
+                    except (ValueError, TypeError):
+                        errores.append(f"Fila {row_num}: Valores numéricos inválidos")
+                        continue
+
+                    if stock_minimo < 0 or precio_unitario < 0 or cantidad_lote < 0:
+                        errores.append(f"Fila {row_num}: Los valores numéricos no pueden ser negativos")
+                        continue
+
+                    # Procesar fecha de caducidad
+                    fecha_caducidad = None
+                    if fecha_cad_str:
+                        try:
+                            if isinstance(fecha_cad_str, datetime):
+                                fecha_caducidad = fecha_cad_str.date()
+                            else:
+                                fecha_caducidad = datetime.strptime(str(fecha_cad_str), '%Y-%m-%d').date()
+                        except ValueError:
+                            errores.append(f"Fila {row_num}: Fecha de caducidad inválida (use YYYY-MM-DD)")
+                            continue
+
+                    # Buscar o crear insumo
+                    proveedor = proveedores_dict.get(proveedor_nombre) if proveedor_nombre else None
+
+                    if id_insumo:
+                        # Actualizar insumo existente
+                        try:
+                            insumo = models.Insumo.objects.get(id=id_insumo)
+                            insumo.descripcion = descripcion
+                            insumo.unidad_medida = unidad_medida
+                            insumo.proveedor = proveedor
+                            insumo.stock_minimo = stock_minimo
+                            insumo.precio_unitario = precio_unitario
+                            insumo.registro_sanitario = registro_sanitario
+                            insumo.save()
+                            insumos_actualizados += 1
+                        except models.Insumo.DoesNotExist:
+                            errores.append(f"Fila {row_num}: Insumo ID {id_insumo} no existe")
+                            continue
+                    else:
+                        # Crear nuevo insumo
+                        insumo = models.Insumo.objects.create(
+                            nombre=nombre,
+                            descripcion=descripcion,
+                            unidad_medida=unidad_medida,
+                            proveedor=proveedor,
+                            stock_minimo=stock_minimo,
+                            precio_unitario=precio_unitario,
+                            registro_sanitario=registro_sanitario
+                        )
+                        insumos_creados += 1
+
+                    # Procesar lote si hay unidad dental especificada
+                    if unidad_dental_nombre and cantidad_lote > 0:
+                        unidad_dental = unidades_dict.get(unidad_dental_nombre)
+                        if not unidad_dental:
+                            errores.append(f"Fila {row_num}: Unidad Dental '{unidad_dental_nombre}' no existe")
+                            continue
+
+                        if id_lote:
+                            # Actualizar lote existente
+                            try:
+                                lote = models.LoteInsumo.objects.get(id=id_lote, insumo=insumo)
+                                lote.cantidad = cantidad_lote
+                                lote.numero_lote = numero_lote
+                                lote.fecha_caducidad = fecha_caducidad
+                                lote.unidad_dental = unidad_dental
+                                lote.save()
+                                lotes_actualizados += 1
+                            except models.LoteInsumo.DoesNotExist:
+                                errores.append(f"Fila {row_num}: Lote ID {id_lote} no existe")
+                                continue
+                        else:
+                            # Crear nuevo lote
+                            models.LoteInsumo.objects.create(
+                                insumo=insumo,
+                                unidad_dental=unidad_dental,
+                                cantidad=cantidad_lote,
+                                numero_lote=numero_lote,
+                                fecha_caducidad=fecha_caducidad
+                            )
+                            lotes_creados += 1
+
+                    filas_procesadas += 1
+
+                except Exception as e:
+                    errores.append(f"Fila {row_num}: Error inesperado - {str(e)}")
+                    continue
+
+            # El stock de los insumos con lotes creados/modificados se recalcula una
+            # sola vez por insumo al confirmar la transacción (core/recalculos.py)
+
+
+        return {
+            'filas_procesadas': filas_procesadas,
+            'insumos_creados': insumos_creados,
+            'insumos_actualizados': insumos_actualizados,
+            'lotes_creados': lotes_creados,
+            'lotes_actualizados': lotes_actualizados,
+            'errores': errores,
+        }
+
+    @staticmethod
+    def resumen_importacion(resultado):
+        """Texto para el usuario con el resultado de importar_excel()."""
+        errores = resultado['errores']
+        if errores:
+            return (
+                f"Importación completada con {len(errores)} errores. "
+                f"Procesadas: {resultado['filas_procesadas']} filas. "
+                f"Errores: {', '.join(errores[:5])}{'...' if len(errores) > 5 else ''}"
+            )
+        return (
+            f"Importación exitosa! "
+            f"Insumos creados: {resultado['insumos_creados']}, actualizados: {resultado['insumos_actualizados']}. "
+            f"Lotes creados: {resultado['lotes_creados']}, actualizados: {resultado['lotes_actualizados']}."
+        )
+
+
+class ValuacionInventarioService:
+    """
+    Valor de la existencia de insumos por insumo y por unidad dental.
+
+    Métodos:
+    - PEPS (primeras entradas, primeras salidas): cada lote con existencia vale
+      su cantidad × su costo_unitario. Como el consumo toma primero los lotes más
+      viejos (InventarioService.consumir_fifo), lo que queda son las capas más
+      recientes. Las unidades de lotes sin costo capturado valen 0.
+    - PROMEDIO (costo promedio ponderado): el costo unitario del insumo es el
+      promedio de sus lotes con costo, ponderado por cantidad, y se aplica a toda
+      su existencia en todas las unidades (incluidos los lotes sin costo).
+
+    Un lote cuenta como "con costo" si costo_unitario > 0: los lotes recién
+    recibidos quedan en 0 hasta que se captura la factura.
+
+    La existencia se lee con un solo GROUP BY (insumo, unidad dental) sobre
+    LoteInsumo; los cortes de fin de mes (CorteValuacionInventario) guardan esas
+    mismas filas con los nombres copiados, y valuar_corte() las lee sin volver
+    a recorrer los lotes ni unir con el catálogo actual.
+    """
+
+    PEPS = 'PEPS'
+    PROMEDIO = 'PROMEDIO'
+    METODOS = [
+        (PEPS, 'PEPS (primeras entradas, primeras salidas)'),
+        (PROMEDIO, 'Costo promedio ponderado'),
+    ]
+
+    CAMPOS_FILA = [
+        'insumo_id', 'insumo__nombre', 'insumo__unidad_medida', 'insumo__proveedor__nombre',
+        'unidad_dental_id', 'unidad_dental__nombre',
+    ]
+    # Cantidades y valores que se guardan tal cual en CorteValuacionInventario
+    CAMPOS_CORTE = ['existencia', 'cantidad_sin_costo', 'valor_peps', 'costo_promedio', 'valor_promedio']
+
+    @staticmethod
+    def metodo_por_defecto():
+        from django.conf import settings
+
+        return getattr(settings, 'METODO_VALUACION_INVENTARIO', ValuacionInventarioService.PEPS)
+
+    @staticmethod
+    def validar_metodo(metodo):
+        metodo = (metodo or '').upper()
+        if metodo not in dict(ValuacionInventarioService.METODOS):
+            raise ValueError(f"Método de valuación no válido: {metodo}")
+        return metodo
+
+    @staticmethod
+    def existencias(lotes=None):
+        """
+        Filas por (insumo, unidad dental) con existencia, en una consulta: existencia,
+        cantidad_sin_costo, valor_peps, costo_promedio (del insumo, entre todas
+        las unidades) y valor_promedio, además de los nombres de CAMPOS_FILA.
+        """
+        from django.db.models import DecimalField, ExpressionWrapper, Q
+
+        if lotes is None:
+            lotes = models.LoteInsumo.objects.all()
+        con_costo = Q(costo_unitario__gt=0)
+        filas = list(
+            lotes.filter(cantidad__gt=0).order_by().values(*ValuacionInventarioService.CAMPOS_FILA).annotate(
+                existencia=Sum('cantidad'),
+                cantidad_con_costo=Sum('cantidad', filter=con_costo),
+                valor_peps=Sum(
+                    ExpressionWrapper(
+                        F('cantidad') * F('costo_unitario'),
+                        output_field=DecimalField(max_digits=14, decimal_places=2),
+                    ),
+                    filter=con_costo,
+                ),
+            ).order_by('insumo__nombre', 'insumo_id', 'unidad_dental__nombre')
+        )
+
+        # Costo promedio por insumo sobre todas sus unidades dentales
+        acumulado = {}
+        for fila in filas:
+            cantidad, valor = acumulado.get(fila['insumo_id'], (0, Decimal('0.00')))
+            acumulado[fila['insumo_id']] = (
+                cantidad + (fila['cantidad_con_costo'] or 0), valor + (fila['valor_peps'] or Decimal('0.00'))
+            )
+
+        for fila in filas:
+            cantidad, valor = acumulado[fila['insumo_id']]
+            costo_promedio = (valor / cantidad).quantize(Decimal('0.0001')) if cantidad else None
+            fila['valor_peps'] = fila['valor_peps'] or Decimal('0.00')
+            fila['cantidad_sin_costo'] = fila['existencia'] - (fila.pop('cantidad_con_costo') or 0)
+            fila['costo_promedio'] = costo_promedio
+            fila['valor_promedio'] = (
+                (fila['existencia'] * costo_promedio).quantize(Decimal('0.01')) if costo_promedio else Decimal('0.00')
+            )
+        return filas
+
+    @staticmethod
+    def resumir(filas, metodo):
+        """
+        Agrupa filas de existencias() (o de un corte) por insumo y por unidad dental
+        según `metodo`. Devuelve dict con por_insumo, por_unidad, valor_total,
+        insumos_sin_costo y metodo.
+        """
+        campo_valor = 'valor_peps' if metodo == ValuacionInventarioService.PEPS else 'valor_promedio'
+        por_insumo = {}
+        por_unidad = {}
+        for fila in filas:
+            valor = fila[campo_valor]
+            # En un corte el insumo/unidad pudo borrarse después (id nulo): se agrupa por nombre
+            insumo = por_insumo.setdefault(fila['insumo_id'] or fila['insumo__nombre'], {
+                'insumo_id': fila['insumo_id'],
+                'nombre': fila['insumo__nombre'],
+                'unidad_medida': fila['insumo__unidad_medida'],
+                'proveedor': fila['insumo__proveedor__nombre'] or 'N/A',
+                'stock': 0,
+                'sin_costo': 0,
+                'valor_total': Decimal('0.00'),
+                'costo_promedio': fila['costo_promedio'],
+            })
+            insumo['stock'] += fila['existencia']
+            insumo['sin_costo'] += fila['cantidad_sin_costo']
+            insumo['valor_total'] += valor
+
+            unidad = por_unidad.setdefault(fila['unidad_dental_id'] or fila['unidad_dental__nombre'], {
+                'unidad_dental_id': fila['unidad_dental_id'],
+                'nombre': fila['unidad_dental__nombre'],
+                'insumos': 0,
+                'valor_total': Decimal('0.00'),
+            })
+            unidad['insumos'] += 1
+            unidad['valor_total'] += valor
+
+        for insumo in por_insumo.values():
+            insumo['tiene_costo'] = insumo['sin_costo'] < insumo['stock']
+            # En PEPS, costo medio de las unidades con costo (las demás valen 0)
+            con_costo = insumo['stock'] - insumo['sin_costo']
+            insumo['costo_unitario'] = (
+                (insumo['valor_total'] / con_costo).quantize(Decimal('0.01'))
+                if metodo == ValuacionInventarioService.PEPS and con_costo
+                else insumo['costo_promedio']
+            )
+
+        return {
+            'metodo': metodo,
+            'por_insumo': sorted(por_insumo.values(), key=lambda x: x['valor_total'], reverse=True),
+            'por_unidad': sorted(por_unidad.values(), key=lambda x: x['valor_total'], reverse=True),
+            'valor_total': sum((u['valor_total'] for u in por_unidad.values()), Decimal('0.00')),
+            'insumos_sin_costo': sum(1 for i in por_insumo.values() if i['sin_costo']),
+        }
+
+    @staticmethod
+    def valuar(metodo=None, lotes=None):
+        """Valuación actual (ver resumir()) con `metodo` o el de settings.METODO_VALUACION_INVENTARIO."""
+        metodo = ValuacionInventarioService.validar_metodo(metodo or ValuacionInventarioService.metodo_por_defecto())
+        return ValuacionInventarioService.resumir(ValuacionInventarioService.existencias(lotes), metodo)
+
+    @staticmethod
+    def valuar_corte(fecha_corte, metodo=None):
+        """
+        Valuación guardada en el corte `fecha_corte` (ver resumir()), sin leer
+        lotes ni el catálogo: los nombres son los copiados al registrar el corte.
+        """
+        metodo = ValuacionInventarioService.validar_metodo(metodo or ValuacionInventarioService.metodo_por_defecto())
+        filas = [
+            {
+                'insumo_id': corte['insumo_id'],
+                'insumo__nombre': corte['insumo_nombre'],
+                'insumo__unidad_medida': corte['insumo_unidad_medida'],
+                'insumo__proveedor__nombre': corte['proveedor_nombre'],
+                'unidad_dental_id': corte['unidad_dental_id'],
+                'unidad_dental__nombre': corte['unidad_dental_nombre'],
+                **{campo: corte[campo] for campo in ValuacionInventarioService.CAMPOS_CORTE},
+            }
+            for corte in models.CorteValuacionInventario.objects.filter(fecha_corte=fecha_corte).values(
+                'insumo_id', 'insumo_nombre', 'insumo_unidad_medida', 'proveedor_nombre',
+                'unidad_dental_id', 'unidad_dental_nombre', *ValuacionInventarioService.CAMPOS_CORTE,
+            )
+        ]
+        return ValuacionInventarioService.resumir(filas, metodo)
+
+    @staticmethod
+    def cortes():
+        """Cortes registrados con sus totales por método, del más reciente al más antiguo."""
+        return list(
+            models.CorteValuacionInventario.objects.order_by().values('fecha_corte').annotate(
+                valor_peps=Sum('valor_peps'),
+                valor_promedio=Sum('valor_promedio'),
+                existencia=Sum('existencia'),
+            ).order_by('-fecha_corte')
+        )
+
+    @staticmethod
+    def registrar_corte(fecha_corte=None):
+        """
+        Guarda la valuación actual como corte a `fecha_corte` (hoy por defecto),
+        reemplazando el corte de esa fecha si ya existía. Devuelve las filas guardadas.
+        """
+        from django.utils import timezone
+
+        fecha_corte = fecha_corte or timezone.localdate()
+        renglones = [
+            models.CorteValuacionInventario(
+                fecha_corte=fecha_corte,
+                insumo_id=fila['insumo_id'],
+                insumo_nombre=fila['insumo__nombre'],
+                insumo_unidad_medida=fila['insumo__unidad_medida'] or '',
+                proveedor_nombre=fila['insumo__proveedor__nombre'] or '',
+                unidad_dental_id=fila['unidad_dental_id'],
+                unidad_dental_nombre=fila['unidad_dental__nombre'],
+                **{campo: fila[campo] for campo in ValuacionInventarioService.CAMPOS_CORTE},
+            )
+            for fila in ValuacionInventarioService.existencias()
+        ]
+        with transaction.atomic():
+            models.CorteValuacionInventario.objects.filter(fecha_corte=fecha_corte).delete()
+            models.CorteValuacionInventario.objects.bulk_create(renglones, batch_size=500)
+        return len(renglones)
+
 
 class PagoService:
     """Servicios relacionados con la gestión de pagos"""
@@ -183,10 +931,7 @@ class PagoService:
                 monto=monto,
                 metodo_pago=metodo_pago
             )
-            
-            # Actualizar saldo del paciente
-            PacienteService.actualizar_saldo_global(paciente)
-            
+            # El saldo del paciente lo recalcula la señal de Pago al confirmar la transacción
             return pago
 
 
@@ -346,3 +1091,537 @@ class SatMappingService:
                 actualizados += 1
         
         return actualizados, total
+
+
+class ResumenReportesService:
+    """
+    Mantiene las tablas de resúmenes diarios (ResumenIngresoDiario y
+    ResumenServicioDiario) que leen los reportes financieros.
+
+    Cada "cubeta" es (día, dentista): al cambiar un pago o un tratamiento
+    se recalcula solo la cubeta afectada a partir de los datos fuente.
+    """
+
+    ESTADOS_FACTURABLES = ['ATN', 'COM']
+
+    @staticmethod
+    def dia_local(fecha_hora):
+        """Día calendario en la zona horaria de la clínica (igual que __date)."""
+        from django.utils import timezone
+        if fecha_hora is None:
+            return None
+        if timezone.is_aware(fecha_hora):
+            return timezone.localdate(fecha_hora)
+        return fecha_hora.date()
+
+    @staticmethod
+    def recalcular_ingresos_dia(dia, dentista_id):
+        """Recalcula los renglones de ingresos para un (día, dentista)."""
+        if dia is None:
+            return
+        agrupado = models.Pago.objects.filter(
+            fecha_pago__date=dia,
+            cita__dentista_id=dentista_id,
+        ).values('metodo_pago').annotate(
+            total=Sum('monto'),
+            num_pagos=Count('id'),
+            num_citas=Count('cita', distinct=True),
+        )
+
+        with transaction.atomic():
+            metodos = []
+            for fila in agrupado:
+                metodos.append(fila['metodo_pago'])
+                models.ResumenIngresoDiario.objects.update_or_create(
+                    dia=dia,
+                    dentista_id=dentista_id,
+                    metodo_pago=fila['metodo_pago'],
+                    defaults={
+                        'total': fila['total'] or Decimal('0.00'),
+                        'num_pagos': fila['num_pagos'],
+                        'num_citas': fila['num_citas'],
+                    },
+                )
+            models.ResumenIngresoDiario.objects.filter(
+                dia=dia, dentista_id=dentista_id
+            ).exclude(metodo_pago__in=metodos).delete()
+
+    @staticmethod
+    def recalcular_servicios_dia(dia, dentista_id):
+        """Recalcula los renglones de servicios vendidos para un (día, dentista)."""
+        if dia is None or dentista_id is None:
+            return
+        through = models.TratamientoCita.servicios.through
+        agrupado = through.objects.filter(
+            tratamientocita__cita__fecha_hora__date=dia,
+            tratamientocita__cita__dentista_id=dentista_id,
+            tratamientocita__cita__estado__in=ResumenReportesService.ESTADOS_FACTURABLES,
+        ).values('servicio_id').annotate(
+            cantidad=Count('id'),
+            ingresos=Sum('servicio__precio'),
+        )
+
+        with transaction.atomic():
+            servicios = []
+            for fila in agrupado:
+                servicios.append(fila['servicio_id'])
+                models.ResumenServicioDiario.objects.update_or_create(
+                    dia=dia,
+                    dentista_id=dentista_id,
+                    servicio_id=fila['servicio_id'],
+                    defaults={
+                        'cantidad': fila['cantidad'],
+                        'ingresos': fila['ingresos'] or Decimal('0.00'),
+                    },
+                )
+            models.ResumenServicioDiario.objects.filter(
+                dia=dia, dentista_id=dentista_id
+            ).exclude(servicio_id__in=servicios).delete()
+
+    @staticmethod
+    def revaluar_servicio(servicio):
+        """Aplica el precio vigente de un servicio a todos sus renglones históricos."""
+        models.ResumenServicioDiario.objects.filter(servicio=servicio).update(
+            ingresos=F('cantidad') * servicio.precio
+        )
+
+    @staticmethod
+    def reconstruir(fecha_inicio=None, fecha_fin=None):
+        """
+        Reconstruye ambas tablas desde cero (o para un rango de días) con
+        dos consultas agrupadas y bulk_create.
+
+        Returns:
+            tuple: (renglones_ingresos, renglones_servicios)
+        """
+        from django.db.models.functions import TruncDate
+
+        pagos = models.Pago.objects.all()
+        resumen_ingresos = models.ResumenIngresoDiario.objects.all()
+        through = models.TratamientoCita.servicios.through
+        tratamientos = through.objects.filter(
+            tratamientocita__cita__estado__in=ResumenReportesService.ESTADOS_FACTURABLES,
+        )
+        resumen_servicios = models.ResumenServicioDiario.objects.all()
+
+        if fecha_inicio:
+            pagos = pagos.filter(fecha_pago__date__gte=fecha_inicio)
+            resumen_ingresos = resumen_ingresos.filter(dia__gte=fecha_inicio)
+            tratamientos = tratamientos.filter(tratamientocita__cita__fecha_hora__date__gte=fecha_inicio)
+            resumen_servicios = resumen_servicios.filter(dia__gte=fecha_inicio)
+        if fecha_fin:
+            pagos = pagos.filter(fecha_pago__date__lte=fecha_fin)
+            resumen_ingresos = resumen_ingresos.filter(dia__lte=fecha_fin)
+            tratamientos = tratamientos.filter(tratamientocita__cita__fecha_hora__date__lte=fecha_fin)
+            resumen_servicios = resumen_servicios.filter(dia__lte=fecha_fin)
+
+        filas_ingresos = [
+            models.ResumenIngresoDiario(
+                dia=fila['dia'],
+                dentista_id=fila['cita__dentista_id'],
+                metodo_pago=fila['metodo_pago'],
+                total=fila['total'] or Decimal('0.00'),
+                num_pagos=fila['num_pagos'],
+                num_citas=fila['num_citas'],
+            )
+            for fila in pagos.annotate(dia=TruncDate('fecha_pago')).values(
+                'dia', 'cita__dentista_id', 'metodo_pago'
+            ).annotate(
+                total=Sum('monto'),
+                num_pagos=Count('id'),
+                num_citas=Count('cita', distinct=True),
+            ).order_by()
+        ]
+        filas_servicios = [
+            models.ResumenServicioDiario(
+                dia=fila['dia'],
+                dentista_id=fila['tratamientocita__cita__dentista_id'],
+                servicio_id=fila['servicio_id'],
+                cantidad=fila['cantidad'],
+                ingresos=fila['ingresos'] or Decimal('0.00'),
+            )
+            for fila in tratamientos.annotate(dia=TruncDate('tratamientocita__cita__fecha_hora')).values(
+                'dia', 'tratamientocita__cita__dentista_id', 'servicio_id'
+            ).annotate(
+                cantidad=Count('id'),
+                ingresos=Sum('servicio__precio'),
+            ).order_by()
+        ]
+
+        with transaction.atomic():
+            resumen_ingresos.delete()
+            resumen_servicios.delete()
+            models.ResumenIngresoDiario.objects.bulk_create(filas_ingresos, batch_size=1000)
+            models.ResumenServicioDiario.objects.bulk_create(filas_servicios, batch_size=1000)
+
+        return len(filas_ingresos), len(filas_servicios)
+
+    # --- Consultas de lectura para reportes ---
+
+    @staticmethod
+    def ingresos(fecha_inicio=None, fecha_fin=None, dentista=None):
+        """QuerySet de ResumenIngresoDiario filtrado por rango y dentista."""
+        qs = models.ResumenIngresoDiario.objects.all()
+        if fecha_inicio:
+            qs = qs.filter(dia__gte=fecha_inicio)
+        if fecha_fin:
+            qs = qs.filter(dia__lte=fecha_fin)
+        if dentista:
+            qs = qs.filter(dentista=dentista)
+        return qs
+
+    @staticmethod
+    def servicios(fecha_inicio=None, fecha_fin=None, dentista=None):
+        """QuerySet de ResumenServicioDiario filtrado por rango y dentista."""
+        qs = models.ResumenServicioDiario.objects.all()
+        if fecha_inicio:
+            qs = qs.filter(dia__gte=fecha_inicio)
+        if fecha_fin:
+            qs = qs.filter(dia__lte=fecha_fin)
+        if dentista:
+            qs = qs.filter(dentista=dentista)
+        return qs
+
+    @staticmethod
+    def servicios_mas_vendidos(fecha_inicio=None, fecha_fin=None):
+        """
+        Lista de Servicio anotados con cantidad_vendida, ingresos_generados y
+        porcentaje, ordenada por cantidad. Devuelve (servicios, total_cantidad,
+        total_ingresos).
+        """
+        filas = ResumenReportesService.servicios(fecha_inicio, fecha_fin).values('servicio_id').annotate(
+            total_cantidad=Sum('cantidad'),
+            total_ingresos=Sum('ingresos'),
+        ).filter(total_cantidad__gt=0).order_by()
+        por_servicio = {fila['servicio_id']: fila for fila in filas}
+        servicios = list(
+            models.Servicio.objects.select_related('especialidad').filter(id__in=por_servicio.keys())
+        )
+        for servicio in servicios:
+            fila = por_servicio[servicio.id]
+            servicio.cantidad_vendida = fila['total_cantidad']
+            servicio.ingresos_generados = fila['total_ingresos'] or Decimal('0.00')
+        servicios.sort(key=lambda s: (-s.cantidad_vendida, s.nombre))
+
+        total_cantidad = sum(s.cantidad_vendida for s in servicios)
+        total_ingresos = sum((s.ingresos_generados for s in servicios), Decimal('0.00'))
+        for servicio in servicios:
+            servicio.porcentaje = (servicio.ingresos_generados / total_ingresos * 100) if total_ingresos > 0 else 0
+        return servicios, total_cantidad, total_ingresos
+
+
+# Diagnósticos mínimos para el odontograma interactivo
+DIAGNOSTICOS_BASE = [
+    ('SANO', '#27ae60'),
+    ('CARIES', '#e74c3c'),
+    ('OBTURACION', '#f39c12'),
+    ('CORONA', '#3498db'),
+    ('ENDODONCIA', '#e91e63'),
+    ('EXTRAIDO', '#95a5a6'),
+]
+
+
+class EstadisticasListaService:
+    """
+    KPIs de las páginas de listado con una sola consulta aggregate(...).
+
+    Cada vista declara sus KPIs una vez como {nombre: agregado}, usando
+    Count/Sum/Avg con filter=Q(...) para las variantes, junto con los modelos
+    de los que dependen. El resultado se guarda en el caché por tenant y por
+    hash de la consulta filtrada, con un TTL corto. Las señales avanzan la
+    versión de esos modelos (cache_http.invalidar), la versión forma parte de
+    la llave, y así un cambio se ve en la siguiente carga.
+    """
+
+    TIMEOUT = 120
+
+    @staticmethod
+    def calcular(queryset, kpis, depende_de=(), timeout=None):
+        """
+        Devuelve {nombre: valor} para `kpis` sobre `queryset` (ya filtrado).
+        Ej.: calcular(citas, {'total': Count('id'), 'canceladas': Count('id', filter=Q(estado='CAN'))}, [models.Cita])
+        """
+        from django.core.cache import cache
+        from django.core.exceptions import EmptyResultSet
+
+        queryset = queryset.order_by()
+        try:
+            clave = EstadisticasListaService._clave(queryset, sorted(kpis.items()), depende_de)
+        except EmptyResultSet:
+            # queryset.none(): Django resuelve el aggregate sin consultar
+            return queryset.aggregate(**kpis)
+
+        resultado = cache.get(clave)
+        if resultado is None:
+            resultado = queryset.aggregate(**kpis)
+            cache.set(clave, resultado, timeout or EstadisticasListaService.TIMEOUT)
+        return resultado
+
+    @staticmethod
+    def agrupar(queryset, campos, kpis, depende_de=(), timeout=None):
+        """
+        Como calcular() pero con GROUP BY `campos`: lista de dicts {campo..., kpi...}.
+        Ej.: agrupar(trabajos, ['laboratorio_id'], {'total': Count('id')}, [models.TrabajoLaboratorio])
+        """
+        from django.core.cache import cache
+        from django.core.exceptions import EmptyResultSet
+
+        queryset = queryset.order_by().values(*campos).annotate(**kpis).order_by(*campos)
+        try:
+            clave = EstadisticasListaService._clave(queryset, (), depende_de)
+        except EmptyResultSet:
+            return []
+
+        resultado = cache.get(clave)
+        if resultado is None:
+            resultado = list(queryset)
+            cache.set(clave, resultado, timeout or EstadisticasListaService.TIMEOUT)
+        return resultado
+
+    @staticmethod
+    def _clave(queryset, extra, depende_de):
+        """Llave de caché: SQL y parámetros de la consulta, `extra` y versiones de `depende_de`."""
+        import hashlib
+        from django.db import connection
+        from . import cache_http
+
+        sql, params = queryset.query.sql_with_params()
+        schema = connection.schema_name
+        versiones = cache_http.versiones(*depende_de, schema=schema) if depende_de else []
+        firma = repr((sql, params, extra, versiones))
+        return (
+            f'estadisticas:{schema}:{queryset.model._meta.label_lower}:'
+            f'{hashlib.md5(firma.encode(), usedforsecurity=False).hexdigest()}'
+        )
+
+
+class LaboratorioService:
+    """Seguimiento de entregas de los trabajos de laboratorio (retrasos y tiempos por laboratorio)"""
+
+    # El resumen por laboratorio considera los trabajos solicitados en estos últimos días
+    DIAS_RESUMEN = 365
+
+    @staticmethod
+    def filtro_retrasados(hoy=None):
+        """Q de los trabajos abiertos cuya fecha estimada de entrega ya pasó (usa el índice estado/fecha)."""
+        from django.db.models import Q
+        from django.utils import timezone
+
+        hoy = hoy or timezone.localdate()
+        return ~Q(estado__in=models.TrabajoLaboratorio.ESTADOS_CERRADOS) & Q(fecha_entrega_estimada__lt=hoy)
+
+    @staticmethod
+    def anotar_retraso(queryset, hoy=None):
+        """
+        Anota en SQL:
+        - retrasado: mismo criterio que TrabajoLaboratorio.esta_retrasado
+        - dias_retraso: días desde la fecha estimada para los retrasados, 0 para el resto
+        """
+        from django.db.models import BooleanField, Case, IntegerField, Value, When
+        from django.db.models.functions import ExtractDay
+        from django.utils import timezone
+
+        hoy = hoy or timezone.localdate()
+        return queryset.annotate(
+            retrasado=Case(
+                When(LaboratorioService.filtro_retrasados(hoy), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            dias_retraso=Case(
+                When(
+                    LaboratorioService.filtro_retrasados(hoy),
+                    then=ExtractDay(Value(hoy) - F('fecha_entrega_estimada')),
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+        )
+
+    @staticmethod
+    def resumen_por_laboratorio(queryset=None, dias=None):
+        """
+        Tiempos de entrega y puntualidad por laboratorio en un solo GROUP BY, guardado
+        en caché hasta que cambie algún trabajo (EstadisticasListaService).
+        Solo mira la ventana de los últimos `dias` por fecha de solicitud, así el costo no
+        crece con el historial. Cada fila trae laboratorio_id, laboratorio__nombre, total,
+        abiertos, retrasados, entregados, entregados_tarde, dias_entrega_promedio y
+        porcentaje_a_tiempo.
+        """
+        from datetime import timedelta
+        from django.db.models import Avg, DurationField, ExpressionWrapper, Q
+        from django.db.models.functions import TruncDate
+        from django.utils import timezone
+
+        hoy = timezone.localdate()
+        # Se compara el DateTimeField directo (sin __date) y se trunca al día para que la llave de caché no cambie a cada segundo
+        desde = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(
+            days=dias or LaboratorioService.DIAS_RESUMEN
+        )
+        if queryset is None:
+            queryset = models.TrabajoLaboratorio.objects.all()
+        queryset = queryset.filter(fecha_solicitud__gte=desde).exclude(estado='CANCELADO')
+
+        entregado = Q(fecha_entrega_real__isnull=False)
+        filas = EstadisticasListaService.agrupar(
+            queryset,
+            ['laboratorio_id', 'laboratorio__nombre'],
+            {
+                'total': Count('id'),
+                'abiertos': Count('id', filter=~Q(estado__in=models.TrabajoLaboratorio.ESTADOS_CERRADOS)),
+                'retrasados': Count('id', filter=LaboratorioService.filtro_retrasados(hoy)),
+                'entregados': Count('id', filter=entregado),
+                'entregados_tarde': Count(
+                    'id', filter=entregado & Q(fecha_entrega_real__gt=F('fecha_entrega_estimada'))
+                ),
+                'tiempo_entrega_promedio': Avg(
+                    ExpressionWrapper(
+                        F('fecha_entrega_real') - TruncDate('fecha_solicitud'), output_field=DurationField()
+                    ),
+                    filter=entregado,
+                ),
+            },
+            depende_de=[models.TrabajoLaboratorio],
+        )
+        for fila in filas:
+            promedio = fila.pop('tiempo_entrega_promedio')
+            fila['dias_entrega_promedio'] = (
+                round(promedio.total_seconds() / 86400, 1) if promedio is not None else None
+            )
+            fila['porcentaje_a_tiempo'] = (
+                round(100 * (fila['entregados'] - fila['entregados_tarde']) / fila['entregados'], 1)
+                if fila['entregados'] else None
+            )
+        return filas
+
+
+class ProvisionamientoTenantService:
+    """
+    Alta rápida de clínicas clonando un schema plantilla ya migrado y sembrado
+    (settings.TENANT_TEMPLATE_SCHEMA) en lugar de correr todas las migraciones.
+
+    Si la plantilla no existe o tiene migraciones pendientes, Clinica.create_schema
+    cae al flujo normal de django-tenants (CREATE SCHEMA + migrate_schemas).
+    La plantilla se (re)construye con `python manage.py preparar_plantilla_tenant`.
+    """
+
+    GRUPOS_BASE = ['Administrador', 'Dentista', 'Recepcionista', 'Asistente']
+
+    @staticmethod
+    def schema_plantilla():
+        from django.conf import settings
+        return getattr(settings, 'TENANT_TEMPLATE_SCHEMA', None)
+
+    @staticmethod
+    def plantilla_vigente():
+        """True si la plantilla existe y no tiene migraciones pendientes."""
+        from django.db import connection
+        from django.db.migrations.executor import MigrationExecutor
+        from django_tenants.utils import schema_exists
+
+        plantilla = ProvisionamientoTenantService.schema_plantilla()
+        if not plantilla or not schema_exists(plantilla):
+            return False
+
+        connection.set_schema(plantilla, include_public=False)
+        try:
+            executor = MigrationExecutor(connection)
+            pendientes = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        finally:
+            connection.set_schema_to_public()
+        return not pendientes
+
+    @staticmethod
+    def preparar_plantilla(forzar=False, verbosity=1):
+        """
+        Crea (o recrea si está desactualizada) el schema plantilla: migraciones
+        de las apps de tenant y datos semilla. Devuelve True si se reconstruyó.
+        """
+        from django.core.management import call_command
+        from django.db import connection
+        from django_tenants.utils import schema_exists
+
+        plantilla = ProvisionamientoTenantService.schema_plantilla()
+        if not plantilla:
+            raise ValueError('TENANT_TEMPLATE_SCHEMA no está configurado')
+        if not forzar and ProvisionamientoTenantService.plantilla_vigente():
+            return False
+
+        connection.set_schema_to_public()
+        with connection.cursor() as cursor:
+            if schema_exists(plantilla):
+                cursor.execute(f'DROP SCHEMA "{plantilla}" CASCADE')
+            cursor.execute(f'CREATE SCHEMA "{plantilla}"')
+
+        call_command('migrate_schemas', tenant=True, schema_name=plantilla, interactive=False, verbosity=verbosity)
+
+        connection.set_schema(plantilla)
+        try:
+            ProvisionamientoTenantService.sembrar()
+        finally:
+            connection.set_schema_to_public()
+        return True
+
+    @staticmethod
+    def sembrar():
+        """Datos semilla de toda clínica nueva (schema activo): grupos, permisos, catálogos."""
+        from django.contrib.auth.models import Group
+        from django.core.management import call_command
+        from .permissions_utils import inicializar_permisos_por_defecto
+
+        with transaction.atomic():
+            for nombre in ProvisionamientoTenantService.GRUPOS_BASE:
+                Group.objects.get_or_create(name=nombre)
+            inicializar_permisos_por_defecto()
+            for nombre, color in DIAGNOSTICOS_BASE:
+                models.Diagnostico.objects.get_or_create(nombre=nombre, defaults={'color_hex': color})
+            # Catálogos SAT: los carga la migración 0026; preguntas del historial:
+            call_command('cargar_preguntas_base', verbosity=0)
+
+    @staticmethod
+    def clonar_desde_plantilla(clinica, verbosity=1):
+        """
+        Crea el schema de la clínica como copia SQL de la plantilla (tablas,
+        datos semilla, django_migrations y secuencias). Devuelve False si la
+        plantilla no está vigente y hay que migrar de la forma normal.
+        """
+        from django.db import connection
+        from django_tenants.clone import CloneSchema
+
+        plantilla = ProvisionamientoTenantService.schema_plantilla()
+        if not ProvisionamientoTenantService.plantilla_vigente():
+            if plantilla and verbosity:
+                logger.warning(
+                    "Plantilla de tenant '%s' ausente o desactualizada; %s se crea con migraciones",
+                    plantilla, clinica.schema_name
+                )
+            return False
+
+        CloneSchema().clone_schema(plantilla, clinica.schema_name, 'DATA')
+        connection.set_schema(clinica.schema_name)
+        try:
+            ProvisionamientoTenantService.reiniciar_secuencias()
+        finally:
+            connection.set_schema_to_public()
+        return True
+
+    @staticmethod
+    def reiniciar_secuencias():
+        """Ajusta las secuencias de las tablas del schema activo al MAX(id) de cada tabla."""
+        from django.apps import apps
+        from django.conf import settings
+        from django.core.management.color import no_style
+        from django.db import connection
+
+        modelos = []
+        for app in settings.TENANT_APPS:
+            try:
+                config = apps.get_app_config(app.rsplit('.', 1)[-1])
+            except LookupError:
+                continue
+            modelos.extend(config.get_models(include_auto_created=True))
+
+        sentencias = connection.ops.sequence_reset_sql(no_style(), modelos)
+        with connection.cursor() as cursor:
+            for sql in sentencias:
+                cursor.execute(sql)
@@ -1,23 +1,38 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, post_init, pre_delete, pre_save, m2m_changed
+from django.conf import settings
 from django.dispatch import receiver
-from .models import Pago, Cita, LoteInsumo, Insumo
+from django.contrib.auth.models import User
+from .models import (
+    Pago, Cita, LoteInsumo, Insumo, Servicio, TratamientoCita, Diagnostico, PerfilDentista,
+    SatFormaPago, SatMetodoPago, SatRegimenFiscal, SatUsoCFDI,
+    ModuloSistema, SubmenuItem, PermisoRol, Especialidad, HorarioLaboral, TipoTrabajoLaboratorio,
+    Paciente, HistorialClinico, RespuestaHistorial, TrabajoLaboratorio, PacienteConsentimiento,
+)
 from . import services
+from . import cache_fragmentos
+from . import cache_http
+from . import imagenes
+from . import recalculos
+from . import tareas
+from .principal import invalidar_principal
+
+# Los recálculos de stock, saldo y resúmenes no se hacen en cada save(): se
+# marcan y core/recalculos.py los ejecuta una vez al confirmar la transacción.
 
 @receiver([post_save, post_delete], sender=LoteInsumo)
 def actualizar_stock_insumo(sender, instance, **kwargs):
     """
     Esta señal se activa cada vez que un LoteInsumo se guarda o elimina.
-    Llama al método del modelo Insumo para recalcular su stock total.
+    Marca el insumo para recalcular su stock total al confirmar la transacción.
     """
-    instance.insumo.actualizar_stock_total()
+    recalculos.marcar_stock(instance.insumo_id)
 
 @receiver([post_save, post_delete], sender=Pago)
 def actualizar_saldo_paciente_pago(sender, instance, **kwargs):
     """
     Actualiza el saldo del paciente cuando se crea, modifica o elimina un pago.
     """
-    if instance.paciente:
-        services.PacienteService.actualizar_saldo_global(instance.paciente)
+    recalculos.marcar_saldo(instance.paciente_id)
 
 @receiver(post_save, sender=Cita)
 def actualizar_saldo_paciente_cita(sender, instance, created, **kwargs):
@@ -25,5 +40,240 @@ def actualizar_saldo_paciente_cita(sender, instance, created, **kwargs):
     Actualiza el saldo del paciente cuando se modifica una cita,
     especialmente cuando cambia a estado 'COM' (Completada).
     """
-    if instance.estado in ['ATN', 'COM'] and instance.paciente_id:
-        services.PacienteService.actualizar_saldo_global(instance.paciente)
+    if instance.estado in ['ATN', 'COM']:
+        recalculos.marcar_saldo(instance.paciente_id)
+
+
+# --- Resúmenes diarios para reportes (ResumenIngresoDiario / ResumenServicioDiario) ---
+# Se guarda el estado previo en post_init (sin consultas, leyendo __dict__) para
+# poder recalcular también la cubeta anterior cuando cambia día o dentista.
+
+def _marcar_ingresos(dia, dentista_id):
+    recalculos.marcar('ingresos_dia', (dia, dentista_id))
+
+
+def _marcar_servicios(dia, dentista_id):
+    recalculos.marcar('servicios_dia', (dia, dentista_id))
+
+
+def _dentista_de_cita(cita_id):
+    if not cita_id:
+        return None
+    return Cita.objects.filter(pk=cita_id).values_list('dentista_id', flat=True).first()
+
+
+@receiver(post_init, sender=Pago)
+def recordar_estado_pago(sender, instance, **kwargs):
+    instance._resumen_previo = (instance.__dict__.get('fecha_pago'), instance.__dict__.get('cita_id'))
+
+
+@receiver([post_save, post_delete], sender=Pago)
+def actualizar_resumen_ingresos(sender, instance, **kwargs):
+    Resumen = services.ResumenReportesService
+    dia = Resumen.dia_local(instance.fecha_pago)
+    _marcar_ingresos(dia, _dentista_de_cita(instance.cita_id))
+
+    fecha_previa, cita_previa = getattr(instance, '_resumen_previo', (None, None))
+    if fecha_previa is not None and (fecha_previa, cita_previa) != (instance.fecha_pago, instance.cita_id):
+        _marcar_ingresos(Resumen.dia_local(fecha_previa), _dentista_de_cita(cita_previa))
+    instance._resumen_previo = (instance.fecha_pago, instance.cita_id)
+
+
+@receiver(post_init, sender=Cita)
+def recordar_estado_cita(sender, instance, **kwargs):
+    instance._resumen_previo = (
+        instance.__dict__.get('fecha_hora'),
+        instance.__dict__.get('dentista_id'),
+        instance.__dict__.get('estado'),
+    )
+
+
+@receiver(post_save, sender=Cita)
+def actualizar_resumenes_cita(sender, instance, created, **kwargs):
+    if created:
+        instance._resumen_previo = (instance.fecha_hora, instance.dentista_id, instance.estado)
+        return
+
+    Resumen = services.ResumenReportesService
+    fecha_previa, dentista_previo, estado_previo = getattr(instance, '_resumen_previo', (None, None, None))
+    actual = (instance.fecha_hora, instance.dentista_id, instance.estado)
+    if (fecha_previa, dentista_previo, estado_previo) == actual:
+        return
+
+    # Servicios vendidos: cubeta actual y anterior
+    _marcar_servicios(Resumen.dia_local(instance.fecha_hora), instance.dentista_id)
+    if fecha_previa is not None and (fecha_previa, dentista_previo) != (instance.fecha_hora, instance.dentista_id):
+        _marcar_servicios(Resumen.dia_local(fecha_previa), dentista_previo)
+
+    # Ingresos: los pagos de la cita cambian de dentista
+    if dentista_previo is not None and dentista_previo != instance.dentista_id:
+        for fecha_pago in instance.pagos.values_list('fecha_pago', flat=True):
+            dia = Resumen.dia_local(fecha_pago)
+            _marcar_ingresos(dia, instance.dentista_id)
+            _marcar_ingresos(dia, dentista_previo)
+
+    instance._resumen_previo = actual
+
+
+@receiver(pre_delete, sender=Cita)
+def recordar_pagos_cita(sender, instance, **kwargs):
+    # Pago.cita es SET_NULL y se actualiza sin señales: los pagos pasan a "sin dentista"
+    instance._resumen_dias_pago = set(
+        services.ResumenReportesService.dia_local(f)
+        for f in instance.pagos.values_list('fecha_pago', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Cita)
+def actualizar_resumenes_cita_eliminada(sender, instance, **kwargs):
+    Resumen = services.ResumenReportesService
+    _marcar_servicios(Resumen.dia_local(instance.fecha_hora), instance.dentista_id)
+    for dia in getattr(instance, '_resumen_dias_pago', ()):
+        _marcar_ingresos(dia, instance.dentista_id)
+        _marcar_ingresos(dia, None)
+
+
+def _marcar_servicios_de_citas(cita_ids):
+    Resumen = services.ResumenReportesService
+    cubetas = set(
+        (Resumen.dia_local(fecha_hora), dentista_id)
+        for fecha_hora, dentista_id in Cita.objects.filter(pk__in=cita_ids).values_list('fecha_hora', 'dentista_id')
+    )
+    for dia, dentista_id in cubetas:
+        _marcar_servicios(dia, dentista_id)
+
+
+@receiver(m2m_changed, sender=TratamientoCita.servicios.through)
+def consumir_insumos_tratamiento(sender, instance, action, reverse, pk_set, **kwargs):
+    """Descuenta (FIFO, en la unidad de la cita) los insumos de los servicios agregados a un tratamiento."""
+    if reverse or action != 'post_add' or not pk_set:
+        return
+    if not getattr(settings, 'CONSUMO_AUTOMATICO_INSUMOS', True):
+        return
+    services.InventarioService.consumir_por_tratamiento(instance, servicio_ids=list(pk_set))
+
+
+@receiver(m2m_changed, sender=TratamientoCita.servicios.through)
+def actualizar_resumen_servicios_tratamiento(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _marcar_servicios_de_citas([instance.cita_id])
+        return
+
+    # Lado inverso: instance es un Servicio y pk_set son tratamientos
+    if action == 'pre_clear':
+        instance._resumen_citas = list(
+            instance.tratamientocita_set.values_list('cita_id', flat=True)
+        )
+    elif action == 'post_clear':
+        _marcar_servicios_de_citas(getattr(instance, '_resumen_citas', []))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        cita_ids = TratamientoCita.objects.filter(pk__in=pk_set).values_list('cita_id', flat=True)
+        _marcar_servicios_de_citas(list(cita_ids))
+
+
+@receiver(post_delete, sender=TratamientoCita)
+def actualizar_resumen_tratamiento_eliminado(sender, instance, **kwargs):
+    # El borrado en cascada de la tabla intermedia no emite m2m_changed
+    _marcar_servicios_de_citas([instance.cita_id])
+
+
+@receiver(post_init, sender=Servicio)
+def recordar_precio_servicio(sender, instance, **kwargs):
+    instance._resumen_precio = instance.__dict__.get('precio')
+
+
+@receiver(post_save, sender=Servicio)
+def revaluar_resumen_servicio(sender, instance, created, **kwargs):
+    precio_previo = getattr(instance, '_resumen_precio', None)
+    if not created and precio_previo is not None and precio_previo != instance.precio:
+        services.ResumenReportesService.revaluar_servicio(instance)
+    instance._resumen_precio = instance.precio
+
+
+# --- Invalidación de fragmentos de plantilla cacheados (ver cache_fragmentos.py) ---
+
+@receiver([post_save, post_delete], sender=ModuloSistema)
+@receiver([post_save, post_delete], sender=SubmenuItem)
+@receiver([post_save, post_delete], sender=PermisoRol)
+@receiver([post_save, post_delete], sender=PerfilDentista)
+def invalidar_fragmento_menu(sender, **kwargs):
+    cache_fragmentos.invalidar('menu')
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidar_menu_por_grupos(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cache_fragmentos.invalidar('menu')
+        if not reverse:
+            invalidar_principal(instance)
+
+
+@receiver([post_save, post_delete], sender=Diagnostico)
+def invalidar_fragmento_diagnosticos(sender, **kwargs):
+    cache_fragmentos.invalidar('diagnosticos')
+
+
+@receiver([post_save, post_delete], sender=SatFormaPago)
+@receiver([post_save, post_delete], sender=SatMetodoPago)
+@receiver([post_save, post_delete], sender=SatRegimenFiscal)
+@receiver([post_save, post_delete], sender=SatUsoCFDI)
+def invalidar_fragmento_sat(sender, **kwargs):
+    cache_fragmentos.invalidar('sat')
+
+
+# --- Versiones de las APIs de catálogos con ETag (ver cache_http.py) ---
+
+@receiver([post_save, post_delete], sender=Diagnostico)
+@receiver([post_save, post_delete], sender=Servicio)
+@receiver([post_save, post_delete], sender=Especialidad)
+@receiver([post_save, post_delete], sender=PerfilDentista)
+@receiver([post_save, post_delete], sender=HorarioLaboral)
+@receiver([post_save, post_delete], sender=TipoTrabajoLaboratorio)
+def invalidar_version_catalogo(sender, **kwargs):
+    cache_http.invalidar(sender)
+
+
+@receiver(m2m_changed, sender=PerfilDentista.especialidades.through)
+@receiver(m2m_changed, sender=Especialidad.especialidades_incluidas.through)
+def invalidar_version_especialidades(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        cache_http.invalidar(Especialidad)
+
+
+# --- Versiones de los datos de las estadísticas de listados (EstadisticasListaService) ---
+
+@receiver([post_save, post_delete], sender=Pago)
+@receiver([post_save, post_delete], sender=Cita)
+@receiver([post_save, post_delete], sender=Paciente)
+@receiver([post_save, post_delete], sender=HistorialClinico)
+@receiver([post_save, post_delete], sender=RespuestaHistorial)
+@receiver([post_save, post_delete], sender=TrabajoLaboratorio)
+def invalidar_version_estadisticas(sender, **kwargs):
+    cache_http.invalidar(sender)
+
+
+
+# --- PDF firmado de los consentimientos (core/consentimientos_pdf.py) ---
+
+@receiver(post_save, sender=PacienteConsentimiento)
+def generar_pdf_consentimiento_firmado(sender, instance, **kwargs):
+    """Al quedar firmado, genera el PDF (base + hoja de firmas) en segundo plano."""
+    if instance.estado == 'FIRMADO' and not instance.documento_firmado:
+        tareas.encolar(
+            tareas.generar_consentimiento_firmado, instance.pk,
+            clave=f'consentimiento_firmado:{instance.pk}'
+        )
+
+
+# --- Normalización de imágenes subidas (core/imagenes.py) ---
+
+def normalizar_imagenes_subidas(sender, instance, **kwargs):
+    """Reduce, limpia y genera derivados de las imágenes recién subidas antes de que se guarden."""
+    for (modelo, campo), perfil in imagenes.CAMPOS.items():
+        if modelo == sender._meta.label:
+            imagenes.procesar_subida(instance, campo, perfil)
+
+
+for _modelo in {modelo for modelo, _ in imagenes.CAMPOS}:
+    pre_save.connect(normalizar_imagenes_subidas, sender=_modelo, dispatch_uid=f'normalizar_imagenes:{_modelo}')
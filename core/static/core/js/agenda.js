@@ -0,0 +1,1118 @@
+/**
+ * AGENDA DE CITAS
+ * Calendario, modal de citas y alta rápida de pacientes.
+ * Las URLs dependientes del tenant llegan en window.AgendaConfig (ver agenda.html).
+ */
+$(document).ready(function() {
+    console.log('Inicializando agenda optimizada...');
+    mostrarLoadingInicial();
+
+    // Esperar un momento para que se carguen completamente las librerías
+    setTimeout(function() {
+        try {
+            initializeModernAgenda();
+        } catch(error) {
+            console.error('Error inicializando agenda:', error);
+            ocultarLoading();
+            alert('Error cargando la agenda. Por favor, recargue la página.');
+        }
+    }, 500);
+});
+
+function mostrarLoadingInicial() {
+    var loadingOverlay = document.getElementById('loading-overlay');
+    if (loadingOverlay) {
+        loadingOverlay.style.display = 'flex';
+    }
+}
+
+function ocultarLoading() {
+    var loadingOverlay = document.getElementById('loading-overlay');
+    if (loadingOverlay) {
+        loadingOverlay.style.display = 'none';
+    }
+}
+
+    // Función para inicializar la agenda moderna (llamada después de cargar librerías)
+    function initializeModernAgenda() {
+        console.log('Inicializando agenda moderna...');
+
+        document.getElementById('debug-text').innerText = 'Inicializando agenda moderna...';
+
+        // Verificar que todas las dependencias estén cargadas
+        if (typeof jQuery === 'undefined') {
+            console.error('jQuery no cargado');
+            showBasicFallback();
+            return;
+        }
+
+        if (typeof FullCalendar === 'undefined') {
+            console.error('FullCalendar no cargado');
+            showBasicFallback();
+            return;
+        }
+
+        // Inicializar variables jQuery
+        var $ = jQuery;
+        var calendarEl = document.getElementById('calendar');
+        var citaModal = new bootstrap.Modal(document.getElementById('citaModal'));
+        var pacienteModal = new bootstrap.Modal(document.getElementById('pacienteModal'));
+        var citaModalEl = document.getElementById('citaModal');
+        var citaForm = document.getElementById('citaForm');
+        var modalTitle = document.getElementById('citaModalLabel');
+        var modalDate = document.getElementById('citaModalDate');
+        var statusIndicator = $('#status-indicator');
+        var statusBadge = document.getElementById('status-badge');
+
+        // Selects
+        var pacienteSelect = $('#id_paciente');
+        var dentistaSelect = $('#id_dentista');
+        var unidadDentalSelect = $('#id_unidad_dental');
+        var horaSelect = $('#id_hora');
+        var serviciosSelect = $('#id_servicios_planeados');
+        var listaServiciosSeleccionados = $('#lista-servicios-seleccionados');
+        var hiddenServiciosInput = $('#id_servicios_seleccionados_hidden');
+
+        var currentCitaId = null;
+
+        try {
+            // Configurar selects nativos (sin Select2 para mayor compatibilidad)
+            // Los selects ya funcionan nativamente
+
+            // ========================================
+            // NUEVO SELECTOR DE SERVICIOS CON BÚSQUEDA
+            // ========================================
+            var serviciosDisponiblesList = $('#servicios-disponibles-list');
+            var listaServiciosSeleccionados = $('#lista-servicios-seleccionados');
+            var searchServiciosInput = $('#search-servicios');
+            var selectedServiciosIds = []; // Array para guardar IDs de servicios seleccionados
+            var allServicios = []; // Cache de todos los servicios
+
+            // Cargar todos los servicios al inicio
+            function loadAllServicios() {
+                allServicios = [];
+                serviciosSelect.find('option').each(function() {
+                    const option = $(this);
+                    const servicioId = option.val();
+                    const servicioNombre = option.text().trim();
+
+                    if (servicioId) {
+                        allServicios.push({
+                            id: servicioId,
+                            nombre: servicioNombre
+                        });
+                    }
+                });
+            }
+
+            // Función para renderizar servicios disponibles (NO seleccionados)
+            function renderServiciosDisponibles(searchTerm = '') {
+                serviciosDisponiblesList.empty();
+
+                const searchLower = searchTerm.toLowerCase();
+                let disponiblesCount = 0;
+
+                allServicios.forEach(function(servicio) {
+                    // Filtrar: solo mostrar NO seleccionados y que coincidan con búsqueda
+                    if (selectedServiciosIds.includes(servicio.id)) {
+                        return; // Ya está seleccionado, no mostrar
+                    }
+
+                    if (searchTerm && !servicio.nombre.toLowerCase().includes(searchLower)) {
+                        return; // No coincide con búsqueda
+                    }
+
+                    disponiblesCount++;
+
+                    const itemDiv = $('<div class="servicio-disponible-item"></div>');
+                    itemDiv.attr('data-servicio-id', servicio.id);
+                    itemDiv.css({
+                        'padding': '8px 12px',
+                        'border-bottom': '1px solid #e9ecef',
+                        'cursor': 'pointer',
+                        'display': 'block',
+                        'transition': 'background-color 0.2s'
+                    });
+                    itemDiv.html(
+                        '<i class="fas fa-plus-circle text-primary me-2"></i>' +
+                        '<span style="font-size: 0.9rem;">' + servicio.nombre + '</span>'
+                    );
+
+                    itemDiv.hover(
+                        function() { $(this).css('background-color', '#d1ecf1'); },
+                        function() { $(this).css('background-color', 'transparent'); }
+                    );
+
+                    serviciosDisponiblesList.append(itemDiv);
+                });
+
+                // Actualizar contador de disponibles
+                $('#disponibles-count').text(disponiblesCount);
+
+                if (disponiblesCount === 0) {
+                    const emptyMsg = $('<div></div>');
+                    emptyMsg.css({
+                        'padding': '20px',
+                        'text-align': 'center',
+                        'color': '#6c757d',
+                        'font-size': '0.85rem'
+                    });
+
+                    if (searchTerm) {
+                        emptyMsg.html('<i class="fas fa-search mb-1"></i><br>No se encontraron servicios');
+                    } else if (selectedServiciosIds.length === allServicios.length) {
+                        emptyMsg.css('color', '#28a745');
+                        emptyMsg.html('<i class="fas fa-check-circle mb-1"></i><br>Todos seleccionados');
+                    } else {
+                        emptyMsg.html('No hay servicios disponibles');
+                    }
+
+                    serviciosDisponiblesList.append(emptyMsg);
+                }
+            }
+
+            // Búsqueda de servicios
+            searchServiciosInput.on('input', function() {
+                const searchTerm = $(this).val();
+                renderServiciosDisponibles(searchTerm);
+            });
+
+            // Click en servicio disponible para agregarlo
+            serviciosDisponiblesList.on('click', '.servicio-disponible-item', function() {
+                const servicioId = String($(this).data('servicio-id')); // Convertir a string
+                addServicio(servicioId);
+            });
+
+            // Función para agregar un servicio
+            function addServicio(servicioId) {
+                servicioId = String(servicioId); // Asegurar que es string
+                if (!selectedServiciosIds.includes(servicioId)) {
+                    selectedServiciosIds.push(servicioId);
+                    updateServiciosList();
+                    renderServiciosDisponibles(searchServiciosInput.val());
+                }
+            }
+
+            // Función para remover un servicio
+            function removeServicio(servicioId) {
+                servicioId = String(servicioId); // Asegurar que es string
+                const index = selectedServiciosIds.indexOf(servicioId);
+                if (index > -1) {
+                    selectedServiciosIds.splice(index, 1);
+                    updateServiciosList();
+                    renderServiciosDisponibles(searchServiciosInput.val());
+                }
+            }
+
+            // Lógica de servicios con select multiple mejorado
+            function updateServiciosList() {
+                // Actualizar contador
+                $('#servicios-count').text(selectedServiciosIds.length);
+
+                // Actualizar el select oculto para envío del formulario
+                serviciosSelect.val(selectedServiciosIds);
+
+                // Limpiar lista
+                listaServiciosSeleccionados.empty();
+
+                if (selectedServiciosIds.length === 0) {
+                    // Mostrar mensaje de placeholder
+                    const emptyMsg = $('<div id="empty-servicios-msg"></div>');
+                    emptyMsg.css({
+                        'padding': '20px',
+                        'text-align': 'center',
+                        'color': '#6c757d',
+                        'font-size': '0.85rem'
+                    });
+                    emptyMsg.html(
+                        '<i class="fas fa-arrow-up mb-2" style="font-size: 1.5rem; display: block;"></i>' +
+                        'Click en servicios arriba para agregar'
+                    );
+                    listaServiciosSeleccionados.append(emptyMsg);
+                } else {
+                    // Renderizar servicios seleccionados
+                    selectedServiciosIds.forEach(function(servicioId) {
+                        const servicio = allServicios.find(s => s.id === servicioId);
+
+                        if (!servicio) {
+                            console.warn('Servicio no encontrado:', servicioId);
+                            return;
+                        }
+
+                        // Crear item con botón para remover
+                        const itemDiv = $('<div class="servicio-seleccionado-item"></div>');
+                        itemDiv.css({
+                            'padding': '8px 12px',
+                            'border-bottom': '1px solid #e9ecef',
+                            'display': 'flex',
+                            'justify-content': 'space-between',
+                            'align-items': 'center',
+                            'background-color': '#ffffff'
+                        });
+                        itemDiv.html(
+                            '<span style="font-size: 0.9rem;">' +
+                            '<i class="fas fa-check-circle text-success me-2"></i>' +
+                            servicio.nombre +
+                            '</span>' +
+                            '<button type="button" class="btn btn-sm btn-danger remove-servicio-btn" data-servicio-id="' + servicioId + '" title="Quitar servicio">' +
+                            '<i class="fas fa-times"></i>' +
+                            '</button>'
+                        );
+                        itemDiv.attr('data-service-id', servicioId);
+                        listaServiciosSeleccionados.append(itemDiv);
+                    });
+                }
+            }
+
+            // Remover servicio al hacer clic en la X
+            listaServiciosSeleccionados.on('click', '.remove-servicio-btn', function(e) {
+                e.preventDefault();
+                const servicioId = $(this).data('servicio-id');
+                removeServicio(servicioId);
+            });
+
+            // NO inicializar aquí - se hará al abrir el modal
+            // loadAllServicios();
+            // renderServiciosDisponibles();
+
+            // ========================================
+            // NUEVO SELECTOR INTELIGENTE DE PACIENTES
+            // ========================================
+            var searchPacienteInput = $('#searchPaciente');
+            var searchResultsDiv = $('#pacienteSearchResults');
+            var searchResultsContent = $('#searchResultsContent');
+            var pacienteSelectedDiv = $('#pacienteSelected');
+            var hiddenPacienteInput = $('#id_paciente');
+            var clearPacienteBtn = $('#clearPacienteBtn');
+            var searchTimeout;
+            var selectedPaciente = null;
+
+            // Función para buscar pacientes
+            function searchPacientes(query) {
+                console.log('Buscando pacientes:', query);
+
+                if (!query || query.length < 2) {
+                    searchResultsDiv.hide();
+                    if (query.length === 0) {
+                        searchResultsContent.html(
+                            '<div class="search-empty-state">' +
+                            '<i class="fas fa-search"></i>' +
+                            '<p class="mb-0">Escribe al menos 2 caracteres para buscar</p>' +
+                            '</div>'
+                        );
+                        searchResultsDiv.show();
+                    }
+                    return;
+                }
+
+                // Mostrar loading
+                searchResultsContent.html(
+                    '<div class="search-loading">' +
+                    '<div class="spinner-border text-primary" role="status">' +
+                    '<span class="visually-hidden">Buscando...</span>' +
+                    '</div>' +
+                    '<p class="mt-2 mb-0 text-muted">Buscando pacientes...</p>' +
+                    '</div>'
+                );
+                searchResultsDiv.show();
+
+                // Hacer petición AJAX
+                const tenantPrefix = AgendaConfig.tenantPrefix;
+                const apiUrl = tenantPrefix ? `${tenantPrefix}/api/pacientes/` : '/api/pacientes/';
+
+                $.ajax({
+                    url: apiUrl,
+                    data: { q: query, limit: 20 },
+                    success: function(response) {
+                        console.log('Resultados:', response);
+
+                        if (!response.success || response.pacientes.length === 0) {
+                            searchResultsContent.html(
+                                '<div class="search-empty-state">' +
+                                '<i class="fas fa-user-slash"></i>' +
+                                '<p class="mb-0">No se encontraron pacientes</p>' +
+                                '<small class="text-muted">Intenta con otro término o crea un nuevo paciente</small>' +
+                                '</div>'
+                            );
+                            return;
+                        }
+
+                        // Renderizar resultados
+                        var html = '';
+                        response.pacientes.forEach(function(paciente) {
+                            var badges = '';
+
+                            // Badge de saldo
+                            if (paciente.saldo_global > 0) {
+                                badges += `<span class="badge bg-danger">💰 $${paciente.saldo_global.toFixed(2)}</span>`;
+                            }
+
+                            // Badge de historial
+                            if (paciente.tiene_historial) {
+                                badges += '<span class="badge bg-success">✅ Historial</span>';
+                            } else {
+                                badges += '<span class="badge bg-warning text-dark">⏳ Sin Historial</span>';
+                            }
+
+                            // Badge de portal
+                            if (paciente.tiene_acceso_portal) {
+                                badges += '<span class="badge bg-info">🔐 Portal</span>';
+                            }
+
+                            var edadText = paciente.edad ? `${paciente.edad} años` : 'Edad no registrada';
+
+                            html += `
+                                <div class="patient-search-item" data-paciente-id="${paciente.id}" data-paciente='${JSON.stringify(paciente)}'>
+                                    <div class="patient-search-name">
+                                        <i class="fas fa-user-circle text-primary"></i> ${paciente.nombre_completo}
+                                    </div>
+                                    <div class="patient-search-info">
+                                        <span><i class="fas fa-envelope"></i> ${paciente.email}</span>
+                                        ${paciente.telefono ? `<span><i class="fas fa-phone"></i> ${paciente.telefono}</span>` : ''}
+                                        <span><i class="fas fa-birthday-cake"></i> ${edadText}</span>
+                                    </div>
+                                    <div class="patient-search-badges">
+                                        ${badges}
+                                    </div>
+                                </div>
+                            `;
+                        });
+
+                        searchResultsContent.html(html);
+
+                        // Agregar evento de clic a cada resultado
+                        $('.patient-search-item').on('click', function() {
+                            var pacienteData = $(this).data('paciente');
+                            selectPaciente(pacienteData);
+                        });
+                    },
+                    error: function(xhr) {
+                        console.error('Error en búsqueda:', xhr);
+                        searchResultsContent.html(
+                            '<div class="search-empty-state text-danger">' +
+                            '<i class="fas fa-exclamation-triangle"></i>' +
+                            '<p class="mb-0">Error al buscar pacientes</p>' +
+                            '<small>Por favor, intenta de nuevo</small>' +
+                            '</div>'
+                        );
+                    }
+                });
+            }
+
+            // Función para seleccionar un paciente
+            function selectPaciente(paciente) {
+                console.log('Paciente seleccionado:', paciente);
+
+                selectedPaciente = paciente;
+                hiddenPacienteInput.val(paciente.id);
+
+                // Mostrar tarjeta de paciente seleccionado
+                $('#selectedPacienteNombre').text(paciente.nombre_completo);
+                $('#selectedPacienteEmail').text(paciente.email);
+                $('#selectedPacienteTelefono').text(paciente.telefono || 'No registrado');
+
+                // Badges
+                var badges = '';
+                if (paciente.saldo_global > 0) {
+                    badges += `<span class="badge bg-danger">Saldo: $${paciente.saldo_global.toFixed(2)}</span> `;
+                }
+                if (paciente.tiene_historial) {
+                    badges += '<span class="badge bg-success">✅ Historial Completo</span> ';
+                } else {
+                    badges += '<span class="badge bg-warning text-dark">⚠️ Historial Pendiente</span> ';
+                }
+
+                $('#selectedPacienteBadges').html(badges);
+
+                // Mostrar/ocultar elementos
+                pacienteSelectedDiv.show();
+                searchResultsDiv.hide();
+                searchPacienteInput.val('').prop('disabled', true);
+            }
+
+            // Función para limpiar selección
+            function clearPacienteSelection() {
+                selectedPaciente = null;
+                hiddenPacienteInput.val('');
+                pacienteSelectedDiv.hide();
+                searchPacienteInput.val('').prop('disabled', false).focus();
+            }
+
+            // Event listeners para el buscador
+            searchPacienteInput.on('input', function() {
+                clearTimeout(searchTimeout);
+                var query = $(this).val().trim();
+
+                searchTimeout = setTimeout(function() {
+                    searchPacientes(query);
+                }, 300); // Delay de 300ms para evitar muchas peticiones
+            });
+
+            searchPacienteInput.on('focus', function() {
+                if ($(this).val().length >= 2) {
+                    searchResultsDiv.show();
+                }
+            });
+
+            // Cerrar resultados al hacer clic fuera
+            $(document).on('click', function(e) {
+                if (!$(e.target).closest('#searchPaciente, #pacienteSearchResults').length) {
+                    searchResultsDiv.hide();
+                }
+            });
+
+            // Botón para limpiar selección
+            clearPacienteBtn.on('click', clearPacienteSelection);
+
+            // Lógica de pacientes
+            $('#addPacienteBtn').on('click', function(){
+                $('#pacienteFormInline')[0].reset();
+                $('#paciente-errors').addClass('d-none').empty();
+                pacienteModal.show();
+            });
+
+            $('#pacienteFormInline').on('submit', function(e){
+                e.preventDefault();
+                const csrftoken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+                const payload = {
+                    nombre: this.nombre.value,
+                    apellido: this.apellido.value,
+                    email: this.email.value,
+                    telefono: this.telefono.value,
+                    fecha_nacimiento: this.fecha_nacimiento.value
+                };
+                fetch(AgendaConfig.urls.crearPaciente, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json', 'X-CSRFToken': csrftoken },
+                    body: JSON.stringify(payload)
+                }).then(r => r.json()).then(data => {
+                    if (data.success) {
+                        // Usar el nuevo selector inteligente
+                        var nuevoPaciente = {
+                            id: data.paciente_id,
+                            nombre_completo: data.paciente_nombre,
+                            email: payload.email,
+                            telefono: payload.telefono || '',
+                            edad: null,
+                            saldo_global: 0,
+                            tiene_historial: false,
+                            tiene_acceso_portal: false
+                        };
+
+                        selectPaciente(nuevoPaciente);
+                        pacienteModal.hide();
+                        Toastify({ text: data.message, duration: 3000, className: 'info' }).showToast();
+                    } else {
+                        $('#paciente-errors').removeClass('d-none').text(data.error || 'Error al crear paciente');
+                    }
+                }).catch(() => {
+                    $('#paciente-errors').removeClass('d-none').text('Error de red al crear paciente');
+                });
+            });
+
+            // Configuración del calendario para FullCalendar 5.x
+            var calendar = new FullCalendar.Calendar(calendarEl, {
+                initialView: 'dayGridMonth',
+                locale: 'es',
+                height: 'auto',
+                headerToolbar: {
+                    left: 'prev,next today',
+                    center: 'title',
+                    right: 'dayGridMonth,timeGridWeek,timeGridDay'
+                },
+                events: function(fetchInfo, successCallback, failureCallback) {
+                    mostrarLoading();
+                    fetch(AgendaConfig.urls.eventos + '?' + new URLSearchParams({
+                        dentista: $('#dentistaFilter').val() || '',
+                        estado: $('#estadoFilter').val() || '',
+                        start: fetchInfo.startStr,
+                        end: fetchInfo.endStr
+                    }))
+                    .then(async (response) => {
+                        if (!response.ok) throw new Error('HTTP ' + response.status);
+                        const ct = (response.headers.get('content-type') || '').toLowerCase();
+                        if (!ct.includes('application/json')) {
+                            const text = await response.text();
+                            throw new Error('Invalid JSON: ' + text.slice(0, 200));
+                        }
+                        return response.json();
+                    })
+                    .then(data => {
+                        ocultarLoading();
+                        // Mapear estado desde extendedProps y aplicar clase
+                        const events = data.map(event => {
+                            const estado = (event.extendedProps && event.extendedProps.estado) ? event.extendedProps.estado : 'PRO';
+                            return { ...event, className: 'cita-' + estado.toLowerCase(), estado };
+                        });
+                        actualizarEstadisticas(events);
+                        successCallback(events);
+                    })
+                    .catch(error => {
+                        ocultarLoading();
+                        console.error('Error cargando eventos:', error);
+                        failureCallback(error);
+                    });
+                },
+                selectable: true,
+                editable: true,
+                eventDidMount: function(info) {
+                    // Tooltip mejorado
+                    info.el.title = `${info.event.title}\nEstado: ${info.event.extendedProps.estado_display}\nHora: ${info.event.start.toLocaleTimeString('es-ES', {hour: '2-digit', minute:'2-digit'})}`;
+                },
+
+                dateClick: function(info) {
+                    console.log('Date clicked:', info.dateStr);
+                    openNewAppointmentModal(info.dateStr);
+                },
+
+                eventClick: function(info) {
+                    editAppointment(info.event.id);
+                },
+
+                datesSet: function(dateInfo) {
+                    // Se ejecuta cuando cambia la vista
+                    actualizarFiltroFecha(dateInfo.start);
+                }
+            });
+
+            // Funciones para loading
+            function mostrarLoading() {
+                $('#loading-overlay').show();
+            }
+
+            function ocultarLoading() {
+                $('#loading-overlay').hide();
+            }
+
+            // Función para actualizar estadísticas
+            function actualizarEstadisticas(events) {
+                const hoy = new Date().toDateString();
+                const inicioSemana = new Date();
+                inicioSemana.setDate(inicioSemana.getDate() - inicioSemana.getDay());
+
+                const stats = {
+                    hoy: 0,
+                    semana: 0,
+                    pendientes: 0,
+                    completadas: 0,
+                    canceladas: 0,
+                    total: events.length
+                };
+
+                events.forEach(event => {
+                    const eventDate = new Date(event.start);
+
+                    // Estadísticas por fecha
+                    if (eventDate.toDateString() === hoy) {
+                        stats.hoy++;
+                    }
+
+                    if (eventDate >= inicioSemana) {
+                        stats.semana++;
+                    }
+
+                    // Estadísticas por estado
+                    switch(event.estado) {
+                        case 'PRO':
+                        case 'CON':
+                            stats.pendientes++;
+                            break;
+                        case 'COM':
+                            stats.completadas++;
+                            break;
+                        case 'CAN':
+                            stats.canceladas++;
+                            break;
+                    }
+                });
+
+                // Actualizar DOM
+                $('#stat-hoy').text(stats.hoy);
+                $('#stat-semana').text(stats.semana);
+                $('#stat-pendientes').text(stats.pendientes);
+                $('#stat-completadas').text(stats.completadas);
+                $('#stat-canceladas').text(stats.canceladas);
+                $('#stat-total').text(stats.total);
+            }
+
+            // Filtros
+            $('#dentistaFilter, #estadoFilter').on('change', function() {
+                calendar.refetchEvents();
+            });
+
+            $('#fechaFilter').on('change', function() {
+                const selectedDate = this.value;
+                if (selectedDate) {
+                    calendar.gotoDate(selectedDate);
+                }
+            });
+
+            // Función para limpiar filtros
+            window.limpiarFiltros = function() {
+                $('#dentistaFilter').val('');
+                $('#estadoFilter').val('');
+                $('#fechaFilter').val('');
+                calendar.today();
+                calendar.refetchEvents();
+            };
+
+            // Actualizar filtro de fecha cuando cambia la vista
+            function actualizarFiltroFecha(date) {
+                const fechaStr = date.toISOString().split('T')[0];
+                $('#fechaFilter').val(fechaStr);
+            }
+
+            // Funciones auxiliares - MUST BE DEFINED BEFORE CALENDAR INIT
+            function openNewAppointmentModal(dateStr) {
+                console.log('=== OPENING NEW APPOINTMENT MODAL ===');
+                console.log('dateStr received:', dateStr);
+
+                citaForm.reset();
+                currentCitaId = null;
+                modalTitle.textContent = 'Nueva Cita';
+
+                const fechaPickerContainer = $('#fecha-picker-container');
+                const fechaPickerInput = $('#id_fecha_cita');
+
+                if (dateStr) {
+                    // Fecha proporcionada desde calendario - usar directamente el string YYYY-MM-DD
+                    console.log('Processing date from calendar:', dateStr);
+
+                    // Parsear la fecha manualmente para evitar problemas de zona horaria
+                    const [year, month, day] = dateStr.split('-').map(Number);
+                    const selectedDate = new Date(year, month - 1, day);
+
+                    console.log('Parsed date object:', selectedDate);
+
+                    // Guardar la fecha en formato ISO (YYYY-MM-DD) en el dataset del form
+                    citaForm.dataset.selectedDate = dateStr;
+
+                    // Mostrar la fecha formateada en el modal
+                    const dateDisplay = selectedDate.toLocaleDateString('es-ES', {
+                        weekday: 'long',
+                        year: 'numeric',
+                        month: 'long',
+                        day: 'numeric'
+                    });
+                    modalDate.textContent = '📅 ' + dateDisplay;
+
+                    fechaPickerContainer.hide();
+                    console.log('Date successfully saved in form dataset:', citaForm.dataset.selectedDate);
+                } else {
+                    // Sin fecha - mostrar selector
+                    console.log('No date provided - showing date picker');
+                    modalDate.textContent = 'Seleccione la fecha de la cita';
+                    citaForm.dataset.selectedDate = '';
+                    fechaPickerContainer.show();
+                    // Set min date to today
+                    const today = new Date().toISOString().split('T')[0];
+                    fechaPickerInput.attr('min', today);
+                }
+
+                // Limpiar selector de pacientes
+                clearPacienteSelection();
+
+                dentistaSelect.val('');
+                unidadDentalSelect.val('');
+                horaSelect.empty().append('<option value="">Primero seleccione fecha y dentista</option>').prop('disabled', true);
+
+                // Limpiar servicios y buscador
+                selectedServiciosIds = [];
+                searchServiciosInput.val('');
+
+                // Recargar servicios desde el select actual
+                loadAllServicios();
+
+                updateServiciosList();
+                renderServiciosDisponibles();
+
+                statusIndicator.hide();
+                $('#editarCitaBtn').hide();
+                $('#cancelarCitaBtn').hide();
+                $('#guardarCitaBtn').show();
+                citaModal.show();
+            }
+
+            // Manejar cambio en el selector de fecha manual
+            $('#id_fecha_cita').on('change', function() {
+                const selectedDate = $(this).val();
+                if (selectedDate) {
+                    citaForm.dataset.selectedDate = selectedDate;
+                    const date = new Date(selectedDate + 'T00:00:00');
+                    modalDate.textContent = '📅 ' + date.toLocaleDateString('es-ES', { weekday: 'long', year: 'numeric', month: 'long', day: 'numeric' });
+                    console.log('Manual date selected:', selectedDate);
+
+                    // Si ya hay dentista seleccionado, cargar horarios
+                    const dentistaId = dentistaSelect.val();
+                    if (dentistaId) {
+                        loadAvailableHours(dentistaId, selectedDate);
+                    }
+                }
+            });
+
+            window.openNewAppointmentModal = openNewAppointmentModal;
+
+            function editAppointment(citaId) {
+                currentCitaId = citaId;
+                modalTitle.textContent = 'Editar Cita';
+
+                // Cargar datos de la cita
+                // Build tenant-aware API URL
+                const tenantPrefix = AgendaConfig.tenantPrefix;
+                const citaApiUrl = tenantPrefix ? `${tenantPrefix}/api/citas/${citaId}/` : `/api/citas/${citaId}/`;
+                fetch(citaApiUrl)
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.success) {
+                            const cita = data.cita;
+
+                            // Llenar formulario
+                            pacienteSelect.val(cita.paciente_id);
+                            dentistaSelect.val(cita.dentista_id).trigger('change');
+                            unidadDentalSelect.val(cita.unidad_dental_id);
+
+                            // Formatear fecha para el modal
+                            const fecha = new Date(cita.fecha_hora);
+                            modalDate.textContent = fecha.toLocaleDateString('es-ES', { 
+                                weekday: 'long', 
+                                year: 'numeric', 
+                                month: 'long', 
+                                day: 'numeric' 
+                            });
+
+                            // Cargar horarios y seleccionar la hora
+                            setTimeout(() => {
+                                horaSelect.val(fecha.toTimeString().substr(0, 5));
+                            }, 500);
+
+                            $('#id_motivo').val(cita.motivo || '');
+                            $('#id_notas').val(cita.notas || '');
+
+                            // Mostrar estado
+                            updateStatusBadge(cita.estado);
+                            statusIndicator.show();
+
+                            // Cargar servicios
+                            loadSelectedServices(cita.servicios_planeados || []);
+
+                            $('#editarCitaBtn, #cancelarCitaBtn').show();
+                            $('#guardarCitaBtn').text('Actualizar');
+                        }
+                    })
+                    .catch(error => {
+                        console.error('Error cargando cita:', error);
+                        alert('Error al cargar los datos de la cita');
+                    });
+
+                citaModal.show();
+            }
+
+            function updateStatusBadge(estado) {
+                const estados = {
+                    'PRO': { text: 'Programada', class: 'bg-secondary' },
+                    'CON': { text: 'Confirmada', class: 'bg-primary' },
+                    'ATN': { text: 'Atendida', class: 'bg-warning' },
+                    'COM': { text: 'Completada', class: 'bg-success' },
+                    'CAN': { text: 'Cancelada', class: 'bg-danger' }
+                };
+
+                const estadoInfo = estados[estado] || { text: estado, class: 'bg-secondary' };
+                statusBadge.textContent = estadoInfo.text;
+                statusBadge.className = 'badge rounded-pill ' + estadoInfo.class;
+            }
+
+            function loadSelectedServices(servicios) {
+                listaServiciosSeleccionados.empty();
+                serviciosSelect.find('option').prop('disabled', false);
+
+                servicios.forEach(servicio => {
+                    const li = '<li class="list-group-item list-group-item-sm py-1 px-2 d-flex justify-content-between align-items-center" data-service-id="' + servicio.id + '">' +
+                                '<span>' + servicio.nombre + '</span>' +
+                                '<button type="button" class="btn-close remove-service-btn" aria-label="Eliminar"></button>' +
+                            '</li>';
+                    listaServiciosSeleccionados.append(li);
+                    serviciosSelect.find('option[value="' + servicio.id + '"]').prop('disabled', true);
+                });
+
+                updateHiddenInput();
+            }
+
+            // Manejo de cambio de estado
+            $('.change-status-btn').on('click', function(e) {
+                e.preventDefault();
+                const nuevoEstado = $(this).data('estado');
+
+                if (!currentCitaId) return;
+
+                fetch('/citas/' + currentCitaId + '/estado/', {
+                    method: 'POST',
+                    headers: {
+                        'Content-Type': 'application/json',
+                        'X-CSRFToken': $('[name=csrfmiddlewaretoken]').val()
+                    },
+                    body: JSON.stringify({ estado: nuevoEstado })
+                })
+                .then(response => response.json())
+                .then(data => {
+                    if (data.success) {
+                        updateStatusBadge(nuevoEstado);
+                        calendar.refetchEvents();
+
+                        if (typeof Toastify !== 'undefined') {
+                            Toastify({ 
+                                text: 'Estado actualizado', 
+                                duration: 3000, 
+                                className: 'info' 
+                            }).showToast();
+                        }
+                    }
+                });
+            });
+
+            // REMOVED: Duplicate dentista change handler - using the one at line 1032
+
+            console.log('Agenda moderna inicializada correctamente');
+            ocultarLoading();
+
+            // Event listeners
+            dentistaSelect.on('change', function() {
+                const dentistaId = $(this).val();
+                const selectedDate = citaForm.dataset.selectedDate;
+                console.log('=== DENTISTA CHANGED ==>');
+                console.log('  Dentista ID:', dentistaId);
+                console.log('  Selected Date:', selectedDate);
+                console.log('  Form dataset:', citaForm.dataset);
+
+                // Recargar servicios (pueden cambiar según el dentista)
+                console.log('  -> Reloading services for dentista:', dentistaId);
+                loadAllServicios();
+                renderServiciosDisponibles(searchServiciosInput.val());
+
+                if (dentistaId && selectedDate) {
+                    console.log('  -> Loading hours for', dentistaId, 'on', selectedDate);
+                    horaSelect.prop('disabled', false);
+                    loadAvailableHours(dentistaId, selectedDate);
+                } else if (!selectedDate) {
+                    console.warn('  -> No date selected');
+                    horaSelect.empty().append('<option value="">Seleccione una fecha primero</option>').prop('disabled', true);
+                } else {
+                    console.warn('  -> No dentista selected');
+                    horaSelect.empty().append('<option value="">Seleccione dentista</option>').prop('disabled', true);
+                }
+            });
+
+            function loadAvailableHours(dentistaId, fecha, selectedHour) {
+                console.log('Loading hours for dentista:', dentistaId, 'fecha:', fecha);
+                horaSelect.empty().append('<option value="">Cargando...</option>').prop('disabled', true);
+
+                // Build URL with tenant prefix from request
+                const tenantPrefix = AgendaConfig.tenantPrefix;
+                const baseUrl = tenantPrefix ? `${tenantPrefix}/api/dentista/${dentistaId}/horarios-disponibles/` : `/api/dentista/${dentistaId}/horarios-disponibles/`;
+
+                console.log('Tenant prefix:', tenantPrefix);
+                console.log('Fetching from URL:', baseUrl, 'with params:', { fecha: fecha });
+
+                $.ajax({
+                    url: baseUrl,
+                    data: { fecha: fecha },
+                    success: function(response) {
+                        console.log('Hours loaded successfully:', response);
+                        horaSelect.empty().append('<option value="">Seleccione horario</option>');
+                        let opciones = response.horarios_disponibles || [];
+
+                        // Filtro adicional en frontend para el día actual (respaldo)
+                        try {
+                            const hoyStr = new Date().toISOString().split('T')[0];
+                            if (fecha === hoyStr) {
+                                const now = new Date();
+                                const minutosActual = now.getHours() * 60 + now.getMinutes();
+                                opciones = opciones.filter(h => {
+                                    const [hh, mm] = h.split(':').map(Number);
+                                    return (hh * 60 + mm) >= minutosActual;
+                                });
+                            }
+                        } catch (_e) {}
+
+                        if (opciones.length === 0) {
+                            horaSelect.empty().append('<option value="">No hay horarios disponibles</option>');
+                            horaSelect.prop('disabled', true);
+                            return;
+                        }
+
+                        if (selectedHour && opciones.indexOf(selectedHour) === -1) {
+                            opciones.unshift(selectedHour);
+                        }
+                        opciones.forEach(function(h) { horaSelect.append('<option value="' + h + '\">' + h + '</option>'); });
+                        if (selectedHour) horaSelect.val(selectedHour);
+                        horaSelect.prop('disabled', false);
+                    },
+                    error: function(xhr, status, error) { 
+                        console.error('Error loading hours:', xhr.status, status, error);
+                        console.error('Response:', xhr.responseText);
+                        horaSelect.empty().append('<option value="">Error al cargar horarios</option>');
+                        horaSelect.prop('disabled', true);
+
+                        // Show user-friendly error
+                        if (xhr.status === 401) {
+                            Toastify({ text: 'Su sesión ha expirado. Por favor, recargue la página e inicie sesión.', duration: 5000, className: 'error' }).showToast();
+                            setTimeout(function() {
+                                window.location.href = AgendaConfig.urls.login + "?next=" + encodeURIComponent(window.location.pathname);
+                            }, 3000);
+                        } else if (xhr.status === 404) {
+                            Toastify({ text: 'Dentista no encontrado', duration: 3000, className: 'error' }).showToast();
+                        } else if (xhr.status === 500) {
+                            Toastify({ text: 'Error del servidor al cargar horarios', duration: 3000, className: 'error' }).showToast();
+                        }
+                    }
+                });
+            }
+
+            // Form submission
+            citaForm.addEventListener('submit', function(e) {
+                e.preventDefault();
+                submitAppointmentForm();
+            });
+
+            function submitAppointmentForm() {
+                // Validación personalizada antes de enviar
+                const selectedDate = citaForm.dataset.selectedDate;
+                const selectedTime = horaSelect.val();
+                const selectedPaciente = $('#id_paciente').val();
+
+                // Validar campos obligatorios
+                if (!selectedPaciente) {
+                    Toastify({ text: 'Por favor seleccione un paciente', duration: 3000, className: 'error' }).showToast();
+                    return;
+                }
+
+                if (!selectedDate) {
+                    Toastify({ text: 'Por favor seleccione una fecha desde el calendario', duration: 3000, className: 'error' }).showToast();
+                    return;
+                }
+
+                if (!selectedTime) {
+                    Toastify({ text: 'Por favor seleccione una hora', duration: 3000, className: 'error' }).showToast();
+                    return;
+                }
+
+                if (selectedServiciosIds.length === 0) {
+                    Toastify({ text: 'Por favor seleccione al menos un servicio', duration: 3000, className: 'error' }).showToast();
+                    return;
+                }
+
+                const formData = new FormData(citaForm);
+                const url = currentCitaId ? '/citas/' + currentCitaId + '/update/' : AgendaConfig.urls.citaCreate;
+                const csrftoken = document.querySelector('[name=csrfmiddlewaretoken]').value;
+
+                formData.append('csrfmiddlewaretoken', csrftoken);
+
+                const localDateTime = selectedDate + 'T' + selectedTime + ':00';
+                formData.append('fecha_hora', localDateTime);
+
+                $.ajax({
+                    url: url,
+                    method: 'POST',
+                    data: formData,
+                    processData: false,
+                    contentType: false,
+                    headers: { "X-CSRFToken": csrftoken },
+                    success: function(response) {
+                        if (response.success) {
+                            citaModal.hide();
+                            Toastify({ text: response.message, duration: 3000, className: 'info' }).showToast();
+                            calendar.refetchEvents();
+                        } else {
+                            showFormErrors(response.errors);
+                        }
+                    },
+                    error: function(xhr) {
+                        console.error('Error al guardar cita:', xhr.status, xhr.responseJSON);
+
+                        if (xhr.status === 403) {
+                            Toastify({ text: 'Su sesión ha expirado. Redirigiendo...', duration: 3000, className: 'error' }).showToast();
+                            setTimeout(function() { window.location.href = AgendaConfig.urls.login + "?next=" + encodeURIComponent(window.location.pathname); }, 2000);
+                        } else if (xhr.status === 400 && xhr.responseJSON) {
+                            // Error de validación - mostrar errores específicos
+                            if (xhr.responseJSON.errors) {
+                                showFormErrors(xhr.responseJSON.errors);
+                            } else if (xhr.responseJSON.error) {
+                                Toastify({ text: xhr.responseJSON.error, duration: 5000, className: 'error' }).showToast();
+                            } else {
+                                Toastify({ text: 'Error de validación. Revisa los datos ingresados.', duration: 5000, className: 'error' }).showToast();
+                            }
+                        } else {
+                            Toastify({ text: 'Error de comunicación con el servidor.', duration: 3000, className: 'error' }).showToast();
+                        }
+                    }
+                });
+            }
+
+            function showFormErrors(errors) {
+                const formErrorsDiv = $('#form-errors');
+                formErrorsDiv.html('<h6>Por favor, corrige los siguientes errores:</h6><ul></ul>').show();
+                const errorList = formErrorsDiv.find('ul');
+                if (typeof errors === 'object' && errors !== null) {
+                    for (const field in errors) {
+                        errors[field].forEach(function(error) {
+                            let fieldName = field.replace(/_/g, ' ');
+                            fieldName = fieldName.charAt(0).toUpperCase() + fieldName.slice(1);
+                            errorList.append('<li><strong>' + fieldName + ':</strong> ' + error + '</li>');
+                        });
+                    }
+                } else {
+                    errorList.append('<li>Error desconocido.</li>');
+                }
+            }
+
+            document.getElementById('debug-text').innerText = 'Renderizando calendario...';
+            calendar.render();
+
+            document.getElementById('debug-text').innerText = 'Calendario moderno cargado exitosamente!';
+
+            // Ocultar debug después de 3 segundos
+            setTimeout(function() {
+                document.getElementById('debug-info').style.display = 'none';
+            }, 3000);
+
+        } catch (error) {
+            console.error('Error creando calendario:', error);
+            document.getElementById('debug-text').innerText = 'Error: ' + error.message;
+            showBasicFallback();
+            return;
+        }
+    }
+
+    // Función para mostrar fallback básico cuando falla el calendario moderno
+    function showBasicFallback() {
+        console.log('Mostrando fallback básico');
+        var calendarEl = document.getElementById('calendar');
+
+        calendarEl.innerHTML = 
+            '<div class="alert alert-warning">' +
+            '<h4><i class="fas fa-exclamation-triangle"></i> Calendario No Disponible</h4>' +
+            '<p>El calendario avanzado no se puede cargar en este dispositivo.</p>' +
+            '<p><strong>Opciones disponibles:</strong></p>' +
+            '</div>' +
+            '<div class="row">' +
+            '<div class="col-md-6 mb-3">' +
+            '<div class="card">' +
+            '<div class="card-body text-center">' +
+            '<i class="fas fa-plus-circle fa-3x text-primary mb-3"></i>' +
+            '<h5>Gestionar Citas</h5>' +
+            '<p>Ver y gestionar todas las citas</p>' +
+            '<a href="' + AgendaConfig.urls.citaList + '" class="btn btn-primary btn-lg">Ir a Lista de Citas</a>' +
+            '</div>' +
+            '</div>' +
+            '</div>' +
+            '<div class="col-md-6 mb-3">' +
+            '<div class="card">' +
+            '<div class="card-body text-center">' +
+            '<i class="fas fa-list fa-3x text-success mb-3"></i>' +
+            '<h5>Calendario Simplificado</h5>' +
+            '<p>Versión compatible con dispositivos antiguos</p>' +
+            '<a href="' + AgendaConfig.urls.agendaLegacy + '" class="btn btn-success btn-lg">Usar Versión Simple</a>' +
+            '</div>' +
+            '</div>' +
+            '</div>' +
+            '</div>';
+    }
@@ -0,0 +1,460 @@
+/**
+ * GESTIONAR CITA
+ * Cambios de estado, registro de tratamientos y acciones rápidas.
+ * Usa window.CitaManageConfig (ver cita_manage.html).
+ */
+(function(){
+  const msg = document.getElementById('cita-action-msg');
+  function showMsg(text, ok=true){
+    msg.classList.remove('d-none','alert-success','alert-danger');
+    msg.classList.add(ok ? 'alert-success' : 'alert-danger');
+    msg.textContent = text;
+  }
+  function getCookie(name){
+    const value = `; ${document.cookie}`;
+    const parts = value.split(`; ${name}=`);
+    if (parts.length === 2) return parts.pop().split(';').shift();
+  }
+  function getCSRF(){
+    return document.querySelector('[name=csrfmiddlewaretoken]')?.value || getCookie('csrftoken') || '';
+  }
+  function activateTab(target){
+    try {
+      const btn = document.querySelector(`[data-bs-target="${target}"]`);
+      if (btn && window.bootstrap && bootstrap.Tab){
+        new bootstrap.Tab(btn).show();
+      } else if (btn) { btn.click(); }
+    } catch(_e){}
+  }
+  function cambiarEstado(estado){
+    const csrftoken = getCSRF();
+    fetch(CitaManageConfig.urls.cambiarEstado, {
+      method: 'POST',
+      headers: { 'X-CSRFToken': csrftoken, 'X-Requested-With':'XMLHttpRequest', 'Accept':'application/json' },
+      body: new URLSearchParams({ estado })
+    }).then(async r => {
+      if (!r.ok) throw new Error('HTTP '+r.status);
+      return r.json();
+    }).then(data => {
+      if (data.success){
+        showMsg(data.message, true);
+        document.getElementById('cita-estado').textContent = estadoMap[estado] || estado;
+        // Flujos asociados
+        if (estado === 'ATN') {
+          activateTab('#tratamientos');
+          document.getElementById('descripcion')?.focus();
+        }
+        if (estado === 'COM') {
+          activateTab('#pagos');
+        }
+        if (estado === 'CAN') {
+          // Deshabilitar acciones
+          ['pro','con','atn','com','can'].forEach(s=>{ const b=document.getElementById('btn-'+s); if(b) b.disabled=true; });
+        }
+      } else {
+        showMsg(data.error || 'Error al cambiar estado', false);
+      }
+    }).catch((e) => showMsg('Error de red', false));
+  }
+  const estadoMap = { PRO:'Programada', CON:'Confirmada', ATN:'Atendida', COM:'Completada', CAN:'Cancelada' };
+  ['pro','con','atn','com','can'].forEach(suf=>{
+    const btn = document.getElementById('btn-'+suf);
+    if (btn){ btn.addEventListener('click', function(){ cambiarEstado(this.dataset.estado); }); }
+  });
+
+  // Manejar checkbox de seguimiento
+  const seguimientoCheck = document.getElementById('requiere_seguimiento');
+  const fechaSeguimientoContainer = document.getElementById('fecha-seguimiento-container');
+
+  if (seguimientoCheck && fechaSeguimientoContainer) {
+    seguimientoCheck.addEventListener('change', function() {
+      fechaSeguimientoContainer.style.display = this.checked ? 'block' : 'none';
+      if (this.checked) {
+        // Sugerir fecha de seguimiento en 7 días
+        const fechaSugerida = new Date();
+        fechaSugerida.setDate(fechaSugerida.getDate() + 7);
+        document.getElementById('fecha_seguimiento').value = fechaSugerida.toISOString().split('T')[0];
+      }
+    });
+  }
+
+  // Manejar formulario de tratamiento
+  const formTratamiento = document.getElementById('form-tratamiento');
+  if (formTratamiento) {
+    formTratamiento.addEventListener('submit', function(e) {
+      e.preventDefault();
+
+      // Deshabilitar botón para evitar doble envío
+      const submitBtn = this.querySelector('button[type="submit"]');
+      const originalText = submitBtn.innerHTML;
+      submitBtn.disabled = true;
+      submitBtn.innerHTML = '<i class="bi bi-clock"></i> Guardando...';
+
+      const formData = new FormData(this);
+      const csrftoken = getCSRF();
+
+      fetch(CitaManageConfig.urls.gestionar, {
+        method: 'POST',
+        headers: {
+          'X-CSRFToken': csrftoken,
+          'X-Requested-With': 'XMLHttpRequest',
+          'Accept':'application/json'
+        },
+        body: formData
+      })
+      .then(async r => { if(!r.ok) throw new Error('HTTP '+r.status); return r.json(); })
+      .then(data => {
+        if (data.success) {
+          showMsg(data.message, true);
+          // Limpiar formulario
+          this.reset();
+          fechaSeguimientoContainer && (fechaSeguimientoContainer.style.display = 'none');
+          // Recargar la página después de un momento para mostrar el nuevo tratamiento
+          setTimeout(() => {
+            window.location.reload();
+          }, 1000);
+        } else {
+          showMsg(data.error || 'Error al registrar tratamiento', false);
+        }
+      })
+      .catch(error => {
+        console.error('Error:', error);
+        showMsg('Error de conexión', false);
+      })
+      .finally(() => {
+        // Rehabilitar botón
+        submitBtn.disabled = false;
+        submitBtn.innerHTML = originalText;
+      });
+    });
+  }
+
+  // Manejar formulario de historial clínico
+  const formHistorial = document.getElementById('form-historial');
+  if (formHistorial) {
+    formHistorial.addEventListener('submit', function(e) {
+      e.preventDefault();
+
+      // Deshabilitar botón para evitar doble envío
+      const submitBtn = this.querySelector('button[type="submit"]');
+      const originalText = submitBtn.innerHTML;
+      submitBtn.disabled = true;
+      submitBtn.innerHTML = '<i class="bi bi-clock"></i> Guardando...';
+
+      const formData = new FormData(this);
+      const csrftoken = getCSRF();
+
+      fetch(CitaManageConfig.urls.gestionar, {
+        method: 'POST',
+        headers: {
+          'X-CSRFToken': csrftoken,
+          'X-Requested-With': 'XMLHttpRequest',
+          'Accept':'application/json'
+        },
+        body: formData
+      })
+      .then(async r => { if(!r.ok) throw new Error('HTTP '+r.status); return r.json(); })
+      .then(data => {
+        if (data.success) {
+          showMsg(data.message, true);
+          // Limpiar formulario
+          this.reset();
+          // Recargar la página después de un momento para mostrar la nueva entrada
+          setTimeout(() => {
+            window.location.reload();
+          }, 1000);
+        } else {
+          showMsg(data.error || 'Error al agregar entrada al historial', false);
+        }
+      })
+      .catch(error => {
+        console.error('Error:', error);
+        showMsg('Error de conexión', false);
+      })
+      .finally(() => {
+        // Rehabilitar botón
+        submitBtn.disabled = false;
+        submitBtn.innerHTML = originalText;
+      });
+    });
+  }
+
+  // Manejar mostrar/ocultar fecha de seguimiento
+  const checkboxSeguimiento = document.getElementById('requiere_seguimiento');
+  const contenedorFecha = document.getElementById('fecha-seguimiento-container');
+
+  if (checkboxSeguimiento && contenedorFecha) {
+    checkboxSeguimiento.addEventListener('change', function() {
+      if (this.checked) {
+        contenedorFecha.style.display = 'block';
+        // Sugerir una fecha 7 días después
+        const fechaActual = new Date();
+        fechaActual.setDate(fechaActual.getDate() + 7);
+        const fechaSugerida = fechaActual.toISOString().split('T')[0];
+        document.getElementById('fecha_seguimiento').value = fechaSugerida;
+      } else {
+        contenedorFecha.style.display = 'none';
+        document.getElementById('fecha_seguimiento').value = '';
+      }
+    });
+  }
+
+  // ==========================================
+  // Funcionalidad de administración de servicios con dual-list
+  // ==========================================
+  const listaDisponibles = document.getElementById('lista-disponibles');
+  const listaSeleccionados = document.getElementById('lista-seleccionados');
+  const buscarServicioInput = document.getElementById('buscar-servicio');
+  const costoActualEl = document.getElementById('costo-actual');
+  const diferenciaEl = document.getElementById('diferencia-costo');
+  const nuevoTotalEl = document.getElementById('nuevo-total');
+  const btnConfirmarAgregar = document.getElementById('btn-confirmar-agregar-servicio');
+
+  // Contadores
+  function actualizarContadores() {
+    const countDisponibles = listaDisponibles.querySelectorAll('.servicio-item:not([style*="display: none"])').length;
+    const countSeleccionados = listaSeleccionados.querySelectorAll('.servicio-item-seleccionado').length;
+
+    document.getElementById('count-disponibles').textContent = countDisponibles;
+    document.getElementById('count-seleccionados').textContent = countSeleccionados;
+  }
+
+  // Calcular costos
+  function calcularCostos() {
+    const costoActual = parseFloat(costoActualEl.textContent) || 0;
+    let costoSeleccionados = 0;
+
+    listaSeleccionados.querySelectorAll('.servicio-item-seleccionado').forEach(item => {
+      const precio = parseFloat(item.dataset.servicioPrecio) || 0;
+      costoSeleccionados += precio;
+    });
+
+    const diferencia = costoSeleccionados - costoActual;
+    const nuevoTotal = costoSeleccionados;
+
+    // Actualizar UI
+    diferenciaEl.textContent = (diferencia >= 0 ? '+' : '') + '$' + Math.abs(diferencia).toFixed(2);
+    diferenciaEl.className = 'fs-5 ' + (diferencia >= 0 ? 'text-success' : 'text-danger');
+    nuevoTotalEl.textContent = nuevoTotal.toFixed(2);
+  }
+
+  // Mover servicio de disponibles a seleccionados
+  function agregarServicio(servicioId) {
+    const item = listaDisponibles.querySelector(`[data-servicio-id="${servicioId}"]`);
+    if (!item) return;
+
+    const nombre = item.dataset.servicioNombre;
+    const precio = item.dataset.servicioPrecio;
+
+    // Crear nuevo item en seleccionados
+    const nuevoItem = document.createElement('div');
+    nuevoItem.className = 'list-group-item list-group-item-action list-group-item-success servicio-item-seleccionado';
+    nuevoItem.dataset.servicioId = servicioId;
+    nuevoItem.dataset.servicioNombre = nombre;
+    nuevoItem.dataset.servicioPrecio = precio;
+    nuevoItem.innerHTML = `
+      <div class="d-flex justify-content-between align-items-center">
+        <button type="button" class="btn btn-sm btn-danger btn-quitar"
+                data-servicio-id="${servicioId}"
+                title="Quitar de la cita">
+          <i class="bi bi-arrow-left"></i>
+        </button>
+        <div class="flex-grow-1 ms-2">
+          <strong>${nombre}</strong>
+          <br>
+          <small class="text-dark">
+            <i class="bi bi-currency-dollar"></i> $${parseFloat(precio).toFixed(2)}
+          </small>
+        </div>
+      </div>
+    `;
+
+    // Agregar a lista seleccionados
+    listaSeleccionados.appendChild(nuevoItem);
+
+    // Remover de disponibles
+    item.remove();
+
+    // Actualizar contadores y costos
+    actualizarContadores();
+    calcularCostos();
+  }
+
+  // Mover servicio de seleccionados a disponibles
+  function quitarServicio(servicioId) {
+    const item = listaSeleccionados.querySelector(`[data-servicio-id="${servicioId}"]`);
+    if (!item) return;
+
+    const nombre = item.dataset.servicioNombre;
+    const precio = item.dataset.servicioPrecio;
+
+    // Crear nuevo item en disponibles
+    const nuevoItem = document.createElement('div');
+    nuevoItem.className = 'list-group-item list-group-item-action servicio-item';
+    nuevoItem.dataset.servicioId = servicioId;
+    nuevoItem.dataset.servicioNombre = nombre;
+    nuevoItem.dataset.servicioPrecio = precio;
+    nuevoItem.innerHTML = `
+      <div class="d-flex justify-content-between align-items-center">
+        <div class="flex-grow-1">
+          <strong>${nombre}</strong>
+          <br>
+          <small class="text-muted">
+            <i class="bi bi-currency-dollar"></i> $${parseFloat(precio).toFixed(2)}
+          </small>
+        </div>
+        <button type="button" class="btn btn-sm btn-success btn-agregar"
+                data-servicio-id="${servicioId}"
+                title="Agregar a la cita">
+          <i class="bi bi-arrow-right"></i>
+        </button>
+      </div>
+    `;
+
+    // Agregar a lista disponibles
+    listaDisponibles.appendChild(nuevoItem);
+
+    // Remover de seleccionados
+    item.remove();
+
+    // Actualizar contadores y costos
+    actualizarContadores();
+    calcularCostos();
+  }
+
+  // Event listeners usando delegación de eventos
+  listaDisponibles.addEventListener('click', function(e) {
+    const btnAgregar = e.target.closest('.btn-agregar');
+    if (btnAgregar) {
+      e.preventDefault();
+      agregarServicio(btnAgregar.dataset.servicioId);
+    }
+  });
+
+  listaSeleccionados.addEventListener('click', function(e) {
+    const btnQuitar = e.target.closest('.btn-quitar');
+    if (btnQuitar) {
+      e.preventDefault();
+      quitarServicio(btnQuitar.dataset.servicioId);
+    }
+  });
+
+  // Doble click para mover items
+  listaDisponibles.addEventListener('dblclick', function(e) {
+    const item = e.target.closest('.servicio-item');
+    if (item) {
+      agregarServicio(item.dataset.servicioId);
+    }
+  });
+
+  listaSeleccionados.addEventListener('dblclick', function(e) {
+    const item = e.target.closest('.servicio-item-seleccionado');
+    if (item) {
+      quitarServicio(item.dataset.servicioId);
+    }
+  });
+
+  // Botones agregar/quitar todos
+  document.getElementById('btn-agregar-todos')?.addEventListener('click', function() {
+    const itemsDisponibles = listaDisponibles.querySelectorAll('.servicio-item:not([style*="display: none"])');
+    itemsDisponibles.forEach(item => {
+      agregarServicio(item.dataset.servicioId);
+    });
+  });
+
+  document.getElementById('btn-quitar-todos')?.addEventListener('click', function() {
+    const itemsSeleccionados = listaSeleccionados.querySelectorAll('.servicio-item-seleccionado');
+    itemsSeleccionados.forEach(item => {
+      quitarServicio(item.dataset.servicioId);
+    });
+  });
+
+  // Búsqueda en tiempo real
+  buscarServicioInput?.addEventListener('input', function() {
+    const termino = this.value.toLowerCase();
+
+    listaDisponibles.querySelectorAll('.servicio-item').forEach(item => {
+      const nombre = item.dataset.servicioNombre.toLowerCase();
+      if (nombre.includes(termino)) {
+        item.style.display = '';
+      } else {
+        item.style.display = 'none';
+      }
+    });
+
+    actualizarContadores();
+  });
+
+  // Confirmar cambios
+  btnConfirmarAgregar?.addEventListener('click', function() {
+    const serviciosIds = Array.from(listaSeleccionados.querySelectorAll('.servicio-item-seleccionado'))
+      .map(item => item.dataset.servicioId);
+
+    // Deshabilitar botón
+    this.disabled = true;
+    this.innerHTML = '<i class="bi bi-clock"></i> Guardando...';
+
+    // Enviar petición
+    const formData = new FormData();
+    formData.append('action', 'agregar_servicios');
+    serviciosIds.forEach(id => formData.append('servicios', id));
+
+    fetch(CitaManageConfig.urls.gestionar, {
+      method: 'POST',
+      headers: {
+        'X-CSRFToken': getCSRF(),
+        'X-Requested-With': 'XMLHttpRequest',
+        'Accept': 'application/json'
+      },
+      body: formData
+    })
+    .then(async r => {
+      if (!r.ok) throw new Error('HTTP ' + r.status);
+      return r.json();
+    })
+    .then(data => {
+      if (data.success) {
+        showMsg(data.message || 'Servicios actualizados correctamente', true);
+
+        // Cerrar modal
+        const modal = bootstrap.Modal.getInstance(document.getElementById('modalAgregarServicio'));
+        modal.hide();
+
+        // Recargar página para mostrar cambios
+        setTimeout(() => window.location.reload(), 1000);
+      } else {
+        showMsg(data.error || 'Error al actualizar servicios', false);
+      }
+    })
+    .catch(error => {
+      console.error('Error:', error);
+      showMsg('Error de conexión', false);
+    })
+    .finally(() => {
+      // Rehabilitar botón
+      this.disabled = false;
+      this.innerHTML = '<i class="bi bi-check-circle"></i> Guardar Cambios';
+    });
+  });
+
+  // Inicializar contadores y costos al abrir el modal
+  document.getElementById('modalAgregarServicio')?.addEventListener('shown.bs.modal', function() {
+    actualizarContadores();
+    calcularCostos();
+  });
+
+})();
+
+// Vincular selección del odontograma con el campo de tratamiento
+document.addEventListener('dienteSeleccionado', function(e) {
+  const input = document.getElementById('dientes_tratados');
+  if (!input) return;
+  const num = String(e.detail?.numeroDiente || '').trim();
+  if (!num) return;
+  const actuales = input.value.split(',').map(s=>s.trim()).filter(Boolean);
+  if (!actuales.includes(num)) {
+    actuales.push(num);
+    input.value = actuales.join(',');
+  }
+  input.focus();
+});
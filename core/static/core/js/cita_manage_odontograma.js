@@ -0,0 +1,174 @@
+/**
+ * ODONTOGRAMA EMBEBIDO EN GESTIONAR CITA
+ * Zoom, hidratación desde la API y paleta de diagnósticos.
+ * Usa window.CitaManageConfig (ver cita_manage.html).
+ */
+(function(){
+  let scale = 1.0;
+  const minScale = 0.6, maxScale = 2.0, step = 0.1;
+  const scaleEl = document.getElementById('odontograma-scale');
+  function applyScale(){ scaleEl.style.transform = `scale(${scale})`; }
+  document.getElementById('odo-zoom-in')?.addEventListener('click', function(){ scale = Math.min(maxScale, +(scale + step).toFixed(2)); applyScale(); });
+  document.getElementById('odo-zoom-out')?.addEventListener('click', function(){ scale = Math.max(minScale, +(scale - step).toFixed(2)); applyScale(); });
+  document.getElementById('odo-zoom-reset')?.addEventListener('click', function(){ scale = 1.0; applyScale(); });
+
+  const selected = new Set();
+
+  // Vincular clics en dientes (toggle multi-selección)
+  function bindToothClicks(){
+    const selector = '#odontograma-stage .diente, #odontograma-stage .diente-clinico, #odontograma-stage .diente-movil';
+    const nodos = document.querySelectorAll(selector);
+    console.log('Dientes enlazados:', nodos.length);
+    nodos.forEach(function(d){
+      d.addEventListener('click', function(e){
+        e.stopPropagation();
+        console.log('Click diente:', d.id);
+        const id = d.id || '';
+        const num = id.replace('diente-','');
+        if (!num) return;
+        if (d.classList.contains('selected')) {
+          d.classList.remove('selected');
+          selected.delete(num);
+        } else {
+          d.classList.add('selected');
+          selected.add(num);
+        }
+        // Eventos para integraciones existentes
+        document.dispatchEvent(new CustomEvent('dienteSeleccionado', { detail: { numeroDiente: num, elemento: d } }));
+        document.dispatchEvent(new CustomEvent('dienteMovilSeleccionado', { detail: { numeroFDI: num, elemento: d } }));
+      });
+    });
+  }
+
+  // Colorear desde API estados actuales
+  async function hydrateFromApi(){
+    try{
+      const url = CitaManageConfig.urls.odontogramaGet;
+      const r = await fetch(url, { headers: { 'Accept':'application/json' } });
+      if(!r.ok) return;
+      const data = await r.json();
+      const mapa = data.dientes || {};
+      const keys = Object.keys(mapa);
+      const classMap = {
+        'SANO':'sano', 'CARIES':'caries', 'OBTURACION':'obturada', 'OBTURADA':'obturada', 'CORONA':'corona',
+        'EXTRAIDO':'extraida', 'EXTRAIDA':'extraida', 'IMPLANTE':'implante', 'ENDODONCIA':'endodoncia'
+      };
+      keys.forEach(k=>{
+        const info = mapa[k] || {};
+        const el = document.getElementById('diente-'+k);
+        if(!el) return;
+        el.classList.remove('sano','caries','obturada','corona','extraida','implante','endodoncia');
+        let nombre = (info.diagnostico_nombre||'').toUpperCase();
+        if(!nombre) nombre = 'SANO';
+        const cls = classMap[nombre] || 'sano';
+        if(cls) el.classList.add(cls);
+        const oc = el.querySelector('.superficie-oclusal') || el.querySelector('.superficie-dental') || el.querySelector('path');
+        if(oc && info.diagnostico_color){ oc.style.fill = info.diagnostico_color; }
+      });
+    }catch(_e){}
+  }
+
+  // Cargar por defecto la variante móvil (sin marco)
+  (async function(){
+    await loadVariant('movil_optimizado');
+    const style = document.createElement('style');
+    style.innerHTML = `
+      .odontograma-movil{padding:0!important;background:transparent!important;box-shadow:none!important;border-radius:0!important}
+      .odontograma-movil svg{background:transparent!important}
+    `;
+    scaleEl.appendChild(style);
+  })();
+
+  // Vincular paleta de diagnóstico
+  const DIAG_MAP = CitaManageConfig.diagnosticos;
+  function getCSRF(){
+    const v = document.querySelector('[name=csrfmiddlewaretoken]')?.value; return v || '';
+  }
+  function norm(s){ return (s||'').toString().normalize('NFD').replace(/[\u0300-\u036f]/g,'').toUpperCase(); }
+  const ALIAS = { 'OBTURADA':'OBTURACION', 'EXTRAIDA':'EXTRAIDO', 'ENDODONCIA':'ENDODONCIA', 'SANO':'SANO', 'CARIES':'CARIES', 'CORONA':'CORONA' };
+  function findDiagId(nombre){
+    const up = norm(nombre);
+    if (DIAG_MAP[up]) return DIAG_MAP[up];
+    const alias = ALIAS[up];
+    if (alias && DIAG_MAP[alias]) return DIAG_MAP[alias];
+    // Fallback: buscar por startsWith/contains
+    const key = Object.keys(DIAG_MAP).find(k=>norm(k)===up || norm(k).startsWith(up) || up.startsWith(norm(k)));
+    return key ? DIAG_MAP[key] : null;
+  }
+  async function applyDiagnosisToSelected(nombre, color){
+    const diagId = findDiagId(nombre);
+    console.log('Aplicar diagnóstico:', nombre, '->', diagId, 'a', Array.from(selected));
+    if (!diagId || selected.size===0) return;
+    const url = CitaManageConfig.urls.odontogramaUpdate;
+    const headers = { 'Content-Type':'application/json', 'X-CSRFToken': getCSRF(), 'X-Requested-With':'XMLHttpRequest' };
+    const lista = Array.from(selected).map(n=>parseInt(n,10));
+    try{
+      // Pintar en UI
+      lista.forEach(num=>{
+        const el = document.getElementById('diente-'+num);
+        if (el){ el.classList.remove('sano','caries','obturada','corona','extraida','implante','endodonica','endodoncia'); el.classList.add(norm(nombre).toLowerCase()); }
+      });
+      await fetch(url, { method:'POST', headers, body: JSON.stringify({ lista_numeros: lista, diagnostico_id: diagId, color_seleccionado: color||'' }) });
+    }catch(e){ console.error('Error aplicando diagnóstico:', e); }
+  }
+  document.querySelectorAll('.diag-btn').forEach(btn=>{
+    btn.addEventListener('click', async function(){
+      const nombre = this.dataset.diag||'SANO';
+      document.querySelectorAll('.diag-btn').forEach(b=>b.classList.remove('active'));
+      this.classList.add('active');
+    });
+  });
+  document.getElementById('diag-apply')?.addEventListener('click', async function(){
+    const active = document.querySelector('.diag-btn.active');
+    const nombre = active ? active.dataset.diag : 'SANO';
+    const color = document.getElementById('diag-color')?.value || '';
+    await applyDiagnosisToSelected(nombre, color);
+  });
+  document.getElementById('diag-clear')?.addEventListener('click', function(){
+    const selector = '#odontograma-stage .diente.selected, #odontograma-stage .diente-clinico.selected, #odontograma-stage .diente-movil.selected';
+    document.querySelectorAll(selector).forEach(x=>x.classList.remove('selected'));
+    selected.clear();
+    document.querySelectorAll('.diag-btn').forEach(b=>b.classList.remove('active'));
+  });
+
+  // API de carga de variante
+  async function loadVariant(variant){
+    const url = CitaManageConfig.urls.odontogramaPartial + '?variant=' + encodeURIComponent(variant);
+    const r = await fetch(url, { headers: { 'Accept':'text/html' } });
+    if(!r.ok){ console.error('Error cargando odontograma:', r.status); return; }
+    const html = await r.text();
+    scaleEl.innerHTML = html;
+    console.log('Odontograma cargado:', variant);
+    bindToothClicks();
+    hydrateFromApi();
+  }
+
+  bindToothClicks();
+  hydrateFromApi();
+
+  // Hacer 'selected' accesible globalmente para el botón de copiar
+  window.odontogramaSelected = selected;
+})();
+
+// Script para copiar dientes seleccionados al formulario
+document.getElementById('btn-copiar-seleccion')?.addEventListener('click', function(){
+  const selected = window.odontogramaSelected;
+  if(!selected || selected.size === 0){
+    alert('No hay dientes seleccionados en el odontograma');
+    return;
+  }
+  const nums = Array.from(selected).sort((a,b)=>a-b).join(',');
+  document.getElementById('dientes_tratados').value = nums;
+  console.log('Dientes copiados:', nums);
+  // Feedback visual
+  const btn = this;
+  const originalHTML = btn.innerHTML;
+  btn.innerHTML = '<i class="bi bi-check-circle-fill"></i> ¡Copiado!';
+  btn.classList.remove('btn-outline-primary');
+  btn.classList.add('btn-success');
+  setTimeout(function(){
+    btn.innerHTML = originalHTML;
+    btn.classList.remove('btn-success');
+    btn.classList.add('btn-outline-primary');
+  }, 1500);
+});
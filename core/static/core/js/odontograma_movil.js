@@ -0,0 +1,91 @@
+(function() {
+    'use strict';
+    
+    function log(mensaje) {
+        console.log(`[ODONTOGRAMA MÓVIL] ${mensaje}`);
+    }
+    
+    document.addEventListener('DOMContentLoaded', function() {
+        log('Iniciando odontograma optimizado para móvil');
+        
+        const dientes = document.querySelectorAll('.diente-movil');
+        log(`Configurando ${dientes.length} dientes para dispositivos móviles`);
+        
+        dientes.forEach(function(diente) {
+            const dienteId = diente.id;
+            const numeroFDI = dienteId.replace('diente-', '');
+            const cuadrante = Math.floor(numeroFDI / 10);
+            const posicion = numeroFDI % 10;
+            
+            // Determinar tipo de diente
+            let tipoDiente = '';
+            if (posicion === 1 || posicion === 2) {
+                tipoDiente = 'Incisivo';
+            } else if (posicion === 3) {
+                tipoDiente = 'Canino';
+            } else if (posicion === 4 || posicion === 5) {
+                tipoDiente = 'Premolar';
+            } else if (posicion === 6 || posicion === 7 || posicion === 8) {
+                tipoDiente = 'Molar';
+            }
+            
+            // Event listeners optimizados para móvil
+            diente.addEventListener('click', function(e) {
+                e.preventDefault();
+                e.stopPropagation();
+                
+                log(`Diente seleccionado: FDI ${numeroFDI} (${tipoDiente})`);
+                
+                // Limpiar selecciones anteriores
+                document.querySelectorAll('.diente-movil').forEach(d => {
+                    d.classList.remove('selected');
+                });
+                
+                // Seleccionar diente actual
+                diente.classList.add('selected');
+                
+                // Feedback háptico en móviles compatibles
+                if (navigator.vibrate) {
+                    navigator.vibrate(50);
+                }
+                
+                // Evento personalizado
+                const evento = new CustomEvent('dienteMovilSeleccionado', {
+                    detail: {
+                        numeroFDI: numeroFDI,
+                        cuadrante: cuadrante,
+                        posicion: posicion,
+                        tipoDiente: tipoDiente,
+                        elemento: diente
+                    }
+                });
+                
+                document.dispatchEvent(evento);
+            });
+            
+            // Solo eventos básicos sin animaciones
+        });
+        
+        log('Odontograma móvil inicializado correctamente');
+    });
+    
+    // Funciones globales
+    window.aplicarDiagnosticoMovil = function(numeroFDI, diagnostico) {
+        const diente = document.getElementById(`diente-${numeroFDI}`);
+        if (diente) {
+            diente.classList.remove('sano', 'caries', 'obturada', 'corona', 'extraida', 'implante', 'endodoncia');
+            if (diagnostico) {
+                diente.classList.add(diagnostico);
+                log(`Diagnóstico aplicado: Diente ${numeroFDI} - ${diagnostico}`);
+            }
+        }
+    };
+    
+    window.limpiarSeleccionMovil = function() {
+        document.querySelectorAll('.diente-movil').forEach(diente => {
+            diente.classList.remove('selected', 'sano', 'caries', 'obturada', 'corona', 'extraida', 'implante', 'endodoncia');
+        });
+        log('Selección limpiada');
+    };
+    
+})();
@@ -0,0 +1,114 @@
+/**
+ * GESTIÓN DE PAGOS
+ * Filtros y búsqueda de la vista híbrida de pagos.
+ */
+document.addEventListener('DOMContentLoaded', function() {
+    // === FUNCIONALIDAD DE EXPANSIÓN DE FILAS ===
+    const expandButtons = document.querySelectorAll('.expand-btn');
+    const paymentRows = document.querySelectorAll('.payment-row');
+
+    // Manejar clicks en los botones de expansión
+    expandButtons.forEach(button => {
+        button.addEventListener('click', function(e) {
+            e.preventDefault();
+            e.stopPropagation();
+
+            const row = this.closest('.payment-row');
+            const pagoId = row.dataset.pagoId;
+            const detailsRow = document.querySelector(`.details-row[data-pago-id="${pagoId}"]`);
+            const icon = this.querySelector('i');
+
+            // Toggle la fila de detalles
+            if (detailsRow.classList.contains('show')) {
+                // Cerrar detalles
+                detailsRow.classList.remove('show');
+                this.classList.remove('expanded');
+                icon.className = 'fas fa-chevron-right';
+
+                // Animación suave
+                setTimeout(() => {
+                    detailsRow.style.display = 'none';
+                }, 300);
+            } else {
+                // Abrir detalles
+                detailsRow.style.display = 'table-row';
+                setTimeout(() => {
+                    detailsRow.classList.add('show');
+                }, 10);
+
+                this.classList.add('expanded');
+                icon.className = 'fas fa-chevron-down';
+            }
+        });
+    });
+
+    // Hacer las filas clickeables para expandir
+    paymentRows.forEach(row => {
+        row.addEventListener('click', function(e) {
+            // No expandir si se clickea en dropdown o botones
+            if (e.target.closest('.dropdown') || e.target.closest('button') || e.target.closest('a')) {
+                return;
+            }
+
+            const expandBtn = this.querySelector('.expand-btn');
+            if (expandBtn) {
+                expandBtn.click();
+            }
+        });
+
+        // Cambiar cursor para indicar que es clickeable
+        row.style.cursor = 'pointer';
+    });
+
+    // === AUTO-SUBMIT DE BÚSQUEDA CON DEBOUNCE ===
+    const searchInput = document.querySelector('input[name="busqueda"]');
+    if (searchInput) {
+        let timeout;
+        searchInput.addEventListener('input', function() {
+            clearTimeout(timeout);
+            timeout = setTimeout(() => {
+                this.form.submit();
+            }, 800);
+        });
+    }
+
+    // === FILTROS DINÁMICOS ===
+    const filterSelects = document.querySelectorAll('select[name="metodo_pago"], input[name="fecha_desde"]');
+    filterSelects.forEach(filter => {
+        filter.addEventListener('change', function() {
+            // Auto-submit el formulario
+            this.form.submit();
+        });
+    });
+
+    // === ANIMACIÓN DE ENTRADA ===
+    const tableRows = document.querySelectorAll('.payment-row');
+    tableRows.forEach((row, index) => {
+        row.style.animationDelay = `${index * 0.05}s`;
+        row.classList.add('fade-in');
+    });
+
+    // === TOOLTIPS ===
+    const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
+    const tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
+        return new bootstrap.Tooltip(tooltipTriggerEl);
+    });
+
+    // === TECLADO SHORTCUTS ===
+    document.addEventListener('keydown', function(e) {
+        // ESC para colapsar todas las filas expandidas
+        if (e.key === 'Escape') {
+            const expandedRows = document.querySelectorAll('.details-row.show');
+            expandedRows.forEach(row => {
+                const pagoId = row.dataset.pagoId;
+                const expandBtn = document.querySelector(`.payment-row[data-pago-id="${pagoId}"] .expand-btn`);
+                if (expandBtn) {
+                    expandBtn.click();
+                }
+            });
+        }
+    });
+
+    console.log('💳 Vista híbrida de pagos cargada exitosamente');
+    console.log(`📊 Total de pagos mostrados: ${paymentRows.length}`);
+});
@@ -0,0 +1,193 @@
+/**
+ * CENTRO DE GESTIÓN DE SERVICIOS
+ * Filtros de la tabla y gráficas de distribución (Chart.js).
+ * Los datos de las gráficas llegan en window.ServiceListConfig (ver service_list.html).
+ */
+document.addEventListener('DOMContentLoaded', function() {
+    // === FUNCIONALIDAD DE EXPANSIÓN DE FILAS ===
+    const expandButtons = document.querySelectorAll('.expand-btn');
+    const serviceRows = document.querySelectorAll('.service-row');
+
+    // Manejar clicks en los botones de expansión
+    expandButtons.forEach(button => {
+        button.addEventListener('click', function(e) {
+            e.preventDefault();
+            e.stopPropagation();
+
+            const row = this.closest('.service-row');
+            const serviceId = row.dataset.serviceId;
+            const detailsRow = document.querySelector(`.details-row[data-service-id="${serviceId}"]`);
+            const icon = this.querySelector('i');
+
+            // Toggle la fila de detalles
+            if (detailsRow.classList.contains('show')) {
+                // Cerrar detalles
+                detailsRow.classList.remove('show');
+                this.classList.remove('expanded');
+                icon.className = 'fas fa-chevron-right';
+
+                // Animación suave
+                setTimeout(() => {
+                    detailsRow.style.display = 'none';
+                }, 300);
+            } else {
+                // Abrir detalles
+                detailsRow.style.display = 'table-row';
+                setTimeout(() => {
+                    detailsRow.classList.add('show');
+                }, 10);
+
+                this.classList.add('expanded');
+                icon.className = 'fas fa-chevron-down';
+            }
+        });
+    });
+
+    // Hacer las filas clickeables para expandir
+    serviceRows.forEach(row => {
+        row.addEventListener('click', function(e) {
+            // No expandir si se clickea en dropdown o botones
+            if (e.target.closest('.dropdown') || e.target.closest('button') || e.target.closest('a')) {
+                return;
+            }
+
+            const expandBtn = this.querySelector('.expand-btn');
+            if (expandBtn) {
+                expandBtn.click();
+            }
+        });
+
+        // Cambiar cursor para indicar que es clickeable
+        row.style.cursor = 'pointer';
+    });
+
+    // === GRÁFICOS ===
+
+    // Gráfico de distribución de precios
+    const preciosCtx = document.getElementById('preciosChart');
+    if (preciosCtx) {
+        new Chart(preciosCtx, {
+            type: 'doughnut',
+            data: {
+                labels: ['Bajo (<$500)', 'Medio ($500-2000)', 'Alto (>$2000)'],
+                datasets: [{
+                    data: ServiceListConfig.rangosPrecios,
+                    backgroundColor: [
+                        '#28a745',  // Verde para bajo
+                        '#ffc107',  // Amarillo para medio  
+                        '#dc3545'   // Rojo para alto
+                    ],
+                    borderWidth: 0
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        position: 'bottom'
+                    },
+                    tooltip: {
+                        callbacks: {
+                            label: function(context) {
+                                const total = context.dataset.data.reduce((a, b) => a + b, 0);
+                                const percentage = ((context.parsed / total) * 100).toFixed(1);
+                                return context.label + ': ' + context.parsed + ' (' + percentage + '%)';
+                            }
+                        }
+                    }
+                }
+            }
+        });
+    }
+
+    // Gráfico de distribución de duración
+    const duracionCtx = document.getElementById('duracionChart');
+    if (duracionCtx) {
+        new Chart(duracionCtx, {
+            type: 'doughnut',
+            data: {
+                labels: ['Corto (<30min)', 'Medio (30-90min)', 'Largo (>90min)'],
+                datasets: [{
+                    data: ServiceListConfig.rangosDuracion,
+                    backgroundColor: [
+                        '#17a2b8',  // Azul para corto
+                        '#6f42c1',  // Púrpura para medio
+                        '#6c757d'   // Gris para largo
+                    ],
+                    borderWidth: 0
+                }]
+            },
+            options: {
+                responsive: true,
+                maintainAspectRatio: false,
+                plugins: {
+                    legend: {
+                        position: 'bottom'
+                    },
+                    tooltip: {
+                        callbacks: {
+                            label: function(context) {
+                                const total = context.dataset.data.reduce((a, b) => a + b, 0);
+                                const percentage = ((context.parsed / total) * 100).toFixed(1);
+                                return context.label + ': ' + context.parsed + ' (' + percentage + '%)';
+                            }
+                        }
+                    }
+                }
+            }
+        });
+    }
+
+    // === AUTO-SUBMIT DE BÚSQUEDA CON DEBOUNCE ===
+    const searchInput = document.querySelector('input[name="busqueda"]');
+    if (searchInput) {
+        let timeout;
+        searchInput.addEventListener('input', function() {
+            clearTimeout(timeout);
+            timeout = setTimeout(() => {
+                this.form.submit();
+            }, 800);
+        });
+    }
+
+    // === FILTROS DINÁMICOS ===
+    const filterSelects = document.querySelectorAll('select[name="especialidad"], select[name="orden"]');
+    filterSelects.forEach(select => {
+        select.addEventListener('change', function() {
+            // Auto-submit el formulario
+            this.form.submit();
+        });
+    });
+
+    // === ANIMACIÓN DE ENTRADA ===
+    const tableRows = document.querySelectorAll('.service-row');
+    tableRows.forEach((row, index) => {
+        row.style.animationDelay = `${index * 0.05}s`;
+        row.classList.add('fade-in');
+    });
+
+    // === TOOLTIPS ===
+    const tooltipTriggerList = [].slice.call(document.querySelectorAll('[data-bs-toggle="tooltip"]'));
+    const tooltipList = tooltipTriggerList.map(function (tooltipTriggerEl) {
+        return new bootstrap.Tooltip(tooltipTriggerEl);
+    });
+
+    // === TECLADO SHORTCUTS ===
+    document.addEventListener('keydown', function(e) {
+        // ESC para colapsar todas las filas expandidas
+        if (e.key === 'Escape') {
+            const expandedRows = document.querySelectorAll('.details-row.show');
+            expandedRows.forEach(row => {
+                const serviceId = row.dataset.serviceId;
+                const expandBtn = document.querySelector(`.service-row[data-service-id="${serviceId}"] .expand-btn`);
+                if (expandBtn) {
+                    expandBtn.click();
+                }
+            });
+        }
+    });
+
+    console.log('🦷 Centro de Gestión de Servicios cargado exitosamente');
+    console.log(`📊 Total de servicios mostrados: ${serviceRows.length}`);
+});
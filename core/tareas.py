@@ -0,0 +1,275 @@
+"""
+Tareas en segundo plano sin broker externo.
+
+La cola es la tabla tenants.TareaEncolada (schema público). Una vista encola
+el trabajo lento (emails, importaciones, recálculos) y responde de inmediato;
+`python manage.py run_workers` lo ejecuta en el schema de la clínica que lo
+encoló, con reintentos y backoff exponencial.
+
+- @tarea(max_intentos=5, reintento_segundos=30): registra una función como tarea.
+  Los argumentos deben ser serializables a JSON (ids, no instancias).
+- encolar(funcion, *args, clave='', retraso=None, adjunto=None, **kwargs): la
+  encola en el schema actual. Con `clave` no se duplica una tarea pendiente
+  igual (p. ej. 'saldo:15'). La fila se inserta en la transacción en curso,
+  así que si la transacción se revierte la tarea tampoco existe.
+- Con settings.TAREAS_SINCRONAS (desarrollo, por defecto con DEBUG) la tarea
+  se ejecuta en el mismo proceso al confirmar la transacción, sin workers.
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_tenants.utils import get_public_schema_name, schema_context
+
+logger = logging.getLogger(__name__)
+
+# {nombre: (funcion, max_intentos, reintento_segundos)}
+_registro = {}
+
+# Tope del backoff entre reintentos
+REINTENTO_MAXIMO_SEGUNDOS = 3600
+
+
+def tarea(funcion=None, max_intentos=5, reintento_segundos=30):
+    """
+    Registra una función como tarea encolable.
+
+    Uso:
+        @tarea
+        def recalcular_saldo_paciente(paciente_id): ...
+
+        @tarea(max_intentos=8, reintento_segundos=60)
+        def enviar_email(asunto, mensaje, destinatarios): ...
+    """
+    def decorador(f):
+        _registro[nombre_tarea(f)] = (f, max_intentos, reintento_segundos)
+        return f
+
+    if funcion:
+        return decorador(funcion)
+    return decorador
+
+
+def nombre_tarea(funcion):
+    return f'{funcion.__module__}.{funcion.__qualname__}'
+
+
+def _resolver(nombre):
+    """Función registrada por nombre; importarla ejecuta su @tarea si aún no se registró."""
+    if nombre not in _registro:
+        import_string(nombre)
+    return _registro[nombre]
+
+
+def encolar(funcion, *args, clave='', retraso=None, adjunto=None, **kwargs):
+    """
+    Encola `funcion` en el schema actual. Devuelve la TareaEncolada creada (o la
+    pendiente con la misma clave), o None si se ejecutó en modo síncrono.
+    """
+    from tenants.models import TareaEncolada
+
+    nombre = nombre_tarea(funcion)
+    _, max_intentos, _ = _resolver(nombre)
+
+    if getattr(settings, 'TAREAS_SINCRONAS', False):
+        if adjunto is not None:
+            kwargs['adjunto'] = adjunto
+        transaction.on_commit(lambda: _ejecutar_sincrona(funcion, args, kwargs), robust=True)
+        return None
+
+    datos = {
+        'schema_name': connection.schema_name,
+        'nombre': nombre,
+        'argumentos': {'args': list(args), 'kwargs': kwargs},
+        'adjunto': adjunto,
+        'clave': clave,
+        'max_intentos': max_intentos,
+        'ejecutar_despues': timezone.now() + (retraso or timedelta(0)),
+    }
+    if not clave:
+        return TareaEncolada.objects.create(**datos)
+    try:
+        with transaction.atomic():
+            return TareaEncolada.objects.create(**datos)
+    except IntegrityError:
+        # Ya hay una pendiente con la misma clave: esa hará el trabajo
+        existente = TareaEncolada.objects.filter(
+            schema_name=datos['schema_name'], clave=clave, estado=TareaEncolada.PENDIENTE
+        ).first()
+        if existente is None:
+            raise
+        return existente
+
+
+def _ejecutar_sincrona(funcion, args, kwargs):
+    try:
+        funcion(*args, **kwargs)
+    except Exception:
+        logger.exception("Error ejecutando la tarea %s en modo síncrono", nombre_tarea(funcion))
+
+
+def identificador_worker():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def tomar_siguiente(worker=None, schema_name=None):
+    """
+    Reserva la siguiente tarea lista (SELECT ... FOR UPDATE SKIP LOCKED, así varios
+    workers no toman la misma) y la marca en curso. None si no hay ninguna.
+    """
+    from tenants.models import TareaEncolada
+
+    connection.set_schema_to_public()
+    with transaction.atomic():
+        pendientes = TareaEncolada.objects.select_for_update(skip_locked=True).filter(
+            estado=TareaEncolada.PENDIENTE, ejecutar_despues__lte=timezone.now()
+        )
+        if schema_name:
+            pendientes = pendientes.filter(schema_name=schema_name)
+        tarea_encolada = pendientes.order_by('ejecutar_despues', 'id').defer('adjunto').first()
+        if tarea_encolada is None:
+            return None
+        tarea_encolada.estado = TareaEncolada.EN_CURSO
+        tarea_encolada.intentos += 1
+        tarea_encolada.iniciada_en = timezone.now()
+        tarea_encolada.worker = worker or identificador_worker()
+        tarea_encolada.save(update_fields=['estado', 'intentos', 'iniciada_en', 'worker'])
+    return tarea_encolada
+
+
+def ejecutar(tarea_encolada):
+    """Ejecuta una tarea tomada con tomar_siguiente() en su schema y registra el resultado. Devuelve True si terminó bien."""
+    from tenants.models import TareaEncolada
+
+    inicio = timezone.now()
+    reintento_segundos = 30
+    try:
+        funcion, _, reintento_segundos = _resolver(tarea_encolada.nombre)
+        args = tarea_encolada.argumentos.get('args', [])
+        kwargs = dict(tarea_encolada.argumentos.get('kwargs', {}))
+        adjunto = TareaEncolada.objects.filter(pk=tarea_encolada.pk).values_list('adjunto', flat=True).first()
+        if adjunto is not None:
+            kwargs['adjunto'] = bytes(adjunto)
+        with schema_context(tarea_encolada.schema_name):
+            funcion(*args, **kwargs)
+    except Exception as e:
+        connection.set_schema_to_public()
+        tarea_encolada.ultimo_error = traceback.format_exc()[-4000:]
+        if tarea_encolada.intentos >= tarea_encolada.max_intentos:
+            tarea_encolada.estado = TareaEncolada.FALLIDA
+            tarea_encolada.terminada_en = timezone.now()
+            logger.error("Tarea %s (%s) falló definitivamente tras %d intentos: %s",
+                         tarea_encolada.pk, tarea_encolada.nombre, tarea_encolada.intentos, e)
+        else:
+            espera = min(reintento_segundos * 2 ** (tarea_encolada.intentos - 1), REINTENTO_MAXIMO_SEGUNDOS)
+            tarea_encolada.estado = TareaEncolada.PENDIENTE
+            tarea_encolada.ejecutar_despues = timezone.now() + timedelta(seconds=espera)
+            logger.warning("Tarea %s (%s) falló (intento %d/%d), se reintenta en %ds: %s",
+                           tarea_encolada.pk, tarea_encolada.nombre, tarea_encolada.intentos,
+                           tarea_encolada.max_intentos, espera, e)
+        try:
+            tarea_encolada.save(update_fields=['estado', 'ejecutar_despues', 'terminada_en', 'ultimo_error'])
+        except IntegrityError:
+            # Mientras corría se encoló otra pendiente con la misma clave: esa la reemplaza
+            TareaEncolada.objects.filter(pk=tarea_encolada.pk).update(
+                estado=TareaEncolada.FALLIDA, terminada_en=timezone.now(),
+                ultimo_error=tarea_encolada.ultimo_error,
+            )
+        return False
+
+    connection.set_schema_to_public()
+    TareaEncolada.objects.filter(pk=tarea_encolada.pk).update(
+        estado=TareaEncolada.COMPLETADA, terminada_en=timezone.now(), ultimo_error='', adjunto=None
+    )
+    logger.info("Tarea %s (%s) completada en %.2fs", tarea_encolada.pk, tarea_encolada.nombre,
+                (timezone.now() - inicio).total_seconds())
+    return True
+
+
+def liberar_atascadas():
+    """Devuelve a pendientes las tareas en curso de workers que murieron (más viejas que TAREAS_TIMEOUT_SEGUNDOS)."""
+    from tenants.models import TareaEncolada
+
+    limite = timezone.now() - timedelta(seconds=settings.TAREAS_TIMEOUT_SEGUNDOS)
+    with schema_context(get_public_schema_name()):
+        liberadas = TareaEncolada.objects.filter(
+            estado=TareaEncolada.EN_CURSO, iniciada_en__lt=limite
+        ).update(estado=TareaEncolada.PENDIENTE, ejecutar_despues=timezone.now(), worker='')
+    if liberadas:
+        logger.warning("Se liberaron %d tareas atascadas en curso", liberadas)
+    return liberadas
+
+
+def purgar_terminadas(dias=None):
+    """Borra las tareas completadas más viejas que TAREAS_RETENCION_DIAS (las fallidas se conservan para revisión)."""
+    from tenants.models import TareaEncolada
+
+    limite = timezone.now() - timedelta(days=dias if dias is not None else settings.TAREAS_RETENCION_DIAS)
+    with schema_context(get_public_schema_name()):
+        borradas, _ = TareaEncolada.objects.filter(
+            estado=TareaEncolada.COMPLETADA, terminada_en__lt=limite
+        ).delete()
+    return borradas
+
+
+# --- Tareas ---
+
+@tarea(max_intentos=8, reintento_segundos=60)
+def enviar_email(asunto, mensaje, destinatarios):
+    from django.core.mail import send_mail
+
+    send_mail(asunto, mensaje, settings.DEFAULT_FROM_EMAIL, destinatarios, fail_silently=False)
+
+
+@tarea
+def recalcular_saldo_paciente(paciente_id):
+    from . import models
+    from .services import PacienteService
+
+    paciente = models.Paciente.objects.filter(pk=paciente_id).first()
+    if paciente is not None:
+        PacienteService.actualizar_saldo_global(paciente)
+
+
+@tarea
+def recalcular_stock_insumo(insumo_id):
+    from . import models
+
+    insumo = models.Insumo.objects.filter(pk=insumo_id).first()
+    if insumo is not None:
+        insumo.actualizar_stock_total()
+
+
+@tarea(max_intentos=1)
+def importar_inventario_excel(destinatario, adjunto):
+    """Importa el Excel de inventario y avisa el resultado por correo (si hay destinatario)."""
+    import io
+    from .services import InventarioService
+
+    try:
+        resultado = InventarioService.importar_excel(io.BytesIO(adjunto))
+        mensaje = InventarioService.resumen_importacion(resultado)
+    except KeyError:
+        mensaje = "El archivo no contiene la hoja 'Inventario'. Use el formato correcto."
+    if destinatario:
+        encolar(enviar_email, 'Resultado de la importación de inventario', mensaje, [destinatario])
+    logger.info("Importación de inventario: %s", mensaje)
+
+
+@tarea(max_intentos=3, reintento_segundos=60)
+def generar_consentimiento_firmado(paciente_consentimiento_id):
+    """Genera y guarda el PDF firmado de un consentimiento (core/consentimientos_pdf.py)."""
+    from . import models
+    from .consentimientos_pdf import guardar_firmado
+
+    pc = models.PacienteConsentimiento.objects.select_related(
+        'paciente', 'consentimiento', 'presentado_por'
+    ).filter(pk=paciente_consentimiento_id, estado='FIRMADO').first()
+    if pc is not None:
+        guardar_firmado(pc)
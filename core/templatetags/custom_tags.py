@@ -1,6 +1,7 @@
 from django import template
-from django.contrib.auth.models import Group
-from django.urls import reverse, NoReverseMatch
+from core.principal import obtener_principal
+from core.imagenes import url_derivado
+from core.url_helpers import url_requiere_parametros
 
 register = template.Library()
 
@@ -12,17 +13,13 @@ def has_group(user, group_name):
     Ej: {% if user|has_group:"Administrador,Recepcionista" %}
     """
     group_names = [g.strip() for g in group_name.split(',')]
-    return user.groups.filter(name__in=group_names).exists()
+    return obtener_principal(user).en_grupo(*group_names)
 
 @register.filter
 def es_url_con_parametros(url_name):
-    """Detecta si una URL requiere parámetros"""
+    """Detecta si una URL requiere parámetros (se calcula una vez por nombre y proceso)"""
     try:
-        # Intentar resolver la URL sin parámetros
-        reverse(url_name)
-        return False  # Si no falla, no requiere parámetros
-    except NoReverseMatch:
-        return True   # Si falla, probablemente requiere parámetros
+        return url_requiere_parametros(url_name)
     except Exception:
         return True   # En caso de cualquier otro error, asumir que requiere parámetros
 
@@ -33,3 +30,13 @@ def es_reporte(url_name: str) -> bool:
         return isinstance(url_name, str) and url_name.startswith('core:reporte_')
     except Exception:
         return False
+
+
+@register.filter(name='derivado')
+def derivado(archivo, nombre):
+    """URL del derivado de tamaño fijo de una imagen (core/imagenes.py), o la del original.
+    Ej: {{ request.tenant.logo|derivado:"cabecera" }}"""
+    try:
+        return url_derivado(archivo, nombre)
+    except Exception:
+        return ''
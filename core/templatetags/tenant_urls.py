@@ -2,7 +2,8 @@
 Template tags personalizados para generar URLs con prefijo de tenant
 """
 from django import template
-from django.urls import reverse
+
+from core.url_helpers import con_prefijo, reverse_en_cache
 
 register = template.Library()
 
@@ -17,20 +18,10 @@ def tenant_url(context, viewname, *args, **kwargs):
         <a href="{% tenant_url 'core:paciente_list' %}">Pacientes</a>
         <a href="{% tenant_url 'core:paciente_detail' pk=paciente.id %}">Ver paciente</a>
     """
-    # Obtener la URL normal
-    url = reverse(viewname, args=args, kwargs=kwargs)
-    
-    # Obtener el request del contexto
+    url = reverse_en_cache(viewname, args=args, kwargs=kwargs)
+
+    # Agregar el prefijo del tenant del request, si existe
     request = context.get('request')
     if request:
-        # Obtener el prefijo del tenant si existe
-        tenant_prefix = getattr(request, 'tenant_prefix', '')
-        
-        # Si existe prefijo y la URL no lo incluye ya, agregarlo
-        if tenant_prefix and not url.startswith(tenant_prefix):
-            # Asegurar que la URL no tenga doble slash
-            if url.startswith('/'):
-                url = url[1:]
-            url = f'{tenant_prefix}/{url}'
-    
+        url = con_prefijo(url, getattr(request, 'tenant_prefix', ''))
     return url
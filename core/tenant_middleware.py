@@ -2,6 +2,9 @@ from django.conf import settings
 from django.http import Http404
 from django_tenants.middleware.main import TenantMainMiddleware
 from django_tenants.utils import get_tenant_model, get_tenant_domain_model
+import logging
+
+logger = logging.getLogger(__name__)
 
 class TenantByParamMiddleware(TenantMainMiddleware):
     """
@@ -42,7 +45,6 @@ class TenantByParamMiddleware(TenantMainMiddleware):
         # Log para debug del tenant
         tenant_param = request.GET.get('tenant')
         if tenant_param:
-            # Log del parámetro tenant detectado
-            print(f"DEBUG: Parámetro tenant detectado: {tenant_param}")
+            logger.debug("Parámetro tenant detectado: %s", tenant_param)
         
         return super().__call__(request)
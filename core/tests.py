@@ -1,3 +1,121 @@
-from django.test import TestCase
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django_tenants.test.cases import TenantTestCase
 
-# Create your tests here.
+
+class PresupuestoImportacionTests(SimpleTestCase):
+    """Arranque en frío de un worker: django.setup() + ROOT_URLCONF (ver `manage.py medir_importacion`)."""
+
+    def test_urlconf_dentro_del_presupuesto(self):
+        from core.management.commands.medir_importacion import medir
+
+        _, total_ms, pesados = medir(settings.ROOT_URLCONF)
+        self.assertLessEqual(
+            total_ms, settings.IMPORT_TIME_BUDGET_MS,
+            f'Importar {settings.ROOT_URLCONF} tomó {total_ms:.1f} ms '
+            f'(presupuesto {settings.IMPORT_TIME_BUDGET_MS} ms)'
+        )
+        self.assertEqual(pesados, [], 'Librerías pesadas importadas al arrancar')
+
+
+# {% static %} sin el manifest de collectstatic
+@override_settings(STORAGES={
+    **settings.STORAGES,
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+})
+class PresupuestoPesoPaginasTests(SimpleTestCase):
+    """
+    Peso de las plantillas a las que se les extrajo el JS/CSS inline (ver
+    `manage.py verificar_peso_paginas`). Se renderizan y se descuenta lo que
+    aporta core/base.html renderizada con la misma request, así solo cuenta lo
+    propio de cada página.
+    """
+
+    def _request(self):
+        from django.contrib.auth.models import AnonymousUser
+        from django.test import RequestFactory
+        from core.principal import ANONIMO
+        from tenants.models import Clinica
+
+        request = RequestFactory().get('/prueba/')
+        request.user = AnonymousUser()
+        request.principal = ANONIMO
+        request.tenant = Clinica(schema_name='prueba', nombre='Prueba')
+        request.tenant_prefix = '/prueba'
+        return request
+
+    def _contexto(self):
+        """Lo mínimo para que las etiquetas {% tenant_url %} y los campos del formulario resuelvan, sin BD."""
+        from django import forms
+
+        class FormularioCita(forms.Form):
+            dentista = forms.CharField()
+            unidad_dental = forms.CharField()
+            servicios_planeados = forms.CharField()
+            motivo = forms.CharField()
+            notas = forms.CharField()
+
+        paciente = {'id': 1, 'pk': 1, 'nombre': 'Paciente', 'apellido': 'Prueba'}
+        return {
+            'cita_form': FormularioCita(),
+            'paciente': paciente,
+            'cita': {'id': 1, 'pk': 1, 'paciente': paciente},
+        }
+
+    def test_plantillas_dentro_del_presupuesto(self):
+        from django.template.loader import render_to_string
+        from core.management.commands.verificar_peso_paginas import PLANTILLAS_PESADAS, kb, kb_inline
+
+        base = render_to_string('core/base.html', self._contexto(), request=self._request())
+        for nombre in PLANTILLAS_PESADAS:
+            with self.subTest(plantilla=nombre):
+                html = render_to_string(nombre, self._contexto(), request=self._request())
+                html_kb = kb(html) - kb(base)
+                inline_kb = kb_inline(html) - kb_inline(base)
+                self.assertLessEqual(
+                    html_kb, settings.PAGE_HTML_BUDGET_KB,
+                    f'{nombre}: {html_kb:.1f} KB de HTML propio (presupuesto {settings.PAGE_HTML_BUDGET_KB} KB)'
+                )
+                self.assertLessEqual(
+                    inline_kb, settings.PAGE_INLINE_BUDGET_KB,
+                    f'{nombre}: {inline_kb:.1f} KB de JS/CSS inline (presupuesto {settings.PAGE_INLINE_BUDGET_KB} KB)'
+                )
+
+
+class PresupuestoConsultasTests(TenantTestCase):
+    """
+    Presupuesto de consultas de cada ruta GET de core/urls.py contra un tenant
+    con datos sintéticos (mismo recorrido que `manage.py verificar_presupuestos_consultas`).
+    """
+
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.nombre = 'Clínica de pruebas'
+
+    def setUp(self):
+        from io import StringIO
+        from django.contrib.auth.models import User
+        from django.core.management import call_command
+        from django.test import Client
+
+        super().setUp()
+        call_command(
+            'generar_datos_sinteticos', tenant=self.tenant.schema_name, pacientes=40, dentistas=2,
+            unidades=2, lotes=20, meses=2, stdout=StringIO(),
+        )
+        usuario = User.objects.create_superuser('presupuesto', 'presupuesto@example.com', 'x')
+        self.client = Client(raise_request_exception=False)
+        self.client.force_login(usuario)
+
+    def test_rutas_dentro_del_presupuesto(self):
+        from core.management.commands.verificar_presupuestos_consultas import rutas_a_verificar
+        from core.presupuesto_consultas import assert_presupuesto
+
+        rutas, _ = rutas_a_verificar()
+        self.assertTrue(rutas)
+        for patron, ruta in rutas:
+            with self.subTest(ruta=patron.name):
+                url = f'/{self.tenant.schema_name}/{ruta}'
+                respuesta = assert_presupuesto(self.client, url)
+                # Una vista que truena tras pocas consultas también "cumple" el presupuesto
+                self.assertLess(respuesta.status_code, 500, f'{url} respondió {respuesta.status_code}')
@@ -1,7 +1,83 @@
 """
 Helper functions for generating tenant-aware URLs in views
 """
-from django.urls import reverse
+from functools import lru_cache
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import NoReverseMatch, get_script_prefix, get_urlconf, reverse
+from django.utils.module_loading import import_string
+
+# Máximo de URLs distintas (nombre + argumentos) guardadas por proceso
+MAX_URLS_EN_CACHE = 4096
+
+
+@lru_cache(maxsize=MAX_URLS_EN_CACHE)
+def _reverse_memorizado(urlconf, prefijo_script, viewname, args, kwargs):
+    # urlconf y prefijo_script solo forman parte de la llave; reverse() los toma del hilo
+    return reverse(
+        viewname,
+        args=[valor for _, valor in args] or None,
+        kwargs={clave: valor for clave, (_, valor) in kwargs} or None,
+    )
+
+
+def reverse_en_cache(viewname, args=None, kwargs=None, urlconf=None, current_app=None):
+    """
+    reverse() con caché por proceso para (urlconf, nombre, args, kwargs).
+
+    Las plantillas y redirecciones resuelven una y otra vez los mismos nombres
+    (el menú lateral, decenas por página); las URLs no cambian mientras el
+    proceso vive, así que solo la primera llamada recorre los patrones. Los
+    argumentos se guardan junto con su tipo (1 y True no comparten entrada).
+    Con urlconf o current_app explícitos, o argumentos no hashables, se usa
+    reverse() directo. NoReverseMatch no se guarda.
+    """
+    if urlconf is not None or current_app is not None:
+        return reverse(viewname, urlconf=urlconf, args=args, kwargs=kwargs, current_app=current_app)
+    try:
+        llave_args = tuple((type(valor), valor) for valor in args or ())
+        llave_kwargs = tuple(sorted((clave, (type(valor), valor)) for clave, valor in (kwargs or {}).items()))
+        return _reverse_memorizado(get_urlconf(), get_script_prefix(), viewname, llave_args, llave_kwargs)
+    except TypeError:
+        # Argumento no hashable (o no comparable al ordenar)
+        return reverse(viewname, args=args, kwargs=kwargs)
+
+
+@lru_cache(maxsize=1024)
+def _requiere_parametros(urlconf, prefijo_script, url_name):
+    try:
+        reverse(url_name)
+        return False
+    except NoReverseMatch:
+        return True
+
+
+def url_requiere_parametros(url_name):
+    """True si `url_name` no se puede resolver sin argumentos (calculado una vez por proceso)."""
+    if not isinstance(url_name, str) or not url_name:
+        return True
+    return _requiere_parametros(get_urlconf(), get_script_prefix(), url_name)
+
+
+def con_prefijo(url, tenant_prefix):
+    """Antepone el prefijo del tenant (p. ej. '/demo') si existe y la URL aún no lo trae."""
+    if not tenant_prefix or url.startswith(tenant_prefix):
+        return url
+    # Asegurar que la URL no tenga doble slash
+    return f'{tenant_prefix}/{url[1:] if url.startswith("/") else url}'
+
+
+def limpiar_cache_urls():
+    _reverse_memorizado.cache_clear()
+    _requiere_parametros.cache_clear()
+
+
+@receiver(setting_changed)
+def _limpiar_al_cambiar_urlconf(setting, **kwargs):
+    # override_settings(ROOT_URLCONF=...) en pruebas o comandos
+    if setting == 'ROOT_URLCONF':
+        limpiar_cache_urls()
 
 
 def tenant_reverse(request, viewname, args=None, kwargs=None):
@@ -31,17 +107,37 @@ def tenant_reverse(request, viewname, args=None, kwargs=None):
     Returns:
         str: URL completa con prefijo del tenant si existe
     """
-    # Obtener la URL normal usando reverse de Django
-    url = reverse(viewname, args=args, kwargs=kwargs)
+    url = reverse_en_cache(viewname, args=args, kwargs=kwargs)
+    return con_prefijo(url, getattr(request, 'tenant_prefix', ''))
 
-    # Obtener el prefijo del tenant del request
-    tenant_prefix = getattr(request, 'tenant_prefix', '')
 
-    # Si existe prefijo y la URL no lo incluye ya, agregarlo
-    if tenant_prefix and not url.startswith(tenant_prefix):
-        # Asegurar que la URL no tenga doble slash
-        if url.startswith('/'):
-            url = url[1:]
-        url = f'{tenant_prefix}/{url}'
+def lazy_view(ruta, **initkwargs):
+    """
+    Devuelve una vista que importa su módulo la primera vez que se invoca.
+
+    Permite declarar rutas en el URLconf sin importar módulos pesados (PDF,
+    Excel, reportes) al arrancar el worker. Acepta funciones o vistas basadas
+    en clase; en este último caso se llama a as_view(**initkwargs) una sola vez.
+
+    Uso en urls.py:
+        path('reportes/ingresos/', lazy_view('core.views_reportes.ReporteIngresosView'),
+             name='reporte_ingresos'),
+
+    Nota: los atributos que los middlewares leen antes de ejecutar la vista
+    (p. ej. csrf_exempt) no se propagan; esas vistas deben importarse directo.
+    """
+    modulo, nombre = ruta.rsplit('.', 1)
+    resuelta = []
+
+    def vista(request, *args, **kwargs):
+        if not resuelta:
+            objeto = import_string(ruta)
+            if isinstance(objeto, type):
+                objeto = objeto.as_view(**initkwargs)
+            resuelta.append(objeto)
+        return resuelta[0](request, *args, **kwargs)
 
-    return url
+    vista.__name__ = vista.__qualname__ = nombre
+    vista.__module__ = modulo
+    vista.lazy_view_path = ruta
+    return vista
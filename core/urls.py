@@ -5,7 +5,7 @@ from django.shortcuts import redirect
 from .views import (
     crear_paciente_ajax,  # Ahora existe
     get_servicios_for_dentista_api,
-    DashboardView, DashboardFinancieroView,
+    DashboardView,
     PacienteListView, PacienteDetailView, PacienteCreateView, PacienteUpdateView, PacienteDeleteView,
     SaldosPendientesListView, PacientesPendientesPagoListView, RegistrarPagoPacienteView,
     ServicioListView, ServicioCreateView, ServicioUpdateView, ServicioDeleteView,
@@ -14,7 +14,7 @@ from .views import (
     PagoListView, PagoCreateView, PagoUpdateView, PagoDeleteView,
     ProveedorListView, ProveedorCreateView, ProveedorUpdateView, ProveedorDeleteView,
     InsumoListView, InsumoCreateView, InsumoUpdateView, InsumoDeleteView,
-    inventario_exportar_excel, inventario_importar_excel, ajustar_stock_lote,
+    ajustar_stock_lote,
     CompraListView, CompraCreateView, CompraUpdateView, CompraDeleteView, RecibirCompraView,
     AgendaView, AgendaLegacyView, CitaListView, CitasPendientesPagoListView,  # FinalizarCitaView deprecated
     CitaDetailView, CitaCreateView, CitaUpdateView, CitaDeleteView, CitaManageView,
@@ -26,18 +26,12 @@ from .views import (
     odontograma_api_get,
     odontograma_api_update,
     diagnostico_api_list,
-    reporte_ingresos_api,
-    reporte_saldos_api,
-    ReporteIngresosView, ReporteSaldosView, ReporteFacturacionView,
-    ReporteServiciosMasVendidosView, ReporteIngresosPorDentistaView,
     DiagnosticoListView, DiagnosticoCreateView, DiagnosticoUpdateView, DiagnosticoDeleteView,
-    exportar_ingresos_excel, exportar_saldos_excel, exportar_facturacion_excel,
-    generar_recibo_pdf, generar_servicios_vendidos_pdf,
     DashboardCofeprisView,
     AvisoFuncionamientoListView, AvisoFuncionamientoCreateView, AvisoFuncionamientoUpdateView,
     EquipoListView, EquipoCreateView, EquipoUpdateView, EquipoDeleteView,
     ResiduosListView, ResiduosCreateView, ResiduosUpdateView, ResiduosDeleteView,
-    InvitarPacienteView, PacientePagosListView, ResetPasswordView, CuestionarioHistorialView, CuestionarioHistorialMejoradoView,
+    InvitarPacienteView, ResetPasswordView, CuestionarioHistorialView, CuestionarioHistorialMejoradoView,
     PreguntaHistorialListView, PreguntaHistorialCreateView, PreguntaHistorialUpdateView, PreguntaHistorialDeleteView,
     UnidadDentalListView, UnidadDentalDetailView, UnidadDentalCreateView, UnidadDentalUpdateView, UnidadDentalDeleteView,
     GestionarHorarioView, 
@@ -51,12 +45,16 @@ from .views import (
     PreguntaHistorialListView, PreguntaHistorialCreateView, PreguntaHistorialUpdateView
 )
 
+# Reportes, exportaciones PDF/Excel y portal del paciente se resuelven con
+# lazy_view() para no importar ReportLab/openpyxl al cargar el URLconf
+from .url_helpers import lazy_view
+
 # Importar vistas de permisos
 from .views_permissions import (
     PermisosAdminView, ModuloSistemaListView, ModuloSistemaCreateView, ModuloSistemaUpdateView, ModuloSistemaDeleteView,
     SubmenuItemListView, SubmenuItemCreateView, SubmenuItemUpdateView, SubmenuItemDeleteView,
     PermisosRolMatrizView, LogAccesoListView, inicializar_sistema_permisos, clonar_permisos_rol,
-    obtener_matriz_permisos_ajax, guardar_matriz_permisos_ajax
+    obtener_matriz_permisos_ajax, guardar_matriz_permisos_ajax, rendimiento_consultas_ajax
 )
 
 # Importar vistas de prueba
@@ -77,6 +75,18 @@ from .views_costos import (
     ComprasSinCostosView, CapturarCostosCompraView, ReporteValorInventarioView
 )
 
+# Con ASGI los endpoints JSON de consulta frecuente usan sus versiones async
+# (mismos nombres de ruta y mismas respuestas)
+from django.conf import settings
+
+pacientes_api = views.pacientes_api
+if settings.ASGI_MODE:
+    from .views_async import (
+        agenda_events, get_horarios_disponibles_api, get_horario_dentista_api,
+        odontograma_api_get, pacientes_api,
+        trabajo_laboratorio_obtener_costo_api, obtener_citas_paciente_api,
+    )
+
 
 app_name = 'core'
 
@@ -85,26 +95,26 @@ urlpatterns = [
     path('dashboard/', DashboardView.as_view(), name='dashboard'),  # Alias para compatibilidad
     
     # Dashboard Financiero
-    path('finanzas/', DashboardFinancieroView.as_view(), name='dashboard_financiero'),
+    path('finanzas/', lazy_view('core.views_reportes.DashboardFinancieroView'), name='dashboard_financiero'),
     
     # Autenticación
     path('logout/', CustomLogoutView.as_view(), name='logout'),
 
     # Rutas de Reportes
-    path('reportes/ingresos/', ReporteIngresosView.as_view(), name='reporte_ingresos'),
-    path('reportes/ingresos/export/', exportar_ingresos_excel, name='exportar_ingresos_excel'),
-    path('reportes/saldos/', ReporteSaldosView.as_view(), name='reporte_saldos'),
-    path('reportes/saldos/export/', exportar_saldos_excel, name='exportar_saldos_excel'),
-    path('reportes/facturacion/', ReporteFacturacionView.as_view(), name='reporte_facturacion'),
-    path('reportes/facturacion/export/', exportar_facturacion_excel, name='exportar_facturacion_excel'),
-    path('reportes/servicios-vendidos/', ReporteServiciosMasVendidosView.as_view(), name='reporte_servicios_vendidos'),
-    path('reportes/servicios-vendidos/pdf/', generar_servicios_vendidos_pdf, name='reporte_servicios_vendidos_pdf'),
-    path('reportes/servicios-vendidos/periodo/', views.ReporteServiciosVendidosPeriodoView.as_view(), name='reporte_servicios_vendidos_periodo'),
-    path('reportes/ingresos-dentista/', ReporteIngresosPorDentistaView.as_view(), name='reporte_ingresos_dentista'),
-    path('reportes/ingresos-dentista/periodo/', views.ReporteIngresosDentistaPeriodoView.as_view(), name='reporte_ingresos_dentista_periodo'),
+    path('reportes/ingresos/', lazy_view('core.views_reportes.ReporteIngresosView'), name='reporte_ingresos'),
+    path('reportes/ingresos/export/', lazy_view('core.views_exportar.exportar_ingresos_excel'), name='exportar_ingresos_excel'),
+    path('reportes/saldos/', lazy_view('core.views_reportes.ReporteSaldosView'), name='reporte_saldos'),
+    path('reportes/saldos/export/', lazy_view('core.views_exportar.exportar_saldos_excel'), name='exportar_saldos_excel'),
+    path('reportes/facturacion/', lazy_view('core.views_reportes.ReporteFacturacionView'), name='reporte_facturacion'),
+    path('reportes/facturacion/export/', lazy_view('core.views_exportar.exportar_facturacion_excel'), name='exportar_facturacion_excel'),
+    path('reportes/servicios-vendidos/', lazy_view('core.views_reportes.ReporteServiciosMasVendidosView'), name='reporte_servicios_vendidos'),
+    path('reportes/servicios-vendidos/pdf/', lazy_view('core.views_exportar.generar_servicios_vendidos_pdf'), name='reporte_servicios_vendidos_pdf'),
+    path('reportes/servicios-vendidos/periodo/', lazy_view('core.views_reportes.ReporteServiciosVendidosPeriodoView'), name='reporte_servicios_vendidos_periodo'),
+    path('reportes/ingresos-dentista/', lazy_view('core.views_reportes.ReporteIngresosPorDentistaView'), name='reporte_ingresos_dentista'),
+    path('reportes/ingresos-dentista/periodo/', lazy_view('core.views_reportes.ReporteIngresosDentistaPeriodoView'), name='reporte_ingresos_dentista_periodo'),
 
     # Rutas de la API
-    path('api/pacientes/', views.pacientes_api, name='pacientes_api'),
+    path('api/pacientes/', pacientes_api, name='pacientes_api'),
     path('api/pacientes/crear/', crear_paciente_ajax, name='crear_paciente_ajax'),
     path('api/pacientes/<int:paciente_id>/saldo/', views.paciente_saldo_api, name='paciente_saldo_api'),
     path('api/pacientes/<int:paciente_id>/pagos/', views.paciente_pagos_api, name='paciente_pagos_api'),
@@ -114,12 +124,12 @@ urlpatterns = [
     path('api/odontograma/<int:cliente_id>/update/', odontograma_api_update, name='odontograma_api_update'),
     path('api/diagnosticos/', diagnostico_api_list, name='diagnostico_api_list'),
     path('api/odontograma/partial/', views.odontograma_partial, name='odontograma_partial'),
-    path('api/reportes/ingresos/', reporte_ingresos_api, name='reporte_ingresos_api'),
+    path('api/reportes/ingresos/', lazy_view('core.views_reportes.reporte_ingresos_api'), name='reporte_ingresos_api'),
     path('api/dentista/<int:dentista_id>/servicios/', get_servicios_for_dentista_api, name='api_servicios_por_dentista'),
     path('api/dentista/<int:dentista_id>/horario/', get_horario_dentista_api, name='api_horario_dentista'),
     path('dentistas/', DentistaListView.as_view(), name='dentista_list'),
     path('api/dentista/<int:dentista_id>/horarios-disponibles/', get_horarios_disponibles_api, name='api_horarios_disponibles'),
-    path('api/reportes/saldos/', reporte_saldos_api, name='reporte_saldos_api'),
+    path('api/reportes/saldos/', lazy_view('core.views_reportes.reporte_saldos_api'), name='reporte_saldos_api'),
 
     # Rutas de la aplicación
     path('agenda/', AgendaView.as_view(), name='agenda'),
@@ -187,7 +197,7 @@ urlpatterns = [
     path('finanzas/pagos/<int:pk>/edit/', PagoUpdateView.as_view(), name='pago_edit'),
     path('finanzas/pagos/<int:pk>/delete/', PagoDeleteView.as_view(), name='pago_delete'),
     path('finanzas/pagos/<int:pk>/recibo/', ReciboPagoView.as_view(), name='recibo_pago'),
-    path('finanzas/pagos/<int:pk>/recibo/pdf/', generar_recibo_pdf, name='generar_recibo_pdf'),
+    path('finanzas/pagos/<int:pk>/recibo/pdf/', lazy_view('core.views_exportar.generar_recibo_pdf'), name='generar_recibo_pdf'),
     
     # Redirección de compatibilidad
     path('pagos/', lambda request: redirect('/finanzas/', permanent=True)),
@@ -201,8 +211,8 @@ urlpatterns = [
     path('insumos/new/', InsumoCreateView.as_view(), name='insumo_create'),
     path('insumos/<int:pk>/edit/', InsumoUpdateView.as_view(), name='insumo_edit'),
     path('insumos/<int:pk>/delete/', InsumoDeleteView.as_view(), name='insumo_delete'),
-    path('insumos/exportar/', inventario_exportar_excel, name='inventario_exportar'),
-    path('insumos/importar/', inventario_importar_excel, name='inventario_importar'),
+    path('insumos/exportar/', lazy_view('core.views_exportar.inventario_exportar_excel'), name='inventario_exportar'),
+    path('insumos/importar/', lazy_view('core.views_exportar.inventario_importar_excel'), name='inventario_importar'),
     path('insumos/lote/<int:lote_id>/ajustar/', ajustar_stock_lote, name='ajustar_stock_lote'),
 
     path('compras/', CompraListView.as_view(), name='compra_list'),
@@ -233,9 +243,9 @@ urlpatterns = [
     path('cofepris/residuos/<int:pk>/eliminar/', ResiduosDeleteView.as_view(), name='residuos_delete'),
 
     # Rutas del Portal del Paciente
-    path('portal/pagos/', PacientePagosListView.as_view(), name='portal_pagos'),
-    path('portal/historial/', views.PortalHistorialPacienteView.as_view(), name='portal_historial'),
-    path('portal/historial/completar/', views.PortalCompletarHistorialView.as_view(), name='portal_completar_historial'),
+    path('portal/pagos/', lazy_view('core.views_portal.PacientePagosListView'), name='portal_pagos'),
+    path('portal/historial/', lazy_view('core.views_portal.PortalHistorialPacienteView'), name='portal_historial'),
+    path('portal/historial/completar/', lazy_view('core.views_portal.PortalCompletarHistorialView'), name='portal_completar_historial'),
 
     # === RUTAS CUESTIONARIO DE HISTORIAL CLÍNICO ===
     
@@ -317,6 +327,9 @@ urlpatterns = [
     path('api/permisos/matriz/obtener/', obtener_matriz_permisos_ajax, name='admin_permisos_obtener_matriz'),
     path('api/permisos/matriz/guardar/', guardar_matriz_permisos_ajax, name='admin_permisos_guardar_matriz'),
 
+    # Histograma de consultas por vista (solo superusuarios)
+    path('admin/rendimiento/consultas/', rendimiento_consultas_ajax, name='admin_rendimiento_consultas'),
+
     # === RUTAS PARA CONSENTIMIENTO INFORMADO ===
     
     # Gestión de documentos de consentimiento
@@ -330,6 +343,8 @@ urlpatterns = [
     path('pacientes-consentimientos/', views.PacienteConsentimientoListView.as_view(), name='paciente_consentimiento_list'),
     path('pacientes-consentimientos/<int:pk>/', views.PacienteConsentimientoDetailView.as_view(), name='paciente_consentimiento_detail'),
     path('pacientes-consentimientos/<int:paciente_consentimiento_id>/firmar/', views.firmar_consentimiento, name='firmar_consentimiento'),
+    path('pacientes-consentimientos/<int:pk>/pdf-firmado/', views.descargar_consentimiento_firmado, name='descargar_consentimiento_firmado'),
+    path('pacientes-consentimientos/exportar/', views.exportar_consentimientos_firmados, name='exportar_consentimientos_firmados'),
     
     # Integración con cuestionario
     path('cuestionarios/<int:cuestionario_id>/presentar-consentimiento/', views.presentar_consentimiento_desde_cuestionario, name='presentar_consentimiento_desde_cuestionario'),
@@ -365,8 +380,6 @@ urlpatterns = [
 # Solo incluir en modo desarrollo (DEBUG=True)
 # Estas rutas NO deben estar disponibles en producción
 
-from django.conf import settings
-
 if settings.DEBUG:
     from .urls_debug import debug_patterns
     urlpatterns += debug_patterns
@@ -4,9 +4,8 @@ from core.mixins import TenantLoginRequiredMixin, tenant_login_required, TenantS
 from django.conf import settings
 from django.db import models
 from django.db.models import Count, Sum, Avg, Min, Max, F, Q
-from django.db.models.functions import ExtractWeek, ExtractYear, TruncMonth, Coalesce
+from django.db.models.functions import Coalesce
 from django.http import JsonResponse, HttpResponse, Http404, FileResponse
-from django.core.exceptions import PermissionDenied
 from django.utils import timezone
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.shortcuts import get_object_or_404, redirect, render
@@ -26,16 +25,10 @@ from django.contrib.messages.views import SuccessMessageMixin
 from django.db import transaction
 from django.contrib import messages
 from django.template.loader import render_to_string
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_RIGHT, TA_CENTER
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, Table, TableStyle
-from reportlab.lib.pagesizes import letter
-from reportlab.lib.units import mm
+from django.core.cache import cache
 import string
 import random
 from datetime import timedelta
-from openpyxl import Workbook
 from datetime import datetime, timedelta
 from django.shortcuts import redirect
 from django.contrib.auth import logout
@@ -47,9 +40,42 @@ import logging
 # Importar forms y models de manera controlada para evitar ciclos
 from . import forms
 from . import models
+from . import services
+from . import cache_fragmentos
+from .presupuesto_consultas import presupuesto_consultas
+from .cache_http import cache_catalogo
+from .principal import obtener_principal
 
 logger = logging.getLogger(__name__)
 
+# Vistas que viven en módulos propios para no cargar ReportLab, openpyxl ni los
+# reportes al importar core.views. Se resuelven bajo demanda para mantener
+# compatibilidad con el código que aún las importa desde este módulo.
+_VISTAS_EN_MODULOS = {
+    'core.views_exportar': (
+        'generar_recibo_pdf', 'exportar_ingresos_excel', 'exportar_saldos_excel',
+        'exportar_facturacion_excel', 'generar_servicios_vendidos_pdf',
+        'inventario_exportar_excel', 'inventario_importar_excel',
+    ),
+    'core.views_reportes': (
+        'DashboardFinancieroView', 'reporte_ingresos_api', 'reporte_saldos_api',
+        'ReporteServiciosMasVendidosView', 'ReporteIngresosPorDentistaView',
+        'ReporteServiciosVendidosPeriodoView', 'ReporteIngresosDentistaPeriodoView',
+        'ReporteIngresosView', 'ReporteSaldosView', 'ReporteFacturacionView',
+    ),
+    'core.views_portal': (
+        'PacientePagosListView', 'PortalHistorialPacienteView', 'PortalCompletarHistorialView',
+    ),
+}
+
+
+def __getattr__(nombre):
+    import importlib
+    for modulo, nombres in _VISTAS_EN_MODULOS.items():
+        if nombre in nombres:
+            return getattr(importlib.import_module(modulo), nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
 # === SAT Catalogs CRUD ===
 # REFACTORIZADO: Usando factory pattern para reducir duplicación de código
 # Antes: ~140 líneas de código duplicado
@@ -123,247 +149,6 @@ SatUsoCFDIUpdateView = type(
 )
 SatUsoCFDIDeleteView = _uso_cfdi_views['delete']
 
-# === DASHBOARD FINANCIERO INTEGRAL ===
-class DashboardFinancieroView(TenantLoginRequiredMixin, TemplateView):
-    template_name = 'core/dashboard_financiero.html'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        # Obtener fechas para filtros
-        hoy = timezone.now().date()
-        inicio_mes = hoy.replace(day=1)
-        inicio_ano = hoy.replace(month=1, day=1)
-        
-        # === MÉTRICAS PRINCIPALES ===
-        context.update(self.get_metricas_principales(hoy, inicio_mes, inicio_ano))
-        
-        # === GRÁFICOS Y TENDENCIAS ===
-        context.update(self.get_datos_graficos(hoy, inicio_mes))
-        
-        # === ALERTAS Y PENDIENTES ===
-        context.update(self.get_alertas_pendientes())
-        
-        # === PAGOS RECIENTES ===
-        context.update(self.get_pagos_recientes())
-        
-        # === REPORTES RÁPIDOS ===
-        context.update(self.get_accesos_reportes())
-        
-        return context
-    
-    def get_metricas_principales(self, hoy, inicio_mes, inicio_ano):
-        """Obtiene las métricas principales del dashboard"""
-        try:
-            # Ingresos del día
-            ingresos_hoy = models.Pago.objects.filter(
-                fecha_pago__date=hoy
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            
-            # Ingresos del mes
-            ingresos_mes = models.Pago.objects.filter(
-                fecha_pago__date__gte=inicio_mes
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            
-            # Ingresos del año
-            ingresos_ano = models.Pago.objects.filter(
-                fecha_pago__date__gte=inicio_ano
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            
-            # Saldos pendientes totales (usar saldo_global)
-            saldos_pendientes = models.Paciente.objects.aggregate(
-                total=Sum('saldo_global')
-            )['total'] or 0
-
-            # Pagos del día (cantidad)
-            pagos_hoy_count = models.Pago.objects.filter(
-                fecha_pago__date=hoy
-            ).count()
-
-            # Pacientes con saldo pendiente
-            pacientes_pendientes = models.Paciente.objects.filter(
-                saldo_global__gt=0
-            ).count()
-
-            # Citas pendientes de pago (citas completadas con saldo > 0)
-            # Como costo_real es un property, calculamos en Python
-            citas_completadas = models.Cita.objects.filter(
-                estado__in=['COM', 'ATN']  # Completadas o Atendidas
-            ).prefetch_related('servicios_planeados', 'tratamientos_realizados__servicios', 'pagos')
-
-            citas_pendientes = sum(1 for cita in citas_completadas if cita.saldo_pendiente > 0)
-            
-            # Promedio de pago diario del mes
-            dias_transcurridos = (hoy - inicio_mes).days + 1
-            promedio_diario = ingresos_mes / dias_transcurridos if dias_transcurridos > 0 else 0
-            
-            # Comparación con mes anterior
-            inicio_mes_anterior = (inicio_mes - timedelta(days=1)).replace(day=1)
-            fin_mes_anterior = inicio_mes - timedelta(days=1)
-            
-            ingresos_mes_anterior = models.Pago.objects.filter(
-                fecha_pago__date__gte=inicio_mes_anterior,
-                fecha_pago__date__lte=fin_mes_anterior
-            ).aggregate(total=Sum('monto'))['total'] or 0
-            
-            # Calcular porcentaje de crecimiento
-            if ingresos_mes_anterior > 0:
-                crecimiento_mes = ((ingresos_mes - ingresos_mes_anterior) / ingresos_mes_anterior) * 100
-            else:
-                crecimiento_mes = 100 if ingresos_mes > 0 else 0
-            
-            return {
-                'ingresos_hoy': ingresos_hoy,
-                'ingresos_mes': ingresos_mes,
-                'ingresos_ano': ingresos_ano,
-                'saldos_pendientes': saldos_pendientes,
-                'pagos_hoy_count': pagos_hoy_count,
-                'pacientes_pendientes': pacientes_pendientes,
-                'citas_pendientes': citas_pendientes,
-                'promedio_diario': promedio_diario,
-                'crecimiento_mes': crecimiento_mes,
-                'ingresos_mes_anterior': ingresos_mes_anterior,
-            }
-        except Exception as e:
-            logger.error(f"Error calculando métricas financieras: {e}")
-            return {}
-    
-    def get_datos_graficos(self, hoy, inicio_mes):
-        """Obtiene datos para gráficos y tendencias"""
-        try:
-            # Ingresos por día (últimos 30 días)
-            hace_30_dias = hoy - timedelta(days=30)
-            ingresos_diarios = []
-            labels_dias = []
-            
-            for i in range(30):
-                fecha = hace_30_dias + timedelta(days=i)
-                ingreso = models.Pago.objects.filter(
-                    fecha_pago__date=fecha
-                ).aggregate(total=Sum('monto'))['total'] or 0
-                
-                ingresos_diarios.append(float(ingreso))
-                labels_dias.append(fecha.strftime('%d/%m'))
-            
-            # Métodos de pago más utilizados
-            metodos_pago = models.Pago.objects.filter(
-                fecha_pago__date__gte=inicio_mes
-            ).values('metodo_pago').annotate(
-                total=Sum('monto'),
-                cantidad=Count('id')
-            ).order_by('-total')[:5]
-            
-            # Servicios más rentables (usando TratamientoCita)
-            # Obtener servicios desde tratamientos realizados en el mes
-            servicios_rentables = models.Servicio.objects.filter(
-                tratamientocita__cita__fecha_hora__date__gte=inicio_mes
-            ).annotate(
-                total_ingresos=Sum('precio'),
-                cantidad=Count('tratamientocita', distinct=True)
-            ).order_by('-total_ingresos')[:5]
-            
-            # Ingresos por dentista (mes actual)
-            ingresos_dentistas = models.Pago.objects.filter(
-                fecha_pago__date__gte=inicio_mes,
-                cita__dentista__isnull=False
-            ).values(
-                'cita__dentista__nombre',
-                'cita__dentista__apellido'
-            ).annotate(
-                total=Sum('monto')
-            ).order_by('-total')[:10]
-            
-            return {
-                'ingresos_diarios': ingresos_diarios,
-                'labels_dias': labels_dias,
-                'metodos_pago': list(metodos_pago),
-                'servicios_rentables': list(servicios_rentables),
-                'ingresos_dentistas': list(ingresos_dentistas),
-            }
-        except Exception as e:
-            logger.error(f"Error obteniendo datos de gráficos: {e}")
-            return {}
-    
-    def get_alertas_pendientes(self):
-        """Obtiene alertas y pendientes críticos"""
-        try:
-            # Pacientes con saldo alto
-            pacientes_saldo_alto = models.Paciente.objects.filter(
-                saldo_global__gt=5000  # Más de $5000
-            ).order_by('-saldo_global')[:5]
-            
-            # Citas sin pagar (más de 7 días) - Citas completadas con saldo pendiente
-            hace_una_semana = timezone.now() - timedelta(days=7)
-            # Como costo_real es un property, filtramos en Python
-            citas_completadas_antiguas = models.Cita.objects.filter(
-                estado__in=['COM', 'ATN'],  # Completada o Atendida
-                fecha_hora__lt=hace_una_semana
-            ).select_related('paciente', 'dentista').prefetch_related(
-                'servicios_planeados', 'tratamientos_realizados__servicios', 'pagos'
-            ).order_by('-fecha_hora')
-
-            citas_vencidas = [cita for cita in citas_completadas_antiguas if cita.saldo_pendiente > 0][:5]
-            
-            # Pagos del día que requieren atención
-            pagos_altos_hoy = models.Pago.objects.filter(
-                fecha_pago__date=timezone.now().date(),
-                monto__gt=2000
-            ).select_related('cita__paciente').order_by('-monto')[:5]
-            
-            return {
-                'pacientes_saldo_alto': pacientes_saldo_alto,
-                'citas_vencidas': citas_vencidas,
-                'pagos_altos_hoy': pagos_altos_hoy,
-            }
-        except Exception as e:
-            logger.error(f"Error obteniendo alertas: {e}")
-            return {}
-    
-    def get_pagos_recientes(self):
-        """Obtiene los pagos más recientes"""
-        try:
-            pagos_recientes = models.Pago.objects.select_related(
-                'cita__paciente',
-                'cita__dentista'
-            ).order_by('-fecha_pago')[:10]
-            
-            return {
-                'pagos_recientes': pagos_recientes,
-            }
-        except Exception as e:
-            logger.error(f"Error obteniendo pagos recientes: {e}")
-            return {}
-    
-    def get_accesos_reportes(self):
-        """Obtiene accesos rápidos a reportes"""
-        return {
-            'reportes_disponibles': [
-                {
-                    'nombre': 'Reporte de Ingresos',
-                    'descripcion': 'Análisis detallado de ingresos por período',
-                    'url': 'core:reporte_ingresos',
-                    'icon': 'bi bi-graph-up'
-                },
-                {
-                    'nombre': 'Saldos Pendientes',
-                    'descripcion': 'Pacientes con pagos pendientes',
-                    'url': 'core:reporte_saldos',
-                    'icon': 'bi bi-exclamation-triangle'
-                },
-                {
-                    'nombre': 'Reporte de Facturación',
-                    'descripcion': 'Facturación y comprobantes fiscales',
-                    'url': 'core:reporte_facturacion',
-                    'icon': 'bi bi-receipt'
-                },
-                {
-                    'nombre': 'Servicios más Vendidos',
-                    'descripcion': 'Análisis de servicios por demanda',
-                    'url': 'core:reporte_servicios_vendidos',
-                    'icon': 'bi bi-trophy'
-                }
-            ]
-        }
 
 # Fallback simple para "Enviar a caja"
 @tenant_login_required
@@ -387,15 +172,15 @@ class AjaxLoginRequiredMixin(TenantLoginRequiredMixin):
 
 class DashboardView(TenantLoginRequiredMixin, TemplateView):
     def get_template_names(self):
-        user = self.request.user
-        if hasattr(user, 'paciente_perfil'):
+        principal = obtener_principal(self.request.user)
+        if principal.paciente_id:
             return ['core/portal/dashboard.html']
         
-        if user.groups.filter(name='Administrador').exists() or user.is_superuser:
+        if principal.es_admin:
             return ['core/dashboards/admin_dashboard.html']
-        elif user.groups.filter(name='Dentista').exists():
+        elif principal.es_dentista:
             return ['core/dashboards/dentista_dashboard.html']
-        elif user.groups.filter(name='Recepcionista').exists():
+        elif principal.es_recepcion:
             return ['core/dashboards/recepcionista_dashboard.html']
         else:
             return ['core/dashboards/admin_dashboard.html']
@@ -403,8 +188,9 @@ class DashboardView(TenantLoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
+        principal = obtener_principal(user)
         
-        if hasattr(user, 'paciente_perfil'):
+        if principal.paciente_id:
             paciente = user.paciente_perfil
             context['paciente'] = paciente
             context['proximas_citas'] = models.Cita.objects.filter(
@@ -449,7 +235,7 @@ class DashboardView(TenantLoginRequiredMixin, TemplateView):
         context['citas_total_periodo'] = citas_periodo.count()
         context['citas_pendientes_periodo'] = citas_periodo.filter(estado__in=['PRO', 'CON']).count()
         
-        if user.groups.filter(name='Administrador').exists() or user.is_superuser:
+        if principal.es_admin:
             context['ingresos_periodo'] = pagos_periodo.aggregate(total=Sum('monto'))['total'] or 0
             
             # USAR SALDO_GLOBAL DE PACIENTES
@@ -457,23 +243,24 @@ class DashboardView(TenantLoginRequiredMixin, TemplateView):
                 saldo_global__gt=0
             ).aggregate(total=Sum('saldo_global'))['total'] or 0
             
-            from datetime import date
-            alert_date = date.today()
-            proximos_30_dias = alert_date + timedelta(days=30)
-            context['stocks_bajos'] = models.Insumo.objects.filter(stock__lte=F('stock_minimo'))
-            context['insumos_caducados'] = models.LoteInsumo.objects.filter(fecha_caducidad__lt=alert_date).order_by('fecha_caducidad')
-            context['insumos_proximos_a_caducar'] = models.LoteInsumo.objects.filter(
-                fecha_caducidad__gte=alert_date,
-                fecha_caducidad__lte=proximos_30_dias
-            ).order_by('fecha_caducidad')
+            # Alertas de inventario del digest diario (manage.py alertas_inventario)
+            digest = services.InventarioService.digest_alertas()
+            alertas = digest.alertas.all()
+            context['alertas_inventario'] = digest
+            context['stocks_bajos'] = [a for a in alertas if a.tipo == models.AlertaInventario.STOCK_BAJO]
+            context['insumos_caducados'] = [a for a in alertas if a.tipo == models.AlertaInventario.CADUCADO]
+            context['insumos_proximos_a_caducar'] = [
+                a for a in alertas if a.tipo == models.AlertaInventario.PROXIMO_CADUCAR
+            ]
             
-        if user.groups.filter(name='Dentista').exists():
-            perfil = get_object_or_404(models.PerfilDentista, usuario=user)
-            citas_dentista_periodo = citas_periodo.filter(dentista=perfil)
+        if principal.es_dentista:
+            if principal.dentista_id is None:
+                raise Http404("El usuario no tiene perfil de dentista")
+            citas_dentista_periodo = citas_periodo.filter(dentista_id=principal.dentista_id)
             context['citas_dentista_periodo'] = citas_dentista_periodo.count()
             context['pacientes_atendidos_periodo'] = citas_dentista_periodo.filter(estado__in=['ATN', 'COM']).count()
             
-        if user.groups.filter(name='Recepcionista').exists():
+        if principal.es_recepcion:
             context['citas_por_confirmar_periodo'] = citas_periodo.filter(estado='PRO').count()
             context['pacientes_nuevos_periodo'] = pacientes_periodo.count()
             
@@ -604,7 +391,7 @@ class UsuarioDeleteView(TenantSuccessUrlMixin, TenantLoginRequiredMixin, Success
 
     def dispatch(self, request, *args, **kwargs):
         # Solo administradores pueden eliminar usuarios
-        if not (request.user.groups.filter(name='Administrador').exists() or request.user.is_superuser):
+        if not obtener_principal(request.user).es_admin:
             messages.error(request, 'No tienes permisos para eliminar usuarios.')
             return redirect(tenant_reverse('core:usuario_list', request=request))
 
@@ -621,6 +408,7 @@ class UsuarioDeleteView(TenantSuccessUrlMixin, TenantLoginRequiredMixin, Success
         messages.success(self.request, f"Usuario '{usuario_nombre}' eliminado con éxito.")
         return super().form_valid(form)
 
+@presupuesto_consultas(15)
 class PacienteListView(TenantLoginRequiredMixin, ListView):
     model = models.Paciente
     template_name = 'core/paciente_list.html'
@@ -628,11 +416,8 @@ class PacienteListView(TenantLoginRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        # Optimizar consultas con select_related y prefetch_related
-        queryset = models.Paciente.objects.select_related('usuario').prefetch_related(
-            'respuestas_historial',
-            'historial_clinico'
-        ).all()
+        # Estado del historial calculado en SQL: filtros, orden y paginación en la BD
+        queryset = services.PacienteService.anotar_estado_historial(models.Paciente.objects.all())
         
         form = forms.PacienteFiltroForm(self.request.GET or None)
         
@@ -647,30 +432,13 @@ class PacienteListView(TenantLoginRequiredMixin, ListView):
                     Q(telefono__icontains=busqueda)
                 )
             
-            # Filtro por estado del historial
+            # Filtro por estado del historial. 'completo' abarca a todo paciente con
+            # historial, también los que están por actualizar (como en la lista original)
             estado_historial = form.cleaned_data.get('estado_historial')
             if estado_historial == 'completo':
-                # Pacientes que tienen historial clínico
-                queryset = queryset.filter(
-                    Q(respuestas_historial__isnull=False) | 
-                    Q(historial_clinico__isnull=False)
-                ).distinct()
-            elif estado_historial == 'pendiente':
-                # Pacientes sin historial clínico
-                queryset = queryset.filter(
-                    respuestas_historial__isnull=True,
-                    historial_clinico__isnull=True
-                )
-            elif estado_historial == 'actualizar':
-                # Pacientes con historial pero con más de 3 meses
-                from datetime import timedelta
-                tres_meses_atras = timezone.now() - timedelta(days=90)
-                queryset = queryset.filter(
-                    Q(respuestas_historial__isnull=False) | 
-                    Q(historial_clinico__isnull=False),
-                    Q(historial_clinico__fecha_evento__lt=tres_meses_atras) |
-                    Q(historial_clinico__isnull=True, respuestas_historial__isnull=False)
-                ).distinct()
+                queryset = queryset.filter(~Q(estado_historial='pendiente'))
+            elif estado_historial:
+                queryset = queryset.filter(estado_historial=estado_historial)
             
             # Filtro por saldo pendiente
             if form.cleaned_data.get('con_saldo_pendiente'):
@@ -682,7 +450,7 @@ class PacienteListView(TenantLoginRequiredMixin, ListView):
             
             # Ordenamiento
             ordenar_por = form.cleaned_data.get('ordenar_por') or 'nombre'
-            queryset = queryset.order_by(ordenar_por)
+            queryset = queryset.order_by(ordenar_por, 'pk')
         else:
             queryset = queryset.order_by('nombre', 'apellido')
         
@@ -692,65 +460,19 @@ class PacienteListView(TenantLoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['form'] = forms.PacienteFiltroForm(self.request.GET or None)
         
-        # Agregar información del estado del historial para cada paciente
-        pacientes_con_estado = []
-        for paciente in context['pacientes']:
-            # Verificar si tiene respuestas al cuestionario
-            tiene_respuestas = paciente.respuestas_historial.exists()
-
-            # Verificar si tiene historial clínico (correctamente)
-            tiene_historial = paciente.historial_clinico.exists()
-            historial_entries = list(paciente.historial_clinico.all()) if tiene_historial else []
-            
-            # Determinar tipo de completado
-            completado_portal = any('Auto-Completado por Paciente' in entry.descripcion_evento 
-                                  for entry in historial_entries)
-            completado_medico = any(entry.registrado_por is not None 
-                                  for entry in historial_entries)
-            
-            # Calcular estado simplificado
-            if tiene_respuestas or tiene_historial:
-                # Verificar si necesita actualización (más de 3 meses)
-                from datetime import timedelta
-                tres_meses_atras = timezone.now() - timedelta(days=90)
-                
-                # Buscar la entrada más reciente del historial
-                fecha_mas_reciente = None
-                if historial_entries:
-                    fecha_mas_reciente = max(entry.fecha_evento for entry in historial_entries)
-                
-                if fecha_mas_reciente and fecha_mas_reciente < tres_meses_atras:
-                    estado_historial = 'actualizar'
-                elif not historial_entries and tiene_respuestas:
-                    # Solo tiene respuestas pero no historial clínico formal
-                    estado_historial = 'actualizar'
-                else:
-                    estado_historial = 'completo'
-            else:
-                estado_historial = 'pendiente'
-            
-            paciente.estado_historial = estado_historial
-            paciente.tiene_acceso_portal = bool(paciente.usuario)
-            pacientes_con_estado.append(paciente)
-        
-        context['pacientes'] = pacientes_con_estado
-        
-        # Estadísticas rápidas
-        total_pacientes = self.get_queryset().count()
-        con_historial = self.get_queryset().filter(
-            Q(respuestas_historial__isnull=False) | 
-            Q(historial_clinico__isnull=False)
-        ).distinct().count()
-        con_portal = self.get_queryset().filter(usuario__isnull=False).count()
-        con_saldo = self.get_queryset().filter(saldo_global__gt=0).count()
-        
-        context['estadisticas'] = {
-            'total': total_pacientes,
-            'con_historial': con_historial,
-            'sin_historial': total_pacientes - con_historial,
-            'con_portal': con_portal,
-            'con_saldo': con_saldo,
-        }
+        # Estadísticas rápidas (una sola consulta sobre la lista filtrada)
+        estadisticas = services.EstadisticasListaService.calcular(
+            self.object_list,
+            {
+                'total': Count('id'),
+                'con_historial': Count('id', filter=~Q(estado_historial='pendiente')),
+                'con_portal': Count('id', filter=Q(usuario__isnull=False)),
+                'con_saldo': Count('id', filter=Q(saldo_global__gt=0)),
+            },
+            depende_de=[models.Paciente, models.HistorialClinico, models.RespuestaHistorial],
+        )
+        estadisticas['sin_historial'] = estadisticas['total'] - estadisticas['con_historial']
+        context['estadisticas'] = estadisticas
         
         return context
 
@@ -887,19 +609,28 @@ class ServicioListView(TenantLoginRequiredMixin, ListView):
         
         # === ANÁLISIS Y MÉTRICAS ===
         try:
-            # Métricas básicas
-            total_servicios = models.Servicio.objects.filter(activo=True).count()
-            servicios_inactivos = models.Servicio.objects.filter(activo=False).count()
-            
-            # Precio promedio
-            precio_promedio = models.Servicio.objects.filter(activo=True).aggregate(
-                promedio=Avg('precio')
-            )['promedio'] or 0
-            
-            # Duración promedio
-            duracion_promedio = models.Servicio.objects.filter(activo=True).aggregate(
-                promedio=Avg('duracion_minutos')
-            )['promedio'] or 0
+            # Métricas básicas, distribuciones y rangos para filtros en una sola consulta
+            activo = Q(activo=True)
+            metricas = services.EstadisticasListaService.calcular(
+                models.Servicio.objects.all(),
+                {
+                    'total_servicios': Count('id', filter=activo),
+                    'servicios_inactivos': Count('id', filter=Q(activo=False)),
+                    'precio_promedio': Avg('precio', filter=activo),
+                    'duracion_promedio': Avg('duracion_minutos', filter=activo),
+                    'precio_bajo': Count('id', filter=activo & Q(precio__lt=500)),
+                    'precio_medio': Count('id', filter=activo & Q(precio__gte=500, precio__lt=2000)),
+                    'precio_alto': Count('id', filter=activo & Q(precio__gte=2000)),
+                    'duracion_corto': Count('id', filter=activo & Q(duracion_minutos__lt=30)),
+                    'duracion_medio': Count('id', filter=activo & Q(duracion_minutos__gte=30, duracion_minutos__lt=90)),
+                    'duracion_largo': Count('id', filter=activo & Q(duracion_minutos__gte=90)),
+                    'min_precio': Min('precio', filter=activo),
+                    'max_precio': Max('precio', filter=activo),
+                    'min_duracion': Min('duracion_minutos', filter=activo),
+                    'max_duracion': Max('duracion_minutos', filter=activo),
+                },
+                depende_de=[models.Servicio],
+            )
             
             # Servicios por especialidad
             servicios_por_especialidad = models.Especialidad.objects.annotate(
@@ -928,26 +659,12 @@ class ServicioListView(TenantLoginRequiredMixin, ListView):
                 cantidad_realizados=Count('tratamientocita', distinct=True)
             ).order_by('-total_ingresos')[:5]
             
-            # Distribución de precios
-            rangos_precios = {
-                'bajo': models.Servicio.objects.filter(activo=True, precio__lt=500).count(),
-                'medio': models.Servicio.objects.filter(activo=True, precio__gte=500, precio__lt=2000).count(),
-                'alto': models.Servicio.objects.filter(activo=True, precio__gte=2000).count(),
-            }
-            
-            # Distribución de duración
-            rangos_duracion = {
-                'corto': models.Servicio.objects.filter(activo=True, duracion_minutos__lt=30).count(),
-                'medio': models.Servicio.objects.filter(activo=True, duracion_minutos__gte=30, duracion_minutos__lt=90).count(),
-                'largo': models.Servicio.objects.filter(activo=True, duracion_minutos__gte=90).count(),
-            }
-            
             context.update({
                 # Métricas básicas
-                'total_servicios': total_servicios,
-                'servicios_inactivos': servicios_inactivos,
-                'precio_promedio': precio_promedio,
-                'duracion_promedio': duracion_promedio,
+                'total_servicios': metricas['total_servicios'],
+                'servicios_inactivos': metricas['servicios_inactivos'],
+                'precio_promedio': metricas['precio_promedio'] or 0,
+                'duracion_promedio': metricas['duracion_promedio'] or 0,
                 
                 # Análisis
                 'servicios_por_especialidad': servicios_por_especialidad,
@@ -957,12 +674,21 @@ class ServicioListView(TenantLoginRequiredMixin, ListView):
                 'servicios_rentables': servicios_rentables,
                 
                 # Distribuciones
-                'rangos_precios': rangos_precios,
-                'rangos_duracion': rangos_duracion,
+                'rangos_precios': {
+                    'bajo': metricas['precio_bajo'],
+                    'medio': metricas['precio_medio'],
+                    'alto': metricas['precio_alto'],
+                },
+                'rangos_duracion': {
+                    'corto': metricas['duracion_corto'],
+                    'medio': metricas['duracion_medio'],
+                    'largo': metricas['duracion_largo'],
+                },
             })
             
         except Exception as e:
             logger.error(f"Error calculando métricas de servicios: {e}")
+            metricas = {}
             # Valores por defecto en caso de error
             context.update({
                 'total_servicios': 0,
@@ -981,21 +707,11 @@ class ServicioListView(TenantLoginRequiredMixin, ListView):
             servicios_count=Count('servicio', filter=Q(servicio__activo=True))
         ).filter(servicios_count__gt=0).order_by('nombre')
         
-        # Rangos de precios para filtros
-        precios = models.Servicio.objects.filter(activo=True).aggregate(
-            min_precio=Min('precio'),
-            max_precio=Max('precio')
-        )
-        context['precio_min_disponible'] = precios['min_precio'] or 0
-        context['precio_max_disponible'] = precios['max_precio'] or 0
-        
-        # Rangos de duración para filtros
-        duraciones = models.Servicio.objects.filter(activo=True).aggregate(
-            min_duracion=Min('duracion_minutos'),
-            max_duracion=Max('duracion_minutos')
-        )
-        context['duracion_min_disponible'] = duraciones['min_duracion'] or 0
-        context['duracion_max_disponible'] = duraciones['max_duracion'] or 0
+        # Rangos de precios y duración para filtros (de la consulta de métricas)
+        context['precio_min_disponible'] = metricas.get('min_precio') or 0
+        context['precio_max_disponible'] = metricas.get('max_precio') or 0
+        context['duracion_min_disponible'] = metricas.get('min_duracion') or 0
+        context['duracion_max_disponible'] = metricas.get('max_duracion') or 0
         
         return context
 
@@ -1114,22 +830,23 @@ class PagoListView(TenantLoginRequiredMixin, ListView):
 
         context = super().get_context_data(**kwargs)
 
-        # Calcular estadísticas de todos los pagos
-        all_pagos = models.Pago.objects.all()
-        stats = all_pagos.aggregate(
-            total_count=Count('id'),
-            total_sum=Sum('monto'),
-            avg_payment=Avg('monto')
-        )
-
-        # Pagos de hoy
+        # Estadísticas de todos los pagos (una consulta, en caché hasta que cambie un Pago)
         hoy = date.today()
-        pagos_hoy = all_pagos.filter(fecha_pago__date=hoy).count()
+        stats = services.EstadisticasListaService.calcular(
+            models.Pago.objects.all(),
+            {
+                'total_count': Count('id'),
+                'total_sum': Sum('monto'),
+                'avg_payment': Avg('monto'),
+                'pagos_hoy': Count('id', filter=Q(fecha_pago__date=hoy)),
+            },
+            depende_de=[models.Pago],
+        )
 
         context['total_pagos'] = stats['total_count'] or 0
         context['total_ingresos'] = stats['total_sum'] or 0
         context['promedio_pago'] = stats['avg_payment'] or 0
-        context['pagos_hoy'] = pagos_hoy
+        context['pagos_hoy'] = stats['pagos_hoy']
         context['date_threshold'] = hoy - timedelta(days=30)
 
         return context
@@ -1344,10 +1061,8 @@ class RecibirCompraView(TenantSuccessUrlMixin, TenantLoginRequiredMixin, Success
                         f"(Lote: {numero_lote or 'N/A'})"
                     )
 
-            # Actualizar stock total de todos los insumos afectados
-            insumos_afectados = set(d.insumo for d in detalles)
-            for insumo in insumos_afectados:
-                insumo.actualizar_stock_total()
+            # El stock de los insumos afectados se recalcula una vez por insumo al
+            # confirmar la transacción (señal de LoteInsumo, core/recalculos.py)
 
             # Marcar compra como recibida
             self.object.estado = 'RECIBIDA'
@@ -1397,6 +1112,7 @@ class AgendaLegacyView(TenantLoginRequiredMixin, TemplateView):
             logger.exception("Error construyendo el contexto de AgendaLegacyView")
             raise
 
+@presupuesto_consultas(5)
 @tenant_login_required
 def pacientes_api(request):
     """API para obtener lista de pacientes con búsqueda inteligente"""
@@ -1405,40 +1121,10 @@ def pacientes_api(request):
         query = request.GET.get('q', '').strip()
         limit = int(request.GET.get('limit', 20))
 
-        # Base queryset con optimización
-        pacientes_qs = models.Paciente.objects.select_related('usuario').all()
-
-        # Aplicar filtro de búsqueda si existe
-        if query:
-            pacientes_qs = pacientes_qs.filter(
-                Q(nombre__icontains=query) |
-                Q(apellido__icontains=query) |
-                Q(email__icontains=query) |
-                Q(telefono__icontains=query)
-            )
-
-        # Ordenar y limitar
-        pacientes_qs = pacientes_qs.order_by('nombre', 'apellido')[:limit]
+        pacientes_qs = _pacientes_busqueda_qs(query, limit)
 
         # Construir respuesta con información completa
-        pacientes_data = []
-        for p in pacientes_qs:
-            # Calcular estado del historial
-            tiene_historial = p.historial_clinico.exists() or p.respuestas_historial.exists()
-
-            pacientes_data.append({
-                'id': p.id,
-                'nombre': p.nombre,
-                'apellido': p.apellido,
-                'nombre_completo': f"{p.nombre} {p.apellido}",
-                'email': p.email,
-                'telefono': p.telefono or '',
-                'edad': p.edad if hasattr(p, 'edad') else None,
-                'saldo_global': float(p.saldo_global) if p.saldo_global else 0.0,
-                'tiene_historial': tiene_historial,
-                'estado_historial': p.estado_historial if hasattr(p, 'estado_historial') else 'pendiente',
-                'tiene_acceso_portal': p.tiene_acceso_portal if hasattr(p, 'tiene_acceso_portal') else False,
-            })
+        pacientes_data = [_paciente_busqueda_dict(p) for p in pacientes_qs]
 
         return JsonResponse({
             'success': True,
@@ -1449,6 +1135,47 @@ def pacientes_api(request):
         logger.exception("Error en pacientes_api")
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
+
+def _pacientes_busqueda_qs(query, limit):
+    """Pacientes que coinciden con la búsqueda, con el estado del historial anotado en la misma consulta."""
+    from django.db.models import Exists, OuterRef
+
+    # Base queryset con optimización
+    pacientes_qs = models.Paciente.objects.select_related('usuario').annotate(
+        con_historial=Exists(models.HistorialClinico.objects.filter(paciente=OuterRef('pk'))),
+        con_respuestas=Exists(models.RespuestaHistorial.objects.filter(paciente=OuterRef('pk'))),
+    )
+
+    # Aplicar filtro de búsqueda si existe
+    if query:
+        pacientes_qs = pacientes_qs.filter(
+            Q(nombre__icontains=query) |
+            Q(apellido__icontains=query) |
+            Q(email__icontains=query) |
+            Q(telefono__icontains=query)
+        )
+
+    # Ordenar y limitar
+    return pacientes_qs.order_by('nombre', 'apellido')[:limit]
+
+
+def _paciente_busqueda_dict(p):
+    """Datos de un paciente de _pacientes_busqueda_qs para la respuesta de búsqueda."""
+    return {
+        'id': p.id,
+        'nombre': p.nombre,
+        'apellido': p.apellido,
+        'nombre_completo': f"{p.nombre} {p.apellido}",
+        'email': p.email,
+        'telefono': p.telefono or '',
+        'edad': p.edad if hasattr(p, 'edad') else None,
+        'saldo_global': float(p.saldo_global) if p.saldo_global else 0.0,
+        'tiene_historial': p.con_historial or p.con_respuestas,
+        'estado_historial': p.estado_historial if hasattr(p, 'estado_historial') else 'pendiente',
+        'tiene_acceso_portal': p.tiene_acceso_portal if hasattr(p, 'tiene_acceso_portal') else False,
+    }
+
+@presupuesto_consultas(15)
 class CitaListView(TenantLoginRequiredMixin, ListView):
     model = models.Cita
     template_name = 'core/cita_list.html'
@@ -1462,14 +1189,13 @@ class CitaListView(TenantLoginRequiredMixin, ListView):
             'servicios_planeados', 'tratamientos_realizados__servicios', 'pagos'
         ).order_by('-fecha_hora')
         
-        user = self.request.user
+        principal = obtener_principal(self.request.user)
         
         # FILTRO POR ROL: Si es dentista, solo ver sus citas
-        if user.groups.filter(name='Dentista').exists():
-            try:
-                perfil_dentista = models.PerfilDentista.objects.get(usuario=user)
-                queryset = queryset.filter(dentista=perfil_dentista)
-            except models.PerfilDentista.DoesNotExist:
+        if principal.es_dentista:
+            if principal.dentista_id:
+                queryset = queryset.filter(dentista_id=principal.dentista_id)
+            else:
                 messages.warning(self.request, 'No tienes un perfil de dentista asignado.')
                 queryset = queryset.none()
         
@@ -1479,7 +1205,7 @@ class CitaListView(TenantLoginRequiredMixin, ListView):
             queryset = queryset.filter(estado=estado)
         
         dentista_id = self.request.GET.get('dentista')
-        if dentista_id and user.groups.filter(name__in=['Administrador', 'Recepcionista']).exists():
+        if dentista_id and principal.en_grupo('Administrador', 'Recepcionista'):
             queryset = queryset.filter(dentista_id=dentista_id)
         
         fecha = self.request.GET.get('fecha')
@@ -1498,7 +1224,6 @@ class CitaListView(TenantLoginRequiredMixin, ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
         
         # Estados disponibles
         context['estados'] = [
@@ -1510,23 +1235,26 @@ class CitaListView(TenantLoginRequiredMixin, ListView):
         ]
         
         # Solo admin y recepción pueden filtrar por dentista
-        context['puede_filtrar_dentista'] = user.groups.filter(
-            name__in=['Administrador', 'Recepcionista']
-        ).exists()
+        context['puede_filtrar_dentista'] = obtener_principal(self.request.user).en_grupo(
+            'Administrador', 'Recepcionista'
+        )
         
         if context['puede_filtrar_dentista']:
             context['dentistas'] = models.PerfilDentista.objects.filter(activo=True)
         
-        # Estadísticas del queryset filtrado
-        queryset = self.get_queryset()
-        context['stats'] = {
-            'programadas': queryset.filter(estado='PRO').count(),
-            'confirmadas': queryset.filter(estado='CON').count(),
-            'atendidas': queryset.filter(estado='ATN').count(),
-            'completadas': queryset.filter(estado='COM').count(),
-            'canceladas': queryset.filter(estado='CAN').count(),
-            'total': queryset.count(),
-        }
+        # Estadísticas del queryset filtrado (una sola consulta)
+        context['stats'] = services.EstadisticasListaService.calcular(
+            self.object_list,
+            {
+                'programadas': Count('id', filter=Q(estado='PRO')),
+                'confirmadas': Count('id', filter=Q(estado='CON')),
+                'atendidas': Count('id', filter=Q(estado='ATN')),
+                'completadas': Count('id', filter=Q(estado='COM')),
+                'canceladas': Count('id', filter=Q(estado='CAN')),
+                'total': Count('id'),
+            },
+            depende_de=[models.Cita],
+        )
         
         # Añadir datos calculados a cada cita
         for cita in context['citas']:
@@ -1628,12 +1356,11 @@ class CitasPendientesPagoListView(TenantLoginRequiredMixin, ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
         
         # Solo admin y recepción pueden filtrar por dentista
-        context['puede_filtrar_dentista'] = user.groups.filter(
-            name__in=['Administrador', 'Recepcionista']
-        ).exists()
+        context['puede_filtrar_dentista'] = obtener_principal(self.request.user).en_grupo(
+            'Administrador', 'Recepcionista'
+        )
         
         if context['puede_filtrar_dentista']:
             context['dentistas'] = models.PerfilDentista.objects.filter(activo=True)
@@ -1749,32 +1476,36 @@ class HistorialClinicoCreateView(TenantSuccessUrlMixin, TenantLoginRequiredMixin
 
 @tenant_login_required
 def agenda_events(request):
-    from .timezone_utils import to_local_isoformat
-    
     dentista_id = request.GET.get('dentista_id')
     citas = models.Cita.objects.exclude(estado='CAN')
     if dentista_id:
         citas = citas.filter(dentista_id=dentista_id)
     
-    eventos = []
-    for cita in citas:
-        eventos.append({
-            'id': cita.id,
-            'title': f"{cita.paciente.nombre} {cita.paciente.apellido}",
-            'start': to_local_isoformat(cita.fecha_hora),
-            'extendedProps': {
-                'estado': cita.estado,
-                'notas': cita.notas,
-                'paciente_id': cita.paciente.id,
-                'dentista_id': cita.dentista.id if cita.dentista else None,
-                'unidad_dental_id': cita.unidad_dental.id if cita.unidad_dental else None,
-                'motivo': cita.motivo,
-                'servicios': list(cita.servicios_planeados.values_list('id', flat=True)),
-            }
-        })
+    citas = citas.select_related('paciente').prefetch_related('servicios_planeados')
+    eventos = [_evento_agenda(cita) for cita in citas]
     
     return JsonResponse(eventos, safe=False)
 
+
+def _evento_agenda(cita):
+    """Evento de FullCalendar para una cita (paciente con select_related y servicios con prefetch)."""
+    from .timezone_utils import to_local_isoformat
+
+    return {
+        'id': cita.id,
+        'title': f"{cita.paciente.nombre} {cita.paciente.apellido}",
+        'start': to_local_isoformat(cita.fecha_hora),
+        'extendedProps': {
+            'estado': cita.estado,
+            'notas': cita.notas,
+            'paciente_id': cita.paciente_id,
+            'dentista_id': cita.dentista_id,
+            'unidad_dental_id': cita.unidad_dental_id,
+            'motivo': cita.motivo,
+            'servicios': [s.id for s in cita.servicios_planeados.all()],
+        }
+    }
+
 @tenant_login_required
 def get_horarios_ocupados(request):
     dentista_id = request.GET.get('dentista_id')
@@ -1824,54 +1555,9 @@ def get_horarios_disponibles_api(request, dentista_id):
             dentista=dentista,
             fecha_hora__date=fecha,
             estado__in=['PRO', 'CON']
-        )
-        ocupados = []
-        for cita in citas:
-            # Duración estimada de la cita (fallback a suma de servicios o 30 min)
-            duracion = cita.duracion_estimada or 0
-            if not duracion or duracion <= 0:
-                try:
-                    duracion = sum(s.duracion_minutos for s in cita.servicios_planeados.all())
-                except Exception:
-                    duracion = 0
-            if not duracion:
-                duracion = 30
-            hora_fin = cita.fecha_hora + timedelta(minutes=duracion)
-            ocupados.append((cita.fecha_hora, hora_fin))
-
-        # Generar horarios disponibles
-        disponibles = []
-        intervalo = 30  # minutos
-        
-        # Usar hora local para comparaciones con los horarios (que son locales)
-        now_local = timezone.localtime()  # datetime aware en zona local
-        today = now_local.date()
-
-        for horario in horarios:
-            # Hacer los datetimes aware para compararlos con cita.fecha_hora
-            inicio = timezone.make_aware(datetime.combine(fecha, horario.hora_inicio))
-            fin = timezone.make_aware(datetime.combine(fecha, horario.hora_fin))
-            actual = inicio
-
-            # Si la fecha es hoy, ajustar el inicio para que sea la hora actual o posterior
-            if fecha == today:
-                now_aware = now_local
-                if actual < now_aware:
-                    actual = now_aware
-                    # Redondear al próximo intervalo si no coincide exactamente
-                    if actual.minute % intervalo != 0:
-                        actual = actual + timedelta(minutes=intervalo - (actual.minute % intervalo))
-                    actual = actual.replace(second=0, microsecond=0)
-
-            while actual + timedelta(minutes=intervalo) <= fin:
-                es_disponible = True
-                for ocup_start, ocup_end in ocupados:
-                    if actual < ocup_end and (actual + timedelta(minutes=intervalo)) > ocup_start:
-                        es_disponible = False
-                        break
-                if es_disponible:
-                    disponibles.append(actual.strftime('%H:%M'))
-                actual += timedelta(minutes=intervalo)
+        ).prefetch_related('servicios_planeados')
+        ocupados = [_intervalo_ocupado(cita) for cita in citas]
+        disponibles = _horarios_libres(fecha, horarios, ocupados)
 
         return JsonResponse({'horarios_disponibles': disponibles}, safe=False)
     except models.PerfilDentista.DoesNotExist:
@@ -1881,6 +1567,54 @@ def get_horarios_disponibles_api(request, dentista_id):
         traceback.print_exc() # Imprimir el traceback completo
         return JsonResponse({'error': str(e)}, status=500)
 
+
+def _intervalo_ocupado(cita):
+    """(inicio, fin) de una cita; servicios_planeados debe venir con prefetch."""
+    # Duración estimada de la cita (fallback a suma de servicios o 30 min)
+    duracion = cita.duracion_estimada or 0
+    if not duracion or duracion <= 0:
+        duracion = sum(s.duracion_minutos or 0 for s in cita.servicios_planeados.all())
+    if not duracion:
+        duracion = 30
+    return cita.fecha_hora, cita.fecha_hora + timedelta(minutes=duracion)
+
+
+def _horarios_libres(fecha, horarios, ocupados, intervalo=30):
+    """Horas ('HH:MM') de inicio libres en los horarios laborales de la fecha, en bloques de `intervalo` minutos."""
+    disponibles = []
+    
+    # Usar hora local para comparaciones con los horarios (que son locales)
+    now_local = timezone.localtime()  # datetime aware en zona local
+    today = now_local.date()
+
+    for horario in horarios:
+        # Hacer los datetimes aware para compararlos con cita.fecha_hora
+        inicio = timezone.make_aware(datetime.combine(fecha, horario.hora_inicio))
+        fin = timezone.make_aware(datetime.combine(fecha, horario.hora_fin))
+        actual = inicio
+
+        # Si la fecha es hoy, ajustar el inicio para que sea la hora actual o posterior
+        if fecha == today:
+            now_aware = now_local
+            if actual < now_aware:
+                actual = now_aware
+                # Redondear al próximo intervalo si no coincide exactamente
+                if actual.minute % intervalo != 0:
+                    actual = actual + timedelta(minutes=intervalo - (actual.minute % intervalo))
+                actual = actual.replace(second=0, microsecond=0)
+
+        while actual + timedelta(minutes=intervalo) <= fin:
+            es_disponible = True
+            for ocup_start, ocup_end in ocupados:
+                if actual < ocup_end and (actual + timedelta(minutes=intervalo)) > ocup_start:
+                    es_disponible = False
+                    break
+            if es_disponible:
+                disponibles.append(actual.strftime('%H:%M'))
+            actual += timedelta(minutes=intervalo)
+    return disponibles
+
+
 @tenant_login_required
 def cita_detail_api(request, pk):
     from .timezone_utils import to_local_strftime
@@ -1917,56 +1651,14 @@ def odontograma_api_get(request, cliente_id):
             # Crear diagnóstico SANO si no existe
             sano = models.Diagnostico.objects.create(nombre='SANO', color_hex='#FFFFFF', icono_svg='')
         
-        # Lista completa de 48 dientes usando numeración FDI extendida
-        # Dientes regulares (32 dientes estándar)
-        dientes_regulares = (
-            list(range(11, 19)) +  # Cuadrante I: 11-18
-            list(range(21, 29)) +  # Cuadrante II: 21-28
-            list(range(31, 39)) +  # Cuadrante III: 31-38
-            list(range(41, 49))    # Cuadrante IV: 41-48
-        )
-        
-        # Supernumerarios usando numeración extendida
-        supernumerarios = [
-            19, 110,    # Cuadrante I: distales
-            29, 210,    # Cuadrante II: distales
-            39, 310,    # Cuadrante III: distales
-            49, 410     # Cuadrante IV: distales
-        ]
-        
-        # Combinar todos los dientes (48 total)
-        todos_los_dientes = dientes_regulares + supernumerarios
-        
-        # Inicializar todos los dientes como SANOS
-        data = {}
-        for diente in todos_los_dientes:
-            data[diente] = {
-                'diagnostico_id': sano.id,
-                'diagnostico_nombre': sano.nombre,
-                'diagnostico_color': sano.color_hex,
-                'diagnostico_icono': sano.icono_svg,
-                'color_seleccionado': '',
-                'es_supernumerario': diente in supernumerarios,
-                'cuadrante': _determinar_cuadrante(diente)
-            }
-
-        # Sobrescribir con estados guardados del paciente
         estados_guardados = cliente.odontograma.select_related('diagnostico')
-        for estado in estados_guardados:
-            if estado.numero_diente in data:  # Verificar que el diente esté en nuestra lista de 48
-                data[estado.numero_diente].update({
-                    'diagnostico_id': estado.diagnostico.id,
-                    'diagnostico_nombre': estado.diagnostico.nombre,
-                    'diagnostico_color': estado.diagnostico.color_hex,
-                    'diagnostico_icono': estado.diagnostico.icono_svg,
-                    'color_seleccionado': estado.color_seleccionado
-                })
+        data = _dientes_odontograma(sano, estados_guardados)
         
         return JsonResponse({
             'dientes': data,
-            'total_dientes': len(todos_los_dientes),
-            'regulares': len(dientes_regulares),
-            'supernumerarios': len(supernumerarios)
+            'total_dientes': len(DIENTES_ODONTOGRAMA),
+            'regulares': len(DIENTES_REGULARES),
+            'supernumerarios': len(DIENTES_SUPERNUMERARIOS)
         })
 
     except models.Paciente.DoesNotExist:
@@ -1974,6 +1666,54 @@ def odontograma_api_get(request, cliente_id):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
+# Lista completa de 48 dientes usando numeración FDI extendida
+# Dientes regulares (32 dientes estándar)
+DIENTES_REGULARES = (
+    list(range(11, 19)) +  # Cuadrante I: 11-18
+    list(range(21, 29)) +  # Cuadrante II: 21-28
+    list(range(31, 39)) +  # Cuadrante III: 31-38
+    list(range(41, 49))    # Cuadrante IV: 41-48
+)
+
+# Supernumerarios usando numeración extendida
+DIENTES_SUPERNUMERARIOS = [
+    19, 110,    # Cuadrante I: distales
+    29, 210,    # Cuadrante II: distales
+    39, 310,    # Cuadrante III: distales
+    49, 410     # Cuadrante IV: distales
+]
+
+# Combinar todos los dientes (48 total)
+DIENTES_ODONTOGRAMA = DIENTES_REGULARES + DIENTES_SUPERNUMERARIOS
+
+
+def _dientes_odontograma(sano, estados_guardados):
+    """Estado de los 48 dientes: SANO por defecto, sobrescrito con los estados guardados (diagnostico con select_related)."""
+    # Inicializar todos los dientes como SANOS
+    data = {}
+    for diente in DIENTES_ODONTOGRAMA:
+        data[diente] = {
+            'diagnostico_id': sano.id,
+            'diagnostico_nombre': sano.nombre,
+            'diagnostico_color': sano.color_hex,
+            'diagnostico_icono': sano.icono_svg,
+            'color_seleccionado': '',
+            'es_supernumerario': diente in DIENTES_SUPERNUMERARIOS,
+            'cuadrante': _determinar_cuadrante(diente)
+        }
+
+    # Sobrescribir con estados guardados del paciente
+    for estado in estados_guardados:
+        if estado.numero_diente in data:  # Verificar que el diente esté en nuestra lista de 48
+            data[estado.numero_diente].update({
+                'diagnostico_id': estado.diagnostico.id,
+                'diagnostico_nombre': estado.diagnostico.nombre,
+                'diagnostico_color': estado.diagnostico.color_hex,
+                'diagnostico_icono': estado.diagnostico.icono_svg,
+                'color_seleccionado': estado.color_seleccionado
+            })
+    return data
+
 def _determinar_cuadrante(numero_diente):
     """Determina el cuadrante dental basado en el número FDI"""
     if numero_diente in [19, 110] or (11 <= numero_diente <= 18):
@@ -2112,6 +1852,7 @@ def odontograma_api_update(request, cliente_id):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 @tenant_login_required
+@cache_catalogo(models.Diagnostico)
 def diagnostico_api_list(request):
     diagnosticos = models.Diagnostico.objects.all().order_by('nombre')
     data = [{'id': d.id, 'nombre': d.nombre, 'color_hex': d.color_hex, 'icono_svg': d.icono_svg} for d in diagnosticos]
@@ -2144,40 +1885,6 @@ def odontograma_partial(request):
             'message': f'No se pudo cargar el odontograma estándar: {str(e)}'
         }, status=500)
 
-@tenant_login_required
-def reporte_ingresos_api(request):
-    form = forms.ReporteIngresosForm(request.GET or None)
-    data = {'labels': [], 'values': []}
-    from datetime import timedelta
-    today = timezone.now().date()
-    default_inicio = today - timedelta(days=30)
-    default_fin = today
-    if form.is_valid():
-        fecha_inicio = form.cleaned_data['fecha_inicio'] or default_inicio
-        fecha_fin = form.cleaned_data['fecha_fin'] or default_fin
-    else:
-        fecha_inicio, fecha_fin = default_inicio, default_fin
-    ingresos = models.Pago.objects.filter(
-        fecha_pago__date__gte=fecha_inicio,
-        fecha_pago__date__lte=fecha_fin
-    ).values('fecha_pago__date').annotate(total_dia=Sum('monto')).order_by('fecha_pago__date')
-    for item in ingresos:
-        data['labels'].append(item['fecha_pago__date'].strftime('%d/%m/%Y'))
-        data['values'].append(float(item['total_dia']))
-    return JsonResponse(data)
-
-@tenant_login_required
-def reporte_saldos_api(request):
-    # USAR SALDO_GLOBAL DE PACIENTES
-    saldos = models.Paciente.objects.filter(
-        saldo_global__gt=0
-    ).values('nombre', 'apellido', 'saldo_global').order_by('-saldo_global')[:10]
-    
-    data = {
-        'labels': [f"{item['nombre']} {item['apellido']}" for item in saldos],
-        'values': [float(item['saldo_global']) for item in saldos]
-    }
-    return JsonResponse(data)
 
 class ReciboPagoView(TenantLoginRequiredMixin, DetailView):
     model = models.Pago
@@ -2196,176 +1903,6 @@ class ReciboPagoView(TenantLoginRequiredMixin, DetailView):
 
         return context
 
-@tenant_login_required
-def generar_recibo_pdf(request, pk):
-    pago = get_object_or_404(models.Pago, pk=pk)
-    formato = request.GET.get('formato', 'carta')
-    
-    response = HttpResponse(content_type='application/pdf')
-    filename = f"recibo_{pago.id}_{formato}.pdf"
-    response['Content-Disposition'] = f'inline; filename="{filename}"'
-    
-    if formato == 'ticket':
-        width, height = 80 * mm, 200 * mm
-        _generar_recibo_ticket(response, pago, width, height, request)  # ← Pasar request
-    else:
-        _generar_recibo_carta(response, pago, request)  # ← Pasar request
-    
-    return response
-
-def _generar_recibo_carta(response, pago, request):  # ← Agregar request
-    doc = SimpleDocTemplate(response, pagesize=letter)
-    styles = getSampleStyleSheet()
-    story = []
-    
-    # OBTENER TENANT DESDE REQUEST
-    tenant = request.tenant
-    
-    if tenant.logo:
-        try:
-            logo = Image(tenant.logo.path, width=50, height=50)
-            logo.hAlign = 'LEFT'
-            story.append(logo)
-        except Exception:
-            story.append(Paragraph(f"<h1>{tenant.nombre}</h1>", styles['h1']))
-    else:
-        story.append(Paragraph(f"<h1>{tenant.nombre}</h1>", styles['h1']))
-        
-    story.append(Spacer(1, 12))
-    story.append(Paragraph(f"<b>Recibo de Pago #{pago.id}</b>", styles['h2']))
-    story.append(Paragraph(f"Fecha: {pago.fecha_pago.strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-    story.append(Spacer(1, 24))
-    story.append(Paragraph("<b>Paciente:</b>", styles['h4']))
-    
-    # Obtener paciente desde cita o directamente del pago
-    paciente = pago.cita.paciente if pago.cita else pago.paciente
-    story.append(Paragraph(f"{paciente.nombre} {paciente.apellido}", styles['Normal']))
-    
-    if paciente.email:
-        story.append(Paragraph(f"{paciente.email}", styles['Normal']))
-        
-    story.append(Spacer(1, 24))
-    story.append(Paragraph("<b>Detalles del Pago:</b>", styles['h4']))
-    
-    data = [['Descripción', 'Monto']]
-    total_servicios = 0
-    
-    if pago.cita:
-        # Pago por cita - mostrar servicios realizados
-        for servicio in pago.cita.servicios_realizados:
-            data.append([servicio.nombre, f"${servicio.precio:,.2f}"])
-            total_servicios += servicio.precio
-    else:
-        # Abono general - mostrar concepto simple
-        data.append(["Abono general", f"${pago.monto:,.2f}"])
-        total_servicios = pago.monto
-        
-    style = TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('BOTTOMPADDING', (0,0), (-1,0), 12),
-        ('BACKGROUND', (0,1), (-1,-1), colors.beige),
-        ('GRID', (0,0), (-1,-1), 1, colors.black)
-    ])
-    
-    tbl = Table(data, colWidths=[300, 100])
-    tbl.setStyle(style)
-    story.append(tbl)
-    
-    styles.add(ParagraphStyle(name='Right', alignment=TA_RIGHT))
-    story.append(Spacer(1, 12))
-    if pago.cita:
-        story.append(Paragraph(f"<b>Total Servicios:</b> ${total_servicios:,.2f}", styles['Right']))
-    else:
-        story.append(Paragraph(f"<b>Concepto:</b> Abono general", styles['Right']))
-    
-    story.append(Paragraph(f"<b>Monto Pagado ({pago.metodo_pago}):</b> ${pago.monto:,.2f}", styles['Right']))
-    
-    # USAR SALDO_GLOBAL DEL PACIENTE
-    paciente = pago.cita.paciente if pago.cita else pago.paciente
-    story.append(Paragraph(f"<b>Saldo Pendiente del Paciente:</b> ${paciente.saldo_global:,.2f}", styles['Right']))
-    
-    doc.build(story)
-
-
-def _generar_recibo_ticket(response, pago, width, height, request):  # ← Agregar request
-    from reportlab.pdfgen import canvas
-    
-    c = canvas.Canvas(response, pagesize=(width, height))
-    
-    x_pos = 3 * mm
-    y_pos = height - (10 * mm)
-    line_height = 5 * mm
-    
-    # OBTENER TENANT DESDE REQUEST
-    tenant = request.tenant
-    
-    if tenant.logo:
-        try:
-            c.drawImage(tenant.logo.path, x_pos, y_pos - 10*mm, width=20*mm, height=20*mm, preserveAspectRatio=True)
-            y_pos -= 25 * mm
-        except Exception:
-            pass
-    
-    c.setFont("Helvetica-Bold", 12)
-    c.drawString(x_pos, y_pos, tenant.nombre)
-    y_pos -= line_height * 2
-    c.setFont("Helvetica", 9)
-    c.drawString(x_pos, y_pos, f"Recibo de Pago #{pago.id}")
-    y_pos -= line_height
-    c.drawString(x_pos, y_pos, f"Fecha: {pago.fecha_pago.strftime('%d/%m/%Y %H:%M')}")
-    y_pos -= line_height * 1.5
-    
-    # Obtener paciente desde cita o directamente del pago
-    paciente = pago.cita.paciente if pago.cita else pago.paciente
-    c.drawString(x_pos, y_pos, f"Paciente: {paciente}")
-    y_pos -= line_height * 2
-    c.line(x_pos, y_pos, width - x_pos, y_pos)
-    y_pos -= line_height
-    c.setFont("Helvetica-Bold", 9)
-    
-    total_servicios = 0
-    
-    if pago.cita:
-        # Pago por cita - mostrar servicios
-        c.drawString(x_pos, y_pos, "Servicios:")
-        y_pos -= line_height
-        c.setFont("Helvetica", 8)
-
-        for servicio in pago.cita.servicios_realizados:
-            c.drawString(x_pos + 2*mm, y_pos, f"- {servicio.nombre}")
-            c.drawRightString(width - x_pos, y_pos, f"${servicio.precio:,.2f}")
-            total_servicios += servicio.precio
-            y_pos -= line_height
-        y_pos -= line_height
-    else:
-        # Abono general - mostrar concepto
-        c.drawString(x_pos, y_pos, "Concepto:")
-        y_pos -= line_height
-        c.setFont("Helvetica", 8)
-        c.drawString(x_pos + 2*mm, y_pos, "- Abono general")
-        c.drawRightString(width - x_pos, y_pos, f"${pago.monto:,.2f}")
-        total_servicios = pago.monto
-        y_pos -= line_height * 2
-    
-    c.setFont("Helvetica-Bold", 9)
-    if pago.cita:
-        c.drawRightString(width - x_pos, y_pos, f"Total: ${total_servicios:,.2f}")
-        y_pos -= line_height
-    
-    c.drawRightString(width - x_pos, y_pos, f"Pagado: ${pago.monto:,.2f}")
-    y_pos -= line_height
-    
-    # USAR SALDO_GLOBAL DEL PACIENTE
-    paciente = pago.cita.paciente if pago.cita else pago.paciente
-    c.drawRightString(width - x_pos, y_pos, f"Saldo: ${paciente.saldo_global:,.2f}")
-    y_pos -= line_height * 2
-    c.setFont("Helvetica-Oblique", 8)
-    c.drawCentredString(width / 2, y_pos, "Gracias por su preferencia")
-    c.showPage()
-    c.save()
 
 class DashboardCofeprisView(TenantLoginRequiredMixin, TemplateView):
     template_name = 'core/cofepris/dashboard_cofepris.html'
@@ -2496,89 +2033,6 @@ class ResiduosDeleteView(TenantSuccessUrlMixin, TenantLoginRequiredMixin, Succes
     context_object_name = 'recoleccion'
     success_message = "Registro de recolección eliminado con éxito."
 
-@tenant_login_required
-def exportar_ingresos_excel(request):
-    form = forms.ReporteIngresosForm(request.GET or None)
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="reporte_ingresos.xlsx"'
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'Ingresos'
-    headers = ['Fecha de Pago', 'Paciente', 'Cita', 'Método de Pago', 'Monto']
-    worksheet.append(headers)
-    if form.is_valid():
-        pagos = models.Pago.objects.filter(
-            fecha_pago__date__gte=form.cleaned_data['fecha_inicio'],
-            fecha_pago__date__lte=form.cleaned_data['fecha_fin']
-        ).select_related('cita__paciente')
-        for pago in pagos:
-            worksheet.append([
-                pago.fecha_pago.strftime('%Y-%m-%d %H:%M'),
-                str(pago.cita.paciente),
-                f"Cita #{pago.cita.id}",
-                pago.metodo_pago,
-                pago.monto
-            ])
-    workbook.save(response)
-    return response
-
-@tenant_login_required
-def exportar_saldos_excel(request):
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="reporte_saldos.xlsx"'
-    
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'Saldos Pendientes'
-    
-    headers = ['Paciente', 'Saldo Pendiente']
-    worksheet.append(headers)
-    
-    # USAR SALDO_GLOBAL DE PACIENTES
-    pacientes = models.Paciente.objects.filter(saldo_global__gt=0).order_by('-saldo_global')
-    for paciente in pacientes:
-        worksheet.append([
-            f"{paciente.nombre} {paciente.apellido}", 
-            float(paciente.saldo_global)
-        ])
-    workbook.save(response)
-    return response
-
-@tenant_login_required
-def exportar_facturacion_excel(request):
-    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename="reporte_facturacion.xlsx"'
-    workbook = Workbook()
-    worksheet = workbook.active
-    worksheet.title = 'Facturación'
-    headers = ['Fecha Cita', 'Paciente', 'RFC Receptor', 'Nombre Receptor', 'CP Receptor', 'Régimen Fiscal', 'Uso CFDI', 'Forma Pago (SAT)', 'Método Pago (SAT)', 'Servicios', 'Monto Pagado']
-    worksheet.append(headers)
-    citas = models.Cita.objects.filter(requiere_factura=True).select_related('paciente').prefetch_related('tratamientos_realizados__servicios', 'pagos')
-    for cita in citas:
-        servicios = ", ".join([s.nombre for s in cita.servicios_realizados])
-        monto_pagado = cita.pagos.aggregate(total=Sum('monto'))['total'] or 0
-        pago = cita.pagos.order_by('-fecha_pago').first()
-        df = getattr(cita.paciente, 'datos_fiscales', None)
-        cp = getattr(df, 'codigo_postal', None) or getattr(cita.paciente, 'codigo_postal', None) or 'N/A'
-        regimen = getattr(getattr(df, 'regimen_fiscal', None), 'codigo', 'N/A')
-        uso = getattr(getattr(df, 'uso_cfdi', None), 'codigo', 'N/A')
-        forma = getattr(getattr(pago, 'forma_pago_sat', None), 'codigo', 'N/A') if pago else 'N/A'
-        metodo = getattr(getattr(pago, 'metodo_sat', None), 'codigo', 'N/A') if pago else 'N/A'
-        worksheet.append([
-            cita.fecha_hora.strftime('%Y-%m-%d'),
-            str(cita.paciente),
-            getattr(df, 'rfc', 'N/A'),
-            getattr(df, 'razon_social', str(cita.paciente)),
-            cp,
-            regimen,
-            uso,
-            forma,
-            metodo,
-            servicios,
-            monto_pagado
-        ])
-    workbook.save(response)
-    return response
 
 class InvitarPacienteView(TenantLoginRequiredMixin, TemplateView):
     template_name = 'core/paciente_invitar.html'
@@ -2608,241 +2062,13 @@ class InvitarPacienteView(TenantLoginRequiredMixin, TemplateView):
         user.groups.add(paciente_group)
         user.save()
 
-        paciente.usuario = user
-        paciente.save()
-
-        messages.success(request, f'Se creó la cuenta para {paciente}. Usuario: {username}, Contraseña: {password}')
-        return redirect(tenant_reverse('core:paciente_detail', request=request, kwargs={'pk': paciente.pk}))
-
-class PacientePagosListView(TenantLoginRequiredMixin, ListView):
-    model = models.Pago
-    template_name = 'core/portal/pago_list.html'
-    context_object_name = 'pagos'
-    paginate_by = 10
-
-    def get_queryset(self):
-        return models.Pago.objects.filter(cita__paciente__usuario=self.request.user).order_by('-fecha_pago')
-
-class PortalHistorialPacienteView(TenantLoginRequiredMixin, TemplateView):
-    """Vista para que el paciente vea su historial clínico desde el portal"""
-    template_name = 'core/portal/historial_paciente.html'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        # Verificar que el usuario sea un paciente
-        if not hasattr(self.request.user, 'paciente_perfil'):
-            raise PermissionDenied("Acceso no autorizado")
-        
-        paciente = self.request.user.paciente_perfil
-        context['paciente'] = paciente
-        
-        # Obtener historial clínico existente
-        context['historial_clinico'] = models.HistorialClinico.objects.filter(
-            paciente=paciente
-        ).order_by('-fecha_registro')
-        
-        # Verificar si ya tiene respuestas al cuestionario
-        respuestas_existentes = models.RespuestaHistorial.objects.filter(
-            paciente=paciente
-        ).exists()
-        context['tiene_cuestionario_completo'] = respuestas_existentes
-        
-        return context
-
-class PortalCompletarHistorialView(TenantLoginRequiredMixin, TemplateView):
-    """Vista para que el paciente complete su historial clínico mejorado desde el portal"""
-    template_name = 'core/portal/completar_historial.html'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        
-        # Verificar que el usuario sea un paciente
-        if not hasattr(self.request.user, 'paciente_perfil'):
-            raise PermissionDenied("Acceso no autorizado")
-        
-        paciente = self.request.user.paciente_perfil
-        context['paciente'] = paciente
-        
-        # Datos para el formulario (mismo formato que la vista mejorada)
-        context['familiares'] = [
-            ('PADRE', 'Padre'),
-            ('MADRE', 'Madre'),
-            ('ABUELO_PATERNO', 'Abuelo Paterno'),
-            ('ABUELA_PATERNA', 'Abuela Paterna'),
-            ('ABUELO_MATERNO', 'Abuelo Materno'),
-            ('ABUELA_MATERNA', 'Abuela Materna'),
-        ]
-        
-        context['enfermedades_familiares'] = [
-            ('DIABETES', 'Diabetes'),
-            ('HIPERTENSION', 'Hipertensión'),
-            ('CARDIOPATIAS', 'Cardiopatías'),
-            ('ALCOHOLISMO', 'Alcoholismo'),
-            ('TABAQUISMO', 'Tabaquismo'),
-            ('CANCER', 'Cáncer'),
-            ('NEUROLOGICAS', 'Neurológicas'),
-            ('HEMATOLOGICAS', 'Hematológicas'),
-            ('RENALES', 'Renales'),
-            ('VENEREAS', 'Venéreas'),
-            ('SOBREPESO', 'Sobrepeso'),
-        ]
-        
-        context['habitos_orales'] = [
-            ('SUCCION_DEDO', 'Succión de dedo'),
-            ('USO_CHUPON', 'Uso de chupón'),
-            ('RESPIRADOR_BUCAL', 'Respirador bucal'),
-            ('INTERPOSICION_LINGUAL', 'Interposición lingual'),
-            ('DEFICIENCIA_CEPILLADO', 'Deficiencia en el cepillado'),
-            ('MORDER_OBJETOS', 'Muerde objetos o uñas'),
-        ]
-        
-        # Cuestionario tradicional
-        preguntas = models.PreguntaHistorial.objects.filter(activa=True)
-        for pregunta in preguntas:
-            models.RespuestaHistorial.objects.get_or_create(
-                paciente=paciente, 
-                pregunta=pregunta, 
-                defaults={'respuesta': ''}
-            )
-            
-        if self.request.POST:
-            context['formset'] = forms.RespuestaHistorialFormSet(
-                self.request.POST, 
-                queryset=paciente.respuestas_historial.all()
-            )
-        else:
-            context['formset'] = forms.RespuestaHistorialFormSet(
-                queryset=paciente.respuestas_historial.all()
-            )
-        
-        return context
-    
-    def post(self, request, *args, **kwargs):
-        context = self.get_context_data(**kwargs)
-        paciente = context['paciente']
-        formset = context['formset']
-        
-        # Procesar datos del formulario mejorado (mismo código que la vista original)
-        try:
-            # Guardar escalas de dolor
-            dolor_numerico = request.POST.get('dolor_numerico')
-            dolor_caras = request.POST.get('dolor_caras')
-            
-            # Guardar antecedentes familiares
-            antecedentes_data = {}
-            for parentesco, _ in context['familiares']:
-                estado = request.POST.get(f'estado_{parentesco}')
-                enfermedades = request.POST.getlist(f'enfermedad_{parentesco}')
-                observaciones = request.POST.get(f'observaciones_{parentesco}', '')
-                
-                if estado:
-                    antecedentes_data[parentesco] = {
-                        'estado': estado,
-                        'enfermedades': enfermedades,
-                        'observaciones': observaciones
-                    }
-            
-            # Guardar hábitos orales
-            habitos_data = {}
-            for habito, _ in context['habitos_orales']:
-                frecuencia = request.POST.get(f'habito_{habito}')
-                if frecuencia and frecuencia != 'NUNCA':
-                    habitos_data[habito] = frecuencia
-            
-            # Guardar signos vitales
-            signos_vitales = {
-                'estatura': request.POST.get('estatura', ''),
-                'peso': request.POST.get('peso', ''),
-                'pulso': request.POST.get('pulso', ''),
-                'frecuencia_respiratoria': request.POST.get('frecuencia_respiratoria', ''),
-                'presion_arterial': request.POST.get('presion_arterial', ''),
-                'temperatura': request.POST.get('temperatura', ''),
-                'tipo_sangre': request.POST.get('tipo_sangre', ''),
-            }
-            
-            # Crear entrada en el historial clínico
-            descripcion_evento = f"""Historial Clínico Auto-Completado por Paciente - {timezone.now().strftime('%d/%m/%Y %H:%M')}
-            
-    ESCALAS DE DOLOR:
-    - Escala numérica: {dolor_numerico or 'No evaluado'}/10
-    - Escala de caras Wong Baker: {dolor_caras or 'No evaluado'}
-    
-    SIGNOS VITALES:
-    - Estatura: {signos_vitales.get('estatura', 'No registrado')}
-    - Peso: {signos_vitales.get('peso', 'No registrado')}
-    - Pulso: {signos_vitales.get('pulso', 'No registrado')} lat/min
-    - F.R.: {signos_vitales.get('frecuencia_respiratoria', 'No registrado')} resp/min
-    - T.A.: {signos_vitales.get('presion_arterial', 'No registrado')} mmHg
-    - Temperatura: {signos_vitales.get('temperatura', 'No registrado')} °C
-    - Tipo de sangre: {signos_vitales.get('tipo_sangre', 'No registrado')}
-    
-    ANTECEDENTES FAMILIARES:
-    {self._format_antecedentes_portal(antecedentes_data)}
-    
-    MALOS HÁBITOS ORALES:
-    {self._format_habitos_portal(habitos_data, context['habitos_orales'])}
-    
-    MOTIVO DE LA CONSULTA:
-    {request.POST.get('motivo_consulta', 'No especificado')}
-    
-    ALERTA MÉDICA:
-    {request.POST.get('alerta_medica', 'Ninguna reportada')}
-    """
-            
-            # Crear entrada en historial
-            historial = models.HistorialClinico.objects.create(
-                paciente=paciente,
-                descripcion_evento=descripcion_evento,
-                registrado_por=None  # Auto-completado por el paciente
-            )
-            
-            # Guardar formset tradicional
-            if formset.is_valid():
-                formset.save()
-            
-            messages.success(request, '¡Tu historial clínico ha sido guardado exitosamente! Nuestro equipo médico lo revisará antes de tu próxima consulta.')
-            return redirect(tenant_reverse('core:portal_historial', request=request))
-            
-        except Exception as e:
-            messages.error(request, f'Error al guardar el historial: {str(e)}')
-            return self.render_to_response(context)
-    
-    def _format_antecedentes_portal(self, antecedentes_data):
-        """Formatea los antecedentes familiares para el historial del portal"""
-        if not antecedentes_data:
-            return "No se reportaron antecedentes familiares significativos."
-        
-        resultado = []
-        for parentesco, datos in antecedentes_data.items():
-            estado = datos.get('estado', '')
-            enfermedades = datos.get('enfermedades', [])
-            observaciones = datos.get('observaciones', '')
-            
-            linea = f"- {parentesco.replace('_', ' ').title()}: {estado}"
-            if enfermedades:
-                linea += f" | Enfermedades: {', '.join(enfermedades)}"
-            if observaciones:
-                linea += f" | Obs: {observaciones}"
-            resultado.append(linea)
-        
-        return "\n    ".join(resultado) if resultado else "No se reportaron antecedentes familiares."
-    
-    def _format_habitos_portal(self, habitos_data, habitos_opciones):
-        """Formatea los hábitos orales para el historial del portal"""
-        if not habitos_data:
-            return "No se reportaron hábitos orales problemáticos."
-        
-        # Crear diccionario para mapear códigos a nombres
-        habitos_nombres = dict(habitos_opciones)
-        
-        resultado = []
-        for habito, frecuencia in habitos_data.items():
-            nombre = habitos_nombres.get(habito, habito)
-            resultado.append(f"- {nombre}: {frecuencia.replace('_', ' ').title()}")
-        
-        return "\n    ".join(resultado) if resultado else "No se reportaron hábitos problemáticos."
-
+        paciente.usuario = user
+        paciente.save()
+
+        messages.success(request, f'Se creó la cuenta para {paciente}. Usuario: {username}, Contraseña: {password}')
+        return redirect(tenant_reverse('core:paciente_detail', request=request, kwargs={'pk': paciente.pk}))
+
+
 class ResetPasswordView(TenantLoginRequiredMixin, TemplateView):
     template_name = 'core/usuario_reset_password.html'
 
@@ -2854,7 +2080,7 @@ class ResetPasswordView(TenantLoginRequiredMixin, TemplateView):
     def post(self, request, *args, **kwargs):
         usuario = get_object_or_404(User, pk=self.kwargs['pk'])
         
-        if not request.user.groups.filter(name='Administrador').exists() and not request.user.is_superuser:
+        if not obtener_principal(request.user).es_admin:
             messages.error(request, 'No tienes permiso para realizar esta acción.')
             return redirect(tenant_reverse('core:usuario_list', request=request))
 
@@ -3101,689 +2327,6 @@ class PreguntaHistorialDeleteView(TenantSuccessUrlMixin, TenantLoginRequiredMixi
     context_object_name = 'pregunta'
     success_message = "Pregunta eliminada con éxito."
 
-class ReporteServiciosMasVendidosView(TenantLoginRequiredMixin, ListView):
-    model = models.Servicio
-    template_name = 'core/reportes/reporte_servicios_vendidos.html'
-    context_object_name = 'servicios'
-
-    def get_queryset(self):
-        # Contar servicios realizados desde TratamientoCita
-        # Ahora los servicios están en TratamientoCita.servicios (M2M)
-        return models.Servicio.objects.annotate(
-            cantidad_vendida=Count('tratamientocita', distinct=True)
-        ).filter(
-            cantidad_vendida__gt=0
-        ).annotate(
-            ingresos_generados=F('precio') * F('cantidad_vendida')
-        ).order_by('-cantidad_vendida')
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        servicios = list(context['servicios'])
-
-        # Calcular totales
-        total_cantidad = sum(s.cantidad_vendida for s in servicios)
-        total_ingresos = sum(s.ingresos_generados for s in servicios)
-        promedio_ingreso = total_ingresos / len(servicios) if servicios else 0
-
-        # Calcular porcentaje de participación para cada servicio
-        for servicio in servicios:
-            servicio.porcentaje = (servicio.ingresos_generados / total_ingresos * 100) if total_ingresos > 0 else 0
-
-        context['servicios'] = servicios
-        context['total_cantidad'] = total_cantidad
-        context['total_ingresos'] = total_ingresos
-        context['promedio_ingreso'] = promedio_ingreso
-
-        return context
-
-def generar_servicios_vendidos_pdf(request):
-    """Genera PDF del reporte de servicios más vendidos"""
-    from reportlab.lib.pagesizes import letter, A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.units import inch, mm
-    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
-    from reportlab.lib import colors
-    from reportlab.platypus.flowables import Image as RLImage
-    from datetime import datetime
-
-    # Obtener datos usando la misma lógica que la vista
-    servicios_qs = models.Servicio.objects.annotate(
-        cantidad_vendida=Count('tratamientocita', distinct=True)
-    ).filter(
-        cantidad_vendida__gt=0
-    ).annotate(
-        ingresos_generados=F('precio') * F('cantidad_vendida')
-    ).order_by('-cantidad_vendida')
-
-    servicios = list(servicios_qs)
-
-    # Calcular estadísticas
-    total_cantidad = sum(s.cantidad_vendida for s in servicios)
-    total_ingresos = sum(s.ingresos_generados for s in servicios)
-    promedio_ingreso = total_ingresos / len(servicios) if servicios else 0
-
-    # Calcular porcentajes
-    for servicio in servicios:
-        servicio.porcentaje = (servicio.ingresos_generados / total_ingresos * 100) if total_ingresos > 0 else 0
-
-    # Configurar respuesta HTTP
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = 'inline; filename="reporte_servicios_vendidos.pdf"'
-
-    # Crear documento PDF
-    doc = SimpleDocTemplate(response, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    styles = getSampleStyleSheet()
-    story = []
-
-    # Obtener tenant
-    tenant = request.tenant
-
-    # Logo y encabezado
-    if tenant.logo:
-        try:
-            logo = RLImage(tenant.logo.path, width=60, height=60)
-            logo.hAlign = 'CENTER'
-            story.append(logo)
-            story.append(Spacer(1, 6))
-        except Exception:
-            pass
-
-    # Título del reporte
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#0d6efd'),
-        alignment=TA_CENTER,
-        spaceAfter=6
-    )
-    story.append(Paragraph(f"<b>{tenant.nombre}</b>", title_style))
-    story.append(Paragraph("Reporte de Servicios Más Vendidos", styles['Heading2']))
-    story.append(Paragraph(f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-    story.append(Spacer(1, 20))
-
-    # Tarjetas de estadísticas (en tabla 2x2)
-    stats_data = [
-        [
-            Paragraph(f"<b>Servicios Realizados</b><br/><font size=16 color='#0d6efd'>{len(servicios)}</font>", styles['Normal']),
-            Paragraph(f"<b>Total de Ventas</b><br/><font size=16 color='#ffc107'>{total_cantidad}</font>", styles['Normal'])
-        ],
-        [
-            Paragraph(f"<b>Ingresos Totales</b><br/><font size=16 color='#198754'>${total_ingresos:,.2f}</font>", styles['Normal']),
-            Paragraph(f"<b>Ingreso Promedio</b><br/><font size=16 color='#dc3545'>${promedio_ingreso:,.2f}</font>", styles['Normal'])
-        ]
-    ]
-
-    stats_table = Table(stats_data, colWidths=[3*inch, 3*inch])
-    stats_table.setStyle(TableStyle([
-        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('BACKGROUND', (0,0), (0,0), colors.HexColor('#e7f3ff')),
-        ('BACKGROUND', (1,0), (1,0), colors.HexColor('#fff3cd')),
-        ('BACKGROUND', (0,1), (0,1), colors.HexColor('#d1e7dd')),
-        ('BACKGROUND', (1,1), (1,1), colors.HexColor('#f8d7da')),
-        ('BOX', (0,0), (-1,-1), 1, colors.grey),
-        ('INNERGRID', (0,0), (-1,-1), 1, colors.grey),
-        ('TOPPADDING', (0,0), (-1,-1), 12),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 12),
-    ]))
-    story.append(stats_table)
-    story.append(Spacer(1, 20))
-
-    # Tabla detallada de servicios
-    story.append(Paragraph("<b>Detalle de Servicios</b>", styles['Heading3']))
-    story.append(Spacer(1, 10))
-
-    # Encabezado de la tabla
-    table_data = [['Rank', 'Servicio', 'Cantidad', 'Precio Unit.', 'Ingresos', 'Participación']]
-
-    # Agregar filas de servicios
-    for idx, servicio in enumerate(servicios, 1):
-        # Medallas para top 3
-        rank_text = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else str(idx)
-
-        table_data.append([
-            rank_text,
-            servicio.nombre[:30],  # Limitar longitud del nombre
-            str(servicio.cantidad_vendida),
-            f"${servicio.precio:,.2f}",
-            f"${servicio.ingresos_generados:,.2f}",
-            f"{servicio.porcentaje:.1f}%"
-        ])
-
-    # Fila de totales
-    table_data.append([
-        '',
-        'TOTAL',
-        str(total_cantidad),
-        '',
-        f"${total_ingresos:,.2f}",
-        '100%'
-    ])
-
-    # Crear tabla
-    table = Table(table_data, colWidths=[0.6*inch, 2.2*inch, 0.8*inch, 1*inch, 1.2*inch, 1*inch])
-
-    # Estilos de la tabla
-    table_style = TableStyle([
-        # Encabezado
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0d6efd')),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('ALIGN', (0,0), (-1,0), 'CENTER'),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,0), 10),
-        ('BOTTOMPADDING', (0,0), (-1,0), 8),
-        ('TOPPADDING', (0,0), (-1,0), 8),
-
-        # Cuerpo
-        ('BACKGROUND', (0,1), (-1,-2), colors.beige),
-        ('TEXTCOLOR', (0,1), (-1,-2), colors.black),
-        ('ALIGN', (0,1), (0,-2), 'CENTER'),  # Rank
-        ('ALIGN', (1,1), (1,-2), 'LEFT'),    # Servicio
-        ('ALIGN', (2,1), (2,-2), 'CENTER'),  # Cantidad
-        ('ALIGN', (3,1), (-1,-2), 'RIGHT'),  # Precios
-        ('FONTNAME', (0,1), (-1,-2), 'Helvetica'),
-        ('FONTSIZE', (0,1), (-1,-2), 9),
-        ('TOPPADDING', (0,1), (-1,-2), 6),
-        ('BOTTOMPADDING', (0,1), (-1,-2), 6),
-
-        # Fila de totales
-        ('BACKGROUND', (0,-1), (-1,-1), colors.HexColor('#f8f9fa')),
-        ('TEXTCOLOR', (0,-1), (-1,-1), colors.black),
-        ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,-1), (-1,-1), 10),
-        ('ALIGN', (0,-1), (1,-1), 'CENTER'),
-        ('ALIGN', (2,-1), (-1,-1), 'RIGHT'),
-        ('TOPPADDING', (0,-1), (-1,-1), 10),
-        ('BOTTOMPADDING', (0,-1), (-1,-1), 10),
-
-        # Bordes
-        ('GRID', (0,0), (-1,-1), 1, colors.grey),
-        ('LINEBELOW', (0,0), (-1,0), 2, colors.HexColor('#0d6efd')),
-        ('LINEABOVE', (0,-1), (-1,-1), 2, colors.grey),
-    ])
-
-    # Resaltar top 3 con colores
-    if len(servicios) >= 1:
-        table_style.add('BACKGROUND', (0,1), (-1,1), colors.HexColor('#fff9e6'))  # Oro
-    if len(servicios) >= 2:
-        table_style.add('BACKGROUND', (0,2), (-1,2), colors.HexColor('#f0f0f0'))  # Plata
-    if len(servicios) >= 3:
-        table_style.add('BACKGROUND', (0,3), (-1,3), colors.HexColor('#ffe5cc'))  # Bronce
-
-    table.setStyle(table_style)
-    story.append(table)
-
-    # Pie de página
-    story.append(Spacer(1, 20))
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=8,
-        textColor=colors.grey,
-        alignment=TA_CENTER
-    )
-    story.append(Paragraph(
-        f"Este reporte muestra los servicios más vendidos ordenados por cantidad de tratamientos realizados.",
-        footer_style
-    ))
-
-    # Construir PDF
-    doc.build(story)
-    return response
-
-class ReporteIngresosPorDentistaView(TenantLoginRequiredMixin, ListView):
-    model = models.Pago
-    template_name = 'core/reportes/reporte_ingresos_dentista.html'
-    context_object_name = 'pagos'
-
-    def get_queryset(self):
-        queryset = models.Pago.objects.select_related('paciente', 'cita__dentista').order_by('-fecha_pago')
-        form = forms.ReporteIngresosDentistaForm(self.request.GET or None)
-
-        if form and form.is_valid():
-            dentista = form.cleaned_data.get('dentista')
-            if dentista:
-                queryset = queryset.filter(cita__dentista=dentista)
-            
-            fecha_inicio = form.cleaned_data.get('fecha_inicio')
-            if fecha_inicio:
-                queryset = queryset.filter(fecha_pago__date__gte=fecha_inicio)
-
-            fecha_fin = form.cleaned_data.get('fecha_fin')
-            if fecha_fin:
-                queryset = queryset.filter(fecha_pago__date__lte=fecha_fin)
-        else:
-            # Defaults si no hay parámetros válidos
-            from datetime import timedelta
-            today = timezone.now().date()
-            default_inicio = today - timedelta(days=30)
-            default_fin = today
-            queryset = queryset.filter(fecha_pago__date__gte=default_inicio, fecha_pago__date__lte=default_fin)
-        
-        return queryset
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        from datetime import timedelta
-        today = timezone.now().date()
-        default_inicio = today - timedelta(days=30)
-        default_fin = today
-        # Mantener valores por defecto visibles cuando no hay GET (o solo paginación)
-        if 'fecha_inicio' in self.request.GET or 'fecha_fin' in self.request.GET:
-            form = forms.ReporteIngresosDentistaForm(self.request.GET)
-        else:
-            form = forms.ReporteIngresosDentistaForm(initial={'fecha_inicio': default_inicio, 'fecha_fin': default_fin})
-        context['form'] = form
-        context['default_fecha_inicio'] = default_inicio.isoformat()
-        context['default_fecha_fin'] = default_fin.isoformat()
-        context['total_ingresos'] = self.get_queryset().aggregate(total=Sum('monto'))['total'] or 0
-        return context
-
-class ReporteServiciosVendidosPeriodoView(TenantLoginRequiredMixin, TemplateView):
-    template_name = 'core/reportes/reporte_servicios_vendidos_periodo.html'
-
-    def get_context_data(self, **kwargs):
-        from datetime import date
-        context = super().get_context_data(**kwargs)
-        form = forms.ReporteServiciosForm(self.request.GET or None)
-
-        # Valores por defecto si no vienen parámetros
-        today = timezone.now().date()
-        periodo = 'mes'
-        fecha_inicio = None
-        fecha_fin = today
-        dentista = None
-
-        if form.is_valid():
-            periodo = form.cleaned_data.get('periodo') or 'semana'
-            fecha_inicio = form.cleaned_data.get('fecha_inicio')
-            fecha_fin = form.cleaned_data.get('fecha_fin') or today
-            dentista = form.cleaned_data.get('dentista')
-        else:
-            periodo = (self.request.GET.get('periodo') or 'semana')
-
-        # Default ranges si no se especifican
-        if not fecha_inicio:
-            if periodo == 'mes':
-                # últimos 6 meses
-                start_month = (today.replace(day=1) - timedelta(days=150)).replace(day=1)
-                fecha_inicio = start_month
-            else:
-                # últimas 8 semanas
-                fecha_inicio = today - timedelta(weeks=8)
-
-        # Filtrar citas con tratamientos realizados
-        citas_qs = models.Cita.objects.filter(
-            fecha_hora__date__gte=fecha_inicio,
-            fecha_hora__date__lte=fecha_fin,
-            estado__in=['ATN', 'COM'],
-            tratamientos_realizados__isnull=False
-        ).distinct()
-        if dentista:
-            citas_qs = citas_qs.filter(dentista=dentista)
-
-        # Obtener tratamientos con servicios
-        tratamientos_qs = models.TratamientoCita.objects.filter(
-            cita__in=citas_qs,
-            servicios__isnull=False
-        ).select_related('cita').prefetch_related('servicios')
-
-        resultados = []
-        from collections import defaultdict, Counter
-
-        # KPIs Globales
-        total_servicios_vendidos = 0
-        total_ingresos = 0
-        servicios_counter = Counter()
-        servicios_ingresos = defaultdict(float)
-
-        # Recolectar datos para KPIs
-        for tratamiento in tratamientos_qs:
-            for servicio in tratamiento.servicios.all():
-                total_servicios_vendidos += 1
-                total_ingresos += float(servicio.precio)
-                servicios_counter[servicio.nombre] += 1
-                servicios_ingresos[servicio.nombre] += float(servicio.precio)
-
-        # Servicio top
-        servicio_top = servicios_counter.most_common(1)
-        servicio_top_nombre = servicio_top[0][0] if servicio_top else 'N/A'
-        servicio_top_cantidad = servicio_top[0][1] if servicio_top else 0
-
-        # Ticket promedio
-        ticket_promedio = total_ingresos / total_servicios_vendidos if total_servicios_vendidos > 0 else 0
-
-        if periodo == 'mes':
-            # Agrupar por mes con cantidad e ingresos
-            grouped = defaultdict(lambda: {'counter': Counter(), 'ingresos': defaultdict(float)})
-            for tratamiento in tratamientos_qs:
-                mes_key = tratamiento.cita.fecha_hora.strftime('%Y-%m')
-                for servicio in tratamiento.servicios.all():
-                    grouped[mes_key]['counter'][servicio.nombre] += 1
-                    grouped[mes_key]['ingresos'][servicio.nombre] += float(servicio.precio)
-
-            # Convertir a formato esperado con ingresos
-            resultados = [
-                {
-                    'periodo': mes,
-                    'items': [
-                        {
-                            'servicio': nombre,
-                            'cantidad': cant,
-                            'ingresos': data['ingresos'][nombre],
-                            'precio_promedio': data['ingresos'][nombre] / cant
-                        }
-                        for nombre, cant in data['counter'].most_common(10)
-                    ]
-                }
-                for mes, data in sorted(grouped.items())
-            ]
-        else:
-            # Agrupar por semana con cantidad e ingresos
-            grouped = defaultdict(lambda: {'counter': Counter(), 'ingresos': defaultdict(float)})
-            for tratamiento in tratamientos_qs:
-                fecha = tratamiento.cita.fecha_hora
-                anio = fecha.year
-                semana = fecha.isocalendar()[1]
-                semana_key = f"{anio}-W{semana:02d}"
-                for servicio in tratamiento.servicios.all():
-                    grouped[semana_key]['counter'][servicio.nombre] += 1
-                    grouped[semana_key]['ingresos'][servicio.nombre] += float(servicio.precio)
-
-            # Convertir a formato esperado con ingresos
-            resultados = [
-                {
-                    'periodo': semana,
-                    'items': [
-                        {
-                            'servicio': nombre,
-                            'cantidad': cant,
-                            'ingresos': data['ingresos'][nombre],
-                            'precio_promedio': data['ingresos'][nombre] / cant
-                        }
-                        for nombre, cant in data['counter'].most_common(10)
-                    ]
-                }
-                for semana, data in sorted(grouped.items())
-            ]
-
-        context.update({
-            'form': form,
-            'periodo': periodo,
-            'fecha_inicio': fecha_inicio,
-            'fecha_fin': fecha_fin,
-            'resultados': resultados,
-            # KPIs
-            'total_servicios_vendidos': total_servicios_vendidos,
-            'total_ingresos': total_ingresos,
-            'servicio_top_nombre': servicio_top_nombre,
-            'servicio_top_cantidad': servicio_top_cantidad,
-            'ticket_promedio': ticket_promedio,
-        })
-        return context
-
-class ReporteIngresosDentistaPeriodoView(TenantLoginRequiredMixin, TemplateView):
-    template_name = 'core/reportes/reporte_ingresos_dentista_periodo.html'
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        form = forms.ReporteIngresosDentistaForm(self.request.GET or None)
-
-        today = timezone.now().date()
-        periodo = 'mes'
-        fecha_inicio = None
-        fecha_fin = today
-        dentista = None
-
-        if form.is_valid():
-            periodo = form.cleaned_data.get('periodo') or 'semana'
-            fecha_inicio = form.cleaned_data.get('fecha_inicio')
-            fecha_fin = form.cleaned_data.get('fecha_fin') or today
-            dentista = form.cleaned_data.get('dentista')
-        else:
-            periodo = (self.request.GET.get('periodo') or 'semana')
-
-        if not fecha_inicio:
-            if periodo == 'mes':
-                start_month = (today.replace(day=1) - timedelta(days=150)).replace(day=1)
-                fecha_inicio = start_month
-            else:
-                fecha_inicio = today - timedelta(weeks=8)
-
-        qs = models.Pago.objects.filter(
-            fecha_pago__date__gte=fecha_inicio,
-            fecha_pago__date__lte=fecha_fin,
-            cita__dentista__isnull=False
-        )
-        if dentista:
-            qs = qs.filter(cita__dentista=dentista)
-
-        # KPIs Globales
-        from django.db.models import Count, Avg
-        from collections import defaultdict
-
-        total_ingresos = float(qs.aggregate(total=Sum('monto'))['total'] or 0)
-
-        # Agrupar por dentista para KPIs
-        dentistas_stats = qs.values(
-            'cita__dentista__id',
-            'cita__dentista__nombre',
-            'cita__dentista__apellido'
-        ).annotate(
-            ingresos=Sum('monto'),
-            num_citas=Count('cita__id', distinct=True)
-        )
-
-        # Calcular dentista top y promedio
-        dentista_top_nombre = 'N/A'
-        dentista_top_ingresos = 0
-        total_dentistas = 0
-
-        if dentistas_stats:
-            dentistas_list = list(dentistas_stats)
-            total_dentistas = len(dentistas_list)
-
-            # Dentista con más ingresos
-            top = max(dentistas_list, key=lambda x: x['ingresos'])
-            dentista_top_nombre = f"Dr. {top['cita__dentista__nombre']} {top['cita__dentista__apellido']}"
-            dentista_top_ingresos = float(top['ingresos'])
-
-        promedio_por_dentista = total_ingresos / total_dentistas if total_dentistas > 0 else 0
-
-        # Total de citas atendidas en el periodo
-        total_citas = models.Cita.objects.filter(
-            fecha_hora__date__gte=fecha_inicio,
-            fecha_hora__date__lte=fecha_fin,
-            dentista__isnull=False,
-            estado__in=['ATN', 'COM']  # Atendida o Completada
-        )
-        if dentista:
-            total_citas = total_citas.filter(dentista=dentista)
-        total_citas_count = total_citas.count()
-
-        # Datos para gráficas y tablas (agrupados por periodo)
-        resultados = []
-        if periodo == 'mes':
-            agg = qs.annotate(
-                periodo_mes=TruncMonth('fecha_pago'),
-                dentista_id=F('cita__dentista__id'),
-                dentista_nombre=F('cita__dentista__nombre'),
-                dentista_apellido=F('cita__dentista__apellido'),
-            ).values('periodo_mes', 'dentista_id', 'dentista_nombre', 'dentista_apellido').annotate(
-                total=Sum('monto'),
-                num_citas=Count('cita__id', distinct=True)
-            ).order_by('periodo_mes', '-total')
-
-            grouped = defaultdict(list)
-            for row in agg:
-                key = row['periodo_mes'].strftime('%Y-%m') if row['periodo_mes'] else 'N/A'
-                nombre = f"Dr. {row['dentista_nombre']} {row['dentista_apellido']}"
-                ingreso = float(row['total'])
-                citas = row['num_citas']
-                promedio_cita = ingreso / citas if citas > 0 else 0
-
-                grouped[key].append({
-                    'dentista': nombre,
-                    'total': ingreso,
-                    'citas': citas,
-                    'promedio_cita': promedio_cita
-                })
-            resultados = [{'periodo': k, 'items': v} for k, v in sorted(grouped.items())]
-        else:
-            agg = qs.annotate(
-                anio=ExtractYear('fecha_pago'),
-                semana=ExtractWeek('fecha_pago'),
-                dentista_id=F('cita__dentista__id'),
-                dentista_nombre=F('cita__dentista__nombre'),
-                dentista_apellido=F('cita__dentista__apellido'),
-            ).values('anio', 'semana', 'dentista_id', 'dentista_nombre', 'dentista_apellido').annotate(
-                total=Sum('monto'),
-                num_citas=Count('cita__id', distinct=True)
-            ).order_by('anio', 'semana', '-total')
-
-            grouped = defaultdict(list)
-            for row in agg:
-                key = f"{row['anio']}-W{int(row['semana']):02d}"
-                nombre = f"Dr. {row['dentista_nombre']} {row['dentista_apellido']}"
-                ingreso = float(row['total'])
-                citas = row['num_citas']
-                promedio_cita = ingreso / citas if citas > 0 else 0
-
-                grouped[key].append({
-                    'dentista': nombre,
-                    'total': ingreso,
-                    'citas': citas,
-                    'promedio_cita': promedio_cita
-                })
-            resultados = [{'periodo': k, 'items': v} for k, v in sorted(grouped.items())]
-
-        context.update({
-            'form': form,
-            'periodo': periodo,
-            'fecha_inicio': fecha_inicio,
-            'fecha_fin': fecha_fin,
-            'resultados': resultados,
-            # KPIs
-            'total_ingresos': total_ingresos,
-            'promedio_por_dentista': promedio_por_dentista,
-            'total_dentistas': total_dentistas,
-            'dentista_top_nombre': dentista_top_nombre,
-            'dentista_top_ingresos': dentista_top_ingresos,
-            'total_citas_count': total_citas_count,
-        })
-        return context
-# REEMPLAZA la clase ReporteIngresosView existente por:
-class ReporteIngresosView(TenantLoginRequiredMixin, ListView):
-    model = models.Pago
-    template_name = 'core/reportes/reporte_ingresos.html'
-    context_object_name = 'pagos'
-    paginate_by = 20
-    
-    def get_queryset(self):
-        queryset = models.Pago.objects.select_related('paciente', 'cita__paciente').order_by('-fecha_pago')
-        form = forms.ReporteIngresosForm(self.request.GET or None)
-        from datetime import date, timedelta
-        today = timezone.now().date()
-        default_inicio = today - timedelta(days=30)
-        default_fin = today
-        if self.request.GET:
-            if form and form.is_valid():
-                fecha_inicio = form.cleaned_data.get('fecha_inicio') or default_inicio
-                fecha_fin = form.cleaned_data.get('fecha_fin') or default_fin
-            else:
-                fecha_inicio, fecha_fin = default_inicio, default_fin
-        else:
-            fecha_inicio, fecha_fin = default_inicio, default_fin
-        queryset = queryset.filter(fecha_pago__date__gte=fecha_inicio, fecha_pago__date__lte=fecha_fin)
-        return queryset
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        from datetime import timedelta
-        from django.db.models import Count, Avg
-        today = timezone.now().date()
-        default_inicio = today - timedelta(days=30)
-        default_fin = today
-        # Si el GET no trae fechas (ej. solo paginación), usar defaults visibles
-        if 'fecha_inicio' in self.request.GET or 'fecha_fin' in self.request.GET:
-            form = forms.ReporteIngresosForm(self.request.GET)
-        else:
-            form = forms.ReporteIngresosForm(initial={'fecha_inicio': default_inicio, 'fecha_fin': default_fin})
-        context['form'] = form
-        context['default_fecha_inicio'] = default_inicio.isoformat()
-        context['default_fecha_fin'] = default_fin.isoformat()
-
-        # KPIs del periodo actual
-        queryset_actual = self.get_queryset()
-        stats_actual = queryset_actual.aggregate(
-            total=Sum('monto'),
-            count=Count('id'),
-            promedio=Avg('monto')
-        )
-
-        context['total_ingresos'] = stats_actual['total'] or 0
-        context['total_pagos'] = stats_actual['count'] or 0
-        context['ticket_promedio'] = stats_actual['promedio'] or 0
-
-        # Método de pago más usado
-        metodo_mas_usado = queryset_actual.values('metodo_pago').annotate(
-            total=Count('id')
-        ).order_by('-total').first()
-
-        if metodo_mas_usado:
-            context['metodo_mas_usado'] = metodo_mas_usado['metodo_pago']
-            context['metodo_mas_usado_porcentaje'] = round((metodo_mas_usado['total'] / context['total_pagos'] * 100) if context['total_pagos'] > 0 else 0, 1)
-        else:
-            context['metodo_mas_usado'] = 'N/A'
-            context['metodo_mas_usado_porcentaje'] = 0
-
-        # Distribución por método de pago (para gráfica de pastel)
-        metodos_distribucion = queryset_actual.values('metodo_pago').annotate(
-            count=Count('id'),
-            total_monto=Sum('monto')
-        ).order_by('-count')
-        context['metodos_distribucion'] = list(metodos_distribucion)
-
-        # Comparación con periodo anterior (para % de cambio)
-        form_data = form.cleaned_data if form.is_valid() else {}
-        fecha_inicio = form_data.get('fecha_inicio') or default_inicio
-        fecha_fin = form_data.get('fecha_fin') or default_fin
-
-        duracion_periodo = (fecha_fin - fecha_inicio).days + 1
-        fecha_inicio_anterior = fecha_inicio - timedelta(days=duracion_periodo)
-        fecha_fin_anterior = fecha_inicio - timedelta(days=1)
-
-        queryset_anterior = models.Pago.objects.filter(
-            fecha_pago__date__gte=fecha_inicio_anterior,
-            fecha_pago__date__lte=fecha_fin_anterior
-        )
-
-        stats_anterior = queryset_anterior.aggregate(
-            total=Sum('monto'),
-            count=Count('id'),
-            promedio=Avg('monto')
-        )
-
-        # Calcular porcentajes de cambio
-        total_anterior = stats_anterior['total'] or 0
-        count_anterior = stats_anterior['count'] or 0
-        promedio_anterior = stats_anterior['promedio'] or 0
-
-        context['cambio_ingresos'] = self._calcular_cambio_porcentual(context['total_ingresos'], total_anterior)
-        context['cambio_pagos'] = self._calcular_cambio_porcentual(context['total_pagos'], count_anterior)
-        context['cambio_ticket'] = self._calcular_cambio_porcentual(context['ticket_promedio'], promedio_anterior)
-
-        return context
-
-    def _calcular_cambio_porcentual(self, actual, anterior):
-        """Calcula el cambio porcentual entre dos valores"""
-        if anterior == 0:
-            return 100 if actual > 0 else 0
-        return round(((actual - anterior) / anterior) * 100, 1)
-# ==================== VISTAS FALTANTES ====================
 
 # --- PROVEEDORES ---
 class ProveedorListView(TenantLoginRequiredMixin, ListView):
@@ -3858,7 +2401,7 @@ class InsumoListView(TenantLoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
 
         # Imports necesarios
-        from django.db.models import F, Sum
+        from django.db.models import Count, F, Q
         from datetime import date, timedelta
 
         # Actualizar stock de todos los insumos
@@ -3866,34 +2409,29 @@ class InsumoListView(TenantLoginRequiredMixin, ListView):
             insumo.actualizar_stock_total()
 
         # Estadísticas
-        total_insumos = models.Insumo.objects.count()
-        stock_critico_count = models.Insumo.objects.filter(stock=0).count()
-        stock_bajo_count = models.Insumo.objects.filter(
-            stock__lte=F('stock_minimo'), stock__gt=0
-        ).count()
+        conteos_stock = models.Insumo.objects.aggregate(
+            critico=Count('id', filter=Q(stock=0)),
+            bajo=Count('id', filter=Q(stock__lte=F('stock_minimo'), stock__gt=0)),
+        )
+        stock_critico_count = conteos_stock['critico']
+        stock_bajo_count = conteos_stock['bajo']
 
-        # Valor total del inventario
-        valor_total = models.Insumo.objects.aggregate(
-            valor_total=Sum(F('stock') * F('precio_unitario'))
-        )['valor_total'] or 0
+        # Valor total del inventario con el costo real de los lotes (PEPS o promedio, según settings)
+        valor_total = services.ValuacionInventarioService.valuar()['valor_total']
 
         # Lista de proveedores para filtros
         proveedores = models.Proveedor.objects.all().order_by('nombre')
 
-        # Alertas de caducidad
+        # Alertas de caducidad: un solo conteo sobre el índice parcial de lotes con existencia
         hoy = date.today()
-        lotes_vencidos = models.LoteInsumo.objects.filter(
-            fecha_caducidad__lte=hoy,
-            fecha_caducidad__isnull=False,
-            cantidad__gt=0
-        ).select_related('insumo', 'unidad_dental').order_by('fecha_caducidad')
-
-        lotes_proximos_vencer = models.LoteInsumo.objects.filter(
-            fecha_caducidad__gt=hoy,
+        conteos_caducidad = models.LoteInsumo.objects.filter(
             fecha_caducidad__lte=hoy + timedelta(days=60),
             fecha_caducidad__isnull=False,
             cantidad__gt=0
-        ).select_related('insumo', 'unidad_dental').order_by('fecha_caducidad')
+        ).aggregate(
+            vencidos=Count('id', filter=Q(fecha_caducidad__lte=hoy)),
+            proximos=Count('id', filter=Q(fecha_caducidad__gt=hoy)),
+        )
 
         # Unidades dentales para filtros
         unidades = models.UnidadDental.objects.all().order_by('nombre')
@@ -3905,10 +2443,8 @@ class InsumoListView(TenantLoginRequiredMixin, ListView):
             'proveedores': proveedores,
             'unidades': unidades,
             'fecha_actual': hoy,
-            'lotes_vencidos': lotes_vencidos,
-            'lotes_proximos_vencer': lotes_proximos_vencer,
-            'lotes_vencidos_count': lotes_vencidos.count(),
-            'lotes_proximos_vencer_count': lotes_proximos_vencer.count(),
+            'lotes_vencidos_count': conteos_caducidad['vencidos'],
+            'lotes_proximos_vencer_count': conteos_caducidad['proximos'],
         })
 
         return context
@@ -3997,7 +2533,7 @@ def ajustar_stock_lote(request, lote_id):
             usuario=request.user
         )
 
-        # Actualizar stock total del insumo
+        # Stock total del insumo para la respuesta (la señal puede haberlo dejado en la cola de tareas)
         lote.insumo.actualizar_stock_total()
 
         return JsonResponse({
@@ -4017,317 +2553,6 @@ def ajustar_stock_lote(request, lote_id):
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
 
-@login_required
-def inventario_exportar_excel(request):
-    """Exportar inventario completo a Excel con formato para re-importación"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment
-    from django.http import HttpResponse
-    from datetime import datetime
-
-    # Crear workbook
-    wb = Workbook()
-
-    # HOJA 1: Insumos con lotes
-    ws = wb.active
-    ws.title = 'Inventario'
-
-    # Headers con estilo
-    headers = [
-        'ID Insumo', 'Nombre', 'Descripción', 'Unidad Medida', 'Proveedor',
-        'Stock Mínimo', 'Precio Unitario', 'ID Lote', 'Unidad Dental',
-        'Cantidad en Lote', 'Número de Lote', 'Fecha Caducidad', 'Registro Sanitario'
-    ]
-
-    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF")
-
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num)
-        cell.value = header
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-    # Obtener datos
-    insumos = models.Insumo.objects.select_related('proveedor').prefetch_related(
-        'lotes', 'lotes__unidad_dental'
-    ).order_by('nombre')
-
-    row = 2
-    for insumo in insumos:
-        lotes = insumo.lotes.all()
-        if lotes.exists():
-            for lote in lotes:
-                ws.cell(row=row, column=1).value = insumo.id
-                ws.cell(row=row, column=2).value = insumo.nombre
-                ws.cell(row=row, column=3).value = insumo.descripcion
-                ws.cell(row=row, column=4).value = insumo.unidad_medida
-                ws.cell(row=row, column=5).value = insumo.proveedor.nombre if insumo.proveedor else ''
-                ws.cell(row=row, column=6).value = insumo.stock_minimo
-                ws.cell(row=row, column=7).value = float(insumo.precio_unitario)
-                ws.cell(row=row, column=8).value = lote.id
-                ws.cell(row=row, column=9).value = lote.unidad_dental.nombre
-                ws.cell(row=row, column=10).value = lote.cantidad
-                ws.cell(row=row, column=11).value = lote.numero_lote or ''
-                ws.cell(row=row, column=12).value = lote.fecha_caducidad.strftime('%Y-%m-%d') if lote.fecha_caducidad else ''
-                ws.cell(row=row, column=13).value = insumo.registro_sanitario or ''
-                row += 1
-        else:
-            # Insumo sin lotes
-            ws.cell(row=row, column=1).value = insumo.id
-            ws.cell(row=row, column=2).value = insumo.nombre
-            ws.cell(row=row, column=3).value = insumo.descripcion
-            ws.cell(row=row, column=4).value = insumo.unidad_medida
-            ws.cell(row=row, column=5).value = insumo.proveedor.nombre if insumo.proveedor else ''
-            ws.cell(row=row, column=6).value = insumo.stock_minimo
-            ws.cell(row=row, column=7).value = float(insumo.precio_unitario)
-            ws.cell(row=row, column=8).value = ''
-            ws.cell(row=row, column=9).value = ''
-            ws.cell(row=row, column=10).value = 0
-            ws.cell(row=row, column=11).value = ''
-            ws.cell(row=row, column=12).value = ''
-            ws.cell(row=row, column=13).value = insumo.registro_sanitario or ''
-            row += 1
-
-    # Ajustar anchos de columna
-    ws.column_dimensions['A'].width = 10
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 40
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 25
-    ws.column_dimensions['F'].width = 12
-    ws.column_dimensions['G'].width = 15
-    ws.column_dimensions['H'].width = 10
-    ws.column_dimensions['I'].width = 20
-    ws.column_dimensions['J'].width = 15
-    ws.column_dimensions['K'].width = 20
-    ws.column_dimensions['L'].width = 15
-    ws.column_dimensions['M'].width = 20
-
-    # HOJA 2: Instrucciones
-    ws_inst = wb.create_sheet('Instrucciones')
-    instrucciones = [
-        "INSTRUCCIONES PARA IMPORTACIÓN DE INVENTARIO",
-        "",
-        "1. IMPORTANTE: No modifique los nombres de las columnas",
-        "2. Para ACTUALIZAR cantidades de lotes existentes: Deje el 'ID Lote' y modifique 'Cantidad en Lote'",
-        "3. Para CREAR nuevos insumos: Deje 'ID Insumo' vacío, complete Nombre (obligatorio)",
-        "4. Para AGREGAR nuevos lotes: Deje 'ID Lote' vacío, especifique 'ID Insumo' existente",
-        "5. La 'Unidad Dental' debe coincidir exactamente con el nombre en el sistema",
-        "6. Fecha Caducidad: Formato YYYY-MM-DD (ej: 2025-12-31)",
-        "7. Campos obligatorios: Nombre, Unidad Dental (si hay lote), Cantidad en Lote",
-        "",
-        "VALIDACIONES AL IMPORTAR:",
-        "- Stock Mínimo debe ser >= 0",
-        "- Precio Unitario debe ser >= 0",
-        "- Cantidad en Lote debe ser >= 0",
-        "- Unidad Dental debe existir en el sistema",
-        "- Fecha Caducidad debe ser futura (si se especifica)",
-        "",
-        "CONSEJOS:",
-        "- Exporte primero el inventario actual para ver el formato correcto",
-        "- Haga una copia de seguridad antes de importar cambios masivos",
-        "- Si hay errores, el sistema le mostrará qué filas tienen problemas",
-    ]
-
-    for idx, linea in enumerate(instrucciones, 1):
-        cell = ws_inst.cell(row=idx, column=1)
-        cell.value = linea
-        if idx == 1:
-            cell.font = Font(bold=True, size=14)
-        elif linea.startswith("VALIDACIONES") or linea.startswith("CONSEJOS"):
-            cell.font = Font(bold=True, size=12)
-
-    ws_inst.column_dimensions['A'].width = 100
-
-    # Preparar respuesta HTTP
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    filename = f'inventario_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    response['Content-Disposition'] = f'attachment; filename={filename}'
-
-    wb.save(response)
-    return response
-
-@login_required
-def inventario_importar_excel(request):
-    """Importar inventario desde Excel con validaciones"""
-    if request.method == 'POST':
-        from openpyxl import load_workbook
-        from django.db import transaction
-        from datetime import datetime
-
-        archivo = request.FILES.get('archivo_excel')
-        if not archivo:
-            messages.error(request, "Por favor seleccione un archivo Excel.")
-            return redirect(tenant_reverse('core:insumo_list', request=request))
-
-        # Validar extensión
-        if not archivo.name.endswith(('.xlsx', '.xls')):
-            messages.error(request, "El archivo debe ser un Excel (.xlsx o .xls)")
-            return redirect(tenant_reverse('core:insumo_list', request=request))
-
-        try:
-            wb = load_workbook(archivo, data_only=True)
-            ws = wb['Inventario']
-
-            errores = []
-            filas_procesadas = 0
-            insumos_creados = 0
-            insumos_actualizados = 0
-            lotes_creados = 0
-            lotes_actualizados = 0
-
-            # Obtener todas las unidades dentales disponibles
-            unidades_dict = {u.nombre: u for u in models.UnidadDental.objects.all()}
-            proveedores_dict = {p.nombre: p for p in models.Proveedor.objects.all()}
-
-            with transaction.atomic():
-                for row_num, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                    try:
-                        # Extraer valores
-                        id_insumo = row[0]
-                        nombre = row[1]
-                        descripcion = row[2] or ''
-                        unidad_medida = row[3] or ''
-                        proveedor_nombre = row[4]
-                        stock_minimo = row[5] or 0
-                        precio_unitario = row[6] or 0.0
-                        id_lote = row[7]
-                        unidad_dental_nombre = row[8]
-                        cantidad_lote = row[9] or 0
-                        numero_lote = row[10] or ''
-                        fecha_cad_str = row[11]
-                        registro_sanitario = row[12] or ''
-
-                        # Validación: nombre es obligatorio
-                        if not nombre:
-                            continue  # Fila vacía, skip
-
-                        # Validar valores numéricos
-                        try:
-                            stock_minimo = int(stock_minimo)
-                            precio_unitario = float(precio_unitario)
-                            cantidad_lote = int(cantidad_lote)
-                        except (ValueError, TypeError):
-                            errores.append(f"Fila {row_num}: Valores numéricos inválidos")
-                            continue
-
-                        if stock_minimo < 0 or precio_unitario < 0 or cantidad_lote < 0:
-                            errores.append(f"Fila {row_num}: Los valores numéricos no pueden ser negativos")
-                            continue
-
-                        # Procesar fecha de caducidad
-                        fecha_caducidad = None
-                        if fecha_cad_str:
-                            try:
-                                if isinstance(fecha_cad_str, datetime):
-                                    fecha_caducidad = fecha_cad_str.date()
-                                else:
-                                    fecha_caducidad = datetime.strptime(str(fecha_cad_str), '%Y-%m-%d').date()
-                            except ValueError:
-                                errores.append(f"Fila {row_num}: Fecha de caducidad inválida (use YYYY-MM-DD)")
-                                continue
-
-                        # Buscar o crear insumo
-                        proveedor = proveedores_dict.get(proveedor_nombre) if proveedor_nombre else None
-
-                        if id_insumo:
-                            # Actualizar insumo existente
-                            try:
-                                insumo = models.Insumo.objects.get(id=id_insumo)
-                                insumo.descripcion = descripcion
-                                insumo.unidad_medida = unidad_medida
-                                insumo.proveedor = proveedor
-                                insumo.stock_minimo = stock_minimo
-                                insumo.precio_unitario = precio_unitario
-                                insumo.registro_sanitario = registro_sanitario
-                                insumo.save()
-                                insumos_actualizados += 1
-                            except models.Insumo.DoesNotExist:
-                                errores.append(f"Fila {row_num}: Insumo ID {id_insumo} no existe")
-                                continue
-                        else:
-                            # Crear nuevo insumo
-                            insumo = models.Insumo.objects.create(
-                                nombre=nombre,
-                                descripcion=descripcion,
-                                unidad_medida=unidad_medida,
-                                proveedor=proveedor,
-                                stock_minimo=stock_minimo,
-                                precio_unitario=precio_unitario,
-                                registro_sanitario=registro_sanitario
-                            )
-                            insumos_creados += 1
-
-                        # Procesar lote si hay unidad dental especificada
-                        if unidad_dental_nombre and cantidad_lote > 0:
-                            unidad_dental = unidades_dict.get(unidad_dental_nombre)
-                            if not unidad_dental:
-                                errores.append(f"Fila {row_num}: Unidad Dental '{unidad_dental_nombre}' no existe")
-                                continue
-
-                            if id_lote:
-                                # Actualizar lote existente
-                                try:
-                                    lote = models.LoteInsumo.objects.get(id=id_lote, insumo=insumo)
-                                    lote.cantidad = cantidad_lote
-                                    lote.numero_lote = numero_lote
-                                    lote.fecha_caducidad = fecha_caducidad
-                                    lote.unidad_dental = unidad_dental
-                                    lote.save()
-                                    lotes_actualizados += 1
-                                except models.LoteInsumo.DoesNotExist:
-                                    errores.append(f"Fila {row_num}: Lote ID {id_lote} no existe")
-                                    continue
-                            else:
-                                # Crear nuevo lote
-                                models.LoteInsumo.objects.create(
-                                    insumo=insumo,
-                                    unidad_dental=unidad_dental,
-                                    cantidad=cantidad_lote,
-                                    numero_lote=numero_lote,
-                                    fecha_caducidad=fecha_caducidad
-                                )
-                                lotes_creados += 1
-
-                        filas_procesadas += 1
-
-                    except Exception as e:
-                        errores.append(f"Fila {row_num}: Error inesperado - {str(e)}")
-                        continue
-
-                # Actualizar stock de todos los insumos
-                for insumo in models.Insumo.objects.all():
-                    insumo.actualizar_stock_total()
-
-            # Mensajes de resultado
-            if errores:
-                messages.warning(
-                    request,
-                    f"Importación completada con {len(errores)} errores. "
-                    f"Procesadas: {filas_procesadas} filas. "
-                    f"Errores: {', '.join(errores[:5])}{'...' if len(errores) > 5 else ''}"
-                )
-            else:
-                messages.success(
-                    request,
-                    f"Importación exitosa! "
-                    f"Insumos creados: {insumos_creados}, actualizados: {insumos_actualizados}. "
-                    f"Lotes creados: {lotes_creados}, actualizados: {lotes_actualizados}."
-                )
-
-        except KeyError:
-            messages.error(request, "El archivo no contiene la hoja 'Inventario'. Use el formato correcto.")
-        except Exception as e:
-            messages.error(request, f"Error al procesar el archivo: {str(e)}")
-
-        return redirect(tenant_reverse('core:insumo_list', request=request))
-
-    # GET request - mostrar formulario
-    return render(request, 'core/inventario_importar.html')
 
 # --- PAGOS ---
 class RegistrarPagoView(TenantSuccessUrlMixin, TenantLoginRequiredMixin, SuccessMessageMixin, CreateView):
@@ -4445,172 +2670,9 @@ class ProcesarPagoView(TenantSuccessUrlMixin, TenantLoginRequiredMixin, CreateVi
         else:
             messages.success(self.request, "Pago registrado con éxito.")
 
-        # Actualizar saldo global
-        pago.paciente.actualizar_saldo_global()
+        # El saldo global lo recalcula la señal de Pago
         return super().form_valid(form)
 
-# --- REPORTES ---
-class ReporteSaldosView(TenantLoginRequiredMixin, ListView):
-    model = models.Paciente
-    template_name = 'core/reportes/reporte_saldos.html'
-    context_object_name = 'pacientes'
-
-    def get_queryset(self):
-        from datetime import date, timedelta
-
-        pacientes = models.Paciente.objects.all()
-        for paciente in pacientes:
-            paciente.actualizar_saldo_global()
-
-        queryset = pacientes.filter(saldo_global__gt=0).select_related('usuario').order_by('-saldo_global')
-
-        # Convertir a lista para preservar atributos dinámicos
-        lista_pacientes = list(queryset)
-
-        # Agregar última cita y calcular antigüedad para cada paciente
-        hoy = date.today()
-        for paciente in lista_pacientes:
-            ultima_cita = paciente.cita_set.order_by('-fecha_hora').first()
-            if ultima_cita:
-                dias_antiguedad = (hoy - ultima_cita.fecha_hora.date()).days
-                paciente.dias_antiguedad = dias_antiguedad
-                paciente.ultima_cita_fecha = ultima_cita.fecha_hora
-
-                # Categorizar por antigüedad
-                if dias_antiguedad <= 30:
-                    paciente.categoria_antiguedad = 'reciente'
-                    paciente.badge_class = 'success'
-                elif dias_antiguedad <= 60:
-                    paciente.categoria_antiguedad = 'media'
-                    paciente.badge_class = 'warning'
-                else:
-                    paciente.categoria_antiguedad = 'alta'
-                    paciente.badge_class = 'danger'
-            else:
-                paciente.dias_antiguedad = 0
-                paciente.ultima_cita_fecha = None
-                paciente.categoria_antiguedad = 'desconocida'
-                paciente.badge_class = 'secondary'
-
-        return lista_pacientes
-
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        from django.db.models import Sum, Count
-
-        # Usar object_list que ya tiene los atributos dinámicos asignados
-        pacientes = context['object_list']
-
-        # KPIs Generales
-        total_saldo = sum(p.saldo_global for p in pacientes)
-        total_pacientes = len(pacientes)
-
-        context['total_saldo'] = total_saldo
-        context['total_pacientes'] = total_pacientes
-
-        # KPIs por Antigüedad
-        saldo_0_30 = 0
-        saldo_31_60 = 0
-        saldo_61_mas = 0
-        pacientes_0_30 = 0
-        pacientes_31_60 = 0
-        pacientes_61_mas = 0
-
-        for paciente in pacientes:
-            if paciente.categoria_antiguedad == 'reciente':
-                saldo_0_30 += paciente.saldo_global
-                pacientes_0_30 += 1
-            elif paciente.categoria_antiguedad == 'media':
-                saldo_31_60 += paciente.saldo_global
-                pacientes_31_60 += 1
-            elif paciente.categoria_antiguedad == 'alta':
-                saldo_61_mas += paciente.saldo_global
-                pacientes_61_mas += 1
-
-        context['saldo_0_30'] = saldo_0_30
-        context['saldo_31_60'] = saldo_31_60
-        context['saldo_61_mas'] = saldo_61_mas
-        context['pacientes_0_30'] = pacientes_0_30
-        context['pacientes_31_60'] = pacientes_31_60
-        context['pacientes_61_mas'] = pacientes_61_mas
-
-        # Datos para gráfica apilada
-        context['datos_antiguedad'] = {
-            '0-30': {'saldo': float(saldo_0_30), 'pacientes': pacientes_0_30},
-            '31-60': {'saldo': float(saldo_31_60), 'pacientes': pacientes_31_60},
-            '>60': {'saldo': float(saldo_61_mas), 'pacientes': pacientes_61_mas}
-        }
-
-        return context
-    
-class ReporteFacturacionView(TenantLoginRequiredMixin, ListView):
-    model = models.Cita
-    template_name = 'core/reportes/reporte_facturacion.html'
-    context_object_name = 'citas_facturacion'
-    
-    def get_queryset(self):
-        # Mostrar citas con factura solicitada (flag) o con pagos que tengan datos SAT (fallback)
-        base = models.Cita.objects.select_related('paciente').order_by('-fecha_hora')
-        queryset = base.filter(
-            Q(requiere_factura=True) | Q(pagos__forma_pago_sat__isnull=False)
-        ).distinct().prefetch_related(
-            'tratamientos_realizados__servicios',
-            'pagos__forma_pago_sat',
-            'pagos__metodo_sat'
-        )
-        
-        # Aplicar filtros basados en parámetros GET
-        nombre_paciente = self.request.GET.get('nombre_paciente', '').strip()
-        if nombre_paciente:
-            queryset = queryset.filter(
-                Q(paciente__usuario__first_name__icontains=nombre_paciente) |
-                Q(paciente__usuario__last_name__icontains=nombre_paciente) |
-                Q(paciente__nombre__icontains=nombre_paciente) |
-                Q(paciente__apellido__icontains=nombre_paciente)
-            )
-        
-        rfc_filtro = self.request.GET.get('rfc', '').strip()
-        if rfc_filtro:
-            queryset = queryset.filter(
-                paciente__datos_fiscales__rfc__icontains=rfc_filtro
-            )
-        
-        fecha_inicio = self.request.GET.get('fecha_inicio', '').strip()
-        if fecha_inicio:
-            try:
-                from datetime import datetime
-                fecha_inicio_dt = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_hora__date__gte=fecha_inicio_dt)
-            except ValueError:
-                pass
-        
-        fecha_fin = self.request.GET.get('fecha_fin', '').strip()
-        if fecha_fin:
-            try:
-                from datetime import datetime
-                fecha_fin_dt = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
-                queryset = queryset.filter(fecha_hora__date__lte=fecha_fin_dt)
-            except ValueError:
-                pass
-        
-        return queryset
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        citas_qs = list(context.get('citas_facturacion') or context.get('object_list'))
-        
-        # Enriquecer cada cita con su último pago para evitar problemas en template
-        for cita in citas_qs:
-            ultimo_pago = cita.pagos.order_by('-fecha_pago').first()
-            cita.ultimo_pago = ultimo_pago
-        
-        # Pasar el nombre esperado por la plantilla actual
-        context['citas_a_facturar'] = citas_qs
-        # Calcular total a facturar como suma de montos pagados en estas citas
-        total = models.Pago.objects.filter(cita__in=citas_qs).aggregate(total=Sum('monto'))['total'] or 0
-        context['total_a_facturar'] = total
-        return context
-        
 class CitaDetailView(TenantLoginRequiredMixin, DetailView):
     model = models.Cita
     template_name = 'core/cita_detail.html'
@@ -4623,25 +2685,25 @@ class CitaManageView(TenantLoginRequiredMixin, DetailView):
 
     def _ensure_default_diagnosticos(self):
         """Asegura un set básico de diagnósticos para el odontograma interactivo"""
-        base = [
-            ('SANO', '#27ae60'),
-            ('CARIES', '#e74c3c'),
-            ('OBTURACION', '#f39c12'),
-            ('CORONA', '#3498db'),
-            ('ENDODONCIA', '#e91e63'),
-            ('EXTRAIDO', '#95a5a6'),
-        ]
-        for nombre, color in base:
+        # Solo se verifica una vez por versión del catálogo de diagnósticos del tenant
+        if cache.get(f"diagnosticos_base:{cache_fragmentos.version('diagnosticos')}"):
+            return
+        for nombre, color in services.DIAGNOSTICOS_BASE:
             if not models.Diagnostico.objects.filter(nombre__iexact=nombre).exists():
                 try:
                     models.Diagnostico.objects.create(nombre=nombre, color_hex=color, icono_svg='')
                 except Exception:
                     pass
+        cache.set(
+            f"diagnosticos_base:{cache_fragmentos.version('diagnosticos')}",
+            True,
+            cache_fragmentos.TIMEOUT_FRAGMENTO
+        )
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['historial_form'] = forms.HistorialClinicoForm()
-        context['puede_facturar'] = self.request.user.groups.filter(name__in=['Administrador','Recepcionista']).exists()
+        context['puede_facturar'] = obtener_principal(self.request.user).en_grupo('Administrador', 'Recepcionista')
 
         # Asegurar diagnósticos base y luego cargar todos
         self._ensure_default_diagnosticos()
@@ -4667,13 +2729,10 @@ class CitaManageView(TenantLoginRequiredMixin, DetailView):
     def _handle_historial_entry(self, request, cita):
         """Manejar creación de entrada de historial clínico"""
         # Permitir a Dentista asignado, Administrador y Recepcionista
-        perfil_dentista = None
-        try:
-            perfil_dentista = models.PerfilDentista.objects.get(usuario=request.user)
-        except models.PerfilDentista.DoesNotExist:
-            pass
-        if not (perfil_dentista or request.user.is_superuser or request.user.groups.filter(name__in=['Administrador','Recepcionista']).exists()):
+        principal = obtener_principal(request.user)
+        if not (principal.dentista_id or principal.es_superusuario or principal.en_grupo('Administrador', 'Recepcionista')):
             return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
+        perfil_dentista = models.PerfilDentista.objects.filter(pk=principal.dentista_id).first() if principal.dentista_id else None
         
         try:
             from .models import crear_entrada_historial_clinico
@@ -4707,15 +2766,11 @@ class CitaManageView(TenantLoginRequiredMixin, DetailView):
     def _handle_agregar_servicios(self, request, cita):
         """Manejar la administración completa de servicios de una cita (reemplazar servicios_planeados)"""
         # Verificar permisos: Dentista asignado, Administrador o Recepcionista
-        autorizado = False
-        perfil_dentista = None
-        try:
-            perfil_dentista = models.PerfilDentista.objects.get(usuario=request.user)
-            autorizado = (cita.dentista == perfil_dentista)
-        except models.PerfilDentista.DoesNotExist:
-            autorizado = False
-        if request.user.is_superuser or request.user.groups.filter(name__in=['Administrador','Recepcionista']).exists():
-            autorizado = True
+        principal = obtener_principal(request.user)
+        autorizado = (
+            (principal.dentista_id is not None and cita.dentista_id == principal.dentista_id)
+            or principal.es_superusuario or principal.en_grupo('Administrador', 'Recepcionista')
+        )
         if not autorizado:
             return JsonResponse({'success': False, 'error': 'Sin permisos para administrar servicios'}, status=403)
 
@@ -4766,15 +2821,11 @@ class CitaManageView(TenantLoginRequiredMixin, DetailView):
     def _handle_tratamiento(self, request, cita):
         """Manejar registro de tratamientos en la cita"""
         # Verificar permisos: Dentista asignado, Administrador o Recepcionista
-        autorizado = False
-        perfil_dentista = None
-        try:
-            perfil_dentista = models.PerfilDentista.objects.get(usuario=request.user)
-            autorizado = (cita.dentista == perfil_dentista)
-        except models.PerfilDentista.DoesNotExist:
-            autorizado = False
-        if request.user.is_superuser or request.user.groups.filter(name__in=['Administrador','Recepcionista']).exists():
-            autorizado = True
+        principal = obtener_principal(request.user)
+        autorizado = (
+            (principal.dentista_id is not None and cita.dentista_id == principal.dentista_id)
+            or principal.es_superusuario or principal.en_grupo('Administrador', 'Recepcionista')
+        )
         if not autorizado:
             return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
         
@@ -5022,12 +3073,11 @@ class PacientesPendientesPagoListView(TenantLoginRequiredMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        user = self.request.user
         
         # Solo admin y recepción pueden filtrar por dentista
-        context['puede_filtrar_dentista'] = user.groups.filter(
-            name__in=['Administrador', 'Recepcionista']
-        ).exists()
+        context['puede_filtrar_dentista'] = obtener_principal(self.request.user).en_grupo(
+            'Administrador', 'Recepcionista'
+        )
         
         if context['puede_filtrar_dentista']:
             context['dentistas'] = models.PerfilDentista.objects.filter(activo=True)
@@ -5112,8 +3162,7 @@ class RegistrarPagoPacienteView(TenantSuccessUrlMixin, TenantLoginRequiredMixin,
             pago.cambio_devuelto = None
 
         pago.save()
-        # Actualizar saldo global del paciente de forma segura
-        self.paciente.actualizar_saldo_global()
+        # El saldo global del paciente lo recalcula la señal de Pago
         # Si se desea facturar y no hay datos fiscales, redirigir para capturarlos
         if form.cleaned_data.get('desea_factura'):
             # Marcar la cita como requerida si aplica
@@ -5131,36 +3180,23 @@ class RegistrarPagoPacienteView(TenantSuccessUrlMixin, TenantLoginRequiredMixin,
         return super().form_valid(form)
 
 @tenant_login_required
+@cache_catalogo(models.PerfilDentista, models.Especialidad, models.Servicio)
 def get_servicios_for_dentista_api(request, dentista_id):
     try:
-        dentista = models.PerfilDentista.objects.get(pk=dentista_id)
-        
-        # Obtener los IDs de las especialidades directas del dentista
-        especialidades_directas_ids = set(dentista.especialidades.values_list('id', flat=True))
-        print(f"Espec. directas: {especialidades_directas_ids}")
-        # Obtener los IDs de las especialidades incluidas
-        especialidades_incluidas_ids = set()
-        for esp in dentista.especialidades.prefetch_related('especialidades_incluidas').all():
-            for incluida in esp.especialidades_incluidas.all():
-                especialidades_incluidas_ids.add(incluida.id)
-        print(f"Espec. incluidas: {especialidades_incluidas_ids}")
-
-        # Combinar todos los IDs de especialidades relevantes
-        todas_las_especialidades_ids = especialidades_directas_ids.union(especialidades_incluidas_ids)
-        print(f"Todas las espec.: {todas_las_especialidades_ids}")
-        # Filtrar los servicios que son activos y pertenecen a cualquiera de esas especialidades
+        # Cierre precalculado especialidad -> servicios (incluye 'Dentista General' y
+        # especialidades incluidas a cualquier profundidad)
+        servicios_dentista = services.EspecialidadService.cierre()['dentistas']
+        if dentista_id not in servicios_dentista:
+            return JsonResponse({'error': 'Dentista no encontrado'}, status=404)
+
         servicios = models.Servicio.objects.filter(
-            especialidad__id__in=todas_las_especialidades_ids,
+            id__in=servicios_dentista[dentista_id],
             activo=True
-        ).values('id', 'nombre').distinct()
-        print(f"Servicios: {list(servicios)}")
+        ).values('id', 'nombre')
         return JsonResponse(list(servicios), safe=False)
-        
-    except models.PerfilDentista.DoesNotExist:
-        print(f"Dentista {dentista_id} no encontrado")
-        return JsonResponse({'error': 'Dentista no encontrado'}, status=404)
+
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception("Error obteniendo servicios del dentista %s", dentista_id)
         return JsonResponse({'error': str(e)}, status=500)
 
 @tenant_login_required
@@ -5191,6 +3227,7 @@ def paciente_saldo_api(request, paciente_id):
     return JsonResponse({'saldo': f"{paciente.saldo_global:.2f}"})
 
 @tenant_login_required
+@cache_catalogo(models.PerfilDentista, models.HorarioLaboral)
 def get_horario_dentista_api(request, dentista_id):
     try:
         dentista = models.PerfilDentista.objects.get(pk=dentista_id)
@@ -5230,12 +3267,7 @@ class RegistrarAbonoView(TenantSuccessUrlMixin, TenantLoginRequiredMixin, Succes
         # Un abono no está vinculado a una cita específica
         pago.cita = None
         pago.save()
-        
-        # Actualizar saldo del paciente si se especifica
-        if pago.paciente:
-            from . import services
-            services.PacienteService.actualizar_saldo_global(pago.paciente)
-        
+        # El saldo del paciente lo recalcula la señal de Pago
         return super().form_valid(form)
 
 # --- FINALIZAR CITA FORM CONTENT ---
@@ -5311,12 +3343,8 @@ class GestionarHorarioView(TenantLoginRequiredMixin, TemplateView):
         context['dentista'] = dentista
         
         # Determinar si el usuario puede editar
-        user = self.request.user
-        context['puede_editar'] = (
-            user.groups.filter(name='Administrador').exists() or
-            user.is_superuser or
-            (hasattr(user, 'perfil_dentista') and user.perfil_dentista == dentista)
-        )
+        principal = obtener_principal(self.request.user)
+        context['puede_editar'] = principal.es_admin or principal.dentista_id == dentista.pk
         
         # Crear formset para horarios
         if self.request.POST:
@@ -5338,12 +3366,8 @@ class GestionarHorarioView(TenantLoginRequiredMixin, TemplateView):
         dentista = get_object_or_404(models.PerfilDentista, id=dentista_id)
         
         # Verificar permisos
-        user = request.user
-        puede_editar = (
-            user.groups.filter(name='Administrador').exists() or
-            user.is_superuser or
-            (hasattr(user, 'perfil_dentista') and user.perfil_dentista == dentista)
-        )
+        principal = obtener_principal(request.user)
+        puede_editar = principal.es_admin or principal.dentista_id == dentista.pk
         
         if not puede_editar:
             messages.error(request, 'No tienes permisos para editar este horario.')
@@ -6102,6 +4126,71 @@ def descargar_consentimiento_pdf(request, consentimiento_id):
         messages.error(request, 'El archivo PDF no se encuentra disponible.')
         return redirect(tenant_reverse('core:consentimiento_detail', request=request, kwargs={'pk': consentimiento_id}))
 
+@tenant_login_required
+def descargar_consentimiento_firmado(request, pk):
+    """Descarga el PDF firmado (documento base + hoja de firmas); lo genera si aún no existe."""
+    from pypdf.errors import PyPdfError
+    from .consentimientos_pdf import guardar_firmado
+
+    paciente_consentimiento = get_object_or_404(
+        models.PacienteConsentimiento.objects.select_related('paciente', 'consentimiento', 'presentado_por'),
+        pk=pk
+    )
+    if paciente_consentimiento.estado != 'FIRMADO':
+        messages.error(request, 'El consentimiento aún no está firmado.')
+        return redirect(tenant_reverse('core:paciente_consentimiento_detail', request=request, kwargs={'pk': pk}))
+
+    try:
+        nombre = guardar_firmado(paciente_consentimiento)
+        archivo = paciente_consentimiento.documento_firmado.storage.open(nombre, 'rb')
+    except (OSError, ValueError, PyPdfError):
+        # PDF base ausente en el storage (o sin archivo) o que pypdf no puede leer
+        logger.exception("No se pudo generar el PDF firmado del consentimiento %s", pk)
+        messages.error(request, 'No se pudo generar el PDF firmado: el documento base no está disponible o está dañado.')
+        return redirect(tenant_reverse('core:paciente_consentimiento_detail', request=request, kwargs={'pk': pk}))
+    response = FileResponse(archivo, content_type='application/pdf')
+    response['Content-Disposition'] = f'attachment; filename="consentimiento_firmado_{pk}.pdf"'
+    # El nombre es el hash del contenido
+    response['ETag'] = f'"{paciente_consentimiento.hash_documento}"'
+    return response
+
+
+@tenant_login_required
+def exportar_consentimientos_firmados(request):
+    """ZIP con los PDF firmados en un rango de fechas de firma (?desde=AAAA-MM-DD&hasta=AAAA-MM-DD)."""
+    import tempfile
+    from datetime import datetime, time as dt_time
+    from .consentimientos_pdf import exportar_zip
+
+    principal = obtener_principal(request.user)
+    if not (principal.es_admin or principal.es_recepcion):
+        messages.error(request, 'No tiene permisos para exportar consentimientos.')
+        return redirect(tenant_reverse('core:paciente_consentimiento_list', request=request))
+
+    try:
+        desde = datetime.strptime(request.GET.get('desde', ''), '%Y-%m-%d').date()
+        hasta = datetime.strptime(request.GET.get('hasta', ''), '%Y-%m-%d').date()
+    except ValueError:
+        messages.error(request, 'Indique un rango de fechas válido para exportar.')
+        return redirect(tenant_reverse('core:paciente_consentimiento_list', request=request))
+
+    zona = timezone.get_current_timezone()
+    consentimientos = models.PacienteConsentimiento.objects.filter(
+        fecha_firmado__gte=datetime.combine(desde, dt_time.min, tzinfo=zona),
+        fecha_firmado__lte=datetime.combine(hasta, dt_time.max, tzinfo=zona),
+    )
+    # Se arma en disco (en memoria si es chico) para no retener todos los PDF en RAM
+    archivo = tempfile.SpooledTemporaryFile(max_size=20 * 1024 * 1024)
+    total = exportar_zip(consentimientos, archivo)
+    archivo.seek(0)
+    logger.info("Exportados %d consentimientos firmados (%s a %s)", total, desde, hasta)
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f'consentimientos_firmados_{desde:%Y%m%d}_{hasta:%Y%m%d}.zip',
+        content_type='application/zip'
+    )
+
 # === INTEGRACIÓN CON CUESTIONARIO ===
 
 @tenant_login_required
@@ -0,0 +1,183 @@
+# core/views_async.py
+"""
+Versiones async de los endpoints JSON que el navegador consulta en cada
+interacción (agenda, horarios, odontograma, búsqueda de pacientes y
+laboratorio). Se usan cuando la app corre con ASGI (settings.ASGI_MODE, ver
+gunicorn.conf.py): mientras esperan a la BD no ocupan un worker, así que
+unas pocas peticiones lentas ya no bloquean al resto.
+
+Reglas para este módulo:
+- Solo el ORM async (aget, afirst, acreate, async for). Cualquier acceso
+  perezoso a una relación dispara una consulta síncrona y Django lanza
+  SynchronousOnlyOperation, así que todo se carga con select_related o
+  prefetch_related antes de iterar.
+- La lógica que no toca la BD se comparte con las vistas síncronas
+  (core/views.py, core/views_laboratorio.py) para que ambas respondan igual.
+"""
+import logging
+from datetime import datetime
+
+from django.http import JsonResponse
+
+from . import models
+from .cache_http import cache_catalogo
+from .mixins import tenant_login_required
+from .presupuesto_consultas import presupuesto_consultas
+from .views import (
+    DIENTES_ODONTOGRAMA, DIENTES_REGULARES, DIENTES_SUPERNUMERARIOS,
+    _dientes_odontograma, _evento_agenda, _horarios_libres, _intervalo_ocupado,
+    _paciente_busqueda_dict, _pacientes_busqueda_qs,
+)
+from .views_laboratorio import cita_paciente_dict, citas_recientes_paciente
+
+logger = logging.getLogger(__name__)
+
+
+@tenant_login_required
+async def agenda_events(request):
+    dentista_id = request.GET.get('dentista_id')
+    citas = models.Cita.objects.exclude(estado='CAN')
+    if dentista_id:
+        citas = citas.filter(dentista_id=dentista_id)
+
+    citas = citas.select_related('paciente').prefetch_related('servicios_planeados')
+    eventos = [_evento_agenda(cita) async for cita in citas]
+
+    return JsonResponse(eventos, safe=False)
+
+
+@tenant_login_required
+async def get_horarios_disponibles_api(request, dentista_id):
+    fecha_str = request.GET.get('fecha')  # Formato: YYYY-MM-DD
+
+    if not fecha_str:
+        return JsonResponse({'error': 'Fecha requerida'}, status=400)
+
+    try:
+        fecha = datetime.strptime(fecha_str, '%Y-%m-%d').date()
+        dentista = await models.PerfilDentista.objects.aget(pk=dentista_id)
+
+        # Obtener horarios laborales
+        horarios = [
+            h async for h in models.HorarioLaboral.objects.filter(
+                dentista=dentista, dia_semana=fecha.weekday(), activo=True
+            )
+        ]
+        if not horarios:
+            return JsonResponse({'horarios_disponibles': []}, safe=False)
+
+        # Calcular horarios ocupados
+        citas = models.Cita.objects.filter(
+            dentista=dentista,
+            fecha_hora__date=fecha,
+            estado__in=['PRO', 'CON']
+        ).prefetch_related('servicios_planeados')
+        ocupados = [_intervalo_ocupado(cita) async for cita in citas]
+
+        return JsonResponse({'horarios_disponibles': _horarios_libres(fecha, horarios, ocupados)}, safe=False)
+    except models.PerfilDentista.DoesNotExist:
+        return JsonResponse({'error': 'Dentista no encontrado'}, status=404)
+    except Exception as e:
+        logger.exception("Error calculando horarios disponibles del dentista %s", dentista_id)
+        return JsonResponse({'error': str(e)}, status=500)
+
+
+@tenant_login_required
+@cache_catalogo(models.PerfilDentista, models.HorarioLaboral)
+async def get_horario_dentista_api(request, dentista_id):
+    try:
+        dentista = await models.PerfilDentista.objects.aget(pk=dentista_id)
+        data = [
+            {
+                'dia': h.get_dia_semana_display(),
+                'hora_inicio': h.hora_inicio.strftime('%H:%M'),
+                'hora_fin': h.hora_fin.strftime('%H:%M')
+            } async for h in models.HorarioLaboral.objects.filter(dentista=dentista, activo=True)
+        ]
+        return JsonResponse(data, safe=False)
+    except models.PerfilDentista.DoesNotExist:
+        return JsonResponse({'error': 'Dentista no encontrado'}, status=404)
+
+
+@tenant_login_required
+async def odontograma_api_get(request, cliente_id):
+    """API para obtener el estado del odontograma completo de 48 dientes de un paciente"""
+    try:
+        cliente = await models.Paciente.objects.aget(pk=cliente_id)
+        sano = await models.Diagnostico.objects.filter(nombre='SANO').afirst()
+        if not sano:
+            # Crear diagnóstico SANO si no existe
+            sano = await models.Diagnostico.objects.acreate(nombre='SANO', color_hex='#FFFFFF', icono_svg='')
+
+        estados_guardados = [e async for e in cliente.odontograma.select_related('diagnostico')]
+        return JsonResponse({
+            'dientes': _dientes_odontograma(sano, estados_guardados),
+            'total_dientes': len(DIENTES_ODONTOGRAMA),
+            'regulares': len(DIENTES_REGULARES),
+            'supernumerarios': len(DIENTES_SUPERNUMERARIOS)
+        })
+
+    except models.Paciente.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Paciente no encontrado'}, status=404)
+    except Exception as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@presupuesto_consultas(5)
+@tenant_login_required
+async def pacientes_api(request):
+    """API para obtener lista de pacientes con búsqueda inteligente"""
+    try:
+        query = request.GET.get('q', '').strip()
+        limit = int(request.GET.get('limit', 20))
+
+        pacientes_data = [_paciente_busqueda_dict(p) async for p in _pacientes_busqueda_qs(query, limit)]
+
+        return JsonResponse({
+            'success': True,
+            'pacientes': pacientes_data,
+            'count': len(pacientes_data)
+        })
+    except Exception as e:
+        logger.exception("Error en pacientes_api")
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@cache_catalogo(models.TipoTrabajoLaboratorio)
+async def trabajo_laboratorio_obtener_costo_api(request):
+    """API para obtener costo de referencia de tipo de trabajo (AJAX)"""
+    tipo_trabajo_id = request.GET.get('tipo_trabajo_id')
+
+    if not tipo_trabajo_id:
+        return JsonResponse({'success': False, 'message': 'Falta ID de tipo de trabajo'}, status=400)
+
+    try:
+        tipo_trabajo = await models.TipoTrabajoLaboratorio.objects.aget(pk=tipo_trabajo_id)
+        return JsonResponse({
+            'success': True,
+            'costo_referencia': float(tipo_trabajo.costo_referencia),
+            'nombre': tipo_trabajo.nombre
+        })
+    except models.TipoTrabajoLaboratorio.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Tipo de trabajo no encontrado'}, status=404)
+
+
+async def obtener_citas_paciente_api(request, paciente_id=None):
+    """API para obtener las citas de un paciente (AJAX)"""
+    paciente_id = paciente_id or request.GET.get('paciente_id')
+
+    if not paciente_id:
+        return JsonResponse({'success': False, 'message': 'Falta ID de paciente'}, status=400)
+
+    try:
+        paciente = await models.Paciente.objects.aget(pk=paciente_id)
+        citas = [cita_paciente_dict(cita) async for cita in citas_recientes_paciente(paciente_id)]
+
+        return JsonResponse({
+            'success': True,
+            'citas': citas,
+            'paciente_nombre': f'{paciente.nombre} {paciente.apellido}'
+        })
+
+    except models.Paciente.DoesNotExist:
+        return JsonResponse({'success': False, 'message': 'Paciente no encontrado'}, status=404)
@@ -35,6 +35,7 @@ from .models import (
     crear_entrada_historial_clinico, obtener_historial_diente,
     obtener_odontograma_completo, validar_numero_diente_fdi
 )
+from .cache_http import cache_catalogo
 
 # --- VISTAS DE HISTORIAL CLÍNICO ---
 
@@ -426,6 +427,7 @@ def api_historial_diente(request, paciente_id, numero_diente):
     })
 
 @login_required
+@cache_catalogo(Diagnostico)
 def api_diagnosticos_disponibles(request):
     """
     API para obtener lista de diagnósticos disponibles
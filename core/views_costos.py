@@ -7,9 +7,10 @@ from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from django.db import transaction
 from django.urls import reverse_lazy
+import datetime
 from decimal import Decimal
 
-from core import models
+from core import models, services
 from core.mixins import TenantLoginRequiredMixin, tenant_reverse
 
 
@@ -125,54 +126,42 @@ class CapturarCostosCompraView(TenantLoginRequiredMixin, TemplateView):
 
 class ReporteValorInventarioView(TenantLoginRequiredMixin, TemplateView):
     """
-    Reporte del valor monetario del inventario actual.
-    Calcula el valor basado en el costo de cada lote.
+    Reporte del valor monetario del inventario por insumo y por unidad dental.
+    ?metodo=PEPS|PROMEDIO elige el método de valuación; ?corte=AAAA-MM-DD muestra
+    un corte de fin de mes guardado en lugar de la existencia actual.
     """
     template_name = 'core/reporte_valor_inventario.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        Valuacion = services.ValuacionInventarioService
 
-        insumos = models.Insumo.objects.filter(stock__gt=0).prefetch_related('lotes')
-
-        datos_insumos = []
-        valor_total = Decimal('0.00')
-        valor_con_costo = Decimal('0.00')
-        cantidad_sin_costo = 0
-
-        for insumo in insumos:
-            # Calcular valor de los lotes con costo
-            lotes_con_costo = insumo.lotes.filter(cantidad__gt=0, costo_unitario__isnull=False)
-            valor_insumo = sum(lote.valor_total for lote in lotes_con_costo)
-
-            # Contar lotes sin costo
-            lotes_sin_costo = insumo.lotes.filter(cantidad__gt=0, costo_unitario__isnull=True).count()
-
-            if lotes_sin_costo > 0:
-                cantidad_sin_costo += 1
-
-            if insumo.stock > 0:
-                datos_insumos.append({
-                    'nombre': insumo.nombre,
-                    'stock': insumo.stock,
-                    'unidad_medida': insumo.unidad_medida,
-                    'valor_total': valor_insumo,
-                    'tiene_costo': lotes_con_costo.exists(),
-                    'lotes_sin_costo': lotes_sin_costo,
-                    'proveedor': insumo.proveedor.nombre if insumo.proveedor else 'N/A'
-                })
-
-                valor_total += valor_insumo
-                if lotes_con_costo.exists():
-                    valor_con_costo += valor_insumo
-
-        # Ordenar por valor descendente
-        datos_insumos.sort(key=lambda x: x['valor_total'], reverse=True)
-
-        context['datos_insumos'] = datos_insumos
-        context['valor_total_inventario'] = valor_total
-        context['valor_con_costo'] = valor_con_costo
-        context['cantidad_items'] = len(datos_insumos)
-        context['cantidad_sin_costo'] = cantidad_sin_costo
+        try:
+            metodo = Valuacion.validar_metodo(self.request.GET.get('metodo') or Valuacion.metodo_por_defecto())
+        except ValueError:
+            metodo = Valuacion.PEPS
+
+        cortes = Valuacion.cortes()
+        corte = None
+        if self.request.GET.get('corte'):
+            try:
+                corte = datetime.date.fromisoformat(self.request.GET['corte'])
+            except ValueError:
+                messages.warning(self.request, 'Fecha de corte no válida; se muestra la existencia actual.')
+
+        if corte:
+            valuacion = Valuacion.valuar_corte(corte, metodo)
+        else:
+            valuacion = Valuacion.valuar(metodo)
+
+        context['datos_insumos'] = valuacion['por_insumo']
+        context['datos_unidades'] = valuacion['por_unidad']
+        context['valor_total_inventario'] = valuacion['valor_total']
+        context['cantidad_items'] = len(valuacion['por_insumo'])
+        context['cantidad_sin_costo'] = valuacion['insumos_sin_costo']
+        context['metodo'] = metodo
+        context['metodos'] = Valuacion.METODOS
+        context['corte'] = corte
+        context['cortes'] = cortes
 
         return context
@@ -0,0 +1,657 @@
+"""
+Vistas de exportación: recibos y reportes en PDF (ReportLab) y archivos Excel (openpyxl).
+
+Este módulo concentra las dependencias pesadas de generación de documentos para
+que solo se importen cuando se solicita una descarga. core/urls.py lo carga de
+forma diferida mediante lazy_view().
+"""
+from django.contrib.auth.decorators import login_required
+from django.conf import settings
+from django.db.models import Sum
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib import messages
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_RIGHT
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Flowable
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import mm
+from openpyxl import Workbook
+
+from .mixins import tenant_login_required, tenant_reverse
+from . import forms
+from . import models
+from . import services
+from . import tareas
+from .imagenes import lector_logo
+from .presupuesto_consultas import presupuesto_consultas
+
+
+class _Logo(Flowable):
+    """Logo de la clínica desde el ImageReader en caché del proceso (imagenes.lector_logo)."""
+
+    def __init__(self, lector, ancho, alto, alineacion='LEFT'):
+        super().__init__()
+        self.lector = lector
+        self.width = ancho
+        self.height = alto
+        self.hAlign = alineacion
+
+    def wrap(self, *args):
+        return self.width, self.height
+
+    def draw(self):
+        self.canv.drawImage(self.lector, 0, 0, self.width, self.height, mask='auto', preserveAspectRatio=True)
+
+
+@tenant_login_required
+def generar_recibo_pdf(request, pk):
+    pago = get_object_or_404(models.Pago, pk=pk)
+    formato = request.GET.get('formato', 'carta')
+    
+    response = HttpResponse(content_type='application/pdf')
+    filename = f"recibo_{pago.id}_{formato}.pdf"
+    response['Content-Disposition'] = f'inline; filename="{filename}"'
+    
+    if formato == 'ticket':
+        width, height = 80 * mm, 200 * mm
+        _generar_recibo_ticket(response, pago, width, height, request)  # ← Pasar request
+    else:
+        _generar_recibo_carta(response, pago, request)  # ← Pasar request
+    
+    return response
+
+
+def _generar_recibo_carta(response, pago, request):  # ← Agregar request
+    doc = SimpleDocTemplate(response, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = []
+    
+    # OBTENER TENANT DESDE REQUEST
+    tenant = request.tenant
+    
+    lector = lector_logo(tenant)
+    if lector:
+        story.append(_Logo(lector, 50, 50))
+    else:
+        story.append(Paragraph(f"<h1>{tenant.nombre}</h1>", styles['h1']))
+        
+    story.append(Spacer(1, 12))
+    story.append(Paragraph(f"<b>Recibo de Pago #{pago.id}</b>", styles['h2']))
+    story.append(Paragraph(f"Fecha: {pago.fecha_pago.strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
+    story.append(Spacer(1, 24))
+    story.append(Paragraph("<b>Paciente:</b>", styles['h4']))
+    
+    # Obtener paciente desde cita o directamente del pago
+    paciente = pago.cita.paciente if pago.cita else pago.paciente
+    story.append(Paragraph(f"{paciente.nombre} {paciente.apellido}", styles['Normal']))
+    
+    if paciente.email:
+        story.append(Paragraph(f"{paciente.email}", styles['Normal']))
+        
+    story.append(Spacer(1, 24))
+    story.append(Paragraph("<b>Detalles del Pago:</b>", styles['h4']))
+    
+    data = [['Descripción', 'Monto']]
+    total_servicios = 0
+    
+    if pago.cita:
+        # Pago por cita - mostrar servicios realizados
+        for servicio in pago.cita.servicios_realizados:
+            data.append([servicio.nombre, f"${servicio.precio:,.2f}"])
+            total_servicios += servicio.precio
+    else:
+        # Abono general - mostrar concepto simple
+        data.append(["Abono general", f"${pago.monto:,.2f}"])
+        total_servicios = pago.monto
+        
+    style = TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.grey),
+        ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('BOTTOMPADDING', (0,0), (-1,0), 12),
+        ('BACKGROUND', (0,1), (-1,-1), colors.beige),
+        ('GRID', (0,0), (-1,-1), 1, colors.black)
+    ])
+    
+    tbl = Table(data, colWidths=[300, 100])
+    tbl.setStyle(style)
+    story.append(tbl)
+    
+    styles.add(ParagraphStyle(name='Right', alignment=TA_RIGHT))
+    story.append(Spacer(1, 12))
+    if pago.cita:
+        story.append(Paragraph(f"<b>Total Servicios:</b> ${total_servicios:,.2f}", styles['Right']))
+    else:
+        story.append(Paragraph(f"<b>Concepto:</b> Abono general", styles['Right']))
+    
+    story.append(Paragraph(f"<b>Monto Pagado ({pago.metodo_pago}):</b> ${pago.monto:,.2f}", styles['Right']))
+    
+    # USAR SALDO_GLOBAL DEL PACIENTE
+    paciente = pago.cita.paciente if pago.cita else pago.paciente
+    story.append(Paragraph(f"<b>Saldo Pendiente del Paciente:</b> ${paciente.saldo_global:,.2f}", styles['Right']))
+    
+    doc.build(story)
+
+
+def _generar_recibo_ticket(response, pago, width, height, request):  # ← Agregar request
+    from reportlab.pdfgen import canvas
+    
+    c = canvas.Canvas(response, pagesize=(width, height))
+    
+    x_pos = 3 * mm
+    y_pos = height - (10 * mm)
+    line_height = 5 * mm
+    
+    # OBTENER TENANT DESDE REQUEST
+    tenant = request.tenant
+    
+    lector = lector_logo(tenant)
+    if lector:
+        c.drawImage(lector, x_pos, y_pos - 10*mm, width=20*mm, height=20*mm, mask='auto', preserveAspectRatio=True)
+        y_pos -= 25 * mm
+    
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(x_pos, y_pos, tenant.nombre)
+    y_pos -= line_height * 2
+    c.setFont("Helvetica", 9)
+    c.drawString(x_pos, y_pos, f"Recibo de Pago #{pago.id}")
+    y_pos -= line_height
+    c.drawString(x_pos, y_pos, f"Fecha: {pago.fecha_pago.strftime('%d/%m/%Y %H:%M')}")
+    y_pos -= line_height * 1.5
+    
+    # Obtener paciente desde cita o directamente del pago
+    paciente = pago.cita.paciente if pago.cita else pago.paciente
+    c.drawString(x_pos, y_pos, f"Paciente: {paciente}")
+    y_pos -= line_height * 2
+    c.line(x_pos, y_pos, width - x_pos, y_pos)
+    y_pos -= line_height
+    c.setFont("Helvetica-Bold", 9)
+    
+    total_servicios = 0
+    
+    if pago.cita:
+        # Pago por cita - mostrar servicios
+        c.drawString(x_pos, y_pos, "Servicios:")
+        y_pos -= line_height
+        c.setFont("Helvetica", 8)
+
+        for servicio in pago.cita.servicios_realizados:
+            c.drawString(x_pos + 2*mm, y_pos, f"- {servicio.nombre}")
+            c.drawRightString(width - x_pos, y_pos, f"${servicio.precio:,.2f}")
+            total_servicios += servicio.precio
+            y_pos -= line_height
+        y_pos -= line_height
+    else:
+        # Abono general - mostrar concepto
+        c.drawString(x_pos, y_pos, "Concepto:")
+        y_pos -= line_height
+        c.setFont("Helvetica", 8)
+        c.drawString(x_pos + 2*mm, y_pos, "- Abono general")
+        c.drawRightString(width - x_pos, y_pos, f"${pago.monto:,.2f}")
+        total_servicios = pago.monto
+        y_pos -= line_height * 2
+    
+    c.setFont("Helvetica-Bold", 9)
+    if pago.cita:
+        c.drawRightString(width - x_pos, y_pos, f"Total: ${total_servicios:,.2f}")
+        y_pos -= line_height
+    
+    c.drawRightString(width - x_pos, y_pos, f"Pagado: ${pago.monto:,.2f}")
+    y_pos -= line_height
+    
+    # USAR SALDO_GLOBAL DEL PACIENTE
+    paciente = pago.cita.paciente if pago.cita else pago.paciente
+    c.drawRightString(width - x_pos, y_pos, f"Saldo: ${paciente.saldo_global:,.2f}")
+    y_pos -= line_height * 2
+    c.setFont("Helvetica-Oblique", 8)
+    c.drawCentredString(width / 2, y_pos, "Gracias por su preferencia")
+    c.showPage()
+    c.save()
+
+
+@tenant_login_required
+def exportar_ingresos_excel(request):
+    form = forms.ReporteIngresosForm(request.GET or None)
+    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = 'attachment; filename="reporte_ingresos.xlsx"'
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Ingresos'
+    headers = ['Fecha de Pago', 'Paciente', 'Cita', 'Método de Pago', 'Monto']
+    worksheet.append(headers)
+    if form.is_valid():
+        pagos = models.Pago.objects.filter(
+            fecha_pago__date__gte=form.cleaned_data['fecha_inicio'],
+            fecha_pago__date__lte=form.cleaned_data['fecha_fin']
+        ).select_related('cita__paciente')
+        for pago in pagos:
+            worksheet.append([
+                pago.fecha_pago.strftime('%Y-%m-%d %H:%M'),
+                str(pago.cita.paciente),
+                f"Cita #{pago.cita.id}",
+                pago.metodo_pago,
+                pago.monto
+            ])
+    workbook.save(response)
+    return response
+
+
+@tenant_login_required
+def exportar_saldos_excel(request):
+    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = 'attachment; filename="reporte_saldos.xlsx"'
+    
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Saldos Pendientes'
+    
+    headers = ['Paciente', 'Saldo Pendiente']
+    worksheet.append(headers)
+    
+    # USAR SALDO_GLOBAL DE PACIENTES
+    pacientes = models.Paciente.objects.filter(saldo_global__gt=0).order_by('-saldo_global')
+    for paciente in pacientes:
+        worksheet.append([
+            f"{paciente.nombre} {paciente.apellido}", 
+            float(paciente.saldo_global)
+        ])
+    workbook.save(response)
+    return response
+
+
+@presupuesto_consultas(10)
+@tenant_login_required
+def exportar_facturacion_excel(request):
+    response = HttpResponse(content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    response['Content-Disposition'] = 'attachment; filename="reporte_facturacion.xlsx"'
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = 'Facturación'
+    headers = ['Fecha Cita', 'Paciente', 'RFC Receptor', 'Nombre Receptor', 'CP Receptor', 'Régimen Fiscal', 'Uso CFDI', 'Forma Pago (SAT)', 'Método Pago (SAT)', 'Servicios', 'Monto Pagado']
+    worksheet.append(headers)
+    citas = models.Cita.objects.filter(requiere_factura=True).select_related('paciente').prefetch_related('tratamientos_realizados__servicios', 'pagos')
+    for cita in citas:
+        servicios = ", ".join([s.nombre for s in cita.servicios_realizados])
+        monto_pagado = cita.pagos.aggregate(total=Sum('monto'))['total'] or 0
+        pago = cita.pagos.order_by('-fecha_pago').first()
+        df = getattr(cita.paciente, 'datos_fiscales', None)
+        cp = getattr(df, 'codigo_postal', None) or getattr(cita.paciente, 'codigo_postal', None) or 'N/A'
+        regimen = getattr(getattr(df, 'regimen_fiscal', None), 'codigo', 'N/A')
+        uso = getattr(getattr(df, 'uso_cfdi', None), 'codigo', 'N/A')
+        forma = getattr(getattr(pago, 'forma_pago_sat', None), 'codigo', 'N/A') if pago else 'N/A'
+        metodo = getattr(getattr(pago, 'metodo_sat', None), 'codigo', 'N/A') if pago else 'N/A'
+        worksheet.append([
+            cita.fecha_hora.strftime('%Y-%m-%d'),
+            str(cita.paciente),
+            getattr(df, 'rfc', 'N/A'),
+            getattr(df, 'razon_social', str(cita.paciente)),
+            cp,
+            regimen,
+            uso,
+            forma,
+            metodo,
+            servicios,
+            monto_pagado
+        ])
+    workbook.save(response)
+    return response
+
+
+def generar_servicios_vendidos_pdf(request):
+    """Genera PDF del reporte de servicios más vendidos"""
+    from reportlab.lib.pagesizes import letter, A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.units import inch, mm
+    from reportlab.lib.enums import TA_CENTER, TA_RIGHT, TA_LEFT
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    from reportlab.lib import colors
+    from datetime import datetime
+
+    # Obtener datos usando la misma lógica que la vista (resumen diario)
+    servicios, total_cantidad, total_ingresos = services.ResumenReportesService.servicios_mas_vendidos()
+    promedio_ingreso = total_ingresos / len(servicios) if servicios else 0
+
+    # Configurar respuesta HTTP
+    response = HttpResponse(content_type='application/pdf')
+    response['Content-Disposition'] = 'inline; filename="reporte_servicios_vendidos.pdf"'
+
+    # Crear documento PDF
+    doc = SimpleDocTemplate(response, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    styles = getSampleStyleSheet()
+    story = []
+
+    # Obtener tenant
+    tenant = request.tenant
+
+    # Logo y encabezado
+    lector = lector_logo(tenant)
+    if lector:
+        story.append(_Logo(lector, 60, 60, alineacion='CENTER'))
+        story.append(Spacer(1, 6))
+
+    # Título del reporte
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=colors.HexColor('#0d6efd'),
+        alignment=TA_CENTER,
+        spaceAfter=6
+    )
+    story.append(Paragraph(f"<b>{tenant.nombre}</b>", title_style))
+    story.append(Paragraph("Reporte de Servicios Más Vendidos", styles['Heading2']))
+    story.append(Paragraph(f"Generado: {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
+    story.append(Spacer(1, 20))
+
+    # Tarjetas de estadísticas (en tabla 2x2)
+    stats_data = [
+        [
+            Paragraph(f"<b>Servicios Realizados</b><br/><font size=16 color='#0d6efd'>{len(servicios)}</font>", styles['Normal']),
+            Paragraph(f"<b>Total de Ventas</b><br/><font size=16 color='#ffc107'>{total_cantidad}</font>", styles['Normal'])
+        ],
+        [
+            Paragraph(f"<b>Ingresos Totales</b><br/><font size=16 color='#198754'>${total_ingresos:,.2f}</font>", styles['Normal']),
+            Paragraph(f"<b>Ingreso Promedio</b><br/><font size=16 color='#dc3545'>${promedio_ingreso:,.2f}</font>", styles['Normal'])
+        ]
+    ]
+
+    stats_table = Table(stats_data, colWidths=[3*inch, 3*inch])
+    stats_table.setStyle(TableStyle([
+        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('BACKGROUND', (0,0), (0,0), colors.HexColor('#e7f3ff')),
+        ('BACKGROUND', (1,0), (1,0), colors.HexColor('#fff3cd')),
+        ('BACKGROUND', (0,1), (0,1), colors.HexColor('#d1e7dd')),
+        ('BACKGROUND', (1,1), (1,1), colors.HexColor('#f8d7da')),
+        ('BOX', (0,0), (-1,-1), 1, colors.grey),
+        ('INNERGRID', (0,0), (-1,-1), 1, colors.grey),
+        ('TOPPADDING', (0,0), (-1,-1), 12),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 12),
+    ]))
+    story.append(stats_table)
+    story.append(Spacer(1, 20))
+
+    # Tabla detallada de servicios
+    story.append(Paragraph("<b>Detalle de Servicios</b>", styles['Heading3']))
+    story.append(Spacer(1, 10))
+
+    # Encabezado de la tabla
+    table_data = [['Rank', 'Servicio', 'Cantidad', 'Precio Unit.', 'Ingresos', 'Participación']]
+
+    # Agregar filas de servicios
+    for idx, servicio in enumerate(servicios, 1):
+        # Medallas para top 3
+        rank_text = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else str(idx)
+
+        table_data.append([
+            rank_text,
+            servicio.nombre[:30],  # Limitar longitud del nombre
+            str(servicio.cantidad_vendida),
+            f"${servicio.precio:,.2f}",
+            f"${servicio.ingresos_generados:,.2f}",
+            f"{servicio.porcentaje:.1f}%"
+        ])
+
+    # Fila de totales
+    table_data.append([
+        '',
+        'TOTAL',
+        str(total_cantidad),
+        '',
+        f"${total_ingresos:,.2f}",
+        '100%'
+    ])
+
+    # Crear tabla
+    table = Table(table_data, colWidths=[0.6*inch, 2.2*inch, 0.8*inch, 1*inch, 1.2*inch, 1*inch])
+
+    # Estilos de la tabla
+    table_style = TableStyle([
+        # Encabezado
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#0d6efd')),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('ALIGN', (0,0), (-1,0), 'CENTER'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,0), 10),
+        ('BOTTOMPADDING', (0,0), (-1,0), 8),
+        ('TOPPADDING', (0,0), (-1,0), 8),
+
+        # Cuerpo
+        ('BACKGROUND', (0,1), (-1,-2), colors.beige),
+        ('TEXTCOLOR', (0,1), (-1,-2), colors.black),
+        ('ALIGN', (0,1), (0,-2), 'CENTER'),  # Rank
+        ('ALIGN', (1,1), (1,-2), 'LEFT'),    # Servicio
+        ('ALIGN', (2,1), (2,-2), 'CENTER'),  # Cantidad
+        ('ALIGN', (3,1), (-1,-2), 'RIGHT'),  # Precios
+        ('FONTNAME', (0,1), (-1,-2), 'Helvetica'),
+        ('FONTSIZE', (0,1), (-1,-2), 9),
+        ('TOPPADDING', (0,1), (-1,-2), 6),
+        ('BOTTOMPADDING', (0,1), (-1,-2), 6),
+
+        # Fila de totales
+        ('BACKGROUND', (0,-1), (-1,-1), colors.HexColor('#f8f9fa')),
+        ('TEXTCOLOR', (0,-1), (-1,-1), colors.black),
+        ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,-1), (-1,-1), 10),
+        ('ALIGN', (0,-1), (1,-1), 'CENTER'),
+        ('ALIGN', (2,-1), (-1,-1), 'RIGHT'),
+        ('TOPPADDING', (0,-1), (-1,-1), 10),
+        ('BOTTOMPADDING', (0,-1), (-1,-1), 10),
+
+        # Bordes
+        ('GRID', (0,0), (-1,-1), 1, colors.grey),
+        ('LINEBELOW', (0,0), (-1,0), 2, colors.HexColor('#0d6efd')),
+        ('LINEABOVE', (0,-1), (-1,-1), 2, colors.grey),
+    ])
+
+    # Resaltar top 3 con colores
+    if len(servicios) >= 1:
+        table_style.add('BACKGROUND', (0,1), (-1,1), colors.HexColor('#fff9e6'))  # Oro
+    if len(servicios) >= 2:
+        table_style.add('BACKGROUND', (0,2), (-1,2), colors.HexColor('#f0f0f0'))  # Plata
+    if len(servicios) >= 3:
+        table_style.add('BACKGROUND', (0,3), (-1,3), colors.HexColor('#ffe5cc'))  # Bronce
+
+    table.setStyle(table_style)
+    story.append(table)
+
+    # Pie de página
+    story.append(Spacer(1, 20))
+    footer_style = ParagraphStyle(
+        'Footer',
+        parent=styles['Normal'],
+        fontSize=8,
+        textColor=colors.grey,
+        alignment=TA_CENTER
+    )
+    story.append(Paragraph(
+        f"Este reporte muestra los servicios más vendidos ordenados por cantidad de tratamientos realizados.",
+        footer_style
+    ))
+
+    # Construir PDF
+    doc.build(story)
+    return response
+
+
+@login_required
+def inventario_exportar_excel(request):
+    """Exportar inventario completo a Excel con formato para re-importación"""
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment
+    from django.http import HttpResponse
+    from datetime import datetime
+
+    # Crear workbook
+    wb = Workbook()
+
+    # HOJA 1: Insumos con lotes
+    ws = wb.active
+    ws.title = 'Inventario'
+
+    # Headers con estilo
+    headers = [
+        'ID Insumo', 'Nombre', 'Descripción', 'Unidad Medida', 'Proveedor',
+        'Stock Mínimo', 'Precio Unitario', 'ID Lote', 'Unidad Dental',
+        'Cantidad en Lote', 'Número de Lote', 'Fecha Caducidad', 'Registro Sanitario'
+    ]
+
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF")
+
+    for col_num, header in enumerate(headers, 1):
+        cell = ws.cell(row=1, column=col_num)
+        cell.value = header
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = Alignment(horizontal='center', vertical='center')
+
+    # Obtener datos
+    insumos = models.Insumo.objects.select_related('proveedor').prefetch_related(
+        'lotes', 'lotes__unidad_dental'
+    ).order_by('nombre')
+
+    row = 2
+    for insumo in insumos:
+        lotes = insumo.lotes.all()
+        if lotes.exists():
+            for lote in lotes:
+                ws.cell(row=row, column=1).value = insumo.id
+                ws.cell(row=row, column=2).value = insumo.nombre
+                ws.cell(row=row, column=3).value = insumo.descripcion
+                ws.cell(row=row, column=4).value = insumo.unidad_medida
+                ws.cell(row=row, column=5).value = insumo.proveedor.nombre if insumo.proveedor else ''
+                ws.cell(row=row, column=6).value = insumo.stock_minimo
+                ws.cell(row=row, column=7).value = float(insumo.precio_unitario)
+                ws.cell(row=row, column=8).value = lote.id
+                ws.cell(row=row, column=9).value = lote.unidad_dental.nombre
+                ws.cell(row=row, column=10).value = lote.cantidad
+                ws.cell(row=row, column=11).value = lote.numero_lote or ''
+                ws.cell(row=row, column=12).value = lote.fecha_caducidad.strftime('%Y-%m-%d') if lote.fecha_caducidad else ''
+                ws.cell(row=row, column=13).value = insumo.registro_sanitario or ''
+                row += 1
+        else:
+            # Insumo sin lotes
+            ws.cell(row=row, column=1).value = insumo.id
+            ws.cell(row=row, column=2).value = insumo.nombre
+            ws.cell(row=row, column=3).value = insumo.descripcion
+            ws.cell(row=row, column=4).value = insumo.unidad_medida
+            ws.cell(row=row, column=5).value = insumo.proveedor.nombre if insumo.proveedor else ''
+            ws.cell(row=row, column=6).value = insumo.stock_minimo
+            ws.cell(row=row, column=7).value = float(insumo.precio_unitario)
+            ws.cell(row=row, column=8).value = ''
+            ws.cell(row=row, column=9).value = ''
+            ws.cell(row=row, column=10).value = 0
+            ws.cell(row=row, column=11).value = ''
+            ws.cell(row=row, column=12).value = ''
+            ws.cell(row=row, column=13).value = insumo.registro_sanitario or ''
+            row += 1
+
+    # Ajustar anchos de columna
+    ws.column_dimensions['A'].width = 10
+    ws.column_dimensions['B'].width = 30
+    ws.column_dimensions['C'].width = 40
+    ws.column_dimensions['D'].width = 15
+    ws.column_dimensions['E'].width = 25
+    ws.column_dimensions['F'].width = 12
+    ws.column_dimensions['G'].width = 15
+    ws.column_dimensions['H'].width = 10
+    ws.column_dimensions['I'].width = 20
+    ws.column_dimensions['J'].width = 15
+    ws.column_dimensions['K'].width = 20
+    ws.column_dimensions['L'].width = 15
+    ws.column_dimensions['M'].width = 20
+
+    # HOJA 2: Instrucciones
+    ws_inst = wb.create_sheet('Instrucciones')
+    instrucciones = [
+        "INSTRUCCIONES PARA IMPORTACIÓN DE INVENTARIO",
+        "",
+        "1. IMPORTANTE: No modifique los nombres de las columnas",
+        "2. Para ACTUALIZAR cantidades de lotes existentes: Deje el 'ID Lote' y modifique 'Cantidad en Lote'",
+        "3. Para CREAR nuevos insumos: Deje 'ID Insumo' vacío, complete Nombre (obligatorio)",
+        "4. Para AGREGAR nuevos lotes: Deje 'ID Lote' vacío, especifique 'ID Insumo' existente",
+        "5. La 'Unidad Dental' debe coincidir exactamente con el nombre en el sistema",
+        "6. Fecha Caducidad: Formato YYYY-MM-DD (ej: 2025-12-31)",
+        "7. Campos obligatorios: Nombre, Unidad Dental (si hay lote), Cantidad en Lote",
+        "",
+        "VALIDACIONES AL IMPORTAR:",
+        "- Stock Mínimo debe ser >= 0",
+        "- Precio Unitario debe ser >= 0",
+        "- Cantidad en Lote debe ser >= 0",
+        "- Unidad Dental debe existir en el sistema",
+        "- Fecha Caducidad debe ser futura (si se especifica)",
+        "",
+        "CONSEJOS:",
+        "- Exporte primero el inventario actual para ver el formato correcto",
+        "- Haga una copia de seguridad antes de importar cambios masivos",
+        "- Si hay errores, el sistema le mostrará qué filas tienen problemas",
+    ]
+
+    for idx, linea in enumerate(instrucciones, 1):
+        cell = ws_inst.cell(row=idx, column=1)
+        cell.value = linea
+        if idx == 1:
+            cell.font = Font(bold=True, size=14)
+        elif linea.startswith("VALIDACIONES") or linea.startswith("CONSEJOS"):
+            cell.font = Font(bold=True, size=12)
+
+    ws_inst.column_dimensions['A'].width = 100
+
+    # Preparar respuesta HTTP
+    response = HttpResponse(
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    )
+    filename = f'inventario_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+    response['Content-Disposition'] = f'attachment; filename={filename}'
+
+    wb.save(response)
+    return response
+
+
+@login_required
+def inventario_importar_excel(request):
+    """Importar inventario desde Excel con validaciones"""
+    if request.method == 'POST':
+        archivo = request.FILES.get('archivo_excel')
+        if not archivo:
+            messages.error(request, "Por favor seleccione un archivo Excel.")
+            return redirect(tenant_reverse('core:insumo_list', request=request))
+
+        # Validar extensión
+        if not archivo.name.endswith(('.xlsx', '.xls')):
+            messages.error(request, "El archivo debe ser un Excel (.xlsx o .xls)")
+            return redirect(tenant_reverse('core:insumo_list', request=request))
+
+        if not settings.TAREAS_SINCRONAS:
+            # Libros grandes tardan más que un request: se importa en un worker
+            # y el resultado llega por correo
+            tareas.encolar(
+                tareas.importar_inventario_excel, request.user.email or '', adjunto=archivo.read()
+            )
+            messages.info(
+                request,
+                "El archivo se está importando en segundo plano. "
+                + ("Recibirá el resultado por correo." if request.user.email else "Revise el inventario en unos minutos.")
+            )
+            return redirect(tenant_reverse('core:insumo_list', request=request))
+
+        try:
+            resultado = services.InventarioService.importar_excel(archivo)
+            if resultado['errores']:
+                messages.warning(request, services.InventarioService.resumen_importacion(resultado))
+            else:
+                messages.success(request, services.InventarioService.resumen_importacion(resultado))
+
+        except KeyError:
+            messages.error(request, "El archivo no contiene la hoja 'Inventario'. Use el formato correcto.")
+        except Exception as e:
+            messages.error(request, f"Error al procesar el archivo: {str(e)}")
+
+        return redirect(tenant_reverse('core:insumo_list', request=request))
+
+    # GET request - mostrar formulario
+    return render(request, 'core/inventario_importar.html')
@@ -15,6 +15,9 @@ from decimal import Decimal
 from .mixins import TenantLoginRequiredMixin, TenantSuccessUrlMixin, tenant_reverse
 from . import models
 from . import forms
+from .cache_http import cache_catalogo
+from .principal import obtener_principal
+from .services import EstadisticasListaService, LaboratorioService
 
 
 # --- VISTAS DE LISTADO Y DETALLE ---
@@ -26,23 +29,28 @@ class TrabajoLaboratorioListView(TenantLoginRequiredMixin, ListView):
     context_object_name = 'trabajos'
     paginate_by = 20
 
-    def get_queryset(self):
-        queryset = models.TrabajoLaboratorio.objects.select_related(
-            'tipo_trabajo',
-            'laboratorio',
-            'paciente',
-            'cita_origen',
-            'dentista_solicitante'
-        ).order_by('-fecha_solicitud')
+    def _trabajos_visibles(self):
+        queryset = models.TrabajoLaboratorio.objects.all()
 
         # Si es dentista, solo mostrar sus trabajos
-        if not self.request.user.is_superuser:
-            if self.request.user.groups.filter(name='Dentista').exists():
-                try:
-                    perfil_dentista = self.request.user.perfil_dentista
-                    queryset = queryset.filter(dentista_solicitante=perfil_dentista)
-                except:
-                    queryset = queryset.none()
+        principal = obtener_principal(self.request.user)
+        if not principal.es_superusuario and principal.es_dentista:
+            if principal.dentista_id:
+                queryset = queryset.filter(dentista_solicitante_id=principal.dentista_id)
+            else:
+                queryset = queryset.none()
+        return queryset
+
+    def get_queryset(self):
+        queryset = LaboratorioService.anotar_retraso(
+            self._trabajos_visibles().select_related(
+                'tipo_trabajo',
+                'laboratorio',
+                'paciente',
+                'cita_origen',
+                'dentista_solicitante'
+            )
+        ).order_by('-fecha_solicitud')
 
         # Aplicar filtros del formulario
         form = forms.TrabajoLaboratorioFiltroForm(self.request.GET)
@@ -87,25 +95,30 @@ class TrabajoLaboratorioListView(TenantLoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['filtro_form'] = forms.TrabajoLaboratorioFiltroForm(self.request.GET)
 
-        # Estadísticas generales
-        trabajos_qs = self.get_queryset()
-        context['total_trabajos'] = trabajos_qs.count()
-        context['trabajos_pendientes'] = trabajos_qs.filter(
-            estado__in=['SOLICITADO', 'EN_PROCESO']
-        ).count()
-        context['trabajos_retrasados'] = sum(
-            1 for t in trabajos_qs if t.esta_retrasado
-        )
-
-        # Estadísticas financieras
-        stats = trabajos_qs.aggregate(
-            total_costos=Sum('costo_laboratorio'),
-            total_ingresos=Sum('precio_paciente')
+        # Estadísticas generales y financieras en una sola consulta sobre la lista ya filtrada
+        stats = EstadisticasListaService.calcular(
+            self.object_list,
+            {
+                'total_trabajos': Count('id'),
+                'trabajos_pendientes': Count('id', filter=Q(estado__in=['SOLICITADO', 'EN_PROCESO'])),
+                'trabajos_retrasados': Count('id', filter=LaboratorioService.filtro_retrasados()),
+                'total_costos': Sum('costo_laboratorio'),
+                'total_ingresos': Sum('precio_paciente'),
+            },
+            depende_de=[models.TrabajoLaboratorio],
         )
+        context['total_trabajos'] = stats['total_trabajos']
+        context['trabajos_pendientes'] = stats['trabajos_pendientes']
+        context['trabajos_retrasados'] = stats['trabajos_retrasados']
         context['total_costos'] = stats['total_costos'] or Decimal('0.00')
         context['total_ingresos'] = stats['total_ingresos'] or Decimal('0.00')
         context['total_margen'] = context['total_ingresos'] - context['total_costos']
 
+        # Puntualidad por laboratorio (mismos permisos de dentista, sin los filtros de la búsqueda)
+        context['resumen_laboratorios'] = LaboratorioService.resumen_por_laboratorio(
+            self._trabajos_visibles()
+        )
+
         return context
 
 
@@ -125,13 +138,12 @@ class TrabajoLaboratorioDetailView(TenantLoginRequiredMixin, DetailView):
         )
 
         # Si es dentista, solo puede ver sus trabajos
-        if not self.request.user.is_superuser:
-            if self.request.user.groups.filter(name='Dentista').exists():
-                try:
-                    perfil_dentista = self.request.user.perfil_dentista
-                    queryset = queryset.filter(dentista_solicitante=perfil_dentista)
-                except:
-                    queryset = queryset.none()
+        principal = obtener_principal(self.request.user)
+        if not principal.es_superusuario and principal.es_dentista:
+            if principal.dentista_id:
+                queryset = queryset.filter(dentista_solicitante_id=principal.dentista_id)
+            else:
+                queryset = queryset.none()
 
         return queryset
 
@@ -212,13 +224,12 @@ class TrabajoLaboratorioUpdateView(TenantSuccessUrlMixin, TenantLoginRequiredMix
         queryset = super().get_queryset()
 
         # Si es dentista, solo puede editar sus trabajos
-        if not self.request.user.is_superuser:
-            if self.request.user.groups.filter(name='Dentista').exists():
-                try:
-                    perfil_dentista = self.request.user.perfil_dentista
-                    queryset = queryset.filter(dentista_solicitante=perfil_dentista)
-                except:
-                    queryset = queryset.none()
+        principal = obtener_principal(self.request.user)
+        if not principal.es_superusuario and principal.es_dentista:
+            if principal.dentista_id:
+                queryset = queryset.filter(dentista_solicitante_id=principal.dentista_id)
+            else:
+                queryset = queryset.none()
 
         return queryset
 
@@ -236,13 +247,10 @@ class TrabajoLaboratorioDeleteView(TenantSuccessUrlMixin, TenantLoginRequiredMix
         queryset = super().get_queryset()
 
         # Solo administradores y dentistas dueños pueden eliminar
-        if not self.request.user.is_superuser:
-            if self.request.user.groups.filter(name='Dentista').exists():
-                try:
-                    perfil_dentista = self.request.user.perfil_dentista
-                    queryset = queryset.filter(dentista_solicitante=perfil_dentista)
-                except:
-                    queryset = queryset.none()
+        principal = obtener_principal(self.request.user)
+        if not principal.es_superusuario:
+            if principal.es_dentista and principal.dentista_id:
+                queryset = queryset.filter(dentista_solicitante_id=principal.dentista_id)
             else:
                 # Recepcionistas no pueden eliminar
                 queryset = queryset.none()
@@ -276,25 +284,22 @@ def trabajo_laboratorio_cambiar_estado_api(request, pk):
     nuevo_estado = request.POST.get('estado')
 
     # Validar permisos
-    if not request.user.is_superuser:
-        es_dentista = request.user.groups.filter(name='Dentista').exists()
-        es_recepcion = request.user.groups.filter(name='Recepcionista').exists()
-
-        if es_dentista:
+    principal = obtener_principal(request.user)
+    if not principal.es_superusuario:
+        if principal.es_dentista:
             # Verificar que sea su trabajo
-            try:
-                if trabajo.dentista_solicitante != request.user.perfil_dentista:
-                    return JsonResponse({
-                        'success': False,
-                        'message': 'No tiene permisos para modificar este trabajo'
-                    }, status=403)
-            except:
+            if principal.dentista_id is None:
                 return JsonResponse({
                     'success': False,
                     'message': 'Usuario no tiene perfil de dentista'
                 }, status=403)
+            if trabajo.dentista_solicitante_id != principal.dentista_id:
+                return JsonResponse({
+                    'success': False,
+                    'message': 'No tiene permisos para modificar este trabajo'
+                }, status=403)
 
-        elif not es_recepcion:
+        elif not principal.es_recepcion:
             return JsonResponse({
                 'success': False,
                 'message': 'No tiene permisos suficientes'
@@ -325,6 +330,7 @@ def trabajo_laboratorio_cambiar_estado_api(request, pk):
     })
 
 
+@cache_catalogo(models.TipoTrabajoLaboratorio)
 def trabajo_laboratorio_obtener_costo_api(request):
     """API para obtener costo de referencia de tipo de trabajo (AJAX)"""
     tipo_trabajo_id = request.GET.get('tipo_trabajo_id')
@@ -343,9 +349,9 @@ def trabajo_laboratorio_obtener_costo_api(request):
         return JsonResponse({'success': False, 'message': 'Tipo de trabajo no encontrado'}, status=404)
 
 
-def obtener_citas_paciente_api(request):
+def obtener_citas_paciente_api(request, paciente_id=None):
     """API para obtener las citas de un paciente (AJAX)"""
-    paciente_id = request.GET.get('paciente_id')
+    paciente_id = paciente_id or request.GET.get('paciente_id')
 
     if not paciente_id:
         return JsonResponse({'success': False, 'message': 'Falta ID de paciente'}, status=400)
@@ -354,28 +360,37 @@ def obtener_citas_paciente_api(request):
         paciente = models.Paciente.objects.get(pk=paciente_id)
 
         # Obtener citas del paciente ordenadas por fecha (más recientes primero)
-        citas = models.Cita.objects.filter(paciente=paciente).order_by('-fecha_hora')[:20]
-
-        citas_data = []
-        for cita in citas:
-            # Construir descripción de la cita
-            servicios = ', '.join([s.nombre for s in cita.servicios_planeados.all()[:2]])
-            if cita.servicios_planeados.count() > 2:
-                servicios += '...'
-
-            citas_data.append({
-                'id': cita.id,
-                'fecha_hora': cita.fecha_hora.strftime('%d/%m/%Y %H:%M'),
-                'estado': cita.get_estado_display(),
-                'servicios': servicios or 'Sin servicios',
-                'dentista': f'Dr. {cita.dentista.nombre} {cita.dentista.apellido}' if cita.dentista else 'Sin asignar'
-            })
+        citas = citas_recientes_paciente(paciente_id)
 
         return JsonResponse({
             'success': True,
-            'citas': citas_data,
+            'citas': [cita_paciente_dict(cita) for cita in citas],
             'paciente_nombre': f'{paciente.nombre} {paciente.apellido}'
         })
 
     except models.Paciente.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Paciente no encontrado'}, status=404)
+
+
+def citas_recientes_paciente(paciente_id, limite=20):
+    """Últimas citas del paciente con dentista y servicios cargados de antemano."""
+    return models.Cita.objects.filter(paciente_id=paciente_id).select_related(
+        'dentista'
+    ).prefetch_related('servicios_planeados').order_by('-fecha_hora')[:limite]
+
+
+def cita_paciente_dict(cita):
+    """Datos de una cita de citas_recientes_paciente para el selector de citas."""
+    # Construir descripción de la cita
+    planeados = list(cita.servicios_planeados.all())
+    servicios = ', '.join([s.nombre for s in planeados[:2]])
+    if len(planeados) > 2:
+        servicios += '...'
+
+    return {
+        'id': cita.id,
+        'fecha_hora': cita.fecha_hora.strftime('%d/%m/%Y %H:%M'),
+        'estado': cita.get_estado_display(),
+        'servicios': servicios or 'Sin servicios',
+        'dentista': f'Dr. {cita.dentista.nombre} {cita.dentista.apellido}' if cita.dentista else 'Sin asignar'
+    }
@@ -1,7 +1,8 @@
 # core/views_permissions.py
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import Group
-from core.mixins import TenantLoginRequiredMixin
+from core.mixins import TenantLoginRequiredMixin, tenant_login_required
+from django.conf import settings
 from django.contrib import messages
 from django.db import transaction
 from django.http import JsonResponse
@@ -14,6 +15,8 @@ from django.contrib.messages.views import SuccessMessageMixin
 
 from .models_permissions import ModuloSistema, SubmenuItem, PermisoRol, LogAcceso
 from .permissions_utils import PermisoDinamicoMixin
+from .presupuesto_consultas import histograma
+from .principal import obtener_principal
 
 
 class PermisosAdminView(TenantLoginRequiredMixin, TemplateView):
@@ -26,8 +29,7 @@ class PermisosAdminView(TenantLoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Solo administradores pueden acceder
-        if not (self.request.user.is_superuser or 
-                self.request.user.groups.filter(name='Administrador').exists()):
+        if not obtener_principal(self.request.user).es_admin:
             messages.error(self.request, 'No tienes permisos para acceder a esta función.')
             return context
         
@@ -139,8 +141,7 @@ class PermisosRolMatrizView(TenantLoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         # Solo administradores
-        if not (self.request.user.is_superuser or 
-                self.request.user.groups.filter(name='Administrador').exists()):
+        if not obtener_principal(self.request.user).es_admin:
             messages.error(self.request, 'No tienes permisos para acceder a esta función.')
             return context
         
@@ -165,8 +166,7 @@ class PermisosRolMatrizView(TenantLoginRequiredMixin, TemplateView):
         """
         Actualizar permisos masivamente desde la matriz.
         """
-        if not (request.user.is_superuser or 
-                request.user.groups.filter(name='Administrador').exists()):
+        if not obtener_principal(request.user).es_admin:
             return JsonResponse({'error': 'No tienes permisos'}, status=403)
         
         try:
@@ -254,8 +254,7 @@ def inicializar_sistema_permisos(request):
     """
     Vista AJAX para inicializar el sistema de permisos usando SQL directo.
     """
-    if not (request.user.is_superuser or 
-            request.user.groups.filter(name='Administrador').exists()):
+    if not obtener_principal(request.user).es_admin:
         return JsonResponse({'error': 'No tienes permisos'}, status=403)
     
     try:
@@ -359,8 +358,7 @@ def clonar_permisos_rol(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Método no permitido'}, status=405)
     
-    if not (request.user.is_superuser or 
-            request.user.groups.filter(name='Administrador').exists()):
+    if not obtener_principal(request.user).es_admin:
         return JsonResponse({'error': 'No tienes permisos'}, status=403)
     
     try:
@@ -412,8 +410,7 @@ def obtener_matriz_permisos_ajax(request):
     if request.method != 'GET':
         return JsonResponse({'error': 'Método no permitido'}, status=405)
     
-    if not (request.user.is_superuser or 
-            request.user.groups.filter(name='Administrador').exists()):
+    if not obtener_principal(request.user).es_admin:
         return JsonResponse({'error': 'No tienes permisos'}, status=403)
     
     try:
@@ -489,8 +486,7 @@ def guardar_matriz_permisos_ajax(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Método no permitido'}, status=405)
     
-    if not (request.user.is_superuser or 
-            request.user.groups.filter(name='Administrador').exists()):
+    if not obtener_principal(request.user).es_admin:
         return JsonResponse({'error': 'No tienes permisos'}, status=403)
     
     try:
@@ -567,3 +563,26 @@ def guardar_matriz_permisos_ajax(request):
             'success': False,
             'error': str(e)
         })
+
+
+# Vista AJAX con el histograma de consultas por vista (QueryBudgetMiddleware)
+@tenant_login_required
+def rendimiento_consultas_ajax(request):
+    """
+    Devuelve p50/p95 de consultas y tiempo de BD por vista de este proceso.
+    Solo superusuarios: los datos son del worker completo, no de un tenant.
+    POST limpia el histograma.
+    """
+    if not request.user.is_superuser:
+        return JsonResponse({'error': 'No tienes permisos'}, status=403)
+
+    if request.method == 'POST':
+        histograma.limpiar()
+        return JsonResponse({'success': True})
+
+    return JsonResponse({
+        'activo': settings.QUERY_BUDGET_MIDDLEWARE,
+        'ventana': histograma.ventana,
+        'vistas': histograma.resumen(),
+    })
+
@@ -0,0 +1,246 @@
+"""
+Vistas del portal del paciente (pagos e historial clínico).
+
+Se cargan de forma diferida desde core/urls.py.
+"""
+from django.contrib import messages
+from django.core.exceptions import PermissionDenied
+from django.shortcuts import redirect
+from django.utils import timezone
+from django.views.generic import ListView, TemplateView
+
+from .mixins import TenantLoginRequiredMixin, tenant_reverse
+from . import forms
+from . import models
+
+
+class PacientePagosListView(TenantLoginRequiredMixin, ListView):
+    model = models.Pago
+    template_name = 'core/portal/pago_list.html'
+    context_object_name = 'pagos'
+    paginate_by = 10
+
+    def get_queryset(self):
+        return models.Pago.objects.filter(cita__paciente__usuario=self.request.user).order_by('-fecha_pago')
+
+
+class PortalHistorialPacienteView(TenantLoginRequiredMixin, TemplateView):
+    """Vista para que el paciente vea su historial clínico desde el portal"""
+    template_name = 'core/portal/historial_paciente.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Verificar que el usuario sea un paciente
+        if not hasattr(self.request.user, 'paciente_perfil'):
+            raise PermissionDenied("Acceso no autorizado")
+        
+        paciente = self.request.user.paciente_perfil
+        context['paciente'] = paciente
+        
+        # Obtener historial clínico existente
+        context['historial_clinico'] = models.HistorialClinico.objects.filter(
+            paciente=paciente
+        ).order_by('-fecha_registro')
+        
+        # Verificar si ya tiene respuestas al cuestionario
+        respuestas_existentes = models.RespuestaHistorial.objects.filter(
+            paciente=paciente
+        ).exists()
+        context['tiene_cuestionario_completo'] = respuestas_existentes
+        
+        return context
+
+
+class PortalCompletarHistorialView(TenantLoginRequiredMixin, TemplateView):
+    """Vista para que el paciente complete su historial clínico mejorado desde el portal"""
+    template_name = 'core/portal/completar_historial.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Verificar que el usuario sea un paciente
+        if not hasattr(self.request.user, 'paciente_perfil'):
+            raise PermissionDenied("Acceso no autorizado")
+        
+        paciente = self.request.user.paciente_perfil
+        context['paciente'] = paciente
+        
+        # Datos para el formulario (mismo formato que la vista mejorada)
+        context['familiares'] = [
+            ('PADRE', 'Padre'),
+            ('MADRE', 'Madre'),
+            ('ABUELO_PATERNO', 'Abuelo Paterno'),
+            ('ABUELA_PATERNA', 'Abuela Paterna'),
+            ('ABUELO_MATERNO', 'Abuelo Materno'),
+            ('ABUELA_MATERNA', 'Abuela Materna'),
+        ]
+        
+        context['enfermedades_familiares'] = [
+            ('DIABETES', 'Diabetes'),
+            ('HIPERTENSION', 'Hipertensión'),
+            ('CARDIOPATIAS', 'Cardiopatías'),
+            ('ALCOHOLISMO', 'Alcoholismo'),
+            ('TABAQUISMO', 'Tabaquismo'),
+            ('CANCER', 'Cáncer'),
+            ('NEUROLOGICAS', 'Neurológicas'),
+            ('HEMATOLOGICAS', 'Hematológicas'),
+            ('RENALES', 'Renales'),
+            ('VENEREAS', 'Venéreas'),
+            ('SOBREPESO', 'Sobrepeso'),
+        ]
+        
+        context['habitos_orales'] = [
+            ('SUCCION_DEDO', 'Succión de dedo'),
+            ('USO_CHUPON', 'Uso de chupón'),
+            ('RESPIRADOR_BUCAL', 'Respirador bucal'),
+            ('INTERPOSICION_LINGUAL', 'Interposición lingual'),
+            ('DEFICIENCIA_CEPILLADO', 'Deficiencia en el cepillado'),
+            ('MORDER_OBJETOS', 'Muerde objetos o uñas'),
+        ]
+        
+        # Cuestionario tradicional
+        preguntas = models.PreguntaHistorial.objects.filter(activa=True)
+        for pregunta in preguntas:
+            models.RespuestaHistorial.objects.get_or_create(
+                paciente=paciente, 
+                pregunta=pregunta, 
+                defaults={'respuesta': ''}
+            )
+            
+        if self.request.POST:
+            context['formset'] = forms.RespuestaHistorialFormSet(
+                self.request.POST, 
+                queryset=paciente.respuestas_historial.all()
+            )
+        else:
+            context['formset'] = forms.RespuestaHistorialFormSet(
+                queryset=paciente.respuestas_historial.all()
+            )
+        
+        return context
+    
+    def post(self, request, *args, **kwargs):
+        context = self.get_context_data(**kwargs)
+        paciente = context['paciente']
+        formset = context['formset']
+        
+        # Procesar datos del formulario mejorado (mismo código que la vista original)
+        try:
+            # Guardar escalas de dolor
+            dolor_numerico = request.POST.get('dolor_numerico')
+            dolor_caras = request.POST.get('dolor_caras')
+            
+            # Guardar antecedentes familiares
+            antecedentes_data = {}
+            for parentesco, _ in context['familiares']:
+                estado = request.POST.get(f'estado_{parentesco}')
+                enfermedades = request.POST.getlist(f'enfermedad_{parentesco}')
+                observaciones = request.POST.get(f'observaciones_{parentesco}', '')
+                
+                if estado:
+                    antecedentes_data[parentesco] = {
+                        'estado': estado,
+                        'enfermedades': enfermedades,
+                        'observaciones': observaciones
+                    }
+            
+            # Guardar hábitos orales
+            habitos_data = {}
+            for habito, _ in context['habitos_orales']:
+                frecuencia = request.POST.get(f'habito_{habito}')
+                if frecuencia and frecuencia != 'NUNCA':
+                    habitos_data[habito] = frecuencia
+            
+            # Guardar signos vitales
+            signos_vitales = {
+                'estatura': request.POST.get('estatura', ''),
+                'peso': request.POST.get('peso', ''),
+                'pulso': request.POST.get('pulso', ''),
+                'frecuencia_respiratoria': request.POST.get('frecuencia_respiratoria', ''),
+                'presion_arterial': request.POST.get('presion_arterial', ''),
+                'temperatura': request.POST.get('temperatura', ''),
+                'tipo_sangre': request.POST.get('tipo_sangre', ''),
+            }
+            
+            # Crear entrada en el historial clínico
+            descripcion_evento = f"""Historial Clínico Auto-Completado por Paciente - {timezone.now().strftime('%d/%m/%Y %H:%M')}
+            
+    ESCALAS DE DOLOR:
+    - Escala numérica: {dolor_numerico or 'No evaluado'}/10
+    - Escala de caras Wong Baker: {dolor_caras or 'No evaluado'}
+    
+    SIGNOS VITALES:
+    - Estatura: {signos_vitales.get('estatura', 'No registrado')}
+    - Peso: {signos_vitales.get('peso', 'No registrado')}
+    - Pulso: {signos_vitales.get('pulso', 'No registrado')} lat/min
+    - F.R.: {signos_vitales.get('frecuencia_respiratoria', 'No registrado')} resp/min
+    - T.A.: {signos_vitales.get('presion_arterial', 'No registrado')} mmHg
+    - Temperatura: {signos_vitales.get('temperatura', 'No registrado')} °C
+    - Tipo de sangre: {signos_vitales.get('tipo_sangre', 'No registrado')}
+    
+    ANTECEDENTES FAMILIARES:
+    {self._format_antecedentes_portal(antecedentes_data)}
+    
+    MALOS HÁBITOS ORALES:
+    {self._format_habitos_portal(habitos_data, context['habitos_orales'])}
+    
+    MOTIVO DE LA CONSULTA:
+    {request.POST.get('motivo_consulta', 'No especificado')}
+    
+    ALERTA MÉDICA:
+    {request.POST.get('alerta_medica', 'Ninguna reportada')}
+    """
+            
+            # Crear entrada en historial
+            historial = models.HistorialClinico.objects.create(
+                paciente=paciente,
+                descripcion_evento=descripcion_evento,
+                registrado_por=None  # Auto-completado por el paciente
+            )
+            
+            # Guardar formset tradicional
+            if formset.is_valid():
+                formset.save()
+            
+            messages.success(request, '¡Tu historial clínico ha sido guardado exitosamente! Nuestro equipo médico lo revisará antes de tu próxima consulta.')
+            return redirect(tenant_reverse('core:portal_historial', request=request))
+            
+        except Exception as e:
+            messages.error(request, f'Error al guardar el historial: {str(e)}')
+            return self.render_to_response(context)
+    
+    def _format_antecedentes_portal(self, antecedentes_data):
+        """Formatea los antecedentes familiares para el historial del portal"""
+        if not antecedentes_data:
+            return "No se reportaron antecedentes familiares significativos."
+        
+        resultado = []
+        for parentesco, datos in antecedentes_data.items():
+            estado = datos.get('estado', '')
+            enfermedades = datos.get('enfermedades', [])
+            observaciones = datos.get('observaciones', '')
+            
+            linea = f"- {parentesco.replace('_', ' ').title()}: {estado}"
+            if enfermedades:
+                linea += f" | Enfermedades: {', '.join(enfermedades)}"
+            if observaciones:
+                linea += f" | Obs: {observaciones}"
+            resultado.append(linea)
+        
+        return "\n    ".join(resultado) if resultado else "No se reportaron antecedentes familiares."
+    
+    def _format_habitos_portal(self, habitos_data, habitos_opciones):
+        """Formatea los hábitos orales para el historial del portal"""
+        if not habitos_data:
+            return "No se reportaron hábitos orales problemáticos."
+        
+        # Crear diccionario para mapear códigos a nombres
+        habitos_nombres = dict(habitos_opciones)
+        
+        resultado = []
+        for habito, frecuencia in habitos_data.items():
+            nombre = habitos_nombres.get(habito, habito)
+            resultado.append(f"- {nombre}: {frecuencia.replace('_', ' ').title()}")
+        
+        return "\n    ".join(resultado) if resultado else "No se reportaron hábitos problemáticos."
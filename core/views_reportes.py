@@ -0,0 +1,889 @@
+"""
+Vistas de reportes financieros y del dashboard de finanzas.
+
+Se cargan de forma diferida desde core/urls.py para no importar los reportes
+en cada arranque de worker.
+"""
+import logging
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Sum, Q
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.generic import ListView, TemplateView
+
+from .mixins import TenantLoginRequiredMixin, tenant_login_required
+from . import forms
+from . import models
+from . import services
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardFinancieroView(TenantLoginRequiredMixin, TemplateView):
+    template_name = 'core/dashboard_financiero.html'
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Obtener fechas para filtros
+        hoy = timezone.now().date()
+        inicio_mes = hoy.replace(day=1)
+        inicio_ano = hoy.replace(month=1, day=1)
+        
+        # === MÉTRICAS PRINCIPALES ===
+        context.update(self.get_metricas_principales(hoy, inicio_mes, inicio_ano))
+        
+        # === GRÁFICOS Y TENDENCIAS ===
+        context.update(self.get_datos_graficos(hoy, inicio_mes))
+        
+        # === ALERTAS Y PENDIENTES ===
+        context.update(self.get_alertas_pendientes())
+        
+        # === PAGOS RECIENTES ===
+        context.update(self.get_pagos_recientes())
+        
+        # === REPORTES RÁPIDOS ===
+        context.update(self.get_accesos_reportes())
+        
+        return context
+    
+    def get_metricas_principales(self, hoy, inicio_mes, inicio_ano):
+        """Obtiene las métricas principales del dashboard"""
+        try:
+            # Ingresos del día, mes, año y mes anterior desde el resumen diario
+            inicio_mes_anterior = (inicio_mes - timedelta(days=1)).replace(day=1)
+            fin_mes_anterior = inicio_mes - timedelta(days=1)
+            resumen = services.ResumenReportesService.ingresos(
+                fecha_inicio=min(inicio_ano, inicio_mes_anterior)
+            ).aggregate(
+                ingresos_hoy=Sum('total', filter=Q(dia=hoy)),
+                ingresos_mes=Sum('total', filter=Q(dia__gte=inicio_mes)),
+                ingresos_ano=Sum('total', filter=Q(dia__gte=inicio_ano)),
+                ingresos_mes_anterior=Sum('total', filter=Q(dia__gte=inicio_mes_anterior, dia__lte=fin_mes_anterior)),
+                pagos_hoy_count=Sum('num_pagos', filter=Q(dia=hoy)),
+            )
+            ingresos_hoy = resumen['ingresos_hoy'] or 0
+            ingresos_mes = resumen['ingresos_mes'] or 0
+            ingresos_ano = resumen['ingresos_ano'] or 0
+            ingresos_mes_anterior = resumen['ingresos_mes_anterior'] or 0
+            pagos_hoy_count = resumen['pagos_hoy_count'] or 0
+            
+            # Saldos pendientes totales (usar saldo_global)
+            saldos_pendientes = models.Paciente.objects.aggregate(
+                total=Sum('saldo_global')
+            )['total'] or 0
+
+            # Pacientes con saldo pendiente
+            pacientes_pendientes = models.Paciente.objects.filter(
+                saldo_global__gt=0
+            ).count()
+
+            # Citas pendientes de pago (citas completadas con saldo > 0)
+            # Como costo_real es un property, calculamos en Python
+            citas_completadas = models.Cita.objects.filter(
+                estado__in=['COM', 'ATN']  # Completadas o Atendidas
+            ).prefetch_related('servicios_planeados', 'tratamientos_realizados__servicios', 'pagos')
+
+            citas_pendientes = sum(1 for cita in citas_completadas if cita.saldo_pendiente > 0)
+            
+            # Promedio de pago diario del mes
+            dias_transcurridos = (hoy - inicio_mes).days + 1
+            promedio_diario = ingresos_mes / dias_transcurridos if dias_transcurridos > 0 else 0
+            
+            # Calcular porcentaje de crecimiento
+            if ingresos_mes_anterior > 0:
+                crecimiento_mes = ((ingresos_mes - ingresos_mes_anterior) / ingresos_mes_anterior) * 100
+            else:
+                crecimiento_mes = 100 if ingresos_mes > 0 else 0
+            
+            return {
+                'ingresos_hoy': ingresos_hoy,
+                'ingresos_mes': ingresos_mes,
+                'ingresos_ano': ingresos_ano,
+                'saldos_pendientes': saldos_pendientes,
+                'pagos_hoy_count': pagos_hoy_count,
+                'pacientes_pendientes': pacientes_pendientes,
+                'citas_pendientes': citas_pendientes,
+                'promedio_diario': promedio_diario,
+                'crecimiento_mes': crecimiento_mes,
+                'ingresos_mes_anterior': ingresos_mes_anterior,
+            }
+        except Exception as e:
+            logger.error(f"Error calculando métricas financieras: {e}")
+            return {}
+    
+    def get_datos_graficos(self, hoy, inicio_mes):
+        """Obtiene datos para gráficos y tendencias"""
+        try:
+            # Ingresos por día (últimos 30 días) en una sola consulta agrupada
+            hace_30_dias = hoy - timedelta(days=30)
+            por_dia = dict(
+                services.ResumenReportesService.ingresos(
+                    fecha_inicio=hace_30_dias, fecha_fin=hace_30_dias + timedelta(days=29)
+                ).values('dia').annotate(suma=Sum('total')).values_list('dia', 'suma')
+            )
+            ingresos_diarios = []
+            labels_dias = []
+            
+            for i in range(30):
+                fecha = hace_30_dias + timedelta(days=i)
+                ingresos_diarios.append(float(por_dia.get(fecha) or 0))
+                labels_dias.append(fecha.strftime('%d/%m'))
+            
+            # Métodos de pago más utilizados
+            metodos_pago = [
+                {'metodo_pago': fila['metodo_pago'], 'total': fila['suma'], 'cantidad': fila['cantidad']}
+                for fila in services.ResumenReportesService.ingresos(
+                    fecha_inicio=inicio_mes
+                ).values('metodo_pago').annotate(
+                    suma=Sum('total'),
+                    cantidad=Sum('num_pagos')
+                ).order_by('-suma')[:5]
+            ]
+            
+            # Servicios más rentables del mes (resumen de tratamientos)
+            servicios_rentables = [
+                {
+                    'servicio_id': fila['servicio_id'],
+                    'servicio__nombre': fila['servicio__nombre'],
+                    'total_ingresos': fila['total_ingresos'],
+                    'cantidad': fila['veces'],
+                }
+                for fila in services.ResumenReportesService.servicios(
+                    fecha_inicio=inicio_mes
+                ).values('servicio_id', 'servicio__nombre').annotate(
+                    total_ingresos=Sum('ingresos'),
+                    veces=Sum('cantidad')
+                ).order_by('-total_ingresos')[:5]
+            ]
+            
+            # Ingresos por dentista (mes actual)
+            ingresos_dentistas = [
+                {
+                    'cita__dentista__nombre': fila['dentista__nombre'],
+                    'cita__dentista__apellido': fila['dentista__apellido'],
+                    'total': fila['suma'],
+                }
+                for fila in services.ResumenReportesService.ingresos(
+                    fecha_inicio=inicio_mes
+                ).filter(dentista__isnull=False).values(
+                    'dentista_id', 'dentista__nombre', 'dentista__apellido'
+                ).annotate(
+                    suma=Sum('total')
+                ).order_by('-suma')[:10]
+            ]
+            
+            return {
+                'ingresos_diarios': ingresos_diarios,
+                'labels_dias': labels_dias,
+                'metodos_pago': list(metodos_pago),
+                'servicios_rentables': list(servicios_rentables),
+                'ingresos_dentistas': list(ingresos_dentistas),
+            }
+        except Exception as e:
+            logger.error(f"Error obteniendo datos de gráficos: {e}")
+            return {}
+    
+    def get_alertas_pendientes(self):
+        """Obtiene alertas y pendientes críticos"""
+        try:
+            # Pacientes con saldo alto
+            pacientes_saldo_alto = models.Paciente.objects.filter(
+                saldo_global__gt=5000  # Más de $5000
+            ).order_by('-saldo_global')[:5]
+            
+            # Citas sin pagar (más de 7 días) - Citas completadas con saldo pendiente
+            hace_una_semana = timezone.now() - timedelta(days=7)
+            # Como costo_real es un property, filtramos en Python
+            citas_completadas_antiguas = models.Cita.objects.filter(
+                estado__in=['COM', 'ATN'],  # Completada o Atendida
+                fecha_hora__lt=hace_una_semana
+            ).select_related('paciente', 'dentista').prefetch_related(
+                'servicios_planeados', 'tratamientos_realizados__servicios', 'pagos'
+            ).order_by('-fecha_hora')
+
+            citas_vencidas = [cita for cita in citas_completadas_antiguas if cita.saldo_pendiente > 0][:5]
+            
+            # Pagos del día que requieren atención
+            pagos_altos_hoy = models.Pago.objects.filter(
+                fecha_pago__date=timezone.now().date(),
+                monto__gt=2000
+            ).select_related('cita__paciente').order_by('-monto')[:5]
+            
+            return {
+                'pacientes_saldo_alto': pacientes_saldo_alto,
+                'citas_vencidas': citas_vencidas,
+                'pagos_altos_hoy': pagos_altos_hoy,
+            }
+        except Exception as e:
+            logger.error(f"Error obteniendo alertas: {e}")
+            return {}
+    
+    def get_pagos_recientes(self):
+        """Obtiene los pagos más recientes"""
+        try:
+            pagos_recientes = models.Pago.objects.select_related(
+                'cita__paciente',
+                'cita__dentista'
+            ).order_by('-fecha_pago')[:10]
+            
+            return {
+                'pagos_recientes': pagos_recientes,
+            }
+        except Exception as e:
+            logger.error(f"Error obteniendo pagos recientes: {e}")
+            return {}
+    
+    def get_accesos_reportes(self):
+        """Obtiene accesos rápidos a reportes"""
+        return {
+            'reportes_disponibles': [
+                {
+                    'nombre': 'Reporte de Ingresos',
+                    'descripcion': 'Análisis detallado de ingresos por período',
+                    'url': 'core:reporte_ingresos',
+                    'icon': 'bi bi-graph-up'
+                },
+                {
+                    'nombre': 'Saldos Pendientes',
+                    'descripcion': 'Pacientes con pagos pendientes',
+                    'url': 'core:reporte_saldos',
+                    'icon': 'bi bi-exclamation-triangle'
+                },
+                {
+                    'nombre': 'Reporte de Facturación',
+                    'descripcion': 'Facturación y comprobantes fiscales',
+                    'url': 'core:reporte_facturacion',
+                    'icon': 'bi bi-receipt'
+                },
+                {
+                    'nombre': 'Servicios más Vendidos',
+                    'descripcion': 'Análisis de servicios por demanda',
+                    'url': 'core:reporte_servicios_vendidos',
+                    'icon': 'bi bi-trophy'
+                }
+            ]
+        }
+
+
+@tenant_login_required
+def reporte_ingresos_api(request):
+    form = forms.ReporteIngresosForm(request.GET or None)
+    data = {'labels': [], 'values': []}
+    from datetime import timedelta
+    today = timezone.now().date()
+    default_inicio = today - timedelta(days=30)
+    default_fin = today
+    if form.is_valid():
+        fecha_inicio = form.cleaned_data['fecha_inicio'] or default_inicio
+        fecha_fin = form.cleaned_data['fecha_fin'] or default_fin
+    else:
+        fecha_inicio, fecha_fin = default_inicio, default_fin
+    ingresos = models.Pago.objects.filter(
+        fecha_pago__date__gte=fecha_inicio,
+        fecha_pago__date__lte=fecha_fin
+    ).values('fecha_pago__date').annotate(total_dia=Sum('monto')).order_by('fecha_pago__date')
+    for item in ingresos:
+        data['labels'].append(item['fecha_pago__date'].strftime('%d/%m/%Y'))
+        data['values'].append(float(item['total_dia']))
+    return JsonResponse(data)
+
+
+@tenant_login_required
+def reporte_saldos_api(request):
+    # USAR SALDO_GLOBAL DE PACIENTES
+    saldos = models.Paciente.objects.filter(
+        saldo_global__gt=0
+    ).values('nombre', 'apellido', 'saldo_global').order_by('-saldo_global')[:10]
+    
+    data = {
+        'labels': [f"{item['nombre']} {item['apellido']}" for item in saldos],
+        'values': [float(item['saldo_global']) for item in saldos]
+    }
+    return JsonResponse(data)
+
+
+class ReporteServiciosMasVendidosView(TenantLoginRequiredMixin, ListView):
+    model = models.Servicio
+    template_name = 'core/reportes/reporte_servicios_vendidos.html'
+    context_object_name = 'servicios'
+
+    def get_queryset(self):
+        # Servicios vendidos desde el resumen diario (ResumenServicioDiario)
+        servicios, self.total_cantidad, self.total_ingresos = (
+            services.ResumenReportesService.servicios_mas_vendidos()
+        )
+        return servicios
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        servicios = context['servicios']
+
+        context['total_cantidad'] = self.total_cantidad
+        context['total_ingresos'] = self.total_ingresos
+        context['promedio_ingreso'] = self.total_ingresos / len(servicios) if servicios else 0
+
+        return context
+
+
+class ReporteIngresosPorDentistaView(TenantLoginRequiredMixin, ListView):
+    model = models.Pago
+    template_name = 'core/reportes/reporte_ingresos_dentista.html'
+    context_object_name = 'pagos'
+
+    def get_queryset(self):
+        queryset = models.Pago.objects.select_related('paciente', 'cita__dentista').order_by('-fecha_pago')
+        form = forms.ReporteIngresosDentistaForm(self.request.GET or None)
+
+        if form and form.is_valid():
+            dentista = form.cleaned_data.get('dentista')
+            if dentista:
+                queryset = queryset.filter(cita__dentista=dentista)
+            
+            fecha_inicio = form.cleaned_data.get('fecha_inicio')
+            if fecha_inicio:
+                queryset = queryset.filter(fecha_pago__date__gte=fecha_inicio)
+
+            fecha_fin = form.cleaned_data.get('fecha_fin')
+            if fecha_fin:
+                queryset = queryset.filter(fecha_pago__date__lte=fecha_fin)
+        else:
+            # Defaults si no hay parámetros válidos
+            from datetime import timedelta
+            today = timezone.now().date()
+            default_inicio = today - timedelta(days=30)
+            default_fin = today
+            queryset = queryset.filter(fecha_pago__date__gte=default_inicio, fecha_pago__date__lte=default_fin)
+        
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        from datetime import timedelta
+        today = timezone.now().date()
+        default_inicio = today - timedelta(days=30)
+        default_fin = today
+        # Mantener valores por defecto visibles cuando no hay GET (o solo paginación)
+        if 'fecha_inicio' in self.request.GET or 'fecha_fin' in self.request.GET:
+            form = forms.ReporteIngresosDentistaForm(self.request.GET)
+        else:
+            form = forms.ReporteIngresosDentistaForm(initial={'fecha_inicio': default_inicio, 'fecha_fin': default_fin})
+        context['form'] = form
+        context['default_fecha_inicio'] = default_inicio.isoformat()
+        context['default_fecha_fin'] = default_fin.isoformat()
+        context['total_ingresos'] = self.get_queryset().aggregate(total=Sum('monto'))['total'] or 0
+        return context
+
+
+class ReporteServiciosVendidosPeriodoView(TenantLoginRequiredMixin, TemplateView):
+    template_name = 'core/reportes/reporte_servicios_vendidos_periodo.html'
+
+    def get_context_data(self, **kwargs):
+        from datetime import date
+        context = super().get_context_data(**kwargs)
+        form = forms.ReporteServiciosForm(self.request.GET or None)
+
+        # Valores por defecto si no vienen parámetros
+        today = timezone.now().date()
+        periodo = 'mes'
+        fecha_inicio = None
+        fecha_fin = today
+        dentista = None
+
+        if form.is_valid():
+            periodo = form.cleaned_data.get('periodo') or 'semana'
+            fecha_inicio = form.cleaned_data.get('fecha_inicio')
+            fecha_fin = form.cleaned_data.get('fecha_fin') or today
+            dentista = form.cleaned_data.get('dentista')
+        else:
+            periodo = (self.request.GET.get('periodo') or 'semana')
+
+        # Default ranges si no se especifican
+        if not fecha_inicio:
+            if periodo == 'mes':
+                # últimos 6 meses
+                start_month = (today.replace(day=1) - timedelta(days=150)).replace(day=1)
+                fecha_inicio = start_month
+            else:
+                # últimas 8 semanas
+                fecha_inicio = today - timedelta(weeks=8)
+
+        # Leer del resumen diario (día, dentista, servicio): una sola pasada
+        filas = services.ResumenReportesService.servicios(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            dentista=dentista,
+        ).values('dia', 'servicio__nombre').annotate(
+            veces=Sum('cantidad'),
+            total=Sum('ingresos')
+        ).order_by('dia')
+
+        from collections import defaultdict, Counter
+        from decimal import Decimal
+
+        # KPIs Globales y agrupación por periodo
+        total_servicios_vendidos = 0
+        total_ingresos = Decimal('0.00')
+        servicios_counter = Counter()
+        grouped = defaultdict(lambda: {'counter': Counter(), 'ingresos': defaultdict(Decimal)})
+
+        for fila in filas:
+            nombre = fila['servicio__nombre']
+            cantidad = fila['veces'] or 0
+            ingresos = fila['total'] or Decimal('0.00')
+            total_servicios_vendidos += cantidad
+            total_ingresos += ingresos
+            servicios_counter[nombre] += cantidad
+
+            if periodo == 'mes':
+                key = fila['dia'].strftime('%Y-%m')
+            else:
+                anio, semana, _ = fila['dia'].isocalendar()
+                key = f"{anio}-W{semana:02d}"
+            grouped[key]['counter'][nombre] += cantidad
+            grouped[key]['ingresos'][nombre] += ingresos
+
+        # Servicio top
+        servicio_top = servicios_counter.most_common(1)
+        servicio_top_nombre = servicio_top[0][0] if servicio_top else 'N/A'
+        servicio_top_cantidad = servicio_top[0][1] if servicio_top else 0
+
+        # Ticket promedio
+        ticket_promedio = total_ingresos / total_servicios_vendidos if total_servicios_vendidos > 0 else 0
+
+        # Convertir a formato esperado con ingresos
+        resultados = [
+            {
+                'periodo': key,
+                'items': [
+                    {
+                        'servicio': nombre,
+                        'cantidad': cant,
+                        'ingresos': float(data['ingresos'][nombre]),
+                        'precio_promedio': float(data['ingresos'][nombre]) / cant
+                    }
+                    for nombre, cant in data['counter'].most_common(10)
+                ]
+            }
+            for key, data in sorted(grouped.items())
+        ]
+
+        context.update({
+            'form': form,
+            'periodo': periodo,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'resultados': resultados,
+            # KPIs
+            'total_servicios_vendidos': total_servicios_vendidos,
+            'total_ingresos': total_ingresos,
+            'servicio_top_nombre': servicio_top_nombre,
+            'servicio_top_cantidad': servicio_top_cantidad,
+            'ticket_promedio': ticket_promedio,
+        })
+        return context
+
+
+class ReporteIngresosDentistaPeriodoView(TenantLoginRequiredMixin, TemplateView):
+    template_name = 'core/reportes/reporte_ingresos_dentista_periodo.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = forms.ReporteIngresosDentistaForm(self.request.GET or None)
+
+        today = timezone.now().date()
+        periodo = 'mes'
+        fecha_inicio = None
+        fecha_fin = today
+        dentista = None
+
+        if form.is_valid():
+            periodo = form.cleaned_data.get('periodo') or 'semana'
+            fecha_inicio = form.cleaned_data.get('fecha_inicio')
+            fecha_fin = form.cleaned_data.get('fecha_fin') or today
+            dentista = form.cleaned_data.get('dentista')
+        else:
+            periodo = (self.request.GET.get('periodo') or 'semana')
+
+        if not fecha_inicio:
+            if periodo == 'mes':
+                start_month = (today.replace(day=1) - timedelta(days=150)).replace(day=1)
+                fecha_inicio = start_month
+            else:
+                fecha_inicio = today - timedelta(weeks=8)
+
+        # Leer del resumen diario (día, dentista) en lugar de escanear Pago
+        qs = services.ResumenReportesService.ingresos(
+            fecha_inicio=fecha_inicio,
+            fecha_fin=fecha_fin,
+            dentista=dentista,
+        ).filter(dentista__isnull=False)
+        filas = list(qs.values(
+            'dia', 'dentista_id', 'dentista__nombre', 'dentista__apellido'
+        ).annotate(
+            ingresos=Sum('total'),
+        ).order_by('dia'))
+
+        from collections import defaultdict
+
+        def clave_periodo(fecha):
+            if periodo == 'mes':
+                return fecha.strftime('%Y-%m')
+            anio, semana, _ = fecha.isocalendar()
+            return f"{anio}-W{semana:02d}"
+
+        # Citas distintas por (periodo, dentista) sobre Pago: sumar num_citas del
+        # resumen contaría dos veces la cita pagada con dos métodos o en varios días
+        pagos = models.Pago.objects.filter(
+            fecha_pago__date__gte=fecha_inicio,
+            fecha_pago__date__lte=fecha_fin,
+            cita__dentista__isnull=False,
+        )
+        if dentista:
+            pagos = pagos.filter(cita__dentista=dentista)
+        citas_por_periodo = {
+            (clave_periodo(fila['inicio']), fila['cita__dentista_id']): fila['citas']
+            for fila in pagos.annotate(
+                inicio=TruncMonth('fecha_pago') if periodo == 'mes' else TruncWeek('fecha_pago')
+            ).values('inicio', 'cita__dentista_id').annotate(
+                citas=Count('cita_id', distinct=True)
+            ).order_by()
+        }
+
+        # KPIs Globales
+        total_ingresos = float(sum(f['ingresos'] or 0 for f in filas))
+
+        # Agrupar por dentista para KPIs
+        dentistas_stats = defaultdict(float)
+        nombres = {}
+        for f in filas:
+            dentistas_stats[f['dentista_id']] += float(f['ingresos'] or 0)
+            nombres[f['dentista_id']] = f"Dr. {f['dentista__nombre']} {f['dentista__apellido']}"
+
+        # Calcular dentista top y promedio
+        dentista_top_nombre = 'N/A'
+        dentista_top_ingresos = 0
+        total_dentistas = len(dentistas_stats)
+
+        if dentistas_stats:
+            top_id = max(dentistas_stats, key=dentistas_stats.get)
+            dentista_top_nombre = nombres[top_id]
+            dentista_top_ingresos = dentistas_stats[top_id]
+
+        promedio_por_dentista = total_ingresos / total_dentistas if total_dentistas > 0 else 0
+
+        # Total de citas atendidas en el periodo
+        total_citas = models.Cita.objects.filter(
+            fecha_hora__date__gte=fecha_inicio,
+            fecha_hora__date__lte=fecha_fin,
+            dentista__isnull=False,
+            estado__in=['ATN', 'COM']  # Atendida o Completada
+        )
+        if dentista:
+            total_citas = total_citas.filter(dentista=dentista)
+        total_citas_count = total_citas.count()
+
+        # Datos para gráficas y tablas (agrupados por periodo)
+        grouped = defaultdict(lambda: defaultdict(lambda: {'total': 0.0, 'citas': 0}))
+        for f in filas:
+            key = clave_periodo(f['dia'])
+            item = grouped[key][f['dentista_id']]
+            item['total'] += float(f['ingresos'] or 0)
+            item['citas'] = citas_por_periodo.get((key, f['dentista_id']), 0)
+
+        resultados = []
+        for key, por_dentista in sorted(grouped.items()):
+            items = [
+                {
+                    'dentista': nombres[dentista_id],
+                    'total': datos['total'],
+                    'citas': datos['citas'],
+                    'promedio_cita': datos['total'] / datos['citas'] if datos['citas'] > 0 else 0
+                }
+                for dentista_id, datos in por_dentista.items()
+            ]
+            items.sort(key=lambda item: -item['total'])
+            resultados.append({'periodo': key, 'items': items})
+
+        context.update({
+            'form': form,
+            'periodo': periodo,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'resultados': resultados,
+            # KPIs
+            'total_ingresos': total_ingresos,
+            'promedio_por_dentista': promedio_por_dentista,
+            'total_dentistas': total_dentistas,
+            'dentista_top_nombre': dentista_top_nombre,
+            'dentista_top_ingresos': dentista_top_ingresos,
+            'total_citas_count': total_citas_count,
+        })
+        return context
+
+
+class ReporteIngresosView(TenantLoginRequiredMixin, ListView):
+    model = models.Pago
+    template_name = 'core/reportes/reporte_ingresos.html'
+    context_object_name = 'pagos'
+    paginate_by = 20
+    
+    def get_queryset(self):
+        queryset = models.Pago.objects.select_related('paciente', 'cita__paciente').order_by('-fecha_pago')
+        form = forms.ReporteIngresosForm(self.request.GET or None)
+        from datetime import date, timedelta
+        today = timezone.now().date()
+        default_inicio = today - timedelta(days=30)
+        default_fin = today
+        if self.request.GET:
+            if form and form.is_valid():
+                fecha_inicio = form.cleaned_data.get('fecha_inicio') or default_inicio
+                fecha_fin = form.cleaned_data.get('fecha_fin') or default_fin
+            else:
+                fecha_inicio, fecha_fin = default_inicio, default_fin
+        else:
+            fecha_inicio, fecha_fin = default_inicio, default_fin
+        queryset = queryset.filter(fecha_pago__date__gte=fecha_inicio, fecha_pago__date__lte=fecha_fin)
+        return queryset
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        today = timezone.now().date()
+        default_inicio = today - timedelta(days=30)
+        default_fin = today
+        # Si el GET no trae fechas (ej. solo paginación), usar defaults visibles
+        if 'fecha_inicio' in self.request.GET or 'fecha_fin' in self.request.GET:
+            form = forms.ReporteIngresosForm(self.request.GET)
+        else:
+            form = forms.ReporteIngresosForm(initial={'fecha_inicio': default_inicio, 'fecha_fin': default_fin})
+        context['form'] = form
+        context['default_fecha_inicio'] = default_inicio.isoformat()
+        context['default_fecha_fin'] = default_fin.isoformat()
+
+        form_data = form.cleaned_data if form.is_valid() else {}
+        fecha_inicio = form_data.get('fecha_inicio') or default_inicio
+        fecha_fin = form_data.get('fecha_fin') or default_fin
+
+        # KPIs del periodo actual desde el resumen diario; solo el detalle paginado lee Pago
+        stats_actual, metodos_distribucion = self._kpis(fecha_inicio, fecha_fin)
+
+        context['total_ingresos'] = stats_actual['total']
+        context['total_pagos'] = stats_actual['count']
+        context['ticket_promedio'] = stats_actual['promedio']
+
+        # Método de pago más usado
+        if metodos_distribucion:
+            metodo_mas_usado = metodos_distribucion[0]
+            context['metodo_mas_usado'] = metodo_mas_usado['metodo_pago']
+            context['metodo_mas_usado_porcentaje'] = round((metodo_mas_usado['count'] / context['total_pagos'] * 100) if context['total_pagos'] > 0 else 0, 1)
+        else:
+            context['metodo_mas_usado'] = 'N/A'
+            context['metodo_mas_usado_porcentaje'] = 0
+
+        # Distribución por método de pago (para gráfica de pastel)
+        context['metodos_distribucion'] = metodos_distribucion
+
+        # Comparación con periodo anterior (para % de cambio)
+        duracion_periodo = (fecha_fin - fecha_inicio).days + 1
+        fecha_inicio_anterior = fecha_inicio - timedelta(days=duracion_periodo)
+        fecha_fin_anterior = fecha_inicio - timedelta(days=1)
+
+        stats_anterior, _ = self._kpis(fecha_inicio_anterior, fecha_fin_anterior)
+
+        # Calcular porcentajes de cambio
+        context['cambio_ingresos'] = self._calcular_cambio_porcentual(context['total_ingresos'], stats_anterior['total'])
+        context['cambio_pagos'] = self._calcular_cambio_porcentual(context['total_pagos'], stats_anterior['count'])
+        context['cambio_ticket'] = self._calcular_cambio_porcentual(context['ticket_promedio'], stats_anterior['promedio'])
+
+        return context
+
+    def _kpis(self, fecha_inicio, fecha_fin):
+        """
+        Totales del periodo y distribución por método de pago con un GROUP BY sobre
+        ResumenIngresoDiario (incluye los abonos sin cita, dentista null).
+        Devuelve ({'total', 'count', 'promedio'}, [{'metodo_pago', 'count', 'total_monto'}, ...]).
+        """
+        metodos = list(services.ResumenReportesService.ingresos(
+            fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+        ).values('metodo_pago').annotate(
+            count=Sum('num_pagos'),
+            total_monto=Sum('total'),
+        ).order_by('-count', 'metodo_pago'))
+        total = sum((m['total_monto'] or 0 for m in metodos), Decimal('0.00'))
+        count = sum(m['count'] or 0 for m in metodos)
+        for m in metodos:
+            # La plantilla vuelca la lista tal cual como JS: sin Decimal
+            m['total_monto'] = float(m['total_monto'] or 0)
+        return {'total': total, 'count': count, 'promedio': total / count if count else 0}, metodos
+
+    def _calcular_cambio_porcentual(self, actual, anterior):
+        """Calcula el cambio porcentual entre dos valores"""
+        if anterior == 0:
+            return 100 if actual > 0 else 0
+        return round(((actual - anterior) / anterior) * 100, 1)
+
+
+class ReporteSaldosView(TenantLoginRequiredMixin, ListView):
+    model = models.Paciente
+    template_name = 'core/reportes/reporte_saldos.html'
+    context_object_name = 'pacientes'
+
+    def get_queryset(self):
+        from datetime import date, timedelta
+
+        pacientes = models.Paciente.objects.all()
+        for paciente in pacientes:
+            paciente.actualizar_saldo_global()
+
+        queryset = pacientes.filter(saldo_global__gt=0).select_related('usuario').order_by('-saldo_global')
+
+        # Convertir a lista para preservar atributos dinámicos
+        lista_pacientes = list(queryset)
+
+        # Agregar última cita y calcular antigüedad para cada paciente
+        hoy = date.today()
+        for paciente in lista_pacientes:
+            ultima_cita = paciente.cita_set.order_by('-fecha_hora').first()
+            if ultima_cita:
+                dias_antiguedad = (hoy - ultima_cita.fecha_hora.date()).days
+                paciente.dias_antiguedad = dias_antiguedad
+                paciente.ultima_cita_fecha = ultima_cita.fecha_hora
+
+                # Categorizar por antigüedad
+                if dias_antiguedad <= 30:
+                    paciente.categoria_antiguedad = 'reciente'
+                    paciente.badge_class = 'success'
+                elif dias_antiguedad <= 60:
+                    paciente.categoria_antiguedad = 'media'
+                    paciente.badge_class = 'warning'
+                else:
+                    paciente.categoria_antiguedad = 'alta'
+                    paciente.badge_class = 'danger'
+            else:
+                paciente.dias_antiguedad = 0
+                paciente.ultima_cita_fecha = None
+                paciente.categoria_antiguedad = 'desconocida'
+                paciente.badge_class = 'secondary'
+
+        return lista_pacientes
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        from django.db.models import Sum, Count
+
+        # Usar object_list que ya tiene los atributos dinámicos asignados
+        pacientes = context['object_list']
+
+        # KPIs Generales
+        total_saldo = sum(p.saldo_global for p in pacientes)
+        total_pacientes = len(pacientes)
+
+        context['total_saldo'] = total_saldo
+        context['total_pacientes'] = total_pacientes
+
+        # KPIs por Antigüedad
+        saldo_0_30 = 0
+        saldo_31_60 = 0
+        saldo_61_mas = 0
+        pacientes_0_30 = 0
+        pacientes_31_60 = 0
+        pacientes_61_mas = 0
+
+        for paciente in pacientes:
+            if paciente.categoria_antiguedad == 'reciente':
+                saldo_0_30 += paciente.saldo_global
+                pacientes_0_30 += 1
+            elif paciente.categoria_antiguedad == 'media':
+                saldo_31_60 += paciente.saldo_global
+                pacientes_31_60 += 1
+            elif paciente.categoria_antiguedad == 'alta':
+                saldo_61_mas += paciente.saldo_global
+                pacientes_61_mas += 1
+
+        context['saldo_0_30'] = saldo_0_30
+        context['saldo_31_60'] = saldo_31_60
+        context['saldo_61_mas'] = saldo_61_mas
+        context['pacientes_0_30'] = pacientes_0_30
+        context['pacientes_31_60'] = pacientes_31_60
+        context['pacientes_61_mas'] = pacientes_61_mas
+
+        # Datos para gráfica apilada
+        context['datos_antiguedad'] = {
+            '0-30': {'saldo': float(saldo_0_30), 'pacientes': pacientes_0_30},
+            '31-60': {'saldo': float(saldo_31_60), 'pacientes': pacientes_31_60},
+            '>60': {'saldo': float(saldo_61_mas), 'pacientes': pacientes_61_mas}
+        }
+
+        return context
+
+
+class ReporteFacturacionView(TenantLoginRequiredMixin, ListView):
+    model = models.Cita
+    template_name = 'core/reportes/reporte_facturacion.html'
+    context_object_name = 'citas_facturacion'
+    
+    def get_queryset(self):
+        # Mostrar citas con factura solicitada (flag) o con pagos que tengan datos SAT (fallback)
+        base = models.Cita.objects.select_related('paciente').order_by('-fecha_hora')
+        queryset = base.filter(
+            Q(requiere_factura=True) | Q(pagos__forma_pago_sat__isnull=False)
+        ).distinct().prefetch_related(
+            'tratamientos_realizados__servicios',
+            'pagos__forma_pago_sat',
+            'pagos__metodo_sat'
+        )
+        
+        # Aplicar filtros basados en parámetros GET
+        nombre_paciente = self.request.GET.get('nombre_paciente', '').strip()
+        if nombre_paciente:
+            queryset = queryset.filter(
+                Q(paciente__usuario__first_name__icontains=nombre_paciente) |
+                Q(paciente__usuario__last_name__icontains=nombre_paciente) |
+                Q(paciente__nombre__icontains=nombre_paciente) |
+                Q(paciente__apellido__icontains=nombre_paciente)
+            )
+        
+        rfc_filtro = self.request.GET.get('rfc', '').strip()
+        if rfc_filtro:
+            queryset = queryset.filter(
+                paciente__datos_fiscales__rfc__icontains=rfc_filtro
+            )
+        
+        fecha_inicio = self.request.GET.get('fecha_inicio', '').strip()
+        if fecha_inicio:
+            try:
+                from datetime import datetime
+                fecha_inicio_dt = datetime.strptime(fecha_inicio, '%Y-%m-%d').date()
+                queryset = queryset.filter(fecha_hora__date__gte=fecha_inicio_dt)
+            except ValueError:
+                pass
+        
+        fecha_fin = self.request.GET.get('fecha_fin', '').strip()
+        if fecha_fin:
+            try:
+                from datetime import datetime
+                fecha_fin_dt = datetime.strptime(fecha_fin, '%Y-%m-%d').date()
+                queryset = queryset.filter(fecha_hora__date__lte=fecha_fin_dt)
+            except ValueError:
+                pass
+        
+        return queryset
+    
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        citas_qs = list(context.get('citas_facturacion') or context.get('object_list'))
+        
+        # Enriquecer cada cita con su último pago para evitar problemas en template
+        for cita in citas_qs:
+            ultimo_pago = cita.pagos.order_by('-fecha_pago').first()
+            cita.ultimo_pago = ultimo_pago
+        
+        # Pasar el nombre esperado por la plantilla actual
+        context['citas_a_facturar'] = citas_qs
+        # Calcular total a facturar como suma de montos pagados en estas citas
+        total = models.Pago.objects.filter(cita__in=citas_qs).aggregate(total=Sum('monto'))['total'] or 0
+        context['total_a_facturar'] = total
+        return context
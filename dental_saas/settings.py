@@ -63,20 +63,33 @@ TENANT_DOMAIN_MODEL = "tenants.Domain"
 # Tenant por defecto para desarrollo (cuando se accede por IP directamente)
 DEFAULT_TENANT_SCHEMA = 'dev'
 
+# Schema plantilla (migrado y con datos semilla) que se clona al crear una clínica.
+# Se construye con `python manage.py preparar_plantilla_tenant`; vacío = siempre migrar.
+TENANT_TEMPLATE_SCHEMA = os.environ.get('TENANT_TEMPLATE_SCHEMA', 'plantilla_tenant')
+
 MIDDLEWARE = [
+    'core.middleware.RequestLogContextMiddleware',  # Contexto de logging (request id, tenant, usuario)
     'tenants.middleware.PathBasedTenantMiddleware',  # Middleware personalizado para path-based tenants
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Para archivos estáticos
+    'core.middleware.AsyncWhiteNoiseMiddleware',  # Archivos estáticos (WhiteNoise, también bajo ASGI)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.PrincipalMiddleware',        # Grupos/perfiles del usuario, una consulta por request
     'core.middleware.LocalTimezoneMiddleware',    # Forzar zona horaria local
     'core.middleware.NoCacheMiddleware',          # Prevenir cacheo de respuestas
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Histograma de consultas/tiempo de BD por vista (ver core.presupuesto_consultas).
+# Activo por defecto en desarrollo; en producción con QUERY_BUDGET_MIDDLEWARE=True.
+QUERY_BUDGET_MIDDLEWARE = os.environ.get('QUERY_BUDGET_MIDDLEWARE', str(DEBUG)).lower() in ('1', 'true', 'yes')
+if QUERY_BUDGET_MIDDLEWARE:
+    MIDDLEWARE.insert(MIDDLEWARE.index('django.contrib.auth.middleware.AuthenticationMiddleware') + 1,
+                      'core.middleware.QueryBudgetMiddleware')
+
 PUBLIC_SCHEMA_URLCONF = 'dental_saas.urls_public'
 ROOT_URLCONF = 'dental_saas.urls_tenant'
 TENANT_URLCONF_MODULE = 'dental_saas.urls_tenant'
@@ -84,8 +97,8 @@ TENANT_URLCONF_MODULE = 'dental_saas.urls_tenant'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates', BASE_DIR / 'core' / 'templates', BASE_DIR / 'core' / 'templates' / 'core'],
-        'APP_DIRS': True,
+        # core/templates ya se resuelve por app_directories; no duplicar rutas de búsqueda
+        'DIRS': [BASE_DIR / 'templates'],
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -93,17 +106,66 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.menu_dinamico',
+                'core.context_processors.fragmentos_cache',
+                'core.context_processors.principal',
+            ],
+            # Plantillas compiladas una sola vez por proceso (runserver limpia
+            # el caché al detectar cambios en archivos de plantilla)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'dental_saas.wsgi.application'
+ASGI_APPLICATION = 'dental_saas.asgi.application'
+
+# Modo ASGI (gunicorn con workers de uvicorn, ver gunicorn.conf.py): los endpoints
+# JSON que la agenda y los formularios consultan en cada interacción se sirven con
+# las vistas async de core/views_async.py. Con WSGI se usan las versiones síncronas.
+# Conviene activarlo junto con DB_POOL (ver configurar_pool).
+ASGI_MODE = os.environ.get('ASGI_MODE', 'false').lower() in ('1', 'true', 'yes')
 
 # --- Database Configuration ---
 # Soporte para DATABASE_URL (DigitalOcean, Heroku, etc.)
 import dj_database_url
 
+# Backend de django-tenants que omite SET search_path cuando la conexión ya está
+# en el schema pedido (ver tenants/postgresql_backend/base.py)
+DB_ENGINE = 'tenants.postgresql_backend'
+TENANT_LIMIT_SET_CALLS = True
+# Segundos que PathBasedTenantMiddleware reutiliza una Clinica ya resuelta por slug
+TENANT_CACHE_SECONDS = 60
+
+# Pool de conexiones de psycopg3 (Django 5.1+, requiere psycopg-pool). Con pool,
+# CONN_MAX_AGE debe ser 0: cada request toma y devuelve una conexión del pool.
+DB_POOL = os.environ.get('DB_POOL', 'false').lower() in ('1', 'true', 'yes')
+DB_POOL_OPTIONS = {
+    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '8')),
+    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', '10')),
+}
+
+
+def configurar_pool(base_datos):
+    """
+    Activa el pool de psycopg3 en la configuración de BD si DB_POOL está activo.
+    Con ASGI cada request corre en un hilo distinto y las conexiones persistentes
+    quedarían abiertas en hilos que ya no se reutilizan: sin pool se desactivan.
+    """
+    if DB_POOL:
+        base_datos['CONN_MAX_AGE'] = 0
+        base_datos['CONN_HEALTH_CHECKS'] = False
+        base_datos.setdefault('OPTIONS', {})['pool'] = dict(DB_POOL_OPTIONS)
+    elif ASGI_MODE:
+        base_datos['CONN_MAX_AGE'] = 0
+    return base_datos
+
+
 if os.environ.get('DATABASE_URL'):
     # Configuración para producción (DigitalOcean, Heroku, etc.)
     DATABASES = {
@@ -114,12 +176,12 @@ if os.environ.get('DATABASE_URL'):
         )
     }
     # Cambiar engine a django-tenants
-    DATABASES['default']['ENGINE'] = 'django_tenants.postgresql_backend'
+    DATABASES['default']['ENGINE'] = DB_ENGINE
 else:
     # Configuración para desarrollo local
     DATABASES = {
         'default': {
-            'ENGINE': 'django_tenants.postgresql_backend',
+            'ENGINE': DB_ENGINE,
             'NAME': os.environ.get('DB_NAME', 'dental_db'),
             'USER': os.environ.get('DB_USER', 'postgres'),
             'PASSWORD': os.environ.get('DB_PASSWORD', 'admin12345'),
@@ -131,6 +193,7 @@ else:
             },
         }
     }
+configurar_pool(DATABASES['default'])
 
 # --- Password Validation ---
 AUTH_PASSWORD_VALIDATORS = [
@@ -160,7 +223,17 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'  # Para producción
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
 # WhiteNoise Configuration
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+# Django 5.1+ ignora STATICFILES_STORAGE; el backend se declara en STORAGES.
+# Con el manifest, {% static %} genera nombres con hash y WhiteNoise los sirve
+# con Cache-Control "max-age=315360000, immutable".
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
 WHITENOISE_USE_FINDERS = True
 WHITENOISE_AUTOREFRESH = DEBUG
 
@@ -219,17 +292,30 @@ DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 LOG_LEVEL = os.environ.get('LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
 LOG_DIR = BASE_DIR / 'logs'
 LOG_DIR.mkdir(parents=True, exist_ok=True)
+# Fracción de eventos DEBUG que se conservan en los loggers del camino de cada
+# request (middleware de tenants/autenticación). 1 = todos, 0.1 = uno de cada diez.
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', '1' if DEBUG else '0.1'))
 
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'contexto_request': {
+            '()': 'core.logging_utils.RequestContextFilter',
+        },
+        'muestreo': {
+            '()': 'core.logging_utils.SamplingFilter',
+            'rate': LOG_SAMPLE_RATE,
+            'max_level': 'DEBUG',
+        },
+    },
     'formatters': {
         'verbose': {
-            'format': '[{levelname}] {asctime} {name} {module}:{lineno} {message}',
+            'format': '[{levelname}] {asctime} [{request_id}] {tenant} {usuario} {name} {module}:{lineno} {message}',
             'style': '{',
         },
         'simple': {
-            'format': '[{levelname}] {name}: {message}',
+            'format': '[{levelname}] [{request_id}] {tenant} {name}: {message}',
             'style': '{',
         },
     },
@@ -237,15 +323,18 @@ LOGGING = {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'simple',
+            'filters': ['contexto_request'],
             'level': LOG_LEVEL,
         },
+        # La escritura a disco ocurre en un hilo aparte (QueueListener)
         'file_rotating': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            'class': 'core.logging_utils.QueueRotatingFileHandler',
             'filename': str(LOG_DIR / 'app.log'),
             'maxBytes': 5 * 1024 * 1024,  # 5MB
             'backupCount': 3,
             'encoding': 'utf-8',
             'formatter': 'verbose',
+            'filters': ['contexto_request'],
             'level': LOG_LEVEL,
         },
     },
@@ -265,6 +354,62 @@ LOGGING = {
             'level': LOG_LEVEL,
             'propagate': False,
         },
+        'tenants': {
+            'handlers': ['console', 'file_rotating'],
+            'level': LOG_LEVEL,
+            'propagate': False,
+        },
+        # Loggers del camino de cada request: se muestrean los eventos DEBUG
+        'tenants.middleware': {
+            'filters': ['muestreo'],
+        },
+        'core.middleware': {
+            'filters': ['muestreo'],
+        },
+        'core.tenant_middleware': {
+            'filters': ['muestreo'],
+        },
+        'core.mixins': {
+            'filters': ['muestreo'],
+        },
     },
 }
 
+
+# --- Tareas en segundo plano (core/tareas.py) ---
+# Sin workers (desarrollo) las tareas se ejecutan en el mismo proceso al confirmar
+# la transacción; en producción las ejecuta `python manage.py run_workers`.
+TAREAS_SINCRONAS = os.environ.get('TAREAS_SINCRONAS', str(DEBUG)).lower() in ('1', 'true', 'yes')
+# Una tarea en curso más vieja que esto se da por abandonada (worker caído) y se reintenta
+TAREAS_TIMEOUT_SEGUNDOS = int(os.environ.get('TAREAS_TIMEOUT_SEGUNDOS', '900'))
+# Días que se conservan las tareas completadas antes de purgarlas
+TAREAS_RETENCION_DIAS = 7
+# Los saldos y stocks marcados por las señales (core/recalculos.py) se encolan como
+# tareas en lugar de recalcularse al confirmar la transacción de la request
+RECALCULOS_EN_SEGUNDO_PLANO = os.environ.get('RECALCULOS_EN_SEGUNDO_PLANO', 'false').lower() in ('1', 'true', 'yes')
+# Al agregar servicios a un TratamientoCita se descuentan sus insumos (ServicioInsumo)
+# de los lotes de la unidad dental de la cita, FIFO por caducidad
+CONSUMO_AUTOMATICO_INSUMOS = os.environ.get('CONSUMO_AUTOMATICO_INSUMOS', 'true').lower() in ('1', 'true', 'yes')
+# Método con el que se valúa el inventario por defecto (core/services.py, ValuacionInventarioService):
+# 'PEPS' (cada lote a su costo) o 'PROMEDIO' (costo promedio ponderado por insumo)
+METODO_VALUACION_INVENTARIO = os.environ.get('METODO_VALUACION_INVENTARIO', 'PEPS').upper()
+# Digest diario de alertas de inventario (`python manage.py alertas_inventario`, cada noche):
+# días hacia adelante para "próximo a caducar" y días que se conservan los digests
+ALERTAS_INVENTARIO_DIAS_CADUCIDAD = int(os.environ.get('ALERTAS_INVENTARIO_DIAS_CADUCIDAD', '30'))
+ALERTAS_INVENTARIO_RETENCION_DIAS = 30
+
+# --- Presupuestos de rendimiento ---
+# Tiempo máximo (ms) para importar el URLconf en frío (django.setup() + ROOT_URLCONF).
+# Lo verifica `python manage.py medir_importacion`.
+IMPORT_TIME_BUDGET_MS = int(os.environ.get('IMPORT_TIME_BUDGET_MS', '2500'))
+# Peso máximo (KB) del código fuente de las plantillas pesadas y del JS/CSS que
+# aún quede inline en ellas. Lo verifica `python manage.py verificar_peso_paginas`.
+PAGE_HTML_BUDGET_KB = 40
+PAGE_INLINE_BUDGET_KB = 2
+# Aumento relativo de p95 tolerado por `python manage.py benchmark_rendimiento --comparar`
+# antes de marcar un escenario como regresión (el número de consultas no puede aumentar).
+BENCHMARK_REGRESSION_TOLERANCE = float(os.environ.get('BENCHMARK_REGRESSION_TOLERANCE', '0.25'))
+# Presupuesto de consultas para vistas sin @presupuesto_consultas, y tamaño de la
+# ventana móvil del histograma por vista. Lo verifica `python manage.py verificar_presupuestos_consultas`.
+QUERY_BUDGET_DEFAULT = 50
+QUERY_BUDGET_WINDOW = 500
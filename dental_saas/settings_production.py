@@ -26,7 +26,7 @@ if database_url.startswith('postgresql'):
     # Configuración para PostgreSQL con django-tenants
     db_config = dj_database_url.parse(database_url)
     DATABASES['default'].update({
-        'ENGINE': 'django_tenants.postgresql_backend',
+        'ENGINE': DB_ENGINE,
         'NAME': db_config['NAME'],
         'USER': db_config['USER'],
         'PASSWORD': db_config['PASSWORD'],
@@ -37,6 +37,7 @@ if database_url.startswith('postgresql'):
             'sslmode': 'require',
         },
     })
+    configurar_pool(DATABASES['default'])
 else:
     # Fallback para SQLite (desarrollo local)
     DATABASES['default'] = dj_database_url.config(
@@ -52,12 +53,23 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'mediafiles')
 
-# WhiteNoise for static files
-MIDDLEWARE.insert(1, 'whitenoise.middleware.WhiteNoiseMiddleware')
+# WhiteNoise for static files (la versión async-capable de core.middleware)
+if 'core.middleware.AsyncWhiteNoiseMiddleware' not in MIDDLEWARE:
+    MIDDLEWARE.insert(1, 'core.middleware.AsyncWhiteNoiseMiddleware')
+
+# Histograma de consultas por vista: en producción solo si se pide explícitamente
+QUERY_BUDGET_MIDDLEWARE = config('QUERY_BUDGET_MIDDLEWARE', default=False, cast=bool)
+if not QUERY_BUDGET_MIDDLEWARE and 'core.middleware.QueryBudgetMiddleware' in MIDDLEWARE:
+    MIDDLEWARE.remove('core.middleware.QueryBudgetMiddleware')
+elif QUERY_BUDGET_MIDDLEWARE and 'core.middleware.QueryBudgetMiddleware' not in MIDDLEWARE:
+    MIDDLEWARE.append('core.middleware.QueryBudgetMiddleware')
+
+# Tareas en segundo plano: en producción las ejecuta el proceso `worker` (run_workers)
+TAREAS_SINCRONAS = config('TAREAS_SINCRONAS', default=False, cast=bool)
 
 # WhiteNoise settings
 WHITENOISE_USE_FINDERS = True
-WHITENOISE_AUTOREFRESH = True
+WHITENOISE_AUTOREFRESH = DEBUG  # Autorefresh desactiva el índice en memoria y el cacheo de larga duración
 
 # Security settings for production
 if not DEBUG:
@@ -77,9 +89,19 @@ if not DEBUG:
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
+    'filters': {
+        'contexto_request': {
+            '()': 'core.logging_utils.RequestContextFilter',
+        },
+        'muestreo': {
+            '()': 'core.logging_utils.SamplingFilter',
+            'rate': LOG_SAMPLE_RATE,
+            'max_level': 'DEBUG',
+        },
+    },
     'formatters': {
         'verbose': {
-            'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
+            'format': '{levelname} {asctime} [{request_id}] {tenant} {usuario} {module} {process:d} {thread:d} {message}',
             'style': '{',
         },
     },
@@ -87,6 +109,7 @@ LOGGING = {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
+            'filters': ['contexto_request'],
         },
     },
     'root': {
@@ -99,6 +122,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        # Loggers del camino de cada request: se muestrean los eventos DEBUG
+        'tenants.middleware': {'filters': ['muestreo']},
+        'core.middleware': {'filters': ['muestreo']},
+        'core.tenant_middleware': {'filters': ['muestreo']},
+        'core.mixins': {'filters': ['muestreo']},
     },
 }
 
@@ -0,0 +1,17 @@
+"""
+Configuración de gunicorn; se carga sola al arrancar desde la raíz del proyecto.
+
+Por defecto sirve dental_saas.wsgi con workers síncronos. Con ASGI_MODE=true
+sirve dental_saas.asgi con workers de uvicorn, y los endpoints JSON de consulta
+frecuente usan las vistas async de core/views_async.py (ver settings.ASGI_MODE).
+Para comparar ambos modos: `python manage.py prueba_carga_async`.
+"""
+import os
+
+ASGI_MODE = os.environ.get('ASGI_MODE', 'false').lower() in ('1', 'true', 'yes')
+
+if ASGI_MODE:
+    wsgi_app = 'dental_saas.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'dental_saas.wsgi:application'
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django_tenants.admin import TenantAdminMixin
-from .models import Clinica, Domain
+from .models import Clinica, Domain, TareaEncolada
 
 @admin.register(Clinica)
 class ClinicaAdmin(TenantAdminMixin, admin.ModelAdmin):
@@ -14,4 +14,12 @@ class ClinicaAdmin(TenantAdminMixin, admin.ModelAdmin):
 
 @admin.register(Domain)
 class DomainAdmin(admin.ModelAdmin):
-    list_display = ('domain', 'tenant')
\ No newline at end of file
+    list_display = ('domain', 'tenant')
+
+@admin.register(TareaEncolada)
+class TareaEncoladaAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre', 'schema_name', 'estado', 'intentos', 'ejecutar_despues', 'terminada_en')
+    list_filter = ('estado', 'schema_name')
+    search_fields = ('nombre', 'clave')
+    exclude = ('adjunto',)
+    readonly_fields = ('creada_en', 'iniciada_en', 'terminada_en', 'worker', 'ultimo_error')
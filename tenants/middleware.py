@@ -2,14 +2,44 @@
 Middleware personalizado para enrutamiento de tenants por PATH
 En vez de subdominios (demo.example.com), usa paths (/demo/)
 """
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
 from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.http import Http404
 from django.db import connection
 from tenants.models import Clinica
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+# Clínicas ya resueltas por slug en este proceso: {slug: (expira_en, clinica)}
+_clinicas_por_slug = {}
+
+
+def obtener_clinica(slug):
+    """
+    Devuelve la Clinica del slug usando un caché en memoria de pocos segundos
+    (settings.TENANT_CACHE_SECONDS), para no consultar tenants_clinica en cada
+    request. Los slugs inexistentes no se cachean; guardar o borrar una Clinica
+    vacía el caché.
+    """
+    ahora = time.monotonic()
+    guardada = _clinicas_por_slug.get(slug)
+    if guardada and guardada[0] > ahora:
+        return guardada[1]
+    clinica = Clinica.objects.get(schema_name=slug)
+    _clinicas_por_slug[slug] = (ahora + getattr(settings, 'TENANT_CACHE_SECONDS', 60), clinica)
+    return clinica
+
+
+@receiver([post_save, post_delete], sender=Clinica)
+def _limpiar_clinicas_por_slug(sender, **kwargs):
+    # Solo alcanza al proceso que guardó/borró la clínica; los demás workers
+    # ven el cambio al vencer TENANT_CACHE_SECONDS
+    _clinicas_por_slug.clear()
+
 
 class PathBasedTenantMiddleware:
     """
@@ -18,8 +48,16 @@ class PathBasedTenantMiddleware:
              /sgdental/ -> tenant 'sgdental'
     """
     
+    # Sirve tanto con WSGI como con ASGI: bajo ASGI no fuerza a Django a
+    # envolver en un hilo el resto de la cadena (y las vistas async)
+    async_capable = True
+    sync_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
         # Lista de paths que NO son tenants (solo esquema público)
         self.excluded_paths = [
             '/admin/',
@@ -30,8 +68,21 @@ class PathBasedTenantMiddleware:
             '/api/',
             '/__debug__/',
         ]
-    
+
     def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        self.resolver_tenant(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        # La conexión es local al hilo: el schema debe fijarse en el mismo hilo
+        # (thread_sensitive) donde después corre el ORM async de la vista
+        await sync_to_async(self.resolver_tenant)(request)
+        return await self.get_response(request)
+
+    def resolver_tenant(self, request):
+        """Fija el schema de la conexión y request.tenant según el primer segmento del path."""
         # Obtener el path
         path = request.path_info
         
@@ -39,8 +90,7 @@ class PathBasedTenantMiddleware:
         if any(path.startswith(excluded) for excluded in self.excluded_paths):
             # Usar esquema público para estos paths
             connection.set_schema_to_public()
-            response = self.get_response(request)
-            return response
+            return
         
         # Extraer el tenant del path
         # Formato esperado: /tenant_name/resto/del/path
@@ -49,23 +99,21 @@ class PathBasedTenantMiddleware:
         if len(path_parts) > 0:
             tenant_slug = path_parts[0]
             
-            # Primero asegurarse de estar en esquema público para buscar
-            connection.set_schema_to_public()
-            
             try:
-                # Buscar el tenant
-                tenant = Clinica.objects.get(schema_name=tenant_slug)
+                # Buscar el tenant (tenants_clinica vive en public, que siempre
+                # está en el search_path, así que no hace falta cambiar de schema)
+                tenant = obtener_clinica(tenant_slug)
                 
-                # Establecer el tenant
+                # Establecer el tenant; el backend omite el SET search_path si la
+                # conexión ya está en este schema
                 connection.set_tenant(tenant)
                 
                 # Guardar el tenant y el prefijo en el request para uso posterior
                 request.tenant = tenant
                 request.tenant_prefix = f'/{tenant_slug}'
                 
-                # DEBUG: Log session info
-                logger.info(f"[Middleware] Tenant: {tenant_slug}, Path: {request.path}, User authenticated: {request.user.is_authenticated if hasattr(request, 'user') else 'N/A'}")
-                logger.info(f"[Middleware] Session key: {request.session.session_key if hasattr(request, 'session') else 'NO SESSION'}")
+                # Tenant y usuario los agrega RequestContextFilter a cada registro
+                logger.debug("[Middleware] Tenant resuelto para %s", request.path)
                 
                 # Ajustar el path para que Django resuelva correctamente las URLs
                 # /demo/pacientes/ -> /pacientes/
@@ -84,6 +132,4 @@ class PathBasedTenantMiddleware:
             # Path raíz (/), usar esquema público
             connection.set_schema_to_public()
             request.tenant = None
-        
-        response = self.get_response(request)
-        return response
+
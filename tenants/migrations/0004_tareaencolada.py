@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0003_clinica_documento_consentimiento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TareaEncolada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('schema_name', models.CharField(db_index=True, max_length=63)),
+                ('nombre', models.CharField(help_text='Ruta de la función registrada con @tarea', max_length=200)),
+                ('argumentos', models.JSONField(blank=True, default=dict)),
+                ('adjunto', models.BinaryField(blank=True, help_text='Archivo que recibe la tarea (p. ej. un Excel a importar)', null=True)),
+                ('clave', models.CharField(blank=True, default='', help_text='Clave de deduplicación: no se encola otra pendiente igual', max_length=200)),
+                ('estado', models.CharField(choices=[('PEN', 'Pendiente'), ('CUR', 'En curso'), ('COM', 'Completada'), ('FAL', 'Fallida')], default='PEN', max_length=3)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('max_intentos', models.PositiveSmallIntegerField(default=5)),
+                ('ejecutar_despues', models.DateTimeField(help_text='No se toma antes de esta fecha (retraso o backoff de reintento)')),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_en', models.DateTimeField(blank=True, null=True)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+                ('worker', models.CharField(blank=True, default='', max_length=100)),
+                ('ultimo_error', models.TextField(blank=True, default='')),
+            ],
+            options={
+                'verbose_name': 'Tarea encolada',
+                'verbose_name_plural': 'Tareas encoladas',
+                'indexes': [models.Index(fields=['estado', 'ejecutar_despues'], name='tarea_estado_ejecutar_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('estado', 'PEN'), models.Q(('clave', ''), _negated=True)), fields=('schema_name', 'clave'), name='tarea_pendiente_clave_unica')],
+            },
+        ),
+    ]
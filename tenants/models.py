@@ -14,5 +14,72 @@ class Clinica(TenantMixin):
     def __str__(self):
         return self.nombre
 
+    def create_schema(self, check_if_exists=False, sync_schema=True, verbosity=1):
+        """
+        Crea el schema clonando la plantilla (settings.TENANT_TEMPLATE_SCHEMA) si
+        está vigente; si no, usa el flujo normal de migraciones de django-tenants.
+        """
+        if sync_schema:
+            from django_tenants.postgresql_backend.base import _check_schema_name
+            from django_tenants.utils import schema_exists
+            from core.services import ProvisionamientoTenantService
+
+            # Mismo chequeo que TenantMixin.create_schema: el nombre se interpola en el SQL del clonado
+            _check_schema_name(self.schema_name)
+            if check_if_exists and schema_exists(self.schema_name):
+                return False
+            if ProvisionamientoTenantService.clonar_desde_plantilla(self, verbosity=verbosity):
+                return True
+        return super().create_schema(check_if_exists=check_if_exists, sync_schema=sync_schema, verbosity=verbosity)
+
 class Domain(DomainMixin):
-    pass
\ No newline at end of file
+    pass
+
+class TareaEncolada(models.Model):
+    """
+    Cola de tareas en segundo plano (ver core/tareas.py). Vive en el schema
+    público para que un solo grupo de workers (`manage.py run_workers`) atienda
+    a todas las clínicas; cada tarea guarda el schema donde debe ejecutarse.
+    """
+    PENDIENTE = 'PEN'
+    EN_CURSO = 'CUR'
+    COMPLETADA = 'COM'
+    FALLIDA = 'FAL'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (EN_CURSO, 'En curso'),
+        (COMPLETADA, 'Completada'),
+        (FALLIDA, 'Fallida'),
+    ]
+
+    schema_name = models.CharField(max_length=63, db_index=True)
+    nombre = models.CharField(max_length=200, help_text="Ruta de la función registrada con @tarea")
+    argumentos = models.JSONField(default=dict, blank=True)
+    adjunto = models.BinaryField(null=True, blank=True, help_text="Archivo que recibe la tarea (p. ej. un Excel a importar)")
+    clave = models.CharField(max_length=200, blank=True, default='', help_text="Clave de deduplicación: no se encola otra pendiente igual")
+    estado = models.CharField(max_length=3, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    ejecutar_despues = models.DateTimeField(help_text="No se toma antes de esta fecha (retraso o backoff de reintento)")
+    creada_en = models.DateTimeField(auto_now_add=True)
+    iniciada_en = models.DateTimeField(null=True, blank=True)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    ultimo_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        verbose_name = 'Tarea encolada'
+        verbose_name_plural = 'Tareas encoladas'
+        indexes = [
+            models.Index(fields=['estado', 'ejecutar_despues'], name='tarea_estado_ejecutar_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schema_name', 'clave'],
+                condition=models.Q(estado='PEN') & ~models.Q(clave=''),
+                name='tarea_pendiente_clave_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.nombre} [{self.schema_name}] {self.get_estado_display()}'
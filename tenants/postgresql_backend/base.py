@@ -0,0 +1,62 @@
+"""
+Backend de PostgreSQL para django-tenants que evita SET search_path redundantes.
+
+django-tenants descarta el search_path aplicado cada vez que se llama a
+set_tenant()/set_schema_to_public(), y PathBasedTenantMiddleware lo hace en cada
+request, así que cada request pagaba al menos un SET (dos si pasaba por public).
+Aquí se recuerda el search_path realmente vigente en la conexión física y solo se
+emite SET cuando cambia. Requiere TENANT_LIMIT_SET_CALLS = True.
+
+El valor recordado se invalida cuando puede dejar de ser cierto: al cerrar o
+devolver la conexión al pool (la siguiente puede ser otra conexión física) y al
+hacer rollback (un SET dentro de la transacción se revierte).
+
+search_path_sets cuenta los SET emitidos por esta conexión (ver medir_conexiones).
+"""
+from django_tenants.postgresql_backend.base import DatabaseWrapper as TenantDatabaseWrapper
+from django_tenants.utils import get_limit_set_calls
+
+
+class DatabaseWrapper(TenantDatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        self.search_path_aplicado = None
+        self.search_path_sets = 0
+        super().__init__(*args, **kwargs)
+
+    def _olvidar_search_path(self):
+        self.search_path_aplicado = None
+        self.search_path_set_schemas = None
+
+    def set_tenant(self, tenant, include_public=True):
+        if (self.tenant is not None and tenant.schema_name == self.schema_name
+                and include_public == self.include_public_schema):
+            # Mismo schema: solo actualizar el objeto tenant, sin invalidar el
+            # search_path ni el caché de ContentType
+            self.tenant = tenant
+            return
+        super().set_tenant(tenant, include_public)
+        if self.search_path_aplicado is not None and self._get_cursor_search_paths() == self.search_path_aplicado:
+            # La conexión ya tiene este search_path (p. ej. public -> tenant -> mismo tenant)
+            self.search_path_set_schemas = self.search_path_aplicado
+
+    def _cursor(self, name=None):
+        emitira_set = (not get_limit_set_calls()) or not self.search_path_set_schemas
+        cursor = super()._cursor(name=name)
+        if emitira_set and self.search_path_set_schemas:
+            self.search_path_sets += 1
+        self.search_path_aplicado = self.search_path_set_schemas
+        return cursor
+
+    def close(self):
+        self._olvidar_search_path()
+        super().close()
+
+    def _rollback(self):
+        self._olvidar_search_path()
+        return super()._rollback()
+
+    def _savepoint_rollback(self, sid):
+        self._olvidar_search_path()
+        return super()._savepoint_rollback(sid)
+